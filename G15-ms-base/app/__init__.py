@@ -1,9 +1,14 @@
 import os
-from flask import Flask
+import threading
+from flask import Flask, request
 from flask_caching import Cache
 from flask_sqlalchemy import SQLAlchemy
 from app.config import cache_config, factory
 from app.utils.logger_config import setup_logger
+from app.utils import circuit_breaker, http_transport, retry, tracing
+from app.utils.json_rapido import ProveedorJsonRapido
+from app.services.cache_stock import cache_disponibilidad, configurar_cache_stock
+from app.services.saga.admision import configurar_admision, control_admision
 
 logger = setup_logger(__name__)
 
@@ -12,6 +17,7 @@ cache = Cache()
 
 def create_app() -> Flask:
     app = Flask(__name__)
+    app.json = ProveedorJsonRapido(app)
     env = os.getenv('FLASK_ENV', 'development')
    
     try:
@@ -34,16 +40,117 @@ def create_app() -> Flask:
     
     logger.info(f"--> PARCHE URLs: Stock={app.config['STOCK_URL']}")
 
+    http_transport.configurar_transporte(app.config)
+    retry.configurar_reintentos(app.config)
+    circuit_breaker.configurar_breakers(app.config)
+    urls_servicios = [app.config[k] for k in ('STOCK_URL', 'PAGOS_URL', 'COMPRAS_URL', 'PRODUCTO_URL')]
+    threading.Thread(
+        target=http_transport.calentar_conexiones,
+        args=(urls_servicios,),
+        kwargs={"verify": app.config.get('VERIFY_SSL', False)},
+        daemon=True,
+    ).start()
+
     try:
         db.init_app(app)
         cache.init_app(app, config=cache_config)
         logger.info("Extensiones inicializadas correctamente")
     except Exception as e:
         logger.error(f"Error inicializando extensiones: {e}")
+
+    tracing.configurar_tracing(app)
+
+    configurar_cache_stock(app.config)
+    configurar_admision(app.config)
+
+    if app.config.get('SAGA_LOG_HABILITADO', True):
+        from app.services.saga.registro import RegistroSaga
+        RegistroSaga(app)
+        if app.config.get('COMPENSACION_HABILITADA', True):
+            # Sin log de sagas los workers no sabrían qué pasos compensar
+            from app.services.saga.cola_compensacion import ColaCompensacion
+            ColaCompensacion(app)
+
+    from app.services.saga.definiciones import configurar_planes
+    configurar_planes(app)
+
+    from app.services.saga.ejecutor import EjecutorSagas
+    EjecutorSagas(app)
+
+    if app.config.get('SAGA_MODO') == 'coreografia':
+        from app.services.saga.coreografia import CoreografiaSagas
+        CoreografiaSagas(app)
+    elif app.config.get('SAGA_RUTEO_HABILITADO'):
+        from app.services.saga.ruteo import RuteoSagas
+        RuteoSagas(app)
+
+    from app.routes import saga
+    app.register_blueprint(saga, url_prefix='/api/v1')
     
     @app.route('/ping', methods=['GET'])
     def ping():
         return {"mensaje": "El servicio de Base está en funcionamiento"}
+
+    @app.route('/metricas/http', methods=['GET'])
+    def metricas_http():
+        return http_transport.metricas.snapshot()
+
+    @app.route('/metricas/reintentos', methods=['GET'])
+    def metricas_reintentos():
+        return retry.metricas.snapshot()
+
+    @app.route('/metricas/breakers', methods=['GET'])
+    def metricas_breakers():
+        return circuit_breaker.snapshot()
+
+    @app.route('/metricas/stock-cache', methods=['GET'])
+    def metricas_stock_cache():
+        return cache_disponibilidad.snapshot()
+
+    @app.route('/metricas/sagas', methods=['GET'])
+    def metricas_sagas():
+        return app.extensions['ejecutor_sagas'].snapshot()
+
+    @app.route('/metricas/coreografia', methods=['GET'])
+    def metricas_coreografia():
+        coreografia = app.extensions.get('coreografia_sagas')
+        if coreografia is None:
+            return {"habilitada": False}
+        return dict(coreografia.snapshot(), habilitada=True)
+
+    @app.route('/metricas/ruteo', methods=['GET'])
+    def metricas_ruteo():
+        ruteo = app.extensions.get('ruteo_sagas')
+        if ruteo is None:
+            return {"habilitado": False}
+        return dict(ruteo.snapshot(), habilitado=True)
+
+    @app.route('/metricas/admision', methods=['GET'])
+    def metricas_admision():
+        return control_admision.snapshot()
+
+    @app.route('/metricas/compensaciones', methods=['GET'])
+    def metricas_compensaciones():
+        cola = app.extensions.get('cola_compensacion')
+        if cola is None:
+            return {"habilitada": False}
+        return dict(cola.snapshot(), habilitada=True)
+
+    @app.route('/sagas/compensaciones/dlq', methods=['GET'])
+    def compensaciones_dlq():
+        cola = app.extensions.get('cola_compensacion')
+        if cola is None:
+            return {"mensaje": "Cola de compensación deshabilitada"}, 404
+        return {"dead_letters": cola.dead_letters(request.args.get('cantidad', 100, type=int))}
+
+    @app.route('/sagas/compensaciones/dlq/<id_mensaje>/reintentar', methods=['POST'])
+    def reintentar_compensacion(id_mensaje):
+        cola = app.extensions.get('cola_compensacion')
+        if cola is None:
+            return {"mensaje": "Cola de compensación deshabilitada"}, 404
+        if not cola.reencolar_dead_letter(id_mensaje):
+            return {"mensaje": f"No se pudo reencolar {id_mensaje}"}, 404
+        return {"mensaje": f"Compensación {id_mensaje} reencolada"}, 202
     
     return app
 
@@ -14,6 +14,58 @@ class Config:
     PRODUCTO_URL = os.getenv('PRODUCTO_URL')
     TIMEOUT_SECONDS = int(os.getenv('REQUEST_TIMEOUT', '10'))
     VERIFY_SSL = os.getenv('FLASK_ENV') == 'production'
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '50'))
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+    HTTP_KEEPALIVE = os.getenv('HTTP_KEEPALIVE', 'true').lower() == 'true'
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30'))
+    HTTP_POOL_WARMUP = int(os.getenv('HTTP_POOL_WARMUP', '1'))
+    HTTP_RETRY_MAX_INTENTOS = int(os.getenv('HTTP_RETRY_MAX_INTENTOS', '3'))
+    HTTP_RETRY_BASE_MS = float(os.getenv('HTTP_RETRY_BASE_MS', '100'))
+    HTTP_RETRY_MAX_MS = float(os.getenv('HTTP_RETRY_MAX_MS', '2000'))
+    HTTP_RETRY_PRESUPUESTO = float(os.getenv('HTTP_RETRY_PRESUPUESTO', '0.1'))
+    HTTP_RETRY_MINIMO_POR_SEG = float(os.getenv('HTTP_RETRY_MINIMO_POR_SEG', '2'))
+    CB_FALLOS_MAX = int(os.getenv('CB_FALLOS_MAX', '5'))
+    CB_RESET_SEGUNDOS = float(os.getenv('CB_RESET_SEGUNDOS', '15'))
+    STOCK_CACHE_HABILITADA = os.getenv('STOCK_CACHE_HABILITADA', 'true').lower() == 'true'
+    STOCK_CACHE_TTL = float(os.getenv('STOCK_CACHE_TTL', '5'))
+    STOCK_CANAL = os.getenv('STOCK_CANAL', 'stock:cambios')
+    SAGA_LOG_HABILITADO = os.getenv('SAGA_LOG_HABILITADO', 'true').lower() == 'true'
+    SAGA_LOG_MAX_LOTE = int(os.getenv('SAGA_LOG_MAX_LOTE', '256'))
+    SAGA_LOG_ESPERA_MS = float(os.getenv('SAGA_LOG_ESPERA_MS', '2'))
+    COMPENSACION_HABILITADA = os.getenv('COMPENSACION_HABILITADA', 'true').lower() == 'true'
+    COMPENSACION_WORKERS = int(os.getenv('COMPENSACION_WORKERS', '4'))
+    COMPENSACION_MAX_INTENTOS = int(os.getenv('COMPENSACION_MAX_INTENTOS', '8'))
+    COMPENSACION_BACKOFF_BASE_S = float(os.getenv('COMPENSACION_BACKOFF_BASE_S', '1'))
+    COMPENSACION_BACKOFF_MAX_S = float(os.getenv('COMPENSACION_BACKOFF_MAX_S', '300'))
+    COMPENSACION_RECLAMO_S = float(os.getenv('COMPENSACION_RECLAMO_S', '60'))
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'true').lower() == 'true'
+    TRACING_MUESTREO = float(os.getenv('TRACING_MUESTREO', '0.1'))
+    TRACING_MAX_TRAZAS_POR_SEG = float(os.getenv('TRACING_MAX_TRAZAS_POR_SEG', '50'))
+    TRACING_ARCHIVO = os.getenv('TRACING_ARCHIVO')
+    SAGA_WORKERS = int(os.getenv('SAGA_WORKERS', '16'))
+    SAGA_MAX_PENDIENTES = int(os.getenv('SAGA_MAX_PENDIENTES', '256'))
+    SAGA_RESULTADO_TTL_S = float(os.getenv('SAGA_RESULTADO_TTL_S', '600'))
+    SAGA_ESPERA_MAX_S = float(os.getenv('SAGA_ESPERA_MAX_S', '30'))
+    SAGA_LOTE_MAX = int(os.getenv('SAGA_LOTE_MAX', '100'))
+    # Ruteo por producto_id: réplicas como URLs base separadas por coma, p. ej. http://orq-1:5005,http://orq-2:5005
+    SAGA_RUTEO_HABILITADO = os.getenv('SAGA_RUTEO_HABILITADO', 'false').lower() == 'true'
+    SAGA_REPLICAS = os.getenv('SAGA_REPLICAS', '')
+    SAGA_REPLICA_PROPIA = os.getenv('SAGA_REPLICA_PROPIA', '')
+    SAGA_RUTEO_VIRTUALES = int(os.getenv('SAGA_RUTEO_VIRTUALES', '64'))
+    SAGA_MAX_POR_CLAVE = int(os.getenv('SAGA_MAX_POR_CLAVE', '32'))
+    # orquestacion: el orquestador llama a cada servicio por HTTP; coreografia: los servicios se encadenan por Redis Streams
+    SAGA_MODO = os.getenv('SAGA_MODO', 'orquestacion')
+    COREOGRAFIA_WORKERS = int(os.getenv('COREOGRAFIA_WORKERS', '4'))
+    COREOGRAFIA_RECLAMO_S = float(os.getenv('COREOGRAFIA_RECLAMO_S', '30'))
+    COREOGRAFIA_MAX_STREAM = int(os.getenv('COREOGRAFIA_MAX_STREAM', '100000'))
+    ADMISION_HABILITADA = os.getenv('ADMISION_HABILITADA', 'true').lower() == 'true'
+    ADMISION_MAX_CONCURRENTES = int(os.getenv('ADMISION_MAX_CONCURRENTES', '64'))
+    ADMISION_MAX_EN_COLA = int(os.getenv('ADMISION_MAX_EN_COLA', '128'))
+    ADMISION_ESPERA_MAX_S = float(os.getenv('ADMISION_ESPERA_MAX_S', '2'))
+    ADMISION_LIMITE_PAGOS = int(os.getenv('ADMISION_LIMITE_PAGOS', '16'))
+    ADMISION_LIMITE_COMPRAS = int(os.getenv('ADMISION_LIMITE_COMPRAS', '32'))
+    ADMISION_LIMITE_STOCK = int(os.getenv('ADMISION_LIMITE_STOCK', '32'))
     @staticmethod
     def init_app(app):
        
@@ -36,6 +88,7 @@ class DevelopmentConfig(Config):
 
 class TestingConfig(Config):
     TESTING = True
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'false').lower() == 'true'
     SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DB_URI')
 
     @staticmethod
@@ -0,0 +1 @@
+from .saga_log import SagaLogEntry
@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from app import db
+
+
+@dataclass
+class SagaLogEntry(db.Model):
+    __tablename__ = 'saga_log'
+
+    id: int = db.Column('id', db.Integer, primary_key=True, autoincrement=True)
+    saga_id: str = db.Column('saga_id', db.String(36), nullable=False, index=True)
+    evento: str = db.Column('evento', db.String(30), nullable=False)
+    paso: str = db.Column('paso', db.String(50), nullable=True)
+    id_recurso: str = db.Column('id_recurso', db.String(64), nullable=True)
+    datos: dict = db.Column('datos', db.JSON, nullable=True)
+    fecha: datetime = db.Column('fecha', db.DateTime, nullable=False, default=datetime.utcnow)
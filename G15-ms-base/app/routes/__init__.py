@@ -0,0 +1 @@
+from .saga_resource import saga
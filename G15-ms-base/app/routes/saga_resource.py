@@ -0,0 +1,133 @@
+import redis
+from flask import Blueprint, current_app, request, url_for
+
+from app.services.saga.admision import SagaRechazada
+from app.services.saga.definiciones import error_plan, plan_saga
+from app.services.saga.lote import SagaLoteOrchestrator
+from app.services.saga.ruteo import HEADER_REENVIO, clave_ruteo
+
+saga = Blueprint('saga', __name__)
+
+
+def _ejecutor():
+    # Con SAGA_MODO=coreografia la saga la encadenan los servicios por Redis Streams
+    if current_app.config.get('SAGA_MODO') == 'coreografia':
+        return current_app.extensions['coreografia_sagas']
+    return current_app.extensions['ejecutor_sagas']
+
+
+def _enviar(plan, datos):
+    """
+    Devuelve el estado de la saga, o la respuesta de la réplica dueña del producto
+    si con el ruteo le tocaba a otra (ver RuteoSagas).
+    """
+    ruteo = current_app.extensions.get('ruteo_sagas')
+    if ruteo is None:
+        return _ejecutor().enviar(plan, datos), None
+    clave = clave_ruteo(datos)
+    reenviada = HEADER_REENVIO in request.headers
+    destino = None if reenviada else ruteo.replica_de(clave)
+    if destino is not None:
+        respuesta = ruteo.reenviar(destino, request.path, datos, _espera_pedida())
+        if respuesta is not None:
+            return None, respuesta
+    ruteo.contar_local(reenviada)
+    return _ejecutor().enviar(plan, datos, clave=clave), None
+
+
+def _espera_pedida():
+    """Segundos de ?wait=, con tope SAGA_ESPERA_MAX_S; 0 si no se pidió."""
+    espera = request.args.get('wait', 0, type=float) or 0
+    return max(0.0, min(espera, float(current_app.config.get('SAGA_ESPERA_MAX_S', 30))))
+
+
+def _respuesta_final(estado):
+    """Respuesta de una saga terminada, con el código que devolvió la saga."""
+    codigo = estado.resultado.get("status_code", 500)
+    encabezados = {}
+    if codigo in (429, 503):
+        datos = estado.resultado.get("data") or {}
+        encabezados["Retry-After"] = str(datos.get("reintentar_en", 1))
+    return estado.a_dict(), codigo, encabezados
+
+
+def _respuesta_pendiente(estado, codigo):
+    url = url_for('saga.estado_saga', saga_id=estado.saga_id)
+    return dict(estado.a_dict(), url=url), codigo, {"Location": url}
+
+
+@saga.route('/saga/compra', methods=['POST'])
+def iniciar_compra():
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict):
+        return {"mensaje": "Se esperaba un objeto JSON con los datos de la saga"}, 422
+    plan = plan_saga("compra")
+    if plan is None:
+        return {"mensaje": "Saga de compra no disponible", "error": error_plan("compra")}, 503
+    faltan = [clave for clave in plan.requeridos if not isinstance(datos.get(clave), dict)]
+    if faltan:
+        return {"mensaje": "Faltan datos de pasos de la saga", "faltan": faltan}, 422
+
+    try:
+        estado, reenviada = _enviar(plan, datos)
+    except SagaRechazada as e:
+        return {"mensaje": "Orquestador sobrecargado", **e.datos()}, 429, {"Retry-After": str(e.reintentar_en)}
+    except redis.RedisError as e:
+        return {"mensaje": "No se pudo publicar la saga", "error": str(e)}, 503, {"Retry-After": "5"}
+    if reenviada is not None:
+        return reenviada
+
+    espera = _espera_pedida()
+    if espera and estado.esperar(espera):
+        return _respuesta_final(estado)
+    return _respuesta_pendiente(estado, 202)
+
+
+@saga.route('/saga/compra/lote', methods=['POST'])
+def iniciar_compras_lote():
+    """
+    Un lote de compras, una saga por ítem, con una llamada bulk por servicio y paso
+    (ver SagaLoteOrchestrator). Corre en el pedido y responde 207 con el resultado de
+    cada saga; si se rechazó el lote entero, con el código del rechazo.
+    """
+    compras = request.get_json(silent=True)
+    if not isinstance(compras, list) or not compras:
+        return {"mensaje": "Se esperaba una lista con los datos de cada saga"}, 422
+    maximo = int(current_app.config.get('SAGA_LOTE_MAX', 100))
+    if len(compras) > maximo:
+        return {"mensaje": f"El lote admite hasta {maximo} compras", "recibidas": len(compras)}, 413
+    plan = plan_saga("compra")
+    if plan is None:
+        return {"mensaje": "Saga de compra no disponible", "error": error_plan("compra")}, 503
+    invalidas = [
+        {"indice": i, "faltan": [clave for clave in plan.requeridos if not isinstance(compra.get(clave), dict)]}
+        for i, compra in enumerate(compras)
+        if not isinstance(compra, dict) or any(not isinstance(compra.get(clave), dict) for clave in plan.requeridos)
+    ]
+    if invalidas:
+        return {"mensaje": "Faltan datos de pasos de la saga", "invalidas": invalidas}, 422
+
+    respuestas = SagaLoteOrchestrator(compras).ejecutar()
+    codigos = {respuesta["codigo_estado"] for respuesta in respuestas}
+    if codigos in ({429}, {503}):
+        codigo = codigos.pop()
+        reintentar_en = (respuestas[0]["datos"] or {}).get("reintentar_en", 1)
+        return {"mensaje": respuestas[0]["mensaje"], "sagas": respuestas}, codigo, {"Retry-After": str(reintentar_en)}
+    return {"sagas": respuestas}, 207
+
+
+@saga.route('/saga/<saga_id>', methods=['GET'])
+def estado_saga(saga_id):
+    estado = _ejecutor().estado(saga_id)
+    if estado is None:
+        desde_log = _ejecutor().estado_desde_log(saga_id)
+        if desde_log is None:
+            return {"mensaje": f"Saga {saga_id} no encontrada"}, 404
+        return desde_log, 200
+
+    espera = _espera_pedida()
+    if espera:
+        estado.esperar(espera)
+    if estado.resultado is not None:
+        return estado.a_dict(), 200
+    return _respuesta_pendiente(estado, 200)
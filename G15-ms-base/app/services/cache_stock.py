@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+
+import redis
+
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class CacheDisponibilidad:
+    """
+    Caché local (en memoria del proceso) del stock disponible por producto_id para la
+    validación previa de la saga. Las entradas viven STOCK_CACHE_TTL segundos, y
+    ms-inventario publica en Redis cada cambio de stock para borrarlas antes.
+
+    Cada producto tiene una generación que sube con cada invalidación: una consulta
+    que empezó antes de un cambio no puede guardar su resultado viejo después.
+    Si se pierde la suscripción la caché se vacía y no se usa hasta reconectar.
+    """
+
+    def __init__(self, ttl=5.0, habilitada=True):
+        self.ttl = ttl
+        self.habilitada = habilitada
+        self.conectada = False
+        self._entradas = {}
+        self._generaciones = {}
+        self._epoca = 0
+        self._lock = threading.Lock()
+        self._hilo = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+
+    def activa(self) -> bool:
+        return self.habilitada and self.conectada
+
+    def obtener(self, producto_id):
+        """Cantidad disponible cacheada, o None si no hay una entrada vigente."""
+        producto_id = int(producto_id)
+        with self._lock:
+            entrada = self._entradas.get(producto_id) if self.activa() else None
+            if entrada is not None and entrada[1] > time.monotonic():
+                self.hits += 1
+                return entrada[0]
+            self.misses += 1
+            return None
+
+    def generacion(self, producto_id):
+        producto_id = int(producto_id)
+        with self._lock:
+            return self._epoca, self._generaciones.get(producto_id, 0)
+
+    def guardar(self, producto_id, cantidad, generacion):
+        producto_id = int(producto_id)
+        with self._lock:
+            if not self.activa() or (self._epoca, self._generaciones.get(producto_id, 0)) != generacion:
+                return
+            self._entradas[producto_id] = (cantidad, time.monotonic() + self.ttl)
+
+    def invalidar(self, *productos_ids):
+        with self._lock:
+            for producto_id in productos_ids:
+                self._entradas.pop(producto_id, None)
+                self._generaciones[producto_id] = self._generaciones.get(producto_id, 0) + 1
+                self.invalidaciones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._epoca += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "habilitada": self.habilitada,
+                "conectada": self.conectada,
+                "entradas": len(self._entradas),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidaciones": self.invalidaciones,
+            }
+
+    def iniciar_suscriptor(self, canal):
+        if not self.habilitada or self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._escuchar, args=(canal,), name="stock-cache", daemon=True)
+        self._hilo.start()
+
+    def _escuchar(self, canal):
+        espera = 1
+        while True:
+            try:
+                cliente = redis.StrictRedis(
+                    host=os.getenv('REDIS_HOST', 'localhost'),
+                    port=int(os.getenv('REDIS_PORT', '6379')),
+                    db=int(os.getenv('REDIS_DB', '0')),
+                    password=os.getenv('REDIS_PASSWORD'),
+                    decode_responses=True,
+                    socket_keepalive=True,
+                    health_check_interval=30,
+                )
+                suscripcion = cliente.pubsub(ignore_subscribe_messages=True)
+                suscripcion.subscribe(canal)
+                # Lo que cambió mientras no se escuchaba no llegó: se arranca vacía
+                self.limpiar()
+                self.conectada = True
+                espera = 1
+                logger.info(f"Caché de stock suscripta a {canal}")
+                for mensaje in suscripcion.listen():
+                    self._procesar(mensaje.get("data"))
+            except Exception as e:
+                logger.warning(f"Se perdió la suscripción a {canal}, caché de stock deshabilitada: {e}")
+            self.conectada = False
+            self.limpiar()
+            time.sleep(espera)
+            espera = min(espera * 2, 30)
+
+    def _procesar(self, data):
+        try:
+            productos_ids = json.loads(data).get("producto_ids", [])
+        except (TypeError, ValueError, AttributeError):
+            logger.warning(f"Mensaje de stock inválido: {data}")
+            return
+        self.invalidar(*(int(producto_id) for producto_id in productos_ids))
+
+
+cache_disponibilidad = CacheDisponibilidad()
+
+
+def configurar_cache_stock(config):
+    cache_disponibilidad.ttl = float(config.get('STOCK_CACHE_TTL', cache_disponibilidad.ttl))
+    cache_disponibilidad.habilitada = bool(config.get('STOCK_CACHE_HABILITADA', True))
+    cache_disponibilidad.iniciar_suscriptor(config.get('STOCK_CANAL', 'stock:cambios'))
@@ -1,8 +1,10 @@
 
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple
 from flask import current_app
 from app.utils.logger_config import setup_logger
 from app.utils.http_client import HttpClient
+from app.utils.json_rapido import json_de
+from app.utils.async_http_client import AsyncHttpClient
 from app.utils.response_validator import validar_respuesta
 
 
@@ -21,7 +23,7 @@ class CompraService:
         response = HttpClient.post(url, data_compra)
 
         validar_respuesta(response, codigo_esperado=201)
-        return url, response.json()
+        return url, json_de(response)
 
     def borrar_compra(self, id_compra: str) -> bool:
         
@@ -35,4 +37,39 @@ class CompraService:
 
         validar_respuesta(response, codigo_esperado=204)
         logger.info(f"Compra con ID {id_compra} borrada exitosamente.")
-        return True
\ No newline at end of file
+        return True
+
+    def comprar_bulk(self, compras: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+
+        url = f"{current_app.config['COMPRAS_URL']}s/bulk"
+
+        logger.info(f"Creando {len(compras)} compras en lote")
+        response = HttpClient.post(url, compras)
+
+        validar_respuesta(response, codigo_esperado=207)
+        return url, json_de(response).get('data', [])
+
+    async def comprar_async(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+
+        data_compra = data.get('compra')
+        url = f"{current_app.config['COMPRAS_URL']}s"
+
+        logger.info(f"Creando compra (async): {data_compra}")
+        response = await AsyncHttpClient.post(url, data_compra)
+
+        validar_respuesta(response, codigo_esperado=201)
+        return url, json_de(response)
+
+    async def borrar_compra_async(self, id_compra: str) -> bool:
+
+        logger.info(f"Borrando compra con ID (async): {id_compra}")
+        url = f"{current_app.config['COMPRAS_URL']}s/{id_compra}"
+        response = await AsyncHttpClient.delete(url)
+
+        if response.status_code == 404:
+            logger.warning(f"Compra con ID {id_compra} no encontrada.")
+            return False
+
+        validar_respuesta(response, codigo_esperado=204)
+        logger.info(f"Compra con ID {id_compra} borrada exitosamente.")
+        return True
@@ -1,8 +1,10 @@
 
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple
 from flask import current_app
 from app.utils.logger_config import setup_logger
 from app.utils.http_client import HttpClient
+from app.utils.json_rapido import json_de
+from app.utils.async_http_client import AsyncHttpClient
 from app.utils.response_validator import validar_respuesta
 
 logger = setup_logger(__name__)
@@ -19,7 +21,7 @@ class PagoService:
         response = HttpClient.post(url, data_pago)
 
         validar_respuesta(response, codigo_esperado=201)
-        return url, response.json()
+        return url, json_de(response)
 
     def eliminar_pago(self, id_pago: str) -> bool:
        
@@ -34,3 +36,38 @@ class PagoService:
         validar_respuesta(response, codigo_esperado=204)
         logger.info(f"Pago con ID {id_pago} borrado exitosamente.")
         return True
+
+    def agregar_pagos_bulk(self, pagos: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+
+        url = f"{current_app.config['PAGOS_URL']}/transaccion/bulk"
+
+        logger.info(f"Crear {len(pagos)} pagos en lote")
+        response = HttpClient.post(url, pagos)
+
+        validar_respuesta(response, codigo_esperado=207)
+        return url, json_de(response).get('data', [])
+
+    async def agregar_pago_async(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+
+        data_pago = data.get('pago')
+        url = f"{current_app.config['PAGOS_URL']}/transaccion"
+
+        logger.info(f"Crear pago (async): {data_pago}")
+        response = await AsyncHttpClient.post(url, data_pago)
+
+        validar_respuesta(response, codigo_esperado=201)
+        return url, json_de(response)
+
+    async def eliminar_pago_async(self, id_pago: str) -> bool:
+
+        logger.info(f"Borrando pago con ID (async): {id_pago}")
+        url = f"{current_app.config['PAGOS_URL']}/{id_pago}/compensacion"
+        response = await AsyncHttpClient.post(url, {})
+
+        if response.status_code == 404:
+            logger.warning(f"Pago con ID {id_pago} no encontrado.")
+            return False
+
+        validar_respuesta(response, codigo_esperado=204)
+        logger.info(f"Pago con ID {id_pago} borrado exitosamente.")
+        return True
@@ -3,6 +3,7 @@ from flask import current_app
 
 from app.utils.logger_config import setup_logger
 from app.utils.http_client import HttpClient
+from app.utils.json_rapido import json_de
 from app.utils.response_validator import validar_respuesta
 
 
@@ -23,7 +24,7 @@ class ProductoService:
             return None
 
         validar_respuesta(response, expected_code=200)
-        return response.json()
+        return json_de(response)
 
     def validar_disponibilidad(self, producto_id: str, cantidad: int) -> bool:
         
@@ -37,7 +38,7 @@ class ProductoService:
 
         validar_respuesta(response, expected_code=200)
         
-        producto = response.json()
+        producto = json_de(response)
         stock_disponible = producto.get("stock", 0)
         
         if stock_disponible >= cantidad:
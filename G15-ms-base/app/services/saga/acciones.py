@@ -1,9 +1,18 @@
 
+from app.services.saga.definiciones import buscar_id
+
+
 class SagaAction:
-    def __init__(self, execute_fn, compensate_fn):
-        
+    RUTAS_ID = (("data", "id"),)
+
+    def __init__(self, execute_fn, compensate_fn, nombre=None, rutas_id=None, confirm_fn=None):
+        # Sin compensate_fn el paso no se deshace (una reserva vence sola); confirm_fn se
+        # llama cuando terminaron bien todos los pasos
         self.execute_fn = execute_fn
         self.compensate_fn = compensate_fn
+        self.confirm_fn = confirm_fn
+        self.nombre = nombre
+        self.rutas_id = rutas_id or self.RUTAS_ID
         self.url = None  
 
     def ejecutar(self, data):
@@ -12,6 +21,21 @@ class SagaAction:
         self.url = url
         return url, response_data
 
+    @property
+    def compensacion(self):
+        return self.compensate_fn
+
+    @property
+    def confirmacion(self):
+        return self.confirm_fn
+
     def compensar(self, id_recurso):
-        
-        return self.compensate_fn(id_recurso)
\ No newline at end of file
+        if self.compensate_fn is None:
+            return True
+        return self.compensate_fn(id_recurso)
+
+    def confirmar(self, id_recurso):
+        return self.confirm_fn(id_recurso)
+
+    def extraer_id(self, response_data):
+        return buscar_id(response_data, self.rutas_id)
\ No newline at end of file
@@ -0,0 +1,108 @@
+import asyncio
+import contextvars
+import functools
+
+from app.services.compra_service import CompraService
+from app.services.pago_service import PagoService
+from app.services.saga.definiciones import buscar_id
+from app.services.stock_service import StockService
+
+
+class AsyncSagaAction:
+    RUTAS_ID = (("data", "id"),)
+
+    def __init__(self, execute_fn, compensate_fn, nombre=None, rutas_id=None, confirm_fn=None):
+        # execute_fn, compensate_fn y confirm_fn son corutinas: async def fn(...).
+        # Sin compensate_fn el paso no se deshace (la reserva de stock vence sola)
+        self.execute_fn = execute_fn
+        self.compensate_fn = compensate_fn
+        self.confirm_fn = confirm_fn
+        self.nombre = nombre
+        self.rutas_id = rutas_id or self.RUTAS_ID
+        self.url = None
+
+    async def ejecutar(self, data):
+        url, response_data = await self.execute_fn(data)
+        self.url = url
+        return url, response_data
+
+    @property
+    def compensacion(self):
+        return self.compensate_fn
+
+    @property
+    def confirmacion(self):
+        return self.confirm_fn
+
+    async def compensar(self, id_recurso):
+        if self.compensate_fn is None:
+            return True
+        return await self.compensate_fn(id_recurso)
+
+    async def confirmar(self, id_recurso):
+        return await self.confirm_fn(id_recurso)
+
+    def extraer_id(self, response_data):
+        return buscar_id(response_data, self.rutas_id)
+
+
+class AdaptadorAccionSync(AsyncSagaAction):
+    """
+    Permite usar una SagaAction o Action síncrona dentro del motor async.
+    La llamada bloqueante corre en un executor para no frenar el event loop;
+    el contexto (incluido el app context de Flask) se copia al hilo.
+    """
+
+    def __init__(self, accion, executor=None):
+        self.accion = accion
+        self.executor = executor
+        nombre = getattr(accion, "nombre", None)
+        rutas_id = getattr(accion, "rutas_id", None)
+        if hasattr(accion, "ejecutar"):
+            super().__init__(accion.ejecutar, accion.compensar, nombre, rutas_id)
+        else:
+            super().__init__(accion.execute, accion.compensate, nombre, rutas_id)
+
+    async def _en_executor(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(ctx.run, fn, *args))
+
+    async def ejecutar(self, data):
+        url, response_data = await self._en_executor(self.execute_fn, data)
+        self.url = url
+        return url, response_data
+
+    @property
+    def compensacion(self):
+        return getattr(self.accion, "compensacion", self.compensate_fn)
+
+    @property
+    def confirmacion(self):
+        return getattr(self.accion, "confirmacion", None)
+
+    async def compensar(self, id_recurso):
+        return await self._en_executor(self.compensate_fn, id_recurso)
+
+    async def confirmar(self, id_recurso):
+        return await self._en_executor(self.accion.confirmar, id_recurso)
+
+
+def adaptar_accion(accion, executor=None) -> AsyncSagaAction:
+    if isinstance(accion, AsyncSagaAction):
+        return accion
+    return AdaptadorAccionSync(accion, executor=executor)
+
+
+def acciones_compra_async():
+    """Pasos pago -> compra -> stock de la saga de compra, con llamadas HTTP no bloqueantes."""
+    pago_service = PagoService()
+    compra_service = CompraService()
+    stock_service = StockService()
+    return [
+        AsyncSagaAction(pago_service.agregar_pago_async, pago_service.eliminar_pago_async, "pago"),
+        AsyncSagaAction(compra_service.comprar_async, compra_service.borrar_compra_async, "compra"),
+        # La reserva no se compensa (vence sola) y se confirma cuando terminó bien la saga
+        AsyncSagaAction(stock_service.reservar_stock_async, None, "stock",
+                        confirm_fn=stock_service.confirmar_reserva_async),
+    ]
@@ -0,0 +1,205 @@
+import asyncio
+import math
+import threading
+import time
+
+from app.services.saga.disponibilidad import SERVICIO_POR_PASO
+
+
+class SagaRechazada(Exception):
+    """La saga no pudo empezar antes de su deadline; reintentar_en es el Retry-After sugerido en segundos."""
+
+    def __init__(self, motivo, reintentar_en):
+        super().__init__(f"{motivo} (reintentar en {reintentar_en}s)")
+        self.motivo = motivo
+        self.reintentar_en = reintentar_en
+
+    def datos(self):
+        return {"motivo": self.motivo, "reintentar_en": self.reintentar_en}
+
+
+class Permiso:
+    """Lugar tomado por una saga admitida; se devuelve al salir del with."""
+
+    def __init__(self, control, destinos):
+        self.control = control
+        self.destinos = destinos
+        self.desde = time.monotonic()
+        self._devuelto = False
+
+    def liberar(self):
+        if not self._devuelto and self.control is not None:
+            self._devuelto = True
+            self.control._liberar(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+
+
+class ControlAdmision:
+    """
+    Cola de admisión acotada delante de la ejecución de sagas. Una saga se admite
+    si hay lugar en el total (ADMISION_MAX_CONCURRENTES) y en cada servicio que
+    usan sus pasos (ADMISION_LIMITE_PAGOS, ..._COMPRAS, ..._STOCK); si no, espera
+    en la cola hasta su deadline.
+
+    Lo que no va a poder empezar a tiempo se rechaza enseguida, antes de cobrar:
+    con la cola llena, o si la espera estimada (sagas en cola por duración media de
+    una saga, repartidas entre los lugares del servicio más limitado) ya supera el
+    deadline.
+    """
+
+    _MOTIVOS = ("cola_llena", "espera_estimada", "vencida")
+
+    def __init__(self, max_concurrentes=64, max_en_cola=128, espera_max_s=2.0, limites=None, habilitado=True):
+        self.max_concurrentes = max_concurrentes
+        self.max_en_cola = max_en_cola
+        self.espera_max_s = espera_max_s
+        self.limites = dict(limites or {})
+        self.habilitado = habilitado
+        self._condicion = threading.Condition()
+        self._en_curso = 0
+        self._en_curso_destino = {}
+        self._en_cola = 0
+        # Duración media de una saga admitida (media móvil exponencial), para estimar la espera
+        self._duracion_media = 0.0
+        self.admitidas = 0
+        self.rechazadas = dict.fromkeys(self._MOTIVOS, 0)
+        self._espera_total = 0.0
+
+    @staticmethod
+    def destinos_de(pasos):
+        return tuple(sorted({SERVICIO_POR_PASO[paso] for paso in pasos if paso in SERVICIO_POR_PASO}))
+
+    def _hay_lugar(self, destinos):
+        if self._en_curso >= self.max_concurrentes:
+            return False
+        return all(
+            self._en_curso_destino.get(destino, 0) < self.limites[destino]
+            for destino in destinos if self.limites.get(destino)
+        )
+
+    def _tomar(self, destinos, llegada):
+        self._en_curso += 1
+        for destino in destinos:
+            self._en_curso_destino[destino] = self._en_curso_destino.get(destino, 0) + 1
+        self.admitidas += 1
+        self._espera_total += time.monotonic() - llegada
+        return Permiso(self, destinos)
+
+    def _espera_estimada(self, destinos):
+        lugares = min([self.max_concurrentes] + [self.limites[d] for d in destinos if self.limites.get(d)])
+        return (self._en_cola + 1) * self._duracion_media / max(lugares, 1)
+
+    def _rechazar(self, motivo, espera):
+        self.rechazadas[motivo] += 1
+        return SagaRechazada(motivo, max(1, math.ceil(espera)))
+
+    def _entrar_a_cola(self, destinos, deadline):
+        """Admite sin esperar si hay lugar; si no, decide si la saga puede quedarse en la cola."""
+        if self._hay_lugar(destinos) and self._en_cola == 0:
+            return self._tomar(destinos, time.monotonic())
+        if self._en_cola >= self.max_en_cola:
+            raise self._rechazar("cola_llena", self._espera_estimada(destinos))
+        espera = self._espera_estimada(destinos)
+        if time.monotonic() + espera > deadline:
+            raise self._rechazar("espera_estimada", espera)
+        self._en_cola += 1
+        return None
+
+    def _deadline(self, deadline):
+        return deadline if deadline is not None else time.monotonic() + self.espera_max_s
+
+    def admitir(self, pasos, deadline=None) -> Permiso:
+        """
+        Espera un lugar para una saga con estos pasos hasta deadline (time.monotonic();
+        por defecto ADMISION_ESPERA_MAX_S desde ahora). Lanza SagaRechazada si no llega.
+        """
+        if not self.habilitado:
+            return Permiso(None, ())
+        destinos = self.destinos_de(pasos)
+        deadline = self._deadline(deadline)
+        llegada = time.monotonic()
+        with self._condicion:
+            permiso = self._entrar_a_cola(destinos, deadline)
+            if permiso is not None:
+                return permiso
+            try:
+                while not self._hay_lugar(destinos):
+                    restante = deadline - time.monotonic()
+                    if restante <= 0:
+                        raise self._rechazar("vencida", self._espera_estimada(destinos))
+                    self._condicion.wait(restante)
+                return self._tomar(destinos, llegada)
+            finally:
+                self._en_cola -= 1
+
+    async def admitir_async(self, pasos, deadline=None, intervalo=0.005) -> Permiso:
+        """Como admitir, pero espera con asyncio.sleep para no bloquear el event loop."""
+        if not self.habilitado:
+            return Permiso(None, ())
+        destinos = self.destinos_de(pasos)
+        deadline = self._deadline(deadline)
+        llegada = time.monotonic()
+        with self._condicion:
+            permiso = self._entrar_a_cola(destinos, deadline)
+            if permiso is not None:
+                return permiso
+        try:
+            while True:
+                with self._condicion:
+                    if self._hay_lugar(destinos):
+                        return self._tomar(destinos, llegada)
+                    if time.monotonic() >= deadline:
+                        raise self._rechazar("vencida", self._espera_estimada(destinos))
+                await asyncio.sleep(intervalo)
+        finally:
+            with self._condicion:
+                self._en_cola -= 1
+
+    def _liberar(self, permiso):
+        duracion = time.monotonic() - permiso.desde
+        with self._condicion:
+            self._en_curso -= 1
+            for destino in permiso.destinos:
+                self._en_curso_destino[destino] -= 1
+            self._duracion_media = duracion if not self._duracion_media else (
+                0.9 * self._duracion_media + 0.1 * duracion
+            )
+            self._condicion.notify_all()
+
+    def snapshot(self):
+        with self._condicion:
+            return {
+                "habilitado": self.habilitado,
+                "en_curso": self._en_curso,
+                "en_curso_por_servicio": dict(self._en_curso_destino),
+                "profundidad_cola": self._en_cola,
+                "max_concurrentes": self.max_concurrentes,
+                "max_en_cola": self.max_en_cola,
+                "limites_por_servicio": dict(self.limites),
+                "admitidas": self.admitidas,
+                "rechazadas": dict(self.rechazadas),
+                "rechazadas_total": sum(self.rechazadas.values()),
+                "espera_media_ms": round(self._espera_total / self.admitidas * 1000, 3) if self.admitidas else 0.0,
+                "duracion_media_ms": round(self._duracion_media * 1000, 3),
+            }
+
+
+# Deshabilitado hasta que create_app lo configure: los motores sueltos (benchmarks, scripts) no se limitan
+control_admision = ControlAdmision(habilitado=False)
+
+
+def configurar_admision(config):
+    control_admision.habilitado = bool(config.get('ADMISION_HABILITADA', True))
+    control_admision.max_concurrentes = int(config.get('ADMISION_MAX_CONCURRENTES', 64))
+    control_admision.max_en_cola = int(config.get('ADMISION_MAX_EN_COLA', 128))
+    control_admision.espera_max_s = float(config.get('ADMISION_ESPERA_MAX_S', 2.0))
+    control_admision.limites = {
+        destino: int(config[f'ADMISION_LIMITE_{destino.upper()}'])
+        for destino in SERVICIO_POR_PASO.values()
+        if config.get(f'ADMISION_LIMITE_{destino.upper()}')
+    }
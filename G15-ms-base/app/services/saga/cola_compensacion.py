@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+import redis
+from app.services.saga.registro import EventoSaga, compensar_desde_log, eventos_de
+
+logger = logging.getLogger(__name__)
+
+STREAM = "saga:compensaciones"
+GRUPO = "compensadores"
+DIFERIDAS = "saga:compensaciones:diferidas"
+DLQ = "saga:compensaciones:dlq"
+
+
+class ColaCompensacion:
+    """
+    Cola persistente (Redis Stream con consumer group) de sagas a compensar. La saga
+    que falla encola su saga_id y responde enseguida; un pool de workers compensa
+    leyendo del log de sagas qué pasos quedan por deshacer.
+
+    Un intento fallido vuelve a la cola con backoff exponencial (un sorted set por
+    fecha de reintento); después de COMPENSACION_MAX_INTENTOS pasa al stream de
+    dead-letter, que se puede consultar y reencolar a mano. Si un worker muere sin
+    confirmar, otro reclama el mensaje cuando supera COMPENSACION_RECLAMO_S de inactividad.
+    """
+
+    def __init__(self, app=None, cliente=None, compensadores=None, reejecutores=None, reejecutores_lote=None):
+        self.app = None
+        self.cliente = cliente
+        self.compensadores = compensadores
+        self.reejecutores = reejecutores
+        self.reejecutores_lote = reejecutores_lote
+        self._hilos = []
+        self._lock = threading.Lock()
+        self.compensadas = 0
+        self.reintentos = 0
+        self.a_dlq = 0
+        self.lag_ultimo = None
+        self.lag_maximo = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = int(app.config.get('COMPENSACION_WORKERS', 4))
+        self.max_intentos = int(app.config.get('COMPENSACION_MAX_INTENTOS', 8))
+        self.backoff_base = float(app.config.get('COMPENSACION_BACKOFF_BASE_S', 1))
+        self.backoff_max = float(app.config.get('COMPENSACION_BACKOFF_MAX_S', 300))
+        self.reclamo_ms = int(float(app.config.get('COMPENSACION_RECLAMO_S', 60)) * 1000)
+        if self.cliente is None:
+            self.cliente = redis.StrictRedis(
+                host=os.getenv('REDIS_HOST', 'localhost'),
+                port=int(os.getenv('REDIS_PORT', '6379')),
+                db=int(os.getenv('REDIS_DB', '0')),
+                password=os.getenv('REDIS_PASSWORD'),
+                decode_responses=True,
+            )
+        app.extensions['cola_compensacion'] = self
+
+    def _compensadores(self):
+        if self.compensadores is None:
+            from app.services.saga.compensadores import compensadores_por_defecto
+            self.compensadores = compensadores_por_defecto()
+        return self.compensadores
+
+    def _reejecutores(self):
+        if self.reejecutores is None:
+            from app.services.saga.compensadores import reejecutores_por_defecto
+            self.reejecutores = reejecutores_por_defecto()
+        return self.reejecutores
+
+    def _reejecutores_lote(self):
+        if self.reejecutores_lote is None:
+            from app.services.saga.compensadores import reejecutores_lote_por_defecto
+            self.reejecutores_lote = reejecutores_lote_por_defecto()
+        return self.reejecutores_lote
+
+    def iniciar_workers(self):
+        if self._hilos:
+            return
+        for numero in range(self.workers):
+            hilo = threading.Thread(target=self._trabajar, args=(numero,), name=f"compensador-{numero}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        logger.info(f"{self.workers} workers de compensación iniciados")
+
+    def _crear_grupo(self):
+        try:
+            self.cliente.xgroup_create(STREAM, GRUPO, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def encolar(self, saga_id, intento=1, encolada=None, error=None) -> bool:
+        """Encola la compensación de la saga. False si Redis no está disponible."""
+        tarea = {
+            "saga_id": saga_id,
+            "intento": intento,
+            "encolada": encolada or time.time(),
+            "error": error,
+        }
+        try:
+            self.cliente.xadd(STREAM, {"tarea": json.dumps(tarea)})
+            return True
+        except redis.RedisError as e:
+            logger.error(f"No se pudo encolar la compensación de la saga {saga_id}: {e}")
+            return False
+
+    def _diferir(self, tarea, error):
+        tarea = dict(tarea, intento=tarea["intento"] + 1, error=error)
+        espera = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tarea["intento"]))
+        self.cliente.zadd(DIFERIDAS, {json.dumps(tarea): time.time() + espera})
+        with self._lock:
+            self.reintentos += 1
+        logger.warning(f"Compensación de la saga {tarea['saga_id']} reintenta en {espera:.1f}s "
+                       f"(intento {tarea['intento']}/{self.max_intentos}): {error}")
+
+    def _mandar_a_dlq(self, tarea, error):
+        self.cliente.xadd(DLQ, {"tarea": json.dumps(dict(tarea, error=error, fallida=time.time()))})
+        with self._lock:
+            self.a_dlq += 1
+        logger.critical(f"Compensación de la saga {tarea['saga_id']} enviada a dead-letter "
+                        f"después de {tarea['intento']} intentos: {error}")
+
+    def _mover_vencidas(self):
+        for miembro in self.cliente.zrangebyscore(DIFERIDAS, 0, time.time(), start=0, num=100):
+            # ZREM decide qué worker la mueve si dos la ven a la vez
+            if self.cliente.zrem(DIFERIDAS, miembro):
+                self.cliente.xadd(STREAM, {"tarea": miembro})
+
+    def _leer(self, consumidor):
+        reclamadas = self.cliente.xautoclaim(STREAM, GRUPO, consumidor, self.reclamo_ms, "0-0", count=10)
+        if reclamadas and reclamadas[1]:
+            return reclamadas[1]
+        respuesta = self.cliente.xreadgroup(GRUPO, consumidor, {STREAM: ">"}, count=1, block=1000)
+        return respuesta[0][1] if respuesta else []
+
+    def _trabajar(self, numero):
+        consumidor = f"{socket.gethostname()}-{os.getpid()}-{numero}"
+        espera = 1
+        while True:
+            try:
+                self._crear_grupo()
+                while True:
+                    if numero == 0:
+                        self._mover_vencidas()
+                    for id_mensaje, campos in self._leer(consumidor):
+                        self._procesar(json.loads(campos["tarea"]))
+                        self.cliente.xack(STREAM, GRUPO, id_mensaje)
+                        self.cliente.xdel(STREAM, id_mensaje)
+                    espera = 1
+            except redis.RedisError as e:
+                logger.error(f"Worker de compensación {numero} sin Redis, reintenta en {espera}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            except Exception as e:
+                logger.exception(f"Error inesperado en el worker de compensación {numero}: {e}")
+                time.sleep(1)
+
+    def _procesar(self, tarea):
+        saga_id = tarea["saga_id"]
+        registro = self.app.extensions.get('registro_saga')
+        with self.app.app_context():
+            eventos = eventos_de(saga_id)
+            if any(e.evento in EventoSaga.TERMINALES for e in eventos):
+                # Ya la cerró otro (por ejemplo la recuperación al arrancar)
+                return
+            fallidos = compensar_desde_log(registro, saga_id, eventos, self._compensadores(), self._reejecutores(),
+                                           self._reejecutores_lote())
+
+        if not fallidos:
+            lag = time.time() - tarea["encolada"]
+            with self._lock:
+                self.compensadas += 1
+                self.lag_ultimo = lag
+                self.lag_maximo = max(self.lag_maximo, lag)
+            return
+
+        error = "; ".join(f"{paso}: {detalle}" for paso, detalle in fallidos)
+        if tarea["intento"] >= self.max_intentos:
+            self._mandar_a_dlq(tarea, error)
+        else:
+            self._diferir(tarea, error)
+
+    def dead_letters(self, cantidad=100):
+        return [
+            dict(json.loads(campos["tarea"]), id=id_mensaje)
+            for id_mensaje, campos in self.cliente.xrevrange(DLQ, count=cantidad)
+        ]
+
+    def reencolar_dead_letter(self, id_mensaje) -> bool:
+        entradas = self.cliente.xrange(DLQ, min=id_mensaje, max=id_mensaje)
+        if not entradas:
+            return False
+        tarea = json.loads(entradas[0][1]["tarea"])
+        if not self.encolar(tarea["saga_id"], encolada=tarea["encolada"]):
+            return False
+        self.cliente.xdel(DLQ, id_mensaje)
+        return True
+
+    def snapshot(self):
+        pendientes = self.cliente.xlen(STREAM)
+        diferidas = self.cliente.zcard(DIFERIDAS)
+        mas_vieja = None
+        primera = self.cliente.xrange(STREAM, count=1)
+        if primera:
+            mas_vieja = json.loads(primera[0][1]["tarea"])["encolada"]
+        for miembro in self.cliente.zrange(DIFERIDAS, 0, 0):
+            encolada = json.loads(miembro)["encolada"]
+            mas_vieja = encolada if mas_vieja is None else min(mas_vieja, encolada)
+        with self._lock:
+            return {
+                "profundidad": pendientes + diferidas,
+                "pendientes": pendientes,
+                "diferidas": diferidas,
+                "dead_letter": self.cliente.xlen(DLQ),
+                # Cuánto hace que espera la compensación más vieja todavía sin terminar
+                "lag_segundos": round(time.time() - mas_vieja, 3) if mas_vieja else 0.0,
+                "lag_ultimo_segundos": self.lag_ultimo,
+                "lag_maximo_segundos": round(self.lag_maximo, 3),
+                "compensadas": self.compensadas,
+                "reintentos": self.reintentos,
+                "enviadas_a_dlq": self.a_dlq,
+            }
@@ -0,0 +1,49 @@
+from app.services.compra_service import CompraService
+from app.services.pago_service import PagoService
+from app.services.saga.definiciones import plan_saga
+from app.services.saga.lote import pasos_compra_lote
+from app.services.stock_service import StockService
+
+
+def compensadores_por_defecto():
+    """
+    Compensación de cada paso de la saga de compra, por nombre de paso. El paso de
+    stock reserva en todos los orquestadores y no se compensa: la reserva vence sola
+    y las sagas lo anotan en el log (sin_compensacion de INICIADA).
+    """
+    compensadores = {
+        "pago": PagoService().eliminar_pago,
+        "compra": CompraService().borrar_compra,
+    }
+    plan = plan_saga("compra")
+    if plan is not None:
+        compensadores.update({paso.nombre: paso.compensar for paso in plan.pasos if paso.compensacion is not None})
+    return compensadores
+
+
+def reejecutores_por_defecto():
+    """
+    Cómo repetir cada paso de la saga de compra con su Idempotency-Key, para resolver
+    los que quedaron sin resultado en el log. Sin plan compilado no hay ninguno.
+    """
+    plan = plan_saga("compra")
+    if plan is None:
+        return {}
+    return {paso.nombre: paso.reejecutar for paso in plan.pasos}
+
+
+def reejecutores_lote_por_defecto():
+    """
+    Llamada bulk de cada paso de SagaLoteOrchestrator, para repetirla con la clave del
+    lote cuando un paso de un lote quedó sin resultado (ver _reejecutar_en_lote).
+    """
+    return {paso.nombre: paso.ejecutar_bulk for paso in pasos_compra_lote()}
+
+
+def confirmadores_por_defecto():
+    """Confirmación de los pasos de la saga de compra que la piden (la reserva de stock)."""
+    confirmadores = {"stock": StockService().confirmar_reserva}
+    plan = plan_saga("compra")
+    if plan is not None:
+        confirmadores.update({paso.nombre: paso.confirmar for paso in plan.pasos if paso.confirmacion is not None})
+    return confirmadores
@@ -0,0 +1,297 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+import redis
+
+from app.services.saga.admision import SagaRechazada
+from app.services.saga.ejecutor import EstadoSaga
+from app.utils.json_rapido import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+STREAM = "saga:base"
+# Cada instancia del orquestador lee los streams con su propio grupo: los eventos
+# finales tienen que llegarle a la instancia que empezó la saga, no a una cualquiera.
+# Procesarlos solo termina la saga en memoria (el ?wait= y el cupo); los pasos con
+# efectos los consumen pagos, compras e inventario con un grupo compartido por servicio
+GRUPO = "base:{}"
+ESTADO = "saga:coreografia:estado:{}"
+
+
+class EventoCoreografia:
+    """Eventos de la saga de compra en modo coreografía; cada uno lo publica un solo servicio."""
+
+    # ms-base
+    COMPRA_SOLICITADA = "compra_solicitada"
+    # pagos
+    PAGO_REALIZADO = "pago_realizado"
+    PAGO_RECHAZADO = "pago_rechazado"
+    PAGO_COMPENSADO = "pago_compensado"
+    # compras
+    COMPRA_REGISTRADA = "compra_registrada"
+    COMPRA_RECHAZADA = "compra_rechazada"
+    COMPRA_COMPENSADA = "compra_compensada"
+    # inventario
+    STOCK_RESERVADO = "stock_reservado"
+    STOCK_RECHAZADO = "stock_rechazado"
+
+
+# Eventos con los que termina la saga: código y mensaje del resultado
+_FINALES = {
+    EventoCoreografia.STOCK_RESERVADO: (201, "Saga completada"),
+    EventoCoreografia.PAGO_RECHAZADO: (500, "Saga fallida: pago rechazado"),
+    EventoCoreografia.PAGO_COMPENSADO: (500, "Saga fallida y compensada"),
+}
+# Rechazos en la mitad de la cadena: la saga sigue compensándose
+_COMPENSANDO = (EventoCoreografia.COMPRA_RECHAZADA, EventoCoreografia.STOCK_RECHAZADO)
+_STREAMS = ("saga:pagos", "saga:compras", "saga:inventario")
+
+
+class CoreografiaSagas:
+    """
+    Saga de compra en modo coreografía (SAGA_MODO=coreografia). El orquestador solo
+    publica compra_solicitada en el stream saga:base; pagos, compras e inventario
+    reaccionan a los eventos del servicio anterior con sus consumer groups y, ante
+    un rechazo, publican las compensaciones (ver app/services/eventos_saga.py de
+    cada servicio). Ningún hilo del orquestador queda esperando la cadena.
+
+    El orquestador escucha los streams de los servicios solo para saber cómo
+    terminó cada saga: el resultado queda en memoria y en Redis por
+    SAGA_RESULTADO_TTL_S, y se consulta igual que el de las sagas orquestadas.
+    Se aceptan hasta SAGA_MAX_PENDIENTES sagas sin terminar; más allá se rechazan con 429.
+
+    Cada instancia tiene su consumer group (host y pid) y recibe todos los eventos
+    finales; sus workers se reparten los mensajes dentro del grupo. Si el resultado
+    igual quedó guardado por otra instancia, estado() lo toma de Redis y libera el cupo.
+    """
+
+    def __init__(self, app=None, cliente=None):
+        self.app = None
+        self.cliente = cliente
+        self.grupo = GRUPO.format(f"{socket.gethostname()}-{os.getpid()}")
+        self._hilos = []
+        self._sagas = {}
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.iniciadas = 0
+        self.rechazadas = 0
+        self.finales = dict.fromkeys(_FINALES, 0)
+        self._duracion_media = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = int(app.config.get('COREOGRAFIA_WORKERS', 4))
+        self.reclamo_ms = int(float(app.config.get('COREOGRAFIA_RECLAMO_S', 30)) * 1000)
+        self.max_stream = int(app.config.get('COREOGRAFIA_MAX_STREAM', 100000))
+        self.max_pendientes = int(app.config.get('SAGA_MAX_PENDIENTES', 256))
+        self.ttl = float(app.config.get('SAGA_RESULTADO_TTL_S', 600))
+        if self.cliente is None:
+            self.cliente = redis.StrictRedis(
+                host=os.getenv('REDIS_HOST', 'localhost'),
+                port=int(os.getenv('REDIS_PORT', '6379')),
+                db=int(os.getenv('REDIS_DB', '0')),
+                password=os.getenv('REDIS_PASSWORD'),
+                decode_responses=True,
+            )
+        app.extensions['coreografia_sagas'] = self
+
+    def _purgar(self):
+        limite = time.time() - self.ttl
+        vencidas = [saga_id for saga_id, estado in self._sagas.items()
+                    if estado.terminada is not None and estado.terminada < limite]
+        for saga_id in vencidas:
+            del self._sagas[saga_id]
+
+    def enviar(self, plan, datos) -> EstadoSaga:
+        """
+        Publica compra_solicitada y devuelve el estado de la saga. Misma interfaz que
+        EjecutorSagas.enviar; los pasos los deciden las suscripciones de cada servicio.
+        """
+        estado = EstadoSaga(str(uuid.uuid4()))
+        estado.estado = EstadoSaga.EN_CURSO
+        with self._lock:
+            if self.en_curso >= self.max_pendientes:
+                self.rechazadas += 1
+                raise SagaRechazada("cola_llena", 1)
+            self.en_curso += 1
+            self._purgar()
+            self._sagas[estado.saga_id] = estado
+        try:
+            self.cliente.xadd(STREAM, {
+                "evento": EventoCoreografia.COMPRA_SOLICITADA,
+                "saga_id": estado.saga_id,
+                "datos": dumps(datos),
+                "emitido": time.time(),
+            }, maxlen=self.max_stream, approximate=True)
+        except redis.RedisError:
+            with self._lock:
+                self.en_curso -= 1
+                self._sagas.pop(estado.saga_id, None)
+            raise
+        with self._lock:
+            self.iniciadas += 1
+        return estado
+
+    def iniciar_workers(self):
+        if self._hilos:
+            return
+        for numero in range(self.workers):
+            hilo = threading.Thread(target=self._trabajar, args=(numero,),
+                                    name=f"coreografia-{numero}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        atexit.register(self._borrar_grupos)
+        logger.info(f"{self.workers} workers de coreografía iniciados con el grupo {self.grupo}")
+
+    def _crear_grupos(self):
+        for stream in _STREAMS:
+            try:
+                self.cliente.xgroup_create(stream, self.grupo, id="$", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    def _borrar_grupos(self):
+        """El grupo es de este proceso: al salir se borra para que no quede en los streams."""
+        try:
+            for stream in _STREAMS:
+                self.cliente.xgroup_destroy(stream, self.grupo)
+        except redis.RedisError as e:
+            logger.warning(f"No se pudo borrar el grupo {self.grupo}: {e}")
+
+    def _leer(self, consumidor, reclamar):
+        if reclamar:
+            reclamados = []
+            for stream in _STREAMS:
+                respuesta = self.cliente.xautoclaim(stream, self.grupo, consumidor, self.reclamo_ms, "0-0", count=10)
+                reclamados.extend((stream, mensaje) for mensaje in (respuesta[1] if respuesta else []))
+            if reclamados:
+                return reclamados
+        respuesta = self.cliente.xreadgroup(self.grupo, consumidor, {stream: ">" for stream in _STREAMS},
+                                            count=10, block=1000)
+        return [(stream, mensaje) for stream, mensajes in respuesta or [] for mensaje in mensajes]
+
+    def _trabajar(self, numero):
+        consumidor = f"{socket.gethostname()}-{os.getpid()}-{numero}"
+        espera = 1
+        while True:
+            try:
+                self._crear_grupos()
+                proximo_reclamo = 0.0
+                while True:
+                    reclamar = time.monotonic() >= proximo_reclamo
+                    if reclamar:
+                        proximo_reclamo = time.monotonic() + self.reclamo_ms / 2000
+                    for stream, (id_mensaje, campos) in self._leer(consumidor, reclamar):
+                        if campos is not None:
+                            self._procesar(campos)
+                        self.cliente.xack(stream, self.grupo, id_mensaje)
+                    espera = 1
+            except redis.RedisError as e:
+                logger.error(f"Worker de coreografía {numero} sin Redis, reintenta en {espera}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            except Exception as e:
+                logger.exception(f"Error inesperado en el worker de coreografía {numero}: {e}")
+                time.sleep(1)
+
+    def _procesar(self, campos):
+        evento = campos.get("evento")
+        saga_id = campos.get("saga_id")
+        if evento in _COMPENSANDO:
+            with self._lock:
+                estado = self._sagas.get(saga_id)
+            if estado is not None and estado.terminada is None:
+                estado.estado = "compensando"
+            return
+        if evento not in _FINALES:
+            return
+
+        codigo, mensaje = _FINALES[evento]
+        datos = loads(campos["datos"])
+        resultado = {
+            "status_code": codigo,
+            "message": mensaje,
+            "data": {
+                "evento": evento,
+                "ids": {paso: datos.get(f"{paso}_id") for paso in ("pago", "compra", "stock")},
+                "error": datos.get("error"),
+            },
+        }
+        estado = self._terminar_local(saga_id, evento, resultado)
+        if estado is not None:
+            guardado = estado.a_dict()
+            self.cliente.set(ESTADO.format(saga_id), dumps(guardado), ex=int(self.ttl))
+        else:
+            # La empezó otra instancia, que guarda el resultado completo; esta solo lo
+            # deja si todavía no está, por si aquella ya no corre
+            guardado = {"saga_id": saga_id, "estado": _estado_final(codigo), "terminada": time.time(),
+                        "resultado": resultado}
+            self.cliente.set(ESTADO.format(saga_id), dumps(guardado), ex=int(self.ttl), nx=True)
+
+    def _terminar_local(self, saga_id, evento, resultado):
+        """
+        Termina la saga si la empezó esta instancia y sigue en curso, y libera su cupo.
+        Devuelve el estado terminado, o None si no había nada que terminar.
+        """
+        with self._lock:
+            estado = self._sagas.get(saga_id)
+            if estado is None or estado.terminada is not None:
+                return None
+            self.en_curso -= 1
+            if evento in self.finales:
+                self.finales[evento] += 1
+            estado.terminar(resultado)
+            duracion = estado.terminada - estado.recibida
+            self._duracion_media = duracion if not self._duracion_media else (
+                0.9 * self._duracion_media + 0.1 * duracion
+            )
+        return estado
+
+    def estado(self, saga_id):
+        with self._lock:
+            estado = self._sagas.get(saga_id)
+        if estado is None or estado.terminada is not None:
+            return estado
+        # El evento final pudo haberlo procesado otra instancia: si el resultado ya
+        # está en Redis, la saga se da por terminada acá también
+        try:
+            guardado = self.estado_desde_log(saga_id)
+        except redis.RedisError:
+            return estado
+        if guardado is not None and guardado.get("resultado") is not None:
+            self._terminar_local(saga_id, guardado["resultado"].get("data", {}).get("evento"),
+                                 guardado["resultado"])
+        return estado
+
+    def estado_desde_log(self, saga_id):
+        """Resultado guardado en Redis, para las sagas que no están en memoria. None si no hay."""
+        guardado = self.cliente.get(ESTADO.format(saga_id))
+        return loads(guardado) if guardado is not None else None
+
+    def snapshot(self):
+        largos = {stream: self.cliente.xlen(stream) for stream in (STREAM,) + _STREAMS}
+        with self._lock:
+            return {
+                "workers": len(self._hilos),
+                "en_curso": self.en_curso,
+                "max_pendientes": self.max_pendientes,
+                "iniciadas": self.iniciadas,
+                "rechazadas": self.rechazadas,
+                "completadas": self.finales[EventoCoreografia.STOCK_RESERVADO],
+                "pago_rechazado": self.finales[EventoCoreografia.PAGO_RECHAZADO],
+                "compensadas": self.finales[EventoCoreografia.PAGO_COMPENSADO],
+                "duracion_media_ms": round(self._duracion_media * 1000, 3),
+                "largo_streams": largos,
+            }
+
+
+def _estado_final(codigo):
+    return EstadoSaga.COMPLETADA if codigo < 300 else EstadoSaga.FALLIDA
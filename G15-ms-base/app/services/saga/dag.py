@@ -0,0 +1,241 @@
+import asyncio
+import logging
+from app.services.saga.acciones_async import adaptar_accion
+from app.services.saga.admision import SagaRechazada, control_admision
+from app.services.saga.disponibilidad import servicios_no_disponibles
+from app.services.saga.registro import (ErrorRegistroSaga, EventoSaga, RegistroMixin, compensable,
+                                        confirmacion_rechazada, datos_de_cierre)
+from app.utils.idempotencia import clave_paso
+from app.utils.tracing import span_paso, trazar_saga
+logger = logging.getLogger(__name__)
+
+
+class PasoSaga:
+    def __init__(self, nombre, accion, depende_de=()):
+        self.nombre = nombre
+        self.accion = accion
+        self.depende_de = tuple(depende_de)
+
+
+class SagaDAG:
+    """Pasos de una saga con sus dependencias. Se valida una sola vez al construirlo."""
+
+    def __init__(self, pasos):
+        self.pasos = {}
+        for paso in pasos:
+            if paso.nombre in self.pasos:
+                raise ValueError(f"Paso duplicado en la saga: {paso.nombre}")
+            self.pasos[paso.nombre] = paso
+
+        for paso in self.pasos.values():
+            faltantes = [d for d in paso.depende_de if d not in self.pasos]
+            if faltantes:
+                raise ValueError(f"El paso {paso.nombre} depende de pasos inexistentes: {faltantes}")
+
+        self.dependientes = {nombre: [] for nombre in self.pasos}
+        for paso in self.pasos.values():
+            for dependencia in paso.depende_de:
+                self.dependientes[dependencia].append(paso.nombre)
+
+        self.orden_topologico = self._ordenar()
+
+    def _ordenar(self):
+        grados = {nombre: len(paso.depende_de) for nombre, paso in self.pasos.items()}
+        listos = [nombre for nombre, grado in grados.items() if grado == 0]
+        orden = []
+        while listos:
+            nombre = listos.pop(0)
+            orden.append(nombre)
+            for dependiente in self.dependientes[nombre]:
+                grados[dependiente] -= 1
+                if grados[dependiente] == 0:
+                    listos.append(dependiente)
+
+        if len(orden) != len(self.pasos):
+            ciclo = [nombre for nombre, grado in grados.items() if grado > 0]
+            raise ValueError(f"La saga tiene dependencias cíclicas entre: {ciclo}")
+        return orden
+
+    @classmethod
+    def secuencial(cls, nombres_y_acciones):
+        """DAG lineal equivalente a la lista de acciones de SagaOrchestrator."""
+        pasos = []
+        anterior = None
+        for nombre, accion in nombres_y_acciones:
+            pasos.append(PasoSaga(nombre, accion, depende_de=(anterior,) if anterior else ()))
+            anterior = nombre
+        return cls(pasos)
+
+
+def dag_compra(accion_pago, accion_compra, accion_stock):
+    """Saga de compra: la compra y la reserva de stock solo dependen del pago, no entre sí."""
+    return SagaDAG([
+        PasoSaga("pago", accion_pago),
+        PasoSaga("compra", accion_compra, depende_de=("pago",)),
+        PasoSaga("stock", accion_stock, depende_de=("pago",)),
+    ])
+
+
+class DagSagaOrchestrator(RegistroMixin):
+    """
+    Ejecuta un SagaDAG: cada paso arranca apenas terminan sus dependencias, así la
+    latencia total es la del camino crítico. Ante un fallo deja de lanzar pasos,
+    espera a los que están en vuelo y compensa en orden topológico inverso; las
+    compensaciones independientes también corren en paralelo.
+    """
+
+    def __init__(self, dag, datos, executor=None, registro=None):
+        self.dag = dag
+        self.acciones = {nombre: adaptar_accion(paso.accion, executor) for nombre, paso in dag.pasos.items()}
+        self.datos = datos.copy()
+        self.ids_generados = {}
+        self.respuesta = {
+            "mensaje": "OK",
+            "codigo_estado": 201,
+            "datos": {"mensaje": "Operación realizada con éxito"},
+        }
+        self._iniciar_registro(registro)
+
+    async def _ejecutar_paso(self, nombre, saga_datos):
+        logger.info(f"Ejecutando paso {nombre}")
+        await self._registrar_async(EventoSaga.PASO_INICIADO, nombre)
+        try:
+            with span_paso(nombre, self.saga_id), clave_paso(nombre, self.saga_id):
+                url, response_data = await self.acciones[nombre].ejecutar(saga_datos)
+        except Exception as e:
+            await self._registrar_async(EventoSaga.PASO_FALLIDO, nombre, datos={"error": str(e)})
+            raise
+        id_generado = self.acciones[nombre].extraer_id(response_data)
+        logger.info(f"Paso {nombre} exitoso. ID generado: {id_generado}")
+        await self._registrar_async(EventoSaga.PASO_COMPLETADO, nombre, id_generado)
+        return id_generado
+
+    @trazar_saga
+    async def ejecutar(self):
+        saga_datos = self.datos.copy()
+
+        no_disponibles = servicios_no_disponibles(self.dag.orden_topologico)
+        if no_disponibles:
+            logger.warning(f"Saga rechazada, servicios no disponibles: {no_disponibles}")
+            self.respuesta["codigo_estado"] = 503
+            self.respuesta["mensaje"] = "Servicio no disponible"
+            self.respuesta["datos"] = {"servicios": no_disponibles}
+            return self.respuesta
+
+        try:
+            permiso = await control_admision.admitir_async(self.dag.orden_topologico)
+        except SagaRechazada as e:
+            logger.warning(f"Saga rechazada por sobrecarga: {e}")
+            self.respuesta["codigo_estado"] = 429
+            self.respuesta["mensaje"] = "Orquestador sobrecargado"
+            self.respuesta["datos"] = e.datos()
+            return self.respuesta
+
+        with permiso:
+            return await self._ejecutar_admitida(saga_datos)
+
+    async def _ejecutar_admitida(self, saga_datos):
+        orden = self.dag.orden_topologico
+        try:
+            await self._registrar_async(EventoSaga.INICIADA,
+                                        datos={"pasos": orden, "datos": saga_datos,
+                                               **datos_de_cierre(orden, [self.acciones[n] for n in orden])},
+                                        estricto=True)
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar el inicio de la saga, no se ejecuta: {e}")
+            self.respuesta["codigo_estado"] = 503
+            self.respuesta["mensaje"] = "Log de sagas no disponible"
+            self.respuesta["datos"] = {"error": str(e)}
+            return self.respuesta
+
+        faltan = {nombre: len(paso.depende_de) for nombre, paso in self.dag.pasos.items()}
+        en_vuelo = {}
+        error = None
+
+        def lanzar_listos():
+            for nombre, cantidad in list(faltan.items()):
+                if cantidad == 0:
+                    del faltan[nombre]
+                    tarea = asyncio.ensure_future(self._ejecutar_paso(nombre, saga_datos))
+                    en_vuelo[tarea] = nombre
+
+        lanzar_listos()
+        while en_vuelo:
+            terminadas, _ = await asyncio.wait(list(en_vuelo), return_when=asyncio.FIRST_COMPLETED)
+            for tarea in terminadas:
+                nombre = en_vuelo.pop(tarea)
+                if tarea.exception() is not None:
+                    logger.error(f"Fallo en el paso {nombre}: {tarea.exception()}")
+                    error = error or tarea.exception()
+                    continue
+                self.ids_generados[nombre] = tarea.result()
+                for dependiente in self.dag.dependientes[nombre]:
+                    if dependiente in faltan:
+                        faltan[dependiente] -= 1
+            if error is None:
+                lanzar_listos()
+
+        if error is None:
+            # Terminaron todos: se confirman en orden topológico los que lo piden (la reserva de stock)
+            error = await self._confirmar_acciones_async(
+                (nombre, self.ids_generados[nombre], self.acciones[nombre].confirmar)
+                for nombre in orden if self.acciones[nombre].confirmacion
+            )
+            if error is None:
+                await self._registrar_async(EventoSaga.COMPLETADA)
+                return self.respuesta
+            if not confirmacion_rechazada(error):
+                self.respuesta["codigo_estado"] = 500
+                self.respuesta["mensaje"] = "Confirmación de la saga sin resultado"
+                self.respuesta["datos"] = {"error": str(error)}
+                return self.respuesta
+
+        self.respuesta["codigo_estado"] = 500
+        self.respuesta["mensaje"] = "Error durante la ejecución de la saga"
+        self.respuesta["datos"] = {"error": str(error)}
+        await self.compensar()
+        return self.respuesta
+
+    def ejecutar_bloqueante(self):
+        """Para código síncrono (scripts, vistas de Flask)."""
+        return asyncio.run(self.ejecutar())
+
+    async def compensar(self):
+        if await self._diferir_compensacion_async():
+            logger.info("Compensación encolada para los workers")
+            self.respuesta["datos"]["compensacion"] = "encolada"
+            return
+
+        logger.info("Iniciando compensación (Rollback)...")
+        await self._registrar_async(EventoSaga.COMPENSANDO)
+        completados = [n for n in self.dag.orden_topologico if n in self.ids_generados]
+        tareas = {}
+        fallidas = []
+
+        async def compensar_paso(nombre):
+            # Primero se deshace todo lo que se construyó encima de este paso
+            dependientes = [tareas[d] for d in self.dag.dependientes[nombre] if d in tareas]
+            if dependientes:
+                await asyncio.gather(*dependientes)
+
+            id_a_compensar = self.ids_generados[nombre]
+            if not id_a_compensar or not compensable(self.acciones[nombre]):
+                return
+            logger.info(f"Compensando paso {nombre} (ID: {id_a_compensar})")
+            try:
+                with span_paso(nombre, self.saga_id, compensacion=True), \
+                        clave_paso(nombre, self.saga_id, compensacion=True):
+                    await self.acciones[nombre].compensar(id_a_compensar)
+                await self._registrar_async(EventoSaga.PASO_COMPENSADO, nombre, id_a_compensar)
+            except Exception as e:
+                logger.critical(f"Error crítico al compensar paso {nombre}: {e}")
+                fallidas.append(nombre)
+                await self._registrar_async(EventoSaga.COMPENSACION_FALLIDA, nombre, id_a_compensar,
+                                            datos={"error": str(e)})
+
+        for nombre in reversed(completados):
+            tareas[nombre] = asyncio.ensure_future(compensar_paso(nombre))
+        await asyncio.gather(*tareas.values())
+
+        if not fallidas:
+            await self._registrar_async(EventoSaga.COMPENSADA)
@@ -0,0 +1,313 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from app.utils.http_client import HttpClient
+from app.utils.json_rapido import json_de
+from app.utils.logger_config import setup_logger
+from app.utils.response_validator import ServerError, validar_respuesta
+
+logger = setup_logger(__name__)
+
+# Tipos de saga declarados como datos. Cada paso indica:
+# - servicio: clave de la config con la URL base del servicio
+# - ejecutar / compensar: método, ruta (se agrega a la URL base; "{id}" es el ID del paso) y código esperado.
+#   Sin compensar el paso no se deshace: lo que deja (una reserva de stock) vence solo
+# - confirmar (opcional): llamada con "{id}" que se hace cuando terminaron bien todos los pasos
+# - payload: ruta dentro de los datos de la saga ("pago"), o un dict campo -> ruta para armar el cuerpo
+# - id: ruta (o lista de rutas, se usa la primera con valor) del ID en la respuesta, para compensar
+# - exclusivo (opcional): el paso escribe sobre el saldo del producto con compare-and-swap
+#   por versión, y dos sagas a la vez chocan y reintentan; con el ruteo por producto_id
+#   la réplica lo ejecuta de a una saga por producto (ver EjecutorSagas)
+DEFINICIONES = {
+    "compra": {
+        "pasos": [
+            {
+                "nombre": "pago",
+                "servicio": "PAGOS_URL",
+                "ejecutar": {"metodo": "POST", "ruta": "/transaccion", "codigo": 201},
+                "payload": "pago",
+                "id": "data.id",
+                "compensar": {"metodo": "POST", "ruta": "/{id}/compensacion", "codigo": 204},
+            },
+            {
+                "nombre": "compra",
+                "servicio": "COMPRAS_URL",
+                "ejecutar": {"metodo": "POST", "ruta": "s", "codigo": 201},
+                "payload": "compra",
+                "id": "data.id",
+                "compensar": {"metodo": "DELETE", "ruta": "s/{id}", "codigo": 204},
+            },
+            {
+                "nombre": "stock",
+                "servicio": "STOCK_URL",
+                "ejecutar": {"metodo": "POST", "ruta": "/reservas", "codigo": 201},
+                "payload": {"producto_id": "stock.producto_id", "cantidad": "stock.cantidad"},
+                "id": "data.id",
+                "confirmar": {"metodo": "POST", "ruta": "/reservas/{id}/confirmacion", "codigo": 200},
+                "exclusivo": True,
+            },
+        ],
+    },
+}
+
+METODOS = ("GET", "POST", "PUT", "DELETE")
+_CON_CUERPO = ("POST", "PUT")
+
+
+class ErrorDefinicionSaga(ValueError):
+    pass
+
+
+def _ruta(texto):
+    if not isinstance(texto, str) or not texto or any(not parte for parte in texto.split(".")):
+        raise ErrorDefinicionSaga(f"Ruta inválida: {texto!r}")
+    return tuple(texto.split("."))
+
+
+def _buscar(datos, ruta):
+    for clave in ruta:
+        if not isinstance(datos, dict):
+            return None
+        datos = datos.get(clave)
+    return datos
+
+
+def buscar_id(respuesta, rutas):
+    """El primer valor no nulo de las rutas, en orden."""
+    for ruta in rutas:
+        valor = _buscar(respuesta, ruta)
+        if valor is not None:
+            return valor
+    return None
+
+
+@dataclass(frozen=True)
+class Llamada:
+    metodo: str
+    url: str
+    codigo: int
+
+    def hacer(self, cuerpo=None, id_recurso=None):
+        url = self.url if id_recurso is None else self.url.format(id=id_recurso)
+        if self.metodo == "POST":
+            return HttpClient.post(url, cuerpo)
+        if self.metodo == "PUT":
+            return HttpClient.put(url, cuerpo)
+        if self.metodo == "DELETE":
+            return HttpClient.delete(url)
+        return HttpClient.get(url)
+
+
+@dataclass(frozen=True)
+class PasoPlan:
+    """Paso compilado: URLs resueltas y rutas ya partidas. No guarda estado, se comparte entre sagas."""
+
+    nombre: str
+    llamada: Llamada
+    compensacion: Optional[Llamada]
+    # Cuerpo: o la parte de los datos en ruta_payload, o un dict armado con campos_payload
+    ruta_payload: Optional[Tuple[str, ...]]
+    campos_payload: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    rutas_id: Tuple[Tuple[str, ...], ...]
+    exclusivo: bool = False
+    confirmacion: Optional[Llamada] = None
+
+    def armar_payload(self, datos):
+        if self.ruta_payload is not None:
+            return _buscar(datos, self.ruta_payload)
+        return {campo: _buscar(datos, ruta) for campo, ruta in self.campos_payload}
+
+    def ejecutar(self, datos):
+        cuerpo = self.armar_payload(datos)
+        logger.info(f"Paso {self.nombre}: {self.llamada.metodo} {self.llamada.url}")
+        response = self.llamada.hacer(cuerpo)
+        validar_respuesta(response, codigo_esperado=self.llamada.codigo)
+        return self.llamada.url, json_de(response)
+
+    def reejecutar(self, datos):
+        """
+        Repite el paso, con la Idempotency-Key que fije quien llama (ver clave_paso), para
+        saber cómo terminó una ejecución que quedó sin resultado en el log: el servicio
+        devuelve la respuesta guardada, o lo ejecuta ahora si el pedido nunca le llegó.
+        Devuelve (completado, id). Lanza una excepción si todavía no se puede saber.
+        """
+        response = self.llamada.hacer(self.armar_payload(datos))
+        if response.status_code == self.llamada.codigo:
+            return True, self.extraer_id(json_de(response))
+        if response.status_code >= 500 or "Retry-After" in response.headers:
+            # Error del servicio, o el pedido original sigue en curso
+            raise ServerError(f"Paso {self.nombre}: {response.status_code}, sin resultado definitivo")
+        return False, None
+
+    def compensar(self, id_recurso):
+        if self.compensacion is None:
+            logger.info(f"Paso {self.nombre} sin compensación (ID: {id_recurso}): vence solo")
+            return True
+        logger.info(f"Compensando paso {self.nombre} (ID: {id_recurso})")
+        response = self.compensacion.hacer({}, id_recurso=id_recurso)
+        if response.status_code == 404:
+            logger.warning(f"Recurso {id_recurso} del paso {self.nombre} no encontrado.")
+            return False
+        validar_respuesta(response, codigo_esperado=self.compensacion.codigo)
+        return True
+
+    def confirmar(self, id_recurso):
+        """
+        Confirma el paso cuando la saga terminó bien (la reserva de stock pasa a ser una
+        salida). Un 409 o 404 (la reserva venció o no existe) lanza ConflictError o NotFoundError.
+        """
+        logger.info(f"Confirmando paso {self.nombre} (ID: {id_recurso})")
+        response = self.confirmacion.hacer({}, id_recurso=id_recurso)
+        if "Retry-After" in response.headers:
+            # La misma confirmación sigue en curso (409 de la Idempotency-Key): no es un rechazo
+            raise ServerError(f"Paso {self.nombre}: confirmación en curso")
+        validar_respuesta(response, codigo_esperado=self.confirmacion.codigo)
+        return True
+
+    def extraer_id(self, respuesta):
+        return buscar_id(respuesta, self.rutas_id)
+
+    # Misma interfaz que Action, para usarlo con Saga
+    execute = ejecutar
+    compensate = compensar
+
+
+class PasoExclusivo:
+    """Un paso exclusivo del plan que espera el lock de su clave antes de ejecutarse; lo demás lo delega."""
+
+    def __init__(self, paso, lock):
+        self._paso = paso
+        self._lock = lock
+
+    def __getattr__(self, nombre):
+        return getattr(self._paso, nombre)
+
+    def ejecutar(self, datos):
+        with self._lock:
+            return self._paso.ejecutar(datos)
+
+    execute = ejecutar
+
+
+@dataclass(frozen=True)
+class PlanSaga:
+    nombre: str
+    pasos: Tuple[PasoPlan, ...]
+    # Claves de primer nivel que tienen que venir en los datos de la saga
+    requeridos: Tuple[str, ...]
+
+    def paso(self, nombre) -> Optional[PasoPlan]:
+        return next((paso for paso in self.pasos if paso.nombre == nombre), None)
+
+    def pasos_con_lock(self, lock):
+        """Los pasos, con los exclusivos esperando el lock antes de ejecutarse."""
+        return tuple(PasoExclusivo(paso, lock) if paso.exclusivo else paso for paso in self.pasos)
+
+
+def _llamada(nombre_saga, nombre_paso, definicion, url_base, con_id):
+    if not isinstance(definicion, dict):
+        raise ErrorDefinicionSaga(f"{nombre_saga}.{nombre_paso}: falta la llamada")
+    metodo = str(definicion.get("metodo", "")).upper()
+    if metodo not in METODOS:
+        raise ErrorDefinicionSaga(f"{nombre_saga}.{nombre_paso}: método {metodo!r} no soportado")
+    ruta = definicion.get("ruta", "")
+    if con_id and "{id}" not in ruta:
+        raise ErrorDefinicionSaga(f"{nombre_saga}.{nombre_paso}: la compensación y la confirmación necesitan "
+                                  "{id} en la ruta")
+    if not con_id and "{" in ruta:
+        raise ErrorDefinicionSaga(f"{nombre_saga}.{nombre_paso}: la ruta del paso no lleva campos")
+    if not isinstance(definicion.get("codigo"), int):
+        raise ErrorDefinicionSaga(f"{nombre_saga}.{nombre_paso}: falta el código esperado")
+    return Llamada(metodo, url_base + ruta, definicion["codigo"])
+
+
+def compilar(nombre, definicion, config) -> PlanSaga:
+    """Valida la definición de un tipo de saga y la compila a un plan inmutable."""
+    pasos_definidos = definicion.get("pasos") if isinstance(definicion, dict) else None
+    if not pasos_definidos:
+        raise ErrorDefinicionSaga(f"La saga {nombre} no tiene pasos")
+
+    pasos = []
+    requeridos = []
+    for definicion_paso in pasos_definidos:
+        paso = definicion_paso.get("nombre")
+        if not paso or any(p.nombre == paso for p in pasos):
+            raise ErrorDefinicionSaga(f"{nombre}: paso sin nombre o repetido ({paso!r})")
+        url_base = config.get(definicion_paso.get("servicio") or "")
+        if not url_base:
+            raise ErrorDefinicionSaga(f"{nombre}.{paso}: {definicion_paso.get('servicio')!r} no está configurada")
+
+        payload = definicion_paso.get("payload")
+        ruta_payload, campos_payload = None, ()
+        if isinstance(payload, str):
+            ruta_payload = _ruta(payload)
+            rutas_payload = [ruta_payload]
+        elif isinstance(payload, dict) and payload:
+            campos_payload = tuple((campo, _ruta(ruta)) for campo, ruta in payload.items())
+            rutas_payload = [ruta for _, ruta in campos_payload]
+        else:
+            raise ErrorDefinicionSaga(f"{nombre}.{paso}: payload inválido")
+        for ruta in rutas_payload:
+            if ruta[0] not in requeridos:
+                requeridos.append(ruta[0])
+
+        rutas_id = definicion_paso.get("id")
+        rutas_id = [rutas_id] if isinstance(rutas_id, str) else rutas_id
+        if not rutas_id:
+            raise ErrorDefinicionSaga(f"{nombre}.{paso}: falta la ruta del ID")
+
+        llamada = _llamada(nombre, paso, definicion_paso.get("ejecutar"), url_base, con_id=False)
+        compensacion = confirmacion = None
+        if definicion_paso.get("compensar") is not None:
+            compensacion = _llamada(nombre, paso, definicion_paso["compensar"], url_base, con_id=True)
+        if definicion_paso.get("confirmar") is not None:
+            confirmacion = _llamada(nombre, paso, definicion_paso["confirmar"], url_base, con_id=True)
+        if llamada.metodo not in _CON_CUERPO:
+            raise ErrorDefinicionSaga(f"{nombre}.{paso}: el paso tiene que ser POST o PUT")
+        pasos.append(PasoPlan(paso, llamada, compensacion, ruta_payload, campos_payload,
+                              tuple(_ruta(ruta) for ruta in rutas_id), bool(definicion_paso.get("exclusivo")),
+                              confirmacion))
+
+    return PlanSaga(nombre, tuple(pasos), tuple(requeridos))
+
+
+def compilar_planes(config, definiciones=None):
+    definiciones = DEFINICIONES if definiciones is None else definiciones
+    return MappingProxyType({nombre: compilar(nombre, definicion, config) for nombre, definicion in definiciones.items()})
+
+
+def configurar_planes(app, definiciones=None):
+    """
+    Compila los tipos de saga al arrancar. Un tipo que no compila (por ejemplo, sin
+    PAGOS_URL en el entorno) no frena la app: queda deshabilitado, se loguea el
+    error y su ruta responde 503 (ver error_plan).
+    """
+    definiciones = DEFINICIONES if definiciones is None else definiciones
+    planes, errores = {}, {}
+    for nombre, definicion in definiciones.items():
+        try:
+            planes[nombre] = compilar(nombre, definicion, app.config)
+        except ErrorDefinicionSaga as e:
+            logger.error(f"La saga {nombre} queda deshabilitada: {e}")
+            errores[nombre] = str(e)
+    app.extensions['planes_saga'] = MappingProxyType(planes)
+    app.extensions['errores_planes_saga'] = MappingProxyType(errores)
+    if planes:
+        logger.info(f"Tipos de saga compilados: {', '.join(planes)}")
+    return app.extensions['planes_saga']
+
+
+def plan_saga(nombre) -> Optional[PlanSaga]:
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('planes_saga', {}).get(nombre)
+
+
+def error_plan(nombre) -> Optional[str]:
+    """Por qué el tipo de saga no se compiló al arrancar, o None si está disponible."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('errores_planes_saga', {}).get(nombre)
@@ -0,0 +1,17 @@
+from app.utils import circuit_breaker
+
+# Servicio que llama cada paso de la saga de compra (mismos nombres que los breakers)
+SERVICIO_POR_PASO = {
+    "pago": "pagos",
+    "compra": "compras",
+    "stock": "stock",
+}
+
+
+def servicios_no_disponibles(pasos):
+    """
+    Servicios con el breaker abierto entre los que usan estos pasos. Si hay alguno la
+    saga se rechaza antes de empezar: no tiene sentido cobrar para después compensar.
+    """
+    destinos = sorted({SERVICIO_POR_PASO[paso] for paso in pasos if paso in SERVICIO_POR_PASO})
+    return circuit_breaker.no_disponibles(destinos)
@@ -0,0 +1,200 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.saga.admision import SagaRechazada
+from app.services.saga.registro import EventoSaga, eventos_de
+from app.services.saga_orchestrator import Saga
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class EstadoSaga:
+    PENDIENTE = "pendiente"
+    EN_CURSO = "en_curso"
+    COMPLETADA = "completada"
+    RECHAZADA = "rechazada"
+    FALLIDA = "fallida"
+
+    def __init__(self, saga_id):
+        self.saga_id = saga_id
+        self.estado = self.PENDIENTE
+        self.resultado = None
+        self.recibida = time.time()
+        self.terminada = None
+        self._listo = threading.Event()
+
+    def terminar(self, resultado):
+        codigo = resultado.get("status_code", 500)
+        if codigo < 300:
+            self.estado = self.COMPLETADA
+        elif codigo in (409, 429, 503):
+            self.estado = self.RECHAZADA
+        else:
+            self.estado = self.FALLIDA
+        self.resultado = resultado
+        self.terminada = time.time()
+        self._listo.set()
+
+    def esperar(self, segundos):
+        return self._listo.wait(segundos)
+
+    def a_dict(self):
+        return {
+            "saga_id": self.saga_id,
+            "estado": self.estado,
+            "recibida": self.recibida,
+            "terminada": self.terminada,
+            "resultado": self.resultado,
+        }
+
+
+def _estado_desde_log(eventos):
+    nombres = [evento.evento for evento in eventos]
+    if EventoSaga.COMPLETADA in nombres:
+        return EstadoSaga.COMPLETADA
+    if EventoSaga.COMPENSADA in nombres:
+        return "compensada"
+    if EventoSaga.COMPENSANDO in nombres:
+        return "compensando"
+    return EstadoSaga.EN_CURSO
+
+
+class EjecutorSagas:
+    """
+    Ejecuta en un pool de SAGA_WORKERS hilos las sagas que llegan por HTTP: el pedido
+    recibe el saga_id enseguida y el resultado se consulta después. Se aceptan hasta
+    SAGA_MAX_PENDIENTES sagas esperando un hilo; más allá se rechazan con 429.
+
+    Los resultados quedan en memoria SAGA_RESULTADO_TTL_S segundos. Después (o desde
+    otra instancia) el estado se reconstruye con el log de sagas.
+
+    Las sagas enviadas con la misma clave (el producto_id, con el ruteo de
+    app/services/saga/ruteo.py) ejecutan de a una los pasos exclusivos del plan (el
+    de stock, que en inventario hace compare-and-swap sobre la versión del saldo del
+    producto y choca con las otras escrituras); los demás pasos corren en paralelo. Con más de SAGA_MAX_POR_CLAVE sagas de la misma clave sin terminar,
+    las nuevas se rechazan con 429.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._pool = None
+        self._sagas = {}
+        # clave -> [lock de los pasos exclusivos, sagas sin terminar con esa clave]
+        self._claves = {}
+        self._lock = threading.Lock()
+        self.pendientes = 0
+        self.aceptadas = 0
+        self.rechazadas = 0
+        self.serializadas = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = int(app.config.get('SAGA_WORKERS', 16))
+        self.max_pendientes = int(app.config.get('SAGA_MAX_PENDIENTES', 256))
+        self.max_por_clave = int(app.config.get('SAGA_MAX_POR_CLAVE', 32))
+        self.ttl = float(app.config.get('SAGA_RESULTADO_TTL_S', 600))
+        app.extensions['ejecutor_sagas'] = self
+
+    def _pool_actual(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="saga")
+        return self._pool
+
+    def _purgar(self):
+        limite = time.time() - self.ttl
+        vencidas = [saga_id for saga_id, estado in self._sagas.items()
+                    if estado.terminada is not None and estado.terminada < limite]
+        for saga_id in vencidas:
+            del self._sagas[saga_id]
+
+    def enviar(self, plan, datos, clave=None) -> EstadoSaga:
+        """
+        Encola una saga del plan y devuelve su estado. Lanza SagaRechazada si ya hay
+        demasiadas esperando, o demasiadas sin terminar con la misma clave.
+        """
+        with self._lock:
+            de_la_clave = self._claves.get(clave) if clave is not None else None
+            if self.pendientes >= self.max_pendientes:
+                self.rechazadas += 1
+                raise SagaRechazada("cola_llena", 1)
+            if de_la_clave is not None and de_la_clave[1] >= self.max_por_clave:
+                self.rechazadas += 1
+                raise SagaRechazada("clave_saturada", 1)
+            if clave is not None:
+                if de_la_clave is None:
+                    de_la_clave = self._claves[clave] = [threading.Lock(), 0]
+                elif de_la_clave[1]:
+                    self.serializadas += 1
+                de_la_clave[1] += 1
+                # Los pasos del plan no guardan estado: todas las sagas usan la misma tupla
+                saga = Saga(plan.pasos_con_lock(de_la_clave[0]), datos)
+            else:
+                saga = Saga(plan.pasos, datos)
+            estado = EstadoSaga(saga.saga_id)
+            self.pendientes += 1
+            self.aceptadas += 1
+            self._purgar()
+            self._sagas[saga.saga_id] = estado
+        # El contexto copiado lleva la traza del pedido HTTP al hilo de la saga
+        self._pool_actual().submit(contextvars.copy_context().run, self._ejecutar, saga, estado, clave)
+        return estado
+
+    def _ejecutar(self, saga, estado, clave=None):
+        with self._lock:
+            self.pendientes -= 1
+        estado.estado = EstadoSaga.EN_CURSO
+        try:
+            with self.app.app_context():
+                resultado = saga.execute()
+        except Exception as e:
+            logger.exception(f"Error inesperado ejecutando la saga {saga.saga_id}: {e}")
+            resultado = {"status_code": 500, "message": "Error inesperado ejecutando la saga", "data": {"error": str(e)}}
+        finally:
+            if clave is not None:
+                self._soltar_clave(clave)
+        estado.terminar(resultado)
+
+    def _soltar_clave(self, clave):
+        with self._lock:
+            de_la_clave = self._claves[clave]
+            de_la_clave[1] -= 1
+            if not de_la_clave[1]:
+                del self._claves[clave]
+
+    def estado(self, saga_id):
+        with self._lock:
+            return self._sagas.get(saga_id)
+
+    def estado_desde_log(self, saga_id):
+        """Estado según el log de sagas, para las que ya no están en memoria. None si no hay registro."""
+        if 'registro_saga' not in self.app.extensions:
+            return None
+        eventos = eventos_de(saga_id)
+        if not eventos:
+            return None
+        return {
+            "saga_id": saga_id,
+            "estado": _estado_desde_log(eventos),
+            "ultimo_evento": eventos[-1].evento,
+            "resultado": None,
+        }
+
+    def snapshot(self):
+        with self._lock:
+            en_memoria = list(self._sagas.values())
+            return {
+                "workers": self.workers,
+                "pendientes": self.pendientes,
+                "max_pendientes": self.max_pendientes,
+                "en_curso": sum(1 for estado in en_memoria if estado.estado == EstadoSaga.EN_CURSO),
+                "en_memoria": len(en_memoria),
+                "aceptadas": self.aceptadas,
+                "rechazadas": self.rechazadas,
+                "serializadas": self.serializadas,
+                "claves_compartidas": sum(1 for _, sagas in self._claves.values() if sagas > 1),
+            }
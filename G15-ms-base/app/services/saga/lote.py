@@ -0,0 +1,267 @@
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.compra_service import CompraService
+from app.services.pago_service import PagoService
+from app.services.saga.admision import SagaRechazada, control_admision
+from app.services.saga.disponibilidad import servicios_no_disponibles
+from app.services.saga.registro import (ErrorRegistroSaga, EventoSaga, RegistroMixin, RegistroSaga, compensable,
+                                        compensar_desde_log, datos_de_cierre, eventos_de)
+from app.services.stock_service import StockService
+from app.utils.idempotencia import clave_paso
+from app.utils.tracing import span_paso, trazar_saga
+
+logger = logging.getLogger(__name__)
+
+
+class PasoLote:
+    def __init__(self, nombre, ejecutar_bulk, compensar, confirmar_bulk=None):
+        # ejecutar_bulk(payloads) -> (url, [{"status_code": ..., "data": ...}, ...]) en el mismo orden;
+        # confirmar_bulk(ids) igual, con 200 por ítem confirmado. Sin compensar el paso no se deshace
+        self.nombre = nombre
+        self.ejecutar_bulk = ejecutar_bulk
+        self.compensar = compensar
+        self.confirmar_bulk = confirmar_bulk
+
+    @property
+    def compensacion(self):
+        return self.compensar
+
+    @property
+    def confirmacion(self):
+        return self.confirmar_bulk
+
+
+def pasos_compra_lote():
+    pago_service = PagoService()
+    compra_service = CompraService()
+    stock_service = StockService()
+    return [
+        PasoLote("pago", pago_service.agregar_pagos_bulk, pago_service.eliminar_pago),
+        PasoLote("compra", compra_service.comprar_bulk, compra_service.borrar_compra),
+        # La reserva vence sola si la compra no sigue; se confirma cuando terminó bien el ítem
+        PasoLote("stock", stock_service.reservar_stock_bulk, None,
+                 confirmar_bulk=stock_service.confirmar_reservas_bulk),
+    ]
+
+
+class SagaLoteOrchestrator(RegistroMixin):
+    """
+    Ejecuta un lote de compras como una saga por ítem, pero cada paso se manda en
+    una sola llamada bulk por servicio (3 llamadas por lote en vez de 3 por compra).
+    Un ítem que falla deja de avanzar y solo se compensa a sí mismo. Lo usa
+    POST /api/v1/saga/compra/lote.
+    """
+
+    CODIGO_OK = 201
+    CODIGO_CONFIRMADO = 200
+    # Un ítem con estos códigos en la confirmación se rechazó (la reserva venció o no existe)
+    CODIGOS_RECHAZO = (404, 409)
+
+    def __init__(self, compras, pasos=None, registro=None, max_compensaciones_paralelas=8):
+        self.compras = [compra.copy() for compra in compras]
+        self.pasos = pasos if pasos is not None else pasos_compra_lote()
+        self._conectar_registro(registro)
+        self.max_compensaciones_paralelas = max_compensaciones_paralelas
+        self.saga_ids = [RegistroSaga.nuevo_id() for _ in self.compras]
+        # Clave de idempotencia de las llamadas bulk, que abarcan a todo el lote
+        self.lote_id = RegistroSaga.nuevo_id()
+        self.ids_generados = [{} for _ in self.compras]
+        self.llamadas = 0
+        self.respuestas = [
+            {
+                "saga_id": saga_id,
+                "mensaje": "OK",
+                "codigo_estado": 201,
+                "datos": {"mensaje": "Operación realizada con éxito"},
+            }
+            for saga_id in self.saga_ids
+        ]
+
+    @trazar_saga
+    def ejecutar(self):
+        nombres = [paso.nombre for paso in self.pasos]
+
+        no_disponibles = servicios_no_disponibles(nombres)
+        if no_disponibles:
+            logger.warning(f"Lote rechazado, servicios no disponibles: {no_disponibles}")
+            for respuesta in self.respuestas:
+                respuesta.update(codigo_estado=503, mensaje="Servicio no disponible",
+                                 datos={"servicios": no_disponibles})
+            return self.respuestas
+
+        try:
+            permiso = control_admision.admitir(nombres)
+        except SagaRechazada as e:
+            logger.warning(f"Lote rechazado por sobrecarga: {e}")
+            for respuesta in self.respuestas:
+                respuesta.update(codigo_estado=429, mensaje="Orquestador sobrecargado", datos=e.datos())
+            return self.respuestas
+
+        with permiso:
+            return self._ejecutar_admitido(nombres)
+
+    def _ejecutar_admitido(self, nombres):
+        try:
+            self._registrar_varios(
+                [(self.saga_ids[i], EventoSaga.INICIADA, None, None,
+                  {"pasos": nombres, "datos": compra, **datos_de_cierre(nombres, self.pasos)})
+                 for i, compra in enumerate(self.compras)],
+                estricto=True,
+            )
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar el inicio del lote, no se ejecuta: {e}")
+            for respuesta in self.respuestas:
+                respuesta.update(codigo_estado=503, mensaje="Log de sagas no disponible", datos={"error": str(e)})
+            return self.respuestas
+
+        vivos = list(range(len(self.compras)))
+        fallidos = {}
+        sin_resultado = {}
+
+        for paso in self.pasos:
+            if not vivos:
+                break
+            logger.info(f"Ejecutando paso {paso.nombre} para {len(vivos)} ítems en una llamada")
+            # Con el lote y la posición en la llamada, la recuperación la repite igual (ver _resultados_lote)
+            self._registrar_varios([(self.saga_ids[i], EventoSaga.PASO_INICIADO, paso.nombre, None,
+                                     {"lote_id": self.lote_id, "indice": indice}) for indice, i in enumerate(vivos)])
+            resultados = self._ejecutar_paso(paso, vivos)
+            if resultados is None:
+                # No se sabe qué hizo el servicio: el paso queda sin resultado y se resuelve al compensar
+                for i in vivos:
+                    sin_resultado[i] = f"Paso {paso.nombre} sin resultado"
+                vivos = []
+                break
+
+            eventos = []
+            siguen = []
+            for i, resultado in zip(vivos, resultados):
+                if resultado.get("status_code") == self.CODIGO_OK:
+                    id_generado = (resultado.get("data") or {}).get("id")
+                    self.ids_generados[i][paso.nombre] = id_generado
+                    eventos.append((self.saga_ids[i], EventoSaga.PASO_COMPLETADO, paso.nombre, id_generado, None))
+                    siguen.append(i)
+                else:
+                    error = resultado.get("message") or f"Código {resultado.get('status_code')}"
+                    fallidos[i] = f"Fallo en el paso {paso.nombre}: {error}"
+                    eventos.append((self.saga_ids[i], EventoSaga.PASO_FALLIDO, paso.nombre, None,
+                                    {"error": error, "detalle": resultado.get("data")}))
+            self._registrar_varios(eventos)
+            vivos = siguen
+
+        for paso in self.pasos:
+            if vivos and paso.confirmar_bulk is not None:
+                vivos = self._confirmar_paso(paso, vivos, fallidos)
+        self._registrar_varios([(self.saga_ids[i], EventoSaga.COMPLETADA, None, None, None) for i in vivos])
+
+        for i, error in list(fallidos.items()) + list(sin_resultado.items()):
+            self.respuestas[i].update(
+                codigo_estado=500, mensaje="Error durante la ejecución de la saga", datos={"error": error}
+            )
+        if fallidos or sin_resultado:
+            self.compensar(list(fallidos), list(sin_resultado))
+
+        return self.respuestas
+
+    def _ejecutar_paso(self, paso, vivos):
+        payloads = [self.compras[i].get(paso.nombre) for i in vivos]
+        self.llamadas += 1
+        try:
+            with span_paso(paso.nombre) as span, clave_paso(paso.nombre, self.lote_id):
+                span.set_attribute("saga.lote.items", len(payloads))
+                _url, resultados = paso.ejecutar_bulk(payloads)
+            if len(resultados) != len(payloads):
+                raise ValueError(f"El servicio devolvió {len(resultados)} resultados para {len(payloads)} ítems")
+            return resultados
+        except Exception as e:
+            logger.error(f"Fallo la llamada bulk del paso {paso.nombre}: {e}")
+            return None
+
+    def _confirmar_paso(self, paso, vivos, fallidos):
+        """
+        Confirma en una llamada bulk el paso de los ítems que terminaron todos sus pasos.
+        Un ítem rechazado (409 o 404) pasa a fallidos y se compensa; uno sin resultado
+        queda abierto para la recuperación. Devuelve los que se confirmaron.
+        """
+        ids = [self.ids_generados[i][paso.nombre] for i in vivos]
+        self.llamadas += 1
+        try:
+            with span_paso(paso.nombre, confirmacion=True) as span, \
+                    clave_paso(paso.nombre, self.lote_id, confirmacion=True):
+                span.set_attribute("saga.lote.items", len(ids))
+                _url, resultados = paso.confirmar_bulk(ids)
+            if len(resultados) != len(ids):
+                raise ValueError(f"El servicio devolvió {len(resultados)} resultados para {len(ids)} ítems")
+        except Exception as e:
+            logger.error(f"Fallo la confirmación bulk del paso {paso.nombre}: {e}")
+            resultados = [{"status_code": 500, "message": str(e)} for _ in ids]
+
+        eventos = []
+        confirmados = []
+        for i, id_recurso, resultado in zip(vivos, ids, resultados):
+            codigo = resultado.get("status_code")
+            if codigo == self.CODIGO_CONFIRMADO:
+                eventos.append((self.saga_ids[i], EventoSaga.PASO_CONFIRMADO, paso.nombre, id_recurso, None))
+                confirmados.append(i)
+                continue
+            error = resultado.get("message") or f"Código {codigo}"
+            if codigo in self.CODIGOS_RECHAZO:
+                fallidos[i] = f"Confirmación del paso {paso.nombre} rechazada: {error}"
+                eventos.append((self.saga_ids[i], EventoSaga.PASO_FALLIDO, paso.nombre, id_recurso,
+                                {"confirmacion": True, "error": error}))
+            else:
+                logger.critical(f"Confirmación del paso {paso.nombre} de la saga {self.saga_ids[i]} sin "
+                                f"resultado, la saga queda abierta: {error}")
+                self.respuestas[i].update(codigo_estado=500, mensaje="Confirmación de la saga sin resultado",
+                                          datos={"error": error})
+        self._registrar_varios(eventos)
+        return confirmados
+
+    def compensar(self, indices, sin_resultado=()):
+        """
+        Compensa los ítems que fallaron. Los de `sin_resultado` (la llamada bulk falló
+        sin respuesta) primero se resuelven repitiéndola con la clave del lote, desde el log.
+        """
+        todos = list(indices) + list(sin_resultado)
+        en_linea = set(self._diferir_compensaciones([self.saga_ids[i] for i in todos]))
+        for i in todos:
+            if self.saga_ids[i] not in en_linea:
+                self.respuestas[i]["datos"]["compensacion"] = "encolada"
+        indices = [i for i in indices if self.saga_ids[i] in en_linea]
+        sin_resultado = [i for i in sin_resultado if self.saga_ids[i] in en_linea]
+        if indices:
+            logger.info(f"Compensando {len(indices)} ítems del lote...")
+            with ThreadPoolExecutor(max_workers=self.max_compensaciones_paralelas) as pool:
+                # Cada hilo necesita el app context de Flask para leer las URLs
+                tareas = [pool.submit(contextvars.copy_context().run, self._compensar_item, i) for i in indices]
+                for tarea in tareas:
+                    tarea.result()
+        if sin_resultado:
+            self._resolver_y_compensar(sin_resultado)
+
+    def _resolver_y_compensar(self, indices):
+        if self.registro is None or self.registro_incompleto:
+            # Sin el log completo no se puede armar la misma llamada bulk
+            for i in indices:
+                logger.critical(f"Saga {self.saga_ids[i]} con un paso sin resultado y sin log para "
+                                "resolverlo: se compensan los pasos anteriores")
+                self._compensar_item(i)
+            return
+        compensadores = {paso.nombre: paso.compensar for paso in self.pasos if compensable(paso)}
+        reejecutores_lote = {paso.nombre: paso.ejecutar_bulk for paso in self.pasos}
+        lotes = {}
+        for i in indices:
+            saga_id = self.saga_ids[i]
+            self._registrar(EventoSaga.COMPENSANDO, saga_id=saga_id)
+            compensar_desde_log(self.registro, saga_id, eventos_de(saga_id), compensadores,
+                                reejecutores_lote=reejecutores_lote, lotes=lotes)
+
+    def _compensar_item(self, i):
+        ids = self.ids_generados[i]
+        self._compensar_pasos(
+            ((paso.nombre, ids[paso.nombre], paso.compensar) for paso in reversed(self.pasos)
+             if ids.get(paso.nombre) and compensable(paso)),
+            saga_id=self.saga_ids[i],
+        )
@@ -1,70 +1,131 @@
 import logging
 from app.services.saga.acciones import SagaAction
+from app.services.saga.admision import SagaRechazada, control_admision
+from app.services.saga.disponibilidad import servicios_no_disponibles
+from app.services.saga.registro import (ErrorRegistroSaga, EventoSaga, RegistroMixin, compensable,
+                                        confirmacion_rechazada, datos_de_cierre)
+from app.utils.idempotencia import clave_paso
+from app.utils.tracing import span_paso, trazar_saga
 logger = logging.getLogger(__name__)
 
-class SagaOrchestrator:
+class SagaOrchestrator(RegistroMixin):
     _INDICES = {
         0: "pago",
         1: "compra",
         2: "stock",
     }
 
-    def __init__(self, acciones, datos):
+    def __init__(self, acciones, datos, registro=None):
         self.acciones = acciones
         self.datos = datos.copy()
-        self.ids_generados = []  
+        self.ids_generados = []
         self.respuesta = {
             "mensaje": "OK",
             "codigo_estado": 201,
             "datos": {"mensaje": "Operación realizada con éxito"},
         }
+        self._iniciar_registro(registro)
 
+    def _nombre_paso(self, indice):
+        return getattr(self.acciones[indice], "nombre", None) or self._INDICES.get(indice, str(indice))
+
+    @trazar_saga
     def ejecutar(self):
         saga_datos = self.datos.copy()
+        pasos = [self._nombre_paso(i) for i in range(len(self.acciones))]
+
+        no_disponibles = servicios_no_disponibles(pasos)
+        if no_disponibles:
+            logger.warning(f"Saga rechazada, servicios no disponibles: {no_disponibles}")
+            self.respuesta["codigo_estado"] = 503
+            self.respuesta["mensaje"] = "Servicio no disponible"
+            self.respuesta["datos"] = {"servicios": no_disponibles}
+            return self.respuesta
+
+        try:
+            permiso = control_admision.admitir(pasos)
+        except SagaRechazada as e:
+            logger.warning(f"Saga rechazada por sobrecarga: {e}")
+            self.respuesta["codigo_estado"] = 429
+            self.respuesta["mensaje"] = "Orquestador sobrecargado"
+            self.respuesta["datos"] = e.datos()
+            return self.respuesta
+
+        with permiso:
+            return self._ejecutar_admitida(saga_datos, pasos)
+
+    def _ejecutar_admitida(self, saga_datos, pasos):
+        try:
+            self._registrar(EventoSaga.INICIADA, datos={"pasos": pasos, "datos": saga_datos,
+                                                        **datos_de_cierre(pasos, self.acciones)}, estricto=True)
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar el inicio de la saga, no se ejecuta: {e}")
+            self.respuesta["codigo_estado"] = 503
+            self.respuesta["mensaje"] = "Log de sagas no disponible"
+            self.respuesta["datos"] = {"error": str(e)}
+            return self.respuesta
 
         for indice, accion in enumerate(self.acciones):
+            paso = self._nombre_paso(indice)
             try:
                 logger.info(f"Ejecutando acción {indice + 1}/{len(self.acciones)}")
-                
-               
-                url, response_data = accion.ejecutar(saga_datos)
-                
-                
-                datos_relevantes = response_data.get("data", {})
-                id_generado = datos_relevantes.get("id")
-                
+                self._registrar(EventoSaga.PASO_INICIADO, paso)
+
+                with span_paso(paso, self.saga_id), clave_paso(paso, self.saga_id):
+                    url, response_data = accion.ejecutar(saga_datos)
+
+
+                id_generado = accion.extraer_id(response_data)
+
                 logger.info(f"Acción exitosa. ID generado: {id_generado}")
                 self.ids_generados.append(id_generado)
+                self._registrar(EventoSaga.PASO_COMPLETADO, paso, id_generado)
 
             except Exception as e:
                 logger.error(f"Fallo en el paso {indice + 1}: {e}")
+                self._registrar(EventoSaga.PASO_FALLIDO, paso, datos={"error": str(e)})
                 self._manejar_error(e, indice)
-                break  
-        
+                break
+        else:
+            self._confirmar()
+
         return self.respuesta
 
+    def _confirmar(self):
+        """Confirma los pasos que lo piden (la reserva de stock) y cierra la saga; ver Saga._confirmar."""
+        error = self._confirmar_acciones(
+            (self._nombre_paso(i), self.ids_generados[i], accion.confirmar)
+            for i, accion in enumerate(self.acciones) if getattr(accion, "confirmacion", None)
+        )
+        if error is None:
+            self._registrar(EventoSaga.COMPLETADA)
+        elif confirmacion_rechazada(error):
+            self._manejar_error(error, len(self.acciones))
+        else:
+            self.respuesta["codigo_estado"] = 500
+            self.respuesta["mensaje"] = "Confirmación de la saga sin resultado"
+            self.respuesta["datos"] = {"error": str(error)}
+
     def _manejar_error(self, error, indice_fallido):
         self.respuesta["codigo_estado"] = 500
         self.respuesta["mensaje"] = "Error durante la ejecución de la saga"
         self.respuesta["datos"] = {"error": str(error)}
-        
-    
+
+
         self.ids_generados.append(None)
-        
-    
+
+
         self.compensar(indice_fallido)
 
     def compensar(self, indice_fallido):
-       
+        if self._diferir_compensacion():
+            logger.info("Compensación encolada para los workers")
+            self.respuesta["datos"]["compensacion"] = "encolada"
+            return
+
         logger.info("Iniciando compensación (Rollback)...")
-        
-        
-        for i in range(indice_fallido - 1, -1, -1):
-            id_a_compensar = self.ids_generados[i]
-            
-            if id_a_compensar:
-                logger.info(f"Compensando paso {i + 1} (ID: {id_a_compensar})")
-                try:
-                    self.acciones[i].compensar(id_a_compensar)
-                except Exception as e:
-                    logger.critical(f"Error crítico al compensar paso {i + 1}: {e}")
\ No newline at end of file
+        self._compensar_pasos(
+            (self._nombre_paso(i), self.ids_generados[i], self.acciones[i].compensar)
+            for i in range(indice_fallido - 1, -1, -1)
+            if self.ids_generados[i] and compensable(self.acciones[i])
+        )
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from app.services.saga.acciones_async import adaptar_accion
+from app.services.saga.admision import SagaRechazada, control_admision
+from app.services.saga.disponibilidad import servicios_no_disponibles
+from app.services.saga.registro import (ErrorRegistroSaga, EventoSaga, RegistroMixin, compensable,
+                                        confirmacion_rechazada, datos_de_cierre)
+from app.utils.idempotencia import clave_paso
+from app.utils.tracing import span_paso, trazar_saga
+logger = logging.getLogger(__name__)
+
+
+class AsyncSagaOrchestrator(RegistroMixin):
+    """
+    Misma semántica que SagaOrchestrator, pero cada paso y cada compensación
+    se esperan con await: mientras pagos responde, el event loop atiende otras sagas.
+    """
+
+    _INDICES = {
+        0: "pago",
+        1: "compra",
+        2: "stock",
+    }
+
+    def __init__(self, acciones, datos, executor=None, registro=None):
+        self.acciones = [adaptar_accion(accion, executor) for accion in acciones]
+        self.datos = datos.copy()
+        self.ids_generados = []
+        self.respuesta = {
+            "mensaje": "OK",
+            "codigo_estado": 201,
+            "datos": {"mensaje": "Operación realizada con éxito"},
+        }
+        self._iniciar_registro(registro)
+
+    def _nombre_paso(self, indice):
+        return self.acciones[indice].nombre or self._INDICES.get(indice, str(indice))
+
+    @trazar_saga
+    async def ejecutar(self):
+        saga_datos = self.datos.copy()
+        pasos = [self._nombre_paso(i) for i in range(len(self.acciones))]
+
+        no_disponibles = servicios_no_disponibles(pasos)
+        if no_disponibles:
+            logger.warning(f"Saga rechazada, servicios no disponibles: {no_disponibles}")
+            self.respuesta["codigo_estado"] = 503
+            self.respuesta["mensaje"] = "Servicio no disponible"
+            self.respuesta["datos"] = {"servicios": no_disponibles}
+            return self.respuesta
+
+        try:
+            permiso = await control_admision.admitir_async(pasos)
+        except SagaRechazada as e:
+            logger.warning(f"Saga rechazada por sobrecarga: {e}")
+            self.respuesta["codigo_estado"] = 429
+            self.respuesta["mensaje"] = "Orquestador sobrecargado"
+            self.respuesta["datos"] = e.datos()
+            return self.respuesta
+
+        with permiso:
+            return await self._ejecutar_admitida(saga_datos, pasos)
+
+    async def _ejecutar_admitida(self, saga_datos, pasos):
+        try:
+            await self._registrar_async(EventoSaga.INICIADA, datos={"pasos": pasos, "datos": saga_datos,
+                                                                    **datos_de_cierre(pasos, self.acciones)},
+                                        estricto=True)
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar el inicio de la saga, no se ejecuta: {e}")
+            self.respuesta["codigo_estado"] = 503
+            self.respuesta["mensaje"] = "Log de sagas no disponible"
+            self.respuesta["datos"] = {"error": str(e)}
+            return self.respuesta
+
+        for indice, accion in enumerate(self.acciones):
+            paso = self._nombre_paso(indice)
+            try:
+                logger.info(f"Ejecutando acción {indice + 1}/{len(self.acciones)}")
+                await self._registrar_async(EventoSaga.PASO_INICIADO, paso)
+
+                with span_paso(paso, self.saga_id), clave_paso(paso, self.saga_id):
+                    url, response_data = await accion.ejecutar(saga_datos)
+
+                id_generado = accion.extraer_id(response_data)
+
+                logger.info(f"Acción exitosa. ID generado: {id_generado}")
+                self.ids_generados.append(id_generado)
+                await self._registrar_async(EventoSaga.PASO_COMPLETADO, paso, id_generado)
+
+            except Exception as e:
+                logger.error(f"Fallo en el paso {indice + 1}: {e}")
+                await self._registrar_async(EventoSaga.PASO_FALLIDO, paso, datos={"error": str(e)})
+                await self._manejar_error(e, indice)
+                break
+        else:
+            await self._confirmar()
+
+        return self.respuesta
+
+    async def _confirmar(self):
+        error = await self._confirmar_acciones_async(
+            (self._nombre_paso(i), self.ids_generados[i], accion.confirmar)
+            for i, accion in enumerate(self.acciones) if accion.confirmacion
+        )
+        if error is None:
+            await self._registrar_async(EventoSaga.COMPLETADA)
+        elif confirmacion_rechazada(error):
+            await self._manejar_error(error, len(self.acciones))
+        else:
+            self.respuesta["codigo_estado"] = 500
+            self.respuesta["mensaje"] = "Confirmación de la saga sin resultado"
+            self.respuesta["datos"] = {"error": str(error)}
+
+    async def _manejar_error(self, error, indice_fallido):
+        self.respuesta["codigo_estado"] = 500
+        self.respuesta["mensaje"] = "Error durante la ejecución de la saga"
+        self.respuesta["datos"] = {"error": str(error)}
+
+        self.ids_generados.append(None)
+
+        await self.compensar(indice_fallido)
+
+    async def compensar(self, indice_fallido):
+        if await self._diferir_compensacion_async():
+            logger.info("Compensación encolada para los workers")
+            self.respuesta["datos"]["compensacion"] = "encolada"
+            return
+
+        logger.info("Iniciando compensación (Rollback)...")
+        await self._registrar_async(EventoSaga.COMPENSANDO)
+        ok = True
+
+        for i in range(indice_fallido - 1, -1, -1):
+            id_a_compensar = self.ids_generados[i]
+
+            if id_a_compensar and compensable(self.acciones[i]):
+                logger.info(f"Compensando paso {i + 1} (ID: {id_a_compensar})")
+                try:
+                    with span_paso(self._nombre_paso(i), self.saga_id, compensacion=True), \
+                            clave_paso(self._nombre_paso(i), self.saga_id, compensacion=True):
+                        await self.acciones[i].compensar(id_a_compensar)
+                    await self._registrar_async(EventoSaga.PASO_COMPENSADO, self._nombre_paso(i), id_a_compensar)
+                except Exception as e:
+                    logger.critical(f"Error crítico al compensar paso {i + 1}: {e}")
+                    await self._registrar_async(EventoSaga.COMPENSACION_FALLIDA, self._nombre_paso(i),
+                                                id_a_compensar, datos={"error": str(e)})
+                    ok = False
+
+        if ok:
+            await self._registrar_async(EventoSaga.COMPENSADA)
+
+
+async def ejecutar_sagas(orquestadores, max_concurrentes=1000):
+    """Ejecuta muchas sagas en el mismo event loop, con a lo sumo max_concurrentes en vuelo."""
+    semaforo = asyncio.Semaphore(max_concurrentes)
+
+    async def _una(orquestador):
+        async with semaforo:
+            return await orquestador.ejecutar()
+
+    return await asyncio.gather(*(_una(o) for o in orquestadores))
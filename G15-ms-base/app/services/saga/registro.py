@@ -0,0 +1,607 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, func, insert
+
+from app import db
+from app.models import SagaLogEntry
+from app.utils.idempotencia import clave_paso
+from app.utils.response_validator import ConflictError, NotFoundError
+from app.utils.tracing import span_paso
+
+logger = logging.getLogger(__name__)
+
+
+class EventoSaga:
+    INICIADA = "INICIADA"
+    PASO_INICIADO = "PASO_INICIADO"
+    PASO_COMPLETADO = "PASO_COMPLETADO"
+    PASO_FALLIDO = "PASO_FALLIDO"
+    PASO_CONFIRMADO = "PASO_CONFIRMADO"
+    COMPENSANDO = "COMPENSANDO"
+    PASO_COMPENSADO = "PASO_COMPENSADO"
+    COMPENSACION_FALLIDA = "COMPENSACION_FALLIDA"
+    COMPLETADA = "COMPLETADA"
+    COMPENSADA = "COMPENSADA"
+
+    TERMINALES = (COMPLETADA, COMPENSADA)
+
+
+class ErrorRegistroSaga(Exception):
+    pass
+
+
+class _Pendiente:
+    __slots__ = ("fila", "evento", "loop", "futuro", "error")
+
+    def __init__(self, fila, loop=None, futuro=None):
+        self.fila = fila
+        self.evento = None if futuro is not None else threading.Event()
+        self.loop = loop
+        self.futuro = futuro
+        self.error = None
+
+    def resolver(self, error=None):
+        self.error = error
+        if self.futuro is not None:
+            self.loop.call_soon_threadsafe(self._resolver_futuro, error)
+        else:
+            self.evento.set()
+
+    def _resolver_futuro(self, error):
+        if self.futuro.done():
+            return
+        if error is not None:
+            self.futuro.set_exception(ErrorRegistroSaga(str(error)))
+        else:
+            self.futuro.set_result(None)
+
+
+class RegistroSaga:
+    """
+    Log append-only de transiciones de sagas en la base del orquestador.
+
+    Cada registrar() espera a que su fila esté commiteada, pero un único hilo
+    escritor junta todo lo que llegó mientras tanto y lo inserta en un solo
+    commit (group commit): con muchas sagas en vuelo el costo por evento baja
+    en vez de multiplicar los commits.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._cola = queue.Queue()
+        self._hilo = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_lote = int(app.config.get('SAGA_LOG_MAX_LOTE', 256))
+        self.espera = float(app.config.get('SAGA_LOG_ESPERA_MS', 2)) / 1000
+        self.timeout = float(app.config.get('SAGA_LOG_TIMEOUT', 10))
+        app.extensions['registro_saga'] = self
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._escritor, name="saga-log", daemon=True)
+            self._hilo.start()
+
+    @staticmethod
+    def nuevo_id() -> str:
+        return str(uuid.uuid4())
+
+    @staticmethod
+    def _fila(saga_id, evento, paso=None, id_recurso=None, datos=None):
+        return {
+            "saga_id": saga_id,
+            "evento": evento,
+            "paso": paso,
+            "id_recurso": None if id_recurso is None else str(id_recurso),
+            "datos": datos,
+        }
+
+    def registrar(self, saga_id, evento, paso=None, id_recurso=None, datos=None):
+        pendiente = _Pendiente(self._fila(saga_id, evento, paso, id_recurso, datos))
+        self._cola.put(pendiente)
+        if not pendiente.evento.wait(self.timeout):
+            raise ErrorRegistroSaga(f"Timeout registrando {evento} de la saga {saga_id}")
+        if pendiente.error is not None:
+            raise ErrorRegistroSaga(str(pendiente.error))
+
+    def registrar_varios(self, eventos):
+        """
+        Registra varios eventos (tuplas saga_id, evento, paso, id_recurso, datos) y
+        espera a que estén todos commiteados; entran en el mismo lote del escritor.
+        """
+        pendientes = [_Pendiente(self._fila(*evento)) for evento in eventos]
+        for pendiente in pendientes:
+            self._cola.put(pendiente)
+        limite = time.monotonic() + self.timeout
+        for pendiente in pendientes:
+            if not pendiente.evento.wait(max(limite - time.monotonic(), 0)):
+                raise ErrorRegistroSaga("Timeout registrando eventos de sagas")
+            if pendiente.error is not None:
+                raise ErrorRegistroSaga(str(pendiente.error))
+
+    async def registrar_async(self, saga_id, evento, paso=None, id_recurso=None, datos=None):
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._cola.put(_Pendiente(self._fila(saga_id, evento, paso, id_recurso, datos), loop, futuro))
+        try:
+            await asyncio.wait_for(futuro, self.timeout)
+        except asyncio.TimeoutError:
+            raise ErrorRegistroSaga(f"Timeout registrando {evento} de la saga {saga_id}")
+
+    def _tomar_lote(self):
+        lote = [self._cola.get()]
+        limite = time.monotonic() + self.espera
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            try:
+                lote.append(self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _escritor(self):
+        while True:
+            lote = self._tomar_lote()
+            error = None
+            try:
+                with self.app.app_context():
+                    db.session.execute(insert(SagaLogEntry), [p.fila for p in lote])
+                    db.session.commit()
+            except Exception as e:
+                logger.error(f"Error escribiendo {len(lote)} eventos en el log de sagas: {e}")
+                error = e
+                try:
+                    with self.app.app_context():
+                        db.session.rollback()
+                except Exception:
+                    pass
+            for pendiente in lote:
+                pendiente.resolver(error)
+
+
+def registro_actual():
+    """El RegistroSaga de la app activa, o None si no hay app o no se inicializó."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('registro_saga')
+
+
+def cola_actual():
+    """La ColaCompensacion de la app activa, o None si no hay app o no está habilitada."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('cola_compensacion')
+
+
+def sagas_sin_terminar():
+    terminada = func.sum(case((SagaLogEntry.evento.in_(EventoSaga.TERMINALES), 1), else_=0))
+    filas = (
+        db.session.query(SagaLogEntry.saga_id)
+        .group_by(SagaLogEntry.saga_id)
+        .having(terminada == 0)
+        .all()
+    )
+    return [fila[0] for fila in filas]
+
+
+def compensable(accion):
+    """Un paso sin compensación (la reserva de stock, que vence sola) no se deshace."""
+    return getattr(accion, "compensacion", True) is not None
+
+
+def datos_de_cierre(pasos, acciones):
+    """Para los datos de INICIADA: qué pasos se confirman al final y cuáles no se compensan."""
+    return {
+        "confirmar": [paso for paso, accion in zip(pasos, acciones) if getattr(accion, "confirmacion", None)],
+        "sin_compensacion": [paso for paso, accion in zip(pasos, acciones) if not compensable(accion)],
+    }
+
+
+def confirmacion_rechazada(error):
+    """El servicio rechazó la confirmación (409 o 404: la reserva venció o no existe) y hay que compensar."""
+    return isinstance(error, (ConflictError, NotFoundError))
+
+
+def _log_fallo_confirmacion(paso, saga_id, error):
+    """Deja en el log de la app cómo falló una confirmación; devuelve si fue rechazada."""
+    if confirmacion_rechazada(error):
+        logger.error(f"Confirmación del paso {paso} de la saga {saga_id} rechazada, se compensa: {error}")
+        return True
+    logger.critical(f"Confirmación del paso {paso} de la saga {saga_id} sin resultado, la saga queda abierta: {error}")
+    return False
+
+
+def _datos_inicio(eventos):
+    """Los datos de INICIADA: pasos, datos de la saga y qué pasos se confirman o no se compensan."""
+    inicio = next((e for e in eventos if e.evento == EventoSaga.INICIADA), None)
+    return (inicio.datos or {}) if inicio else {}
+
+
+def _pasos_sin_resultado(eventos):
+    """Pasos con PASO_INICIADO y sin PASO_COMPLETADO ni PASO_FALLIDO, en orden."""
+    terminados = {e.paso for e in eventos if e.evento in (EventoSaga.PASO_COMPLETADO, EventoSaga.PASO_FALLIDO)}
+    return [e.paso for e in eventos if e.evento == EventoSaga.PASO_INICIADO and e.paso not in terminados]
+
+
+def _resultados_lote(paso, lote_id, ejecutar_bulk):
+    """
+    Repite la llamada bulk de un paso de SagaLoteOrchestrator con la Idempotency-Key
+    del lote: el servicio devuelve la respuesta guardada, o la ejecuta ahora si el
+    pedido nunca le llegó. El cuerpo tiene que ser el mismo que el original, así que
+    se arma con los datos de INICIADA de cada saga del lote, en el orden de la llamada.
+    Devuelve {saga_id: resultado del ítem}.
+    """
+    iniciados = (
+        SagaLogEntry.query
+        .filter(SagaLogEntry.evento == EventoSaga.PASO_INICIADO, SagaLogEntry.paso == paso,
+                SagaLogEntry.datos["lote_id"].as_string() == lote_id)
+        .order_by(SagaLogEntry.id)
+        .all()
+    )
+    iniciados.sort(key=lambda e: (e.datos or {}).get("indice", 0))
+    saga_ids = [e.saga_id for e in iniciados]
+    datos = {
+        e.saga_id: (e.datos or {}).get("datos") or {}
+        for e in SagaLogEntry.query.filter(SagaLogEntry.saga_id.in_(saga_ids),
+                                           SagaLogEntry.evento == EventoSaga.INICIADA)
+    }
+    payloads = [datos.get(saga_id, {}).get(paso) for saga_id in saga_ids]
+    with span_paso(paso) as span, clave_paso(paso, lote_id):
+        span.set_attribute("saga.lote.items", len(payloads))
+        _url, resultados = ejecutar_bulk(payloads)
+    if len(resultados) != len(payloads):
+        raise ValueError(f"El servicio devolvió {len(resultados)} resultados para {len(payloads)} ítems")
+    return dict(zip(saga_ids, resultados))
+
+
+def _reejecutar_en_lote(saga_id, paso, lote_id, ejecutar_bulk, lotes):
+    """
+    Como PasoPlan.reejecutar para un paso que se mandó en una llamada bulk: (completado, id),
+    o una excepción si todavía no se sabe. `lotes` guarda lo que devolvió cada llamada
+    repetida, así el lote se pide una sola vez aunque tenga muchas sagas abiertas.
+    """
+    clave = (paso, lote_id)
+    if clave not in lotes:
+        try:
+            lotes[clave] = _resultados_lote(paso, lote_id, ejecutar_bulk)
+        except Exception as e:
+            lotes[clave] = e
+    if isinstance(lotes[clave], Exception):
+        raise lotes[clave]
+    resultado = lotes[clave].get(saga_id)
+    if resultado is None:
+        raise ValueError(f"La saga no figura en el lote {lote_id}")
+    # Cada ítem se toma igual que en el lote: el resultado del ítem es definitivo
+    if resultado.get("status_code") == 201:
+        return True, (resultado.get("data") or {}).get("id")
+    return False, None
+
+
+def _resolver_pasos(registro, saga_id, eventos, reejecutores, reejecutores_lote=None, lotes=None):
+    """
+    Un paso sin resultado puede haber terminado bien en el servicio (se cayó el
+    orquestador antes de registrarlo): se repite con su Idempotency-Key, y el servicio
+    devuelve la respuesta guardada (o lo ejecuta ahora), para conocer el ID y poder
+    compensarlo. Un paso de un lote se repite con la llamada bulk del lote y su clave
+    (`reejecutores_lote`, ver _reejecutar_en_lote). Devuelve ({paso: id} de los que
+    terminaron bien, [(paso, error)] de los que todavía no se pueden resolver).
+    """
+    resueltos = {}
+    fallidos = []
+    pendientes = _pasos_sin_resultado(eventos)
+    if not pendientes:
+        return resueltos, fallidos
+    datos = _datos_inicio(eventos).get("datos")
+    # Repetirlo solo con la clave de la saga ejecutaría de nuevo un paso que se mandó en un lote
+    en_lote = {e.paso: e.datos["lote_id"] for e in eventos
+               if e.evento == EventoSaga.PASO_INICIADO and (e.datos or {}).get("lote_id")}
+    lotes = {} if lotes is None else lotes
+    for paso in pendientes:
+        lote_id = en_lote.get(paso)
+        reejecutar = ((reejecutores_lote if lote_id else reejecutores) or {}).get(paso)
+        if reejecutar is None or datos is None:
+            logger.critical(f"Paso {paso} de la saga {saga_id} quedó sin resultado y no se puede repetir: "
+                            "la saga queda abierta")
+            fallidos.append((paso, "sin resultado"))
+            continue
+        try:
+            if lote_id:
+                completado, id_recurso = _reejecutar_en_lote(saga_id, paso, lote_id, reejecutar, lotes)
+            else:
+                with span_paso(paso, saga_id), clave_paso(paso, saga_id):
+                    completado, id_recurso = reejecutar(datos)
+        except Exception as e:
+            logger.error(f"No se pudo resolver el paso {paso} de la saga {saga_id}: {e}")
+            fallidos.append((paso, f"sin resultado: {e}"))
+            continue
+        if completado:
+            registro.registrar(saga_id, EventoSaga.PASO_COMPLETADO, paso=paso, id_recurso=id_recurso,
+                               datos={"recuperacion": True})
+            resueltos[paso] = None if id_recurso is None else str(id_recurso)
+        else:
+            registro.registrar(saga_id, EventoSaga.PASO_FALLIDO, paso=paso, datos={"recuperacion": True})
+    return resueltos, fallidos
+
+
+def _pasos_a_compensar(eventos, resueltos=None):
+    """
+    Pasos completados y todavía no compensados, del último al primero. `resueltos`
+    son los que estaban sin resultado y se resolvieron (ver _resolver_pasos). Los
+    pasos sin compensación (una reserva de stock, que vence sola) no se devuelven.
+    """
+    resueltos = resueltos or {}
+    completados = []
+    compensados = set(_datos_inicio(eventos).get("sin_compensacion") or ())
+    for evento in eventos:
+        if evento.evento == EventoSaga.PASO_COMPLETADO and evento.id_recurso:
+            completados.append((evento.paso, evento.id_recurso))
+        elif evento.evento == EventoSaga.PASO_COMPENSADO:
+            compensados.add(evento.paso)
+        elif evento.evento == EventoSaga.PASO_INICIADO and resueltos.get(evento.paso):
+            completados.append((evento.paso, resueltos[evento.paso]))
+    return [(paso, id_recurso) for paso, id_recurso in reversed(completados) if paso not in compensados]
+
+
+def _termino_todos_los_pasos(eventos):
+    pasos = _datos_inicio(eventos).get("pasos")
+    if not pasos:
+        return False
+    if any(e.evento in (EventoSaga.PASO_FALLIDO, EventoSaga.COMPENSANDO) for e in eventos):
+        return False
+    completados = {e.paso for e in eventos if e.evento == EventoSaga.PASO_COMPLETADO}
+    return set(pasos) <= completados
+
+
+def _confirmar_pasos(registro, saga_id, eventos, confirmadores):
+    """
+    Una saga que completó todos sus pasos confirma los que lo piden y todavía no se
+    confirmaron (ver Saga._confirmar) antes de cerrarse. Devuelve True si quedaron
+    todos confirmados, False si se rechazó alguno (la reserva venció: hay que
+    compensar) y None si todavía no se puede saber.
+    """
+    confirmados = {e.paso for e in eventos if e.evento == EventoSaga.PASO_CONFIRMADO}
+    ids = {e.paso: e.id_recurso for e in eventos if e.evento == EventoSaga.PASO_COMPLETADO}
+    for paso in _datos_inicio(eventos).get("confirmar") or ():
+        if paso in confirmados:
+            continue
+        confirmar = (confirmadores or {}).get(paso)
+        if confirmar is None:
+            logger.critical(f"No hay confirmación registrada para el paso {paso} (saga {saga_id}): "
+                            "la saga queda abierta")
+            return None
+        try:
+            with span_paso(paso, saga_id, confirmacion=True), clave_paso(paso, saga_id, confirmacion=True):
+                confirmar(ids.get(paso))
+        except (ConflictError, NotFoundError) as e:
+            logger.error(f"Confirmación del paso {paso} de la saga {saga_id} rechazada, se compensa: {e}")
+            registro.registrar(saga_id, EventoSaga.PASO_FALLIDO, paso=paso, id_recurso=ids.get(paso),
+                               datos={"confirmacion": True, "recuperacion": True, "error": str(e)})
+            return False
+        except Exception as e:
+            logger.error(f"No se pudo confirmar el paso {paso} de la saga {saga_id}: {e}")
+            return None
+        registro.registrar(saga_id, EventoSaga.PASO_CONFIRMADO, paso=paso, id_recurso=ids.get(paso),
+                           datos={"recuperacion": True})
+    return True
+
+
+def recuperar_sagas(registro, compensadores, cola=None, reejecutores=None, confirmadores=None,
+                    reejecutores_lote=None):
+    """
+    Pasada de recuperación al arrancar. Una saga sin evento terminal que ya había
+    completado todos sus pasos confirma los que lo piden (con `confirmadores`) y se
+    cierra como completada; si se rechaza una confirmación se compensa. El resto se compensa
+    (o se retoma la compensación que había quedado a medias). Si algún paso no se
+    puede compensar, o quedó sin resultado y no se pudo resolver con `reejecutores`
+    (o `reejecutores_lote` si era de un lote), la saga queda abierta y se reintenta en el próximo arranque.
+    Con cola de compensación las sagas se encolan en vez de compensarse acá, y las
+    que ya estaban encoladas se dejan a los workers.
+    """
+    pendientes = sagas_sin_terminar()
+    lotes = {}
+    if pendientes:
+        logger.warning(f"Recuperando {len(pendientes)} sagas sin terminar")
+
+    for saga_id in pendientes:
+        eventos = eventos_de(saga_id)
+        if _termino_todos_los_pasos(eventos):
+            # Se cayó justo antes de confirmar o de registrar el cierre: se retoma
+            confirmada = _confirmar_pasos(registro, saga_id, eventos, confirmadores)
+            if confirmada is None:
+                continue
+            if confirmada:
+                logger.info(f"Saga {saga_id} había completado todos sus pasos, se marca como completada")
+                registro.registrar(saga_id, EventoSaga.COMPLETADA, datos={"recuperacion": True})
+                continue
+
+        if cola is not None:
+            if not any(_es_diferida(e) for e in eventos):
+                registro.registrar(saga_id, EventoSaga.COMPENSANDO, datos={"recuperacion": True, "diferida": True})
+                if cola.encolar(saga_id):
+                    continue
+            else:
+                continue
+
+        registro.registrar(saga_id, EventoSaga.COMPENSANDO, datos={"recuperacion": True})
+        compensar_desde_log(registro, saga_id, eventos, compensadores, reejecutores, reejecutores_lote, lotes)
+    return pendientes
+
+
+def _es_diferida(evento):
+    return evento.evento == EventoSaga.COMPENSANDO and bool((evento.datos or {}).get("diferida"))
+
+
+def eventos_de(saga_id):
+    return SagaLogEntry.query.filter_by(saga_id=saga_id).order_by(SagaLogEntry.id).all()
+
+
+def compensar_desde_log(registro, saga_id, eventos, compensadores, reejecutores=None, reejecutores_lote=None,
+                        lotes=None):
+    """
+    Compensa, del último al primero, los pasos que el log da como completados y
+    todavía no compensados, después de resolver los que quedaron sin resultado.
+    Cierra la saga como COMPENSADA si no falló ninguno; devuelve la lista de
+    (paso, error) que fallaron o no se pudieron resolver.
+    """
+    resueltos, fallidos = _resolver_pasos(registro, saga_id, eventos, reejecutores, reejecutores_lote, lotes)
+    for paso, id_recurso in _pasos_a_compensar(eventos, resueltos):
+        compensar = compensadores.get(paso)
+        if compensar is None:
+            logger.critical(f"No hay compensación registrada para el paso {paso} (saga {saga_id})")
+            fallidos.append((paso, "sin compensación registrada"))
+            continue
+        try:
+            with span_paso(paso, saga_id, compensacion=True), clave_paso(paso, saga_id, compensacion=True):
+                compensar(id_recurso)
+            registro.registrar(saga_id, EventoSaga.PASO_COMPENSADO, paso=paso, id_recurso=id_recurso)
+        except Exception as e:
+            logger.critical(f"Error crítico al compensar paso {paso} de la saga {saga_id}: {e}")
+            registro.registrar(saga_id, EventoSaga.COMPENSACION_FALLIDA, paso=paso,
+                               id_recurso=id_recurso, datos={"error": str(e)})
+            fallidos.append((paso, str(e)))
+    if not fallidos:
+        registro.registrar(saga_id, EventoSaga.COMPENSADA)
+    return fallidos
+
+
+class RegistroMixin:
+    """Registro de eventos compartido por los orquestadores. Sin RegistroSaga no hace nada."""
+
+    def _iniciar_registro(self, registro=None):
+        self.saga_id = RegistroSaga.nuevo_id()
+        self._conectar_registro(registro)
+
+    def _conectar_registro(self, registro=None):
+        self.registro = registro if registro is not None else registro_actual()
+        self.cola = cola_actual() if self.registro is not None else None
+        self.registro_incompleto = False
+
+    def _diferir_compensacion(self) -> bool:
+        """
+        Con cola de compensación la saga se compensa en segundo plano y el cliente no
+        espera el rollback. El worker lee del log qué pasos deshacer, así que si no se
+        puede registrar COMPENSANDO (o se perdió algún evento antes) se compensa en
+        línea como antes.
+        """
+        return not self._diferir_compensaciones([self.saga_id])
+
+    def _diferir_compensaciones(self, saga_ids):
+        """Encola las sagas que se pueda (ver _diferir_compensacion); devuelve las que hay que compensar en línea."""
+        if self.cola is None or self.registro_incompleto:
+            return list(saga_ids)
+        try:
+            self.registro.registrar_varios([(saga_id, EventoSaga.COMPENSANDO, None, None, {"diferida": True})
+                                            for saga_id in saga_ids])
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar la compensación diferida de {len(saga_ids)} sagas: {e}")
+            return list(saga_ids)
+        return [saga_id for saga_id in saga_ids if not self.cola.encolar(saga_id)]
+
+    def _compensar_pasos(self, pasos, saga_id=None):
+        """
+        Compensa en el orden dado los (paso, id_recurso, compensar) y registra cada uno;
+        cierra la saga como COMPENSADA si no falló ninguno. Devuelve si se compensaron todos.
+        """
+        saga_id = saga_id or self.saga_id
+        self._registrar(EventoSaga.COMPENSANDO, saga_id=saga_id)
+        ok = True
+        for paso, id_recurso, compensar in pasos:
+            logger.info(f"Compensando paso {paso} de la saga {saga_id} (ID: {id_recurso})")
+            try:
+                with span_paso(paso, saga_id, compensacion=True), clave_paso(paso, saga_id, compensacion=True):
+                    compensar(id_recurso)
+                self._registrar(EventoSaga.PASO_COMPENSADO, paso, id_recurso, saga_id=saga_id)
+            except Exception as e:
+                logger.critical(f"Error crítico al compensar paso {paso} de la saga {saga_id}: {e}")
+                self._registrar(EventoSaga.COMPENSACION_FALLIDA, paso, id_recurso, datos={"error": str(e)},
+                                saga_id=saga_id)
+                ok = False
+        if ok:
+            self._registrar(EventoSaga.COMPENSADA, saga_id=saga_id)
+        return ok
+
+    def _confirmar_acciones(self, pasos, saga_id=None):
+        """
+        Terminaron bien todos los pasos: confirma en orden los (paso, id_recurso, confirmar)
+        y registra cada uno. Devuelve None si se confirmaron todos, o el error del primero
+        que no: si confirmacion_rechazada(error) hay que compensar; si no, no se sabe cómo
+        terminó y la saga queda abierta para que la recuperación confirme con la misma clave.
+        """
+        saga_id = saga_id or self.saga_id
+        for paso, id_recurso, confirmar in pasos:
+            try:
+                with span_paso(paso, saga_id, confirmacion=True), clave_paso(paso, saga_id, confirmacion=True):
+                    confirmar(id_recurso)
+            except Exception as e:
+                if _log_fallo_confirmacion(paso, saga_id, e):
+                    self._registrar(EventoSaga.PASO_FALLIDO, paso, id_recurso,
+                                    datos={"confirmacion": True, "error": str(e)}, saga_id=saga_id)
+                return e
+            self._registrar(EventoSaga.PASO_CONFIRMADO, paso, id_recurso, saga_id=saga_id)
+        return None
+
+    async def _confirmar_acciones_async(self, pasos):
+        for paso, id_recurso, confirmar in pasos:
+            try:
+                with span_paso(paso, self.saga_id, confirmacion=True), \
+                        clave_paso(paso, self.saga_id, confirmacion=True):
+                    await confirmar(id_recurso)
+            except Exception as e:
+                if _log_fallo_confirmacion(paso, self.saga_id, e):
+                    await self._registrar_async(EventoSaga.PASO_FALLIDO, paso, id_recurso,
+                                                datos={"confirmacion": True, "error": str(e)})
+                return e
+            await self._registrar_async(EventoSaga.PASO_CONFIRMADO, paso, id_recurso)
+        return None
+
+    async def _diferir_compensacion_async(self) -> bool:
+        if self.cola is None or self.registro_incompleto:
+            return False
+        try:
+            await self.registro.registrar_async(self.saga_id, EventoSaga.COMPENSANDO, datos={"diferida": True})
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar la compensación diferida de la saga {self.saga_id}: {e}")
+            return False
+        return await asyncio.get_running_loop().run_in_executor(None, self.cola.encolar, self.saga_id)
+
+    def _registrar(self, evento, paso=None, id_recurso=None, datos=None, estricto=False, saga_id=None):
+        if self.registro is None:
+            return
+        saga_id = saga_id or self.saga_id
+        try:
+            self.registro.registrar(saga_id, evento, paso, id_recurso, datos)
+        except ErrorRegistroSaga as e:
+            self.registro_incompleto = True
+            if estricto:
+                raise
+            logger.error(f"No se pudo registrar {evento} de la saga {saga_id}: {e}")
+
+    def _registrar_varios(self, eventos, estricto=False):
+        """Varios eventos (saga_id, evento, paso, id_recurso, datos) en el mismo lote del escritor."""
+        if self.registro is None or not eventos:
+            return
+        try:
+            self.registro.registrar_varios(eventos)
+        except ErrorRegistroSaga as e:
+            self.registro_incompleto = True
+            if estricto:
+                raise
+            logger.error(f"No se pudieron registrar {len(eventos)} eventos: {e}")
+
+    async def _registrar_async(self, evento, paso=None, id_recurso=None, datos=None, estricto=False):
+        if self.registro is None:
+            return
+        try:
+            await self.registro.registrar_async(self.saga_id, evento, paso, id_recurso, datos)
+        except ErrorRegistroSaga as e:
+            self.registro_incompleto = True
+            if estricto:
+                raise
+            logger.error(f"No se pudo registrar {evento} de la saga {self.saga_id}: {e}")
@@ -0,0 +1,166 @@
+import bisect
+import hashlib
+import threading
+
+import requests
+
+from app.utils.http_client import HttpClient
+from app.utils.json_rapido import json_de
+from app.utils.logger_config import setup_logger
+from app.utils.response_validator import ServicioNoDisponible
+
+logger = setup_logger(__name__)
+
+# Lo manda la réplica que reenvía una saga: la dueña la ejecuta sin volver a rutear
+HEADER_REENVIO = "X-Saga-Reenviada"
+
+
+def _hash(texto):
+    return int.from_bytes(hashlib.blake2b(texto.encode(), digest_size=8).digest(), "big")
+
+
+class AnilloHash:
+    """
+    Hashing consistente con nodos virtuales: cada nodo ocupa `virtuales` puntos del
+    anillo y una clave va al primer punto a partir de su hash. Al agregar o sacar un
+    nodo solo cambian de dueño las claves de ese nodo (~1/N), no todas.
+    """
+
+    def __init__(self, nodos=(), virtuales=64):
+        self.virtuales = virtuales
+        self._puntos = []
+        self._duenos = []
+        self._nodos = []
+        for nodo in nodos:
+            self.agregar(nodo)
+
+    @property
+    def nodos(self):
+        return tuple(self._nodos)
+
+    def agregar(self, nodo):
+        if nodo in self._nodos:
+            return
+        self._nodos.append(nodo)
+        for numero in range(self.virtuales):
+            punto = _hash(f"{nodo}#{numero}")
+            indice = bisect.bisect(self._puntos, punto)
+            self._puntos.insert(indice, punto)
+            self._duenos.insert(indice, nodo)
+
+    def quitar(self, nodo):
+        if nodo not in self._nodos:
+            return
+        self._nodos.remove(nodo)
+        quedan = [(punto, dueno) for punto, dueno in zip(self._puntos, self._duenos) if dueno != nodo]
+        self._puntos = [punto for punto, _ in quedan]
+        self._duenos = [dueno for _, dueno in quedan]
+
+    def nodo(self, clave):
+        if not self._puntos:
+            return None
+        indice = bisect.bisect(self._puntos, _hash(str(clave))) % len(self._puntos)
+        return self._duenos[indice]
+
+
+def clave_ruteo(datos):
+    """producto_id de la saga (del paso de stock, si no del de compra o pago); None si no viene."""
+    for paso in ("stock", "compra", "pago"):
+        parte = datos.get(paso)
+        if isinstance(parte, dict) and parte.get("producto_id") is not None:
+            return parte["producto_id"]
+    return None
+
+
+class RuteoSagas:
+    """
+    Con SAGA_RUTEO_HABILITADO las sagas de un mismo producto_id van siempre a la
+    misma réplica del orquestador, elegida con hashing consistente sobre
+    SAGA_REPLICAS, y ahí EjecutorSagas ejecuta el paso de stock de a una saga por
+    producto. Así dos sagas del mismo producto no chocan en el compare-and-swap
+    sobre la versión del saldo en inventario, donde la perdedora reintenta y, tras
+    CAS_REINTENTOS choques, recibe 409 y compensa: la segunda espera acá.
+
+    Una saga que le toca a otra réplica se le reenvía por HTTP. Si no se puede
+    conectar con la dueña se ejecuta acá, como sin ruteo; si se conectó pero no
+    respondió, se contesta 504 (pudo haberla aceptado). Sin SAGA_REPLICAS (una sola
+    réplica) solo se serializa por producto.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.anillo = None
+        self.propia = None
+        self._lock = threading.Lock()
+        self.locales = 0
+        self.reenviadas = 0
+        self.recibidas = 0
+        self.fallas_reenvio = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        replicas = [r.strip().rstrip("/") for r in (app.config.get('SAGA_REPLICAS') or "").split(",") if r.strip()]
+        self.propia = (app.config.get('SAGA_REPLICA_PROPIA') or "").rstrip("/") or None
+        if replicas and self.propia not in replicas:
+            logger.error(f"SAGA_REPLICA_PROPIA ({self.propia}) no está en SAGA_REPLICAS: no se reenvían sagas")
+            replicas = []
+        if replicas:
+            self.anillo = AnilloHash(replicas, int(app.config.get('SAGA_RUTEO_VIRTUALES', 64)))
+        app.extensions['ruteo_sagas'] = self
+
+    def replica_de(self, clave):
+        """URL base de la réplica dueña de la clave, o None si es esta (o no hay clave)."""
+        if self.anillo is None or clave is None:
+            return None
+        destino = self.anillo.nodo(clave)
+        return None if destino == self.propia else destino
+
+    def contar_local(self, reenviada):
+        with self._lock:
+            self.locales += 1
+            self.recibidas += reenviada
+
+    def reenviar(self, destino, ruta, datos, espera=0):
+        """
+        Manda la saga a la réplica dueña y devuelve (cuerpo, código, encabezados), o
+        None si el pedido no llegó a la dueña y hay que ejecutarla acá.
+        """
+        # El ?wait= reenviado tiene que terminar antes que el timeout del cliente HTTP
+        espera = min(espera, HttpClient.DEFAULT_TIMEOUT / 2)
+        url = f"{destino}{ruta}" + (f"?wait={espera:g}" if espera else "")
+        try:
+            respuesta = HttpClient.post(url, datos, headers={HEADER_REENVIO: self.propia})
+        except (requests.ConnectionError, ServicioNoDisponible) as e:
+            logger.warning(f"No se pudo reenviar la saga a {destino}, se ejecuta acá: {e}")
+            with self._lock:
+                self.fallas_reenvio += 1
+            return None
+        except requests.RequestException as e:
+            # La dueña pudo haberla aceptado: ejecutarla acá la duplicaría
+            with self._lock:
+                self.fallas_reenvio += 1
+            return {"mensaje": f"La réplica {destino} no respondió", "error": str(e)}, 504, {"X-Saga-Replica": destino}
+        with self._lock:
+            self.reenviadas += 1
+        encabezados = {"X-Saga-Replica": destino}
+        if "Location" in respuesta.headers:
+            encabezados["Location"] = f"{destino}{respuesta.headers['Location']}"
+        if "Retry-After" in respuesta.headers:
+            encabezados["Retry-After"] = respuesta.headers["Retry-After"]
+        try:
+            return json_de(respuesta), respuesta.status_code, encabezados
+        except ValueError:
+            return {"mensaje": f"Respuesta inválida de la réplica {destino}"}, 502, encabezados
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "replicas": list(self.anillo.nodos) if self.anillo else [],
+                "propia": self.propia,
+                "locales": self.locales,
+                "recibidas": self.recibidas,
+                "reenviadas": self.reenviadas,
+                "fallas_reenvio": self.fallas_reenvio,
+            }
@@ -1,23 +1,27 @@
 import logging
 import requests
 from flask import current_app
-from tenacity import (before_sleep_log, retry, retry_if_exception_type,
-                      stop_after_attempt, wait_fixed)
 from app.services.stock_service import StockService 
+from app.utils.http_transport import obtener_sesion
+from app.utils.retry import con_reintentos
+from app.utils.idempotencia import HEADER, cabeceras_con_clave, clave_paso
+from app.utils.json_rapido import dumps
+from app.utils.tracing import cabeceras_con_traza, span_paso, trazar_saga
+from app.services.saga.admision import SagaRechazada, control_admision
+from app.services.saga.definiciones import buscar_id
+from app.services.saga.disponibilidad import servicios_no_disponibles
+from app.services.saga.registro import (ErrorRegistroSaga, EventoSaga, RegistroMixin, confirmacion_rechazada,
+                                        datos_de_cierre)
 
 logger = logging.getLogger(__name__)
 
-@retry(
-    retry=retry_if_exception_type(requests.RequestException),
-    wait=wait_fixed(2),  
-    stop=stop_after_attempt(3), 
-    reraise=True,
-    before_sleep=before_sleep_log(logger, logging.INFO)  
-)
 def hacer_peticion(url, data):
     try:
         logger.info(f"Enviando petición a {url} con datos: {data}")
-        response = requests.post(url, json=data)
+        headers = cabeceras_con_clave(cabeceras_con_traza({"Content-Type": "application/json"}))
+        cuerpo = dumps(data)
+        response = con_reintentos("POST", url, lambda: obtener_sesion().post(url, data=cuerpo, headers=headers),
+                                  idempotente=HEADER in headers)
         response.raise_for_status()  
         return response
     except requests.RequestException as e:
@@ -25,29 +29,77 @@ def hacer_peticion(url, data):
         raise
 
 class Action:
-    def __init__(self, execute_fn, compensate_fn):
+    # Dónde está el ID generado en la respuesta, si no se indica otra cosa
+    RUTAS_ID = (("data", "id"), ("data", "producto_id"))
+
+    def __init__(self, execute_fn, compensate_fn, nombre=None, rutas_id=None, confirm_fn=None):
         self.execute_fn = execute_fn
         self.compensate_fn = compensate_fn
+        self.confirm_fn = confirm_fn
+        self.nombre = nombre
+        self.rutas_id = rutas_id or self.RUTAS_ID
         self.url = None
 
+    @property
+    def compensacion(self):
+        return self.compensate_fn
+
+    @property
+    def confirmacion(self):
+        return self.confirm_fn
+
     def execute(self, data):
         url, response_data = self.execute_fn(data)
         self.url = url
         return url, response_data
 
     def compensate(self, id):
+        if self.compensate_fn is None:
+            return True
         return self.compensate_fn(id)
 
-class Saga:
-    def __init__(self, actions, data):
+    def confirmar(self, id):
+        return self.confirm_fn(id)
+
+    def extraer_id(self, response_data):
+        return buscar_id(response_data, self.rutas_id)
+
+class Saga(RegistroMixin):
+    _PASOS = ("pago", "compra", "stock")
+
+    def __init__(self, actions, data, registro=None):
         self.actions = actions
         self.data = data
         self.IDs = []
         self.response = {"message": "OK", "status_code": 201, "data": {"message": "Operación realizada con éxito"}}
+        self._iniciar_registro(registro)
 
+    def _nombre_paso(self, index):
+        nombre = getattr(self.actions[index], "nombre", None)
+        if nombre:
+            return nombre
+        return self._PASOS[index] if index < len(self._PASOS) else str(index)
+
+    @trazar_saga
     def execute(self):
         saga_data = self.data.copy()
+        pasos = [self._nombre_paso(i) for i in range(len(self.actions))]
+
+        no_disponibles = servicios_no_disponibles(pasos)
+        if no_disponibles:
+            logger.warning(f"SAGA RECHAZADA: servicios no disponibles {no_disponibles}")
+            return {"status_code": 503, "message": "Servicio no disponible", "data": {"servicios": no_disponibles}}
 
+        try:
+            permiso = control_admision.admitir(pasos)
+        except SagaRechazada as e:
+            logger.warning(f"SAGA RECHAZADA por sobrecarga: {e}")
+            return {"status_code": 429, "message": "Orquestador sobrecargado", "data": e.datos()}
+
+        with permiso:
+            return self._execute_admitida(saga_data, pasos)
+
+    def _execute_admitida(self, saga_data, pasos):
         try:
             stock_data = saga_data.get("stock", {})
             prod_id = stock_data.get("producto_id")
@@ -73,36 +125,82 @@ class Saga:
             logger.error(f"Error en validación previa de stock: {e}")
             return {"status_code": 500, "message": f"Error validando stock: {str(e)}", "data": None}
 
+        try:
+            self._registrar(EventoSaga.INICIADA, datos={"pasos": pasos, "datos": saga_data,
+                                                        **datos_de_cierre(pasos, self.actions)}, estricto=True)
+        except ErrorRegistroSaga as e:
+            logger.error(f"No se pudo registrar el inicio de la saga, no se ejecuta: {e}")
+            return {"status_code": 503, "message": "Log de sagas no disponible", "data": {"error": str(e)}}
+
         for index, action in enumerate(self.actions):
+            paso = self._nombre_paso(index)
             try:
-                url, response_data = action.execute(saga_data)
+                self._registrar(EventoSaga.PASO_INICIADO, paso)
+                with span_paso(paso, self.saga_id), clave_paso(paso, self.saga_id):
+                    url, response_data = action.execute(saga_data)
         
-                datos_relevantes = response_data.get("data", {}).copy()
-                logger.info(f"Datos relevantes paso {index}: {datos_relevantes}")
-                
-                id_generado = datos_relevantes.get("id") or datos_relevantes.get("producto_id")
+                id_generado = action.extraer_id(response_data)
+                logger.info(f"Paso {index} exitoso. ID generado: {id_generado}")
                 self.IDs.append(id_generado)
+                self._registrar(EventoSaga.PASO_COMPLETADO, paso, id_generado)
                 
             except Exception as e:
                 logger.error(f"FALLO en paso {index}. Iniciando compensación. Error: {e}")
+                self._registrar(EventoSaga.PASO_FALLIDO, paso, datos={"error": str(e)})
                 self.response["status_code"] = 500
                 self.response["message"] = "Error durante la ejecución de la saga"
                 self.response["data"] = {"error": str(e)}
                 self.compensate(index)
                 break
+        else:
+            self._confirmar()
         
         logger.info(f"Estado final de IDs: {self.IDs}")
         return self.response
 
+    def _confirmar(self):
+        """
+        Terminaron bien todos los pasos: se confirman los que lo piden (la reserva de
+        stock pasa a ser una salida) y la saga se cierra. Si se rechaza una confirmación
+        (la reserva venció) se compensa; si no se sabe cómo terminó, la saga queda
+        abierta y la recuperación vuelve a confirmar con la misma Idempotency-Key.
+        """
+        error = self._confirmar_acciones(
+            (self._nombre_paso(index), self.IDs[index], action.confirmar)
+            for index, action in enumerate(self.actions) if getattr(action, "confirmacion", None)
+        )
+        if error is None:
+            self._registrar(EventoSaga.COMPLETADA)
+            return
+        self.response["status_code"] = 500
+        self.response["data"] = {"error": str(error)}
+        if confirmacion_rechazada(error):
+            self.response["message"] = "Error durante la ejecución de la saga"
+            self.compensate(len(self.actions))
+        else:
+            self.response["message"] = "Confirmación de la saga sin resultado"
+
     def compensate(self, index):
+        if self._diferir_compensacion():
+            logger.info("Compensación encolada para los workers")
+            self.response["data"]["compensacion"] = "encolada"
+            return
+
+        self._registrar(EventoSaga.COMPENSANDO)
         try:
             for i in range(index - 1, -1, -1):  
                 action = self.actions[i]
                 if i < len(self.IDs) and self.IDs[i] is not None:
                     logger.info(f"Compensando paso {i} con ID {self.IDs[i]}...")
-                    action.compensate(self.IDs[i])
+                    with span_paso(self._nombre_paso(i), self.saga_id, compensacion=True), \
+                            clave_paso(self._nombre_paso(i), self.saga_id, compensacion=True):
+                        action.compensate(self.IDs[i])
+                    self._registrar(EventoSaga.PASO_COMPENSADO, self._nombre_paso(i), self.IDs[i])
                 else:
                     logger.warning(f"No hay ID disponible para compensar en el índice {i}")
+            self._registrar(EventoSaga.COMPENSADA)
 
         except Exception as e:
-            logger.exception(f"Error crítico durante la compensación: {e}")
\ No newline at end of file
+            logger.exception(f"Error crítico durante la compensación: {e}")
+            self._registrar(EventoSaga.COMPENSACION_FALLIDA, self._nombre_paso(i), self.IDs[i],
+                            datos={"error": str(e)})
\ No newline at end of file
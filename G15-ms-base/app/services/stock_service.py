@@ -1,8 +1,11 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Tuple
 from flask import current_app
 from app.utils.logger_config import setup_logger
 from app.utils.http_client import HttpClient
-from app.utils.response_validator import validar_respuesta
+from app.utils.json_rapido import json_de
+from app.utils.async_http_client import AsyncHttpClient
+from app.utils.response_validator import ServerError, validar_respuesta
+from app.services.cache_stock import cache_disponibilidad
 
 logger = setup_logger(__name__)
 
@@ -14,7 +17,7 @@ class StockService:
         logger.info(f"Agregando stock: {data_stock}")
         response = HttpClient.post(url, data_stock)
         validar_respuesta(response, codigo_esperado=201)
-        return url, response.json()
+        return url, json_de(response)
 
     def borrar_stock(self, id_stock: str) -> bool:
         logger.info(f"Borrando stock ID: {id_stock}")
@@ -27,27 +30,121 @@ class StockService:
         logger.info(f"Stock con ID {id_stock} borrado exitosamente.")
         return True
 
+    def agregar_stock_bulk(self, stocks: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        url = f"{current_app.config['STOCK_URL']}/bulk"
+        logger.info(f"Agregando {len(stocks)} movimientos de stock en lote")
+        response = HttpClient.post(url, stocks)
+        validar_respuesta(response, codigo_esperado=207)
+        return url, json_de(response).get('data', [])
+
+    @staticmethod
+    def _reserva(data_stock: Dict[str, Any]) -> Dict[str, Any]:
+        """Lo que pide POST /stock/reservas de los datos de stock de la saga."""
+        data_stock = data_stock or {}
+        return {"producto_id": data_stock.get('producto_id'), "cantidad": data_stock.get('cantidad')}
+
+    def reservar_stock(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        url = f"{current_app.config['STOCK_URL']}/reservas"
+        reserva = self._reserva(data.get('stock'))
+        logger.info(f"Reservando stock: {reserva}")
+        response = HttpClient.post(url, reserva)
+        validar_respuesta(response, codigo_esperado=201)
+        return url, json_de(response)
+
+    def confirmar_reserva(self, id_reserva: str) -> bool:
+        """La reserva pasa a ser una salida de stock. Un 409 (venció) o 404 lanza ConflictError o NotFoundError."""
+        logger.info(f"Confirmando reserva de stock ID: {id_reserva}")
+        url = f"{current_app.config['STOCK_URL']}/reservas/{id_reserva}/confirmacion"
+        response = HttpClient.post(url, {})
+        if "Retry-After" in response.headers:
+            # La misma confirmación sigue en curso: todavía no se sabe si venció
+            raise ServerError(f"Confirmación de la reserva {id_reserva} en curso")
+        validar_respuesta(response, codigo_esperado=200)
+        return True
+
+    def reservar_stock_bulk(self, stocks: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        url = f"{current_app.config['STOCK_URL']}/reservas/bulk"
+        logger.info(f"Reservando stock para {len(stocks)} compras en lote")
+        response = HttpClient.post(url, [self._reserva(stock) for stock in stocks])
+        validar_respuesta(response, codigo_esperado=207)
+        return url, json_de(response).get('data', [])
+
+    def confirmar_reservas_bulk(self, ids_reserva: List[Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        url = f"{current_app.config['STOCK_URL']}/reservas/confirmacion/bulk"
+        logger.info(f"Confirmando {len(ids_reserva)} reservas de stock en lote")
+        response = HttpClient.post(url, [int(id_reserva) for id_reserva in ids_reserva])
+        validar_respuesta(response, codigo_esperado=207)
+        return url, json_de(response).get('data', [])
+
+    async def agregar_stock_async(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        data_stock = data.get('stock')
+        url = current_app.config['STOCK_URL']
+        logger.info(f"Agregando stock (async): {data_stock}")
+        response = await AsyncHttpClient.post(url, data_stock)
+        validar_respuesta(response, codigo_esperado=201)
+        return url, json_de(response)
+
+    async def borrar_stock_async(self, id_stock: str) -> bool:
+        logger.info(f"Borrando stock ID (async): {id_stock}")
+        url = f"{current_app.config['STOCK_URL']}/{id_stock}"
+        response = await AsyncHttpClient.delete(url)
+        if response.status_code == 404:
+            logger.warning(f"Stock con ID {id_stock} no encontrado.")
+            return False
+        validar_respuesta(response, codigo_esperado=204)
+        logger.info(f"Stock con ID {id_stock} borrado exitosamente.")
+        return True
+
+    async def reservar_stock_async(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        url = f"{current_app.config['STOCK_URL']}/reservas"
+        reserva = self._reserva(data.get('stock'))
+        logger.info(f"Reservando stock (async): {reserva}")
+        response = await AsyncHttpClient.post(url, reserva)
+        validar_respuesta(response, codigo_esperado=201)
+        return url, json_de(response)
+
+    async def confirmar_reserva_async(self, id_reserva: str) -> bool:
+        logger.info(f"Confirmando reserva de stock ID (async): {id_reserva}")
+        url = f"{current_app.config['STOCK_URL']}/reservas/{id_reserva}/confirmacion"
+        response = await AsyncHttpClient.post(url, {})
+        if "Retry-After" in response.headers:
+            raise ServerError(f"Confirmación de la reserva {id_reserva} en curso")
+        validar_respuesta(response, codigo_esperado=200)
+        return True
+
     def validar_stock(self, producto_id: int, cantidad_necesaria: int) -> bool:
         """Consulta al ms-inventario si hay suficiente stock"""
         logger.info(f"Validando stock para producto {producto_id}, cantidad: {cantidad_necesaria}")
+        stock_actual = cache_disponibilidad.obtener(producto_id)
+        if stock_actual is None:
+            stock_actual = self._consultar_disponible(producto_id)
+            if stock_actual is None:
+                return False
+        else:
+            logger.info(f"Stock del producto {producto_id} tomado de la caché local")
+
+        if stock_actual >= cantidad_necesaria:
+            logger.info(f"Stock suficiente. Hay {stock_actual}, se piden {cantidad_necesaria}")
+            return True
+        logger.warning(f"Stock insuficiente. Hay {stock_actual}, se piden {cantidad_necesaria}")
+        return False
+
+    def _consultar_disponible(self, producto_id: int):
+        """GET al ms-inventario; guarda el resultado en la caché local. None si falló la consulta."""
+        generacion = cache_disponibilidad.generacion(producto_id)
         url = f"{current_app.config['STOCK_URL']}/producto/{producto_id}"
-        
+
         response = HttpClient.get(url)
-        
+
         if response.status_code == 404:
             logger.warning(f"Producto {producto_id} no existe en inventario.")
-            return False
-            
+            cache_disponibilidad.guardar(producto_id, 0, generacion)
+            return 0
+
         if response.status_code == 200:
-            data = response.json().get('data', {})
-            stock_actual = data.get('cantidad', 0) 
-            
-            if stock_actual >= cantidad_necesaria:
-                logger.info(f"Stock suficiente. Hay {stock_actual}, se piden {cantidad_necesaria}")
-                return True
-            else:
-                logger.warning(f"Stock insuficiente. Hay {stock_actual}, se piden {cantidad_necesaria}")
-                return False
-        
+            stock_actual = json_de(response).get('data', {}).get('cantidad', 0)
+            cache_disponibilidad.guardar(producto_id, stock_actual, generacion)
+            return stock_actual
+
         logger.error(f"Error al consultar stock. Status: {response.status_code}")
-        return False
\ No newline at end of file
+        return None
\ No newline at end of file
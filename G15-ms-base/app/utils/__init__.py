@@ -1,6 +1,7 @@
 
 from app.utils.logger_config import setup_logger
 from app.utils.http_client import HttpClient
+from app.utils.async_http_client import AsyncHttpClient
 from app.utils.response_validator import (
     validar_respuesta,
     ServiceError,
@@ -8,15 +9,18 @@ from app.utils.response_validator import (
     NotFoundError,
     ConflictError,
     ServerError,
+    ServicioNoDisponible,
 )
 
 __all__ = [
     "setup_logger",
     "HttpClient",
+    "AsyncHttpClient",
     "validar_respuesta",
     "ServiceError",
     "ValidationError",
     "NotFoundError",
     "ConflictError",
     "ServerError",
+    "ServicioNoDisponible",
 ]
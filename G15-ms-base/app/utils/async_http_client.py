@@ -0,0 +1,77 @@
+import asyncio
+import os
+import weakref
+
+import httpx
+from app.utils.logger_config import setup_logger
+from app.utils.http_transport import limites_async
+from app.utils.retry import con_reintentos_async
+from app.utils.circuit_breaker import con_breaker_async
+from app.utils.idempotencia import HEADER, cabeceras_con_clave
+from app.utils.json_rapido import dumps
+from app.utils.tracing import anotar_respuesta_http, cabeceras_con_traza, span_http
+
+logger = setup_logger(__name__)
+
+
+class AsyncHttpClient:
+    """Versión asíncrona de HttpClient. Mantiene un httpx.AsyncClient por event loop."""
+
+    DEFAULT_TIMEOUT = 10
+    _clientes = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _verify_ssl():
+        return os.getenv("FLASK_ENV", "development").lower() == "production"
+
+    @classmethod
+    def _cliente(cls) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        cliente = cls._clientes.get(loop)
+        if cliente is None or cliente.is_closed:
+            cliente = httpx.AsyncClient(
+                verify=cls._verify_ssl(), timeout=cls.DEFAULT_TIMEOUT, limits=limites_async()
+            )
+            cls._clientes[loop] = cliente
+        return cliente
+
+    @classmethod
+    async def _request(cls, method, url, headers=None, **kwargs):
+        logger.debug(f"Petición async {method} a: {url}")
+        cliente = cls._cliente()
+        cuerpo = kwargs.pop("json", None)
+        if cuerpo is not None:
+            kwargs["content"] = dumps(cuerpo)
+            headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        with span_http(method, url) as span:
+            headers = cabeceras_con_clave(cabeceras_con_traza(headers))
+            response = await con_breaker_async(
+                url, lambda: con_reintentos_async(
+                    method, url, lambda: cliente.request(method, url, headers=headers, **kwargs),
+                    idempotente=HEADER in headers,
+                )
+            )
+            anotar_respuesta_http(span, response)
+            return response
+
+    @classmethod
+    async def get(cls, url, headers=None):
+        return await cls._request("GET", url, headers=headers)
+
+    @classmethod
+    async def post(cls, url, json=None, headers=None):
+        return await cls._request("POST", url, json=json, headers=headers)
+
+    @classmethod
+    async def put(cls, url, json=None, headers=None):
+        return await cls._request("PUT", url, json=json, headers=headers)
+
+    @classmethod
+    async def delete(cls, url, headers=None):
+        return await cls._request("DELETE", url, headers=headers)
+
+    @classmethod
+    async def cerrar(cls):
+        cliente = cls._clientes.pop(asyncio.get_running_loop(), None)
+        if cliente is not None:
+            await cliente.aclose()
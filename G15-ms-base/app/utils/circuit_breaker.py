@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pybreaker
+
+from app.utils.logger_config import setup_logger
+from app.utils.response_validator import ServicioNoDisponible
+from app.utils.retry import destino_de
+
+logger = setup_logger(__name__)
+
+# Valores por defecto; create_app los reemplaza con los de Config vía configurar_breakers
+_opciones = {
+    "CB_FALLOS_MAX": 5,
+    "CB_RESET_SEGUNDOS": 15.0,
+}
+_breakers = {}
+_lock = threading.Lock()
+
+
+class _RespuestaFallida(Exception):
+    """Un 5xx cuenta como fallo para el breaker, pero al que llamó se le devuelve la respuesta."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class _Listener(pybreaker.CircuitBreakerListener):
+    def __init__(self, breaker_servicio):
+        self.breaker_servicio = breaker_servicio
+
+    def state_change(self, cb, old_state, new_state):
+        if new_state.name == pybreaker.STATE_OPEN:
+            self.breaker_servicio.abierto_desde = time.monotonic()
+            self.breaker_servicio.aperturas += 1
+            logger.warning(f"Circuit breaker de {cb.name} ABIERTO: se rechazan pedidos por {cb.reset_timeout}s")
+        elif new_state.name == pybreaker.STATE_HALF_OPEN:
+            logger.info(f"Circuit breaker de {cb.name} semiabierto: se prueba con un pedido")
+        else:
+            logger.info(f"Circuit breaker de {cb.name} cerrado")
+
+
+class BreakerServicio:
+    """
+    Circuit breaker de un servicio. Cerrado deja pasar todo; después de CB_FALLOS_MAX
+    fallos seguidos (error de conexión o 5xx) se abre y rechaza al instante durante
+    CB_RESET_SEGUNDOS. Pasado ese tiempo deja pasar un único pedido de prueba: si
+    anda se cierra, si no vuelve a abrirse.
+    """
+
+    def __init__(self, nombre, fallos_max=5, reset_segundos=15.0):
+        self.nombre = nombre
+        self.abierto_desde = None
+        self.aperturas = 0
+        self.rechazados = 0
+        self._sondeo = threading.Lock()
+        self.breaker = pybreaker.CircuitBreaker(
+            fail_max=fallos_max,
+            reset_timeout=reset_segundos,
+            name=nombre,
+            throw_new_error_on_trip=False,
+            listeners=[_Listener(self)],
+        )
+
+    @property
+    def estado(self):
+        return self.breaker.current_state
+
+    def rechaza(self) -> bool:
+        """True si un pedido hecho ahora se rechazaría sin llegar al servicio."""
+        if self.estado == pybreaker.STATE_CLOSED:
+            return False
+        if self.estado == pybreaker.STATE_HALF_OPEN:
+            return self._sondeo.locked()
+        if self.abierto_desde is None:
+            return False
+        return time.monotonic() - self.abierto_desde < self.breaker.reset_timeout or self._sondeo.locked()
+
+    def _rechazar(self):
+        self.rechazados += 1
+        raise ServicioNoDisponible(f"Servicio {self.nombre} no disponible (circuit breaker abierto)")
+
+    def _tomar_sondeo(self) -> bool:
+        if self.estado == pybreaker.STATE_CLOSED:
+            return False
+        if self.rechaza() or not self._sondeo.acquire(blocking=False):
+            self._rechazar()
+        return True
+
+    @staticmethod
+    def _resultado(response=None, error=None):
+        def reproducir():
+            if error is not None:
+                raise error
+            if response.status_code >= 500:
+                raise _RespuestaFallida(response)
+            return response
+        return reproducir
+
+    def _registrar_resultado(self, response, error):
+        """
+        Le pasa al breaker el resultado de un pedido ya hecho. pybreaker toma su lock
+        durante todo call(), así que el pedido se hace afuera: si no, los pedidos a un
+        mismo servicio quedarían en fila.
+        """
+        try:
+            return self.breaker.call(self._resultado(response, error))
+        except _RespuestaFallida as e:
+            return e.response
+        except pybreaker.CircuitBreakerError:
+            # Otro pedido lo abrió mientras este estaba en vuelo: se devuelve lo que llegó
+            if error is not None:
+                raise error
+            return response
+
+    def llamar(self, hacer_pedido):
+        sondeo = self._tomar_sondeo()
+        try:
+            response, error = None, None
+            try:
+                response = hacer_pedido()
+            except Exception as e:
+                error = e
+            return self._registrar_resultado(response, error)
+        finally:
+            if sondeo:
+                self._sondeo.release()
+
+    async def llamar_async(self, hacer_pedido):
+        sondeo = self._tomar_sondeo()
+        try:
+            response, error = None, None
+            try:
+                response = await hacer_pedido()
+            except Exception as e:
+                error = e
+            return self._registrar_resultado(response, error)
+        finally:
+            if sondeo:
+                self._sondeo.release()
+
+    def snapshot(self):
+        return {
+            "estado": self.estado,
+            "fallos_seguidos": self.breaker.fail_counter,
+            "aperturas": self.aperturas,
+            "rechazados": self.rechazados,
+        }
+
+
+def configurar_breakers(config):
+    """Toma las opciones CB_* de la config de Flask y descarta los breakers anteriores."""
+    with _lock:
+        for clave in _opciones:
+            if config.get(clave) is not None:
+                _opciones[clave] = config.get(clave)
+        _breakers.clear()
+
+
+def breaker(destino) -> BreakerServicio:
+    with _lock:
+        actual = _breakers.get(destino)
+        if actual is None:
+            actual = _breakers[destino] = BreakerServicio(
+                destino,
+                fallos_max=int(_opciones["CB_FALLOS_MAX"]),
+                reset_segundos=float(_opciones["CB_RESET_SEGUNDOS"]),
+            )
+        return actual
+
+
+def con_breaker(url, hacer_pedido):
+    return breaker(destino_de(url)).llamar(hacer_pedido)
+
+
+async def con_breaker_async(url, hacer_pedido):
+    return await breaker(destino_de(url)).llamar_async(hacer_pedido)
+
+
+def no_disponibles(destinos):
+    """Los destinos cuyo breaker rechazaría un pedido ahora mismo."""
+    return [destino for destino in destinos if breaker(destino).rechaza()]
+
+
+def snapshot():
+    with _lock:
+        actuales = dict(_breakers)
+    return {destino: b.snapshot() for destino, b in actuales.items()}
@@ -1,6 +1,11 @@
 import os
-import requests
 from app.utils.logger_config import setup_logger
+from app.utils.http_transport import obtener_sesion
+from app.utils.retry import con_reintentos
+from app.utils.circuit_breaker import con_breaker
+from app.utils.idempotencia import HEADER, cabeceras_con_clave
+from app.utils.json_rapido import dumps
+from app.utils.tracing import anotar_respuesta_http, cabeceras_con_traza, span_http
 
 logger = setup_logger(__name__)
 
@@ -13,19 +18,33 @@ class HttpClient:
        
         return os.getenv("FLASK_ENV", "development").lower() == "production"
 
+    @staticmethod
+    def _cuerpo_json(headers, kwargs):
+        """Serializa el json= con orjson una sola vez, así requests no lo vuelve a hacer en cada reintento."""
+        cuerpo = kwargs.pop("json", None)
+        if cuerpo is not None:
+            kwargs["data"] = dumps(cuerpo)
+            headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        return headers
+
     @classmethod
-    def _request(cls, method, url, **kwargs):
+    def _request(cls, method, url, headers=None, **kwargs):
        
         logger.debug(f"Petición {method} a: {url}")
         
-        
-        return requests.request(
-            method=method,
-            url=url,
-            verify=cls._verify_ssl(),
-            timeout=cls.DEFAULT_TIMEOUT,
-            **kwargs
-        )
+        with span_http(method, url) as span:
+            headers = cabeceras_con_clave(cabeceras_con_traza(cls._cuerpo_json(headers, kwargs)))
+            idempotente = HEADER in headers
+            response = con_breaker(url, lambda: con_reintentos(method, url, lambda: obtener_sesion().request(
+                method=method,
+                url=url,
+                headers=headers,
+                verify=cls._verify_ssl(),
+                timeout=cls.DEFAULT_TIMEOUT,
+                **kwargs
+            ), idempotente=idempotente))
+            anotar_respuesta_http(span, response)
+            return response
 
     @classmethod
     def get(cls, url, headers=None):
@@ -0,0 +1,162 @@
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Valores por defecto; create_app los reemplaza con los de Config vía configurar_transporte
+_opciones = {
+    "HTTP_POOL_CONNECTIONS": 10,
+    "HTTP_POOL_MAXSIZE": 50,
+    "HTTP_POOL_BLOCK": False,
+    "HTTP_KEEPALIVE": True,
+    "HTTP_KEEPALIVE_EXPIRY": 30.0,
+    "HTTP_POOL_WARMUP": 1,
+}
+_sesion = None
+_lock = threading.Lock()
+
+
+class MetricasPool:
+    """Contadores de todos los pools del proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.pedidos = 0
+            self.esperas = 0
+            self.conexiones_creadas = 0
+
+    def sumar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pedidos": self.pedidos,
+                # Conexiones tomadas del pool ya abiertas (sin handshake TCP/TLS)
+                "hits": max(self.pedidos - self.conexiones_creadas, 0),
+                # Pedidos que encontraron el pool agotado: esperan un lugar o abren una conexión extra
+                "esperas": self.esperas,
+                "conexiones_creadas": self.conexiones_creadas,
+            }
+
+
+metricas = MetricasPool()
+
+
+class _MetricasPoolMixin:
+    def _get_conn(self, timeout=None):
+        metricas.sumar("pedidos")
+        if self.pool is not None and self.pool.empty():
+            metricas.sumar("esperas")
+        return super()._get_conn(timeout=timeout)
+
+    def _new_conn(self):
+        metricas.sumar("conexiones_creadas")
+        return super()._new_conn()
+
+
+class _HTTPPool(_MetricasPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _HTTPSPool(_MetricasPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class AdaptadorPool(HTTPAdapter):
+    def __init__(self, keepalive=True, **kwargs):
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keepalive:
+            pool_kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+
+def configurar_transporte(config):
+    """Toma las opciones HTTP_* de la config de Flask y descarta la sesión anterior."""
+    global _sesion
+    with _lock:
+        for clave in _opciones:
+            if config.get(clave) is not None:
+                _opciones[clave] = config.get(clave)
+        anterior, _sesion = _sesion, None
+    if anterior is not None:
+        anterior.close()
+
+
+def obtener_sesion() -> requests.Session:
+    """Sesión compartida por todo el proceso, con un pool de conexiones por host."""
+    global _sesion
+    if _sesion is None:
+        with _lock:
+            if _sesion is None:
+                sesion = requests.Session()
+                adaptador = AdaptadorPool(
+                    keepalive=_opciones["HTTP_KEEPALIVE"],
+                    pool_connections=_opciones["HTTP_POOL_CONNECTIONS"],
+                    pool_maxsize=_opciones["HTTP_POOL_MAXSIZE"],
+                    pool_block=_opciones["HTTP_POOL_BLOCK"],
+                )
+                sesion.mount("http://", adaptador)
+                sesion.mount("https://", adaptador)
+                if not _opciones["HTTP_KEEPALIVE"]:
+                    sesion.headers["Connection"] = "close"
+                _sesion = sesion
+    return _sesion
+
+
+def limites_async() -> httpx.Limits:
+    """Los mismos tamaños de pool para AsyncHttpClient."""
+    return httpx.Limits(
+        max_connections=_opciones["HTTP_POOL_MAXSIZE"] * _opciones["HTTP_POOL_CONNECTIONS"],
+        max_keepalive_connections=_opciones["HTTP_POOL_MAXSIZE"] if _opciones["HTTP_KEEPALIVE"] else 0,
+        keepalive_expiry=_opciones["HTTP_KEEPALIVE_EXPIRY"],
+    )
+
+
+def calentar_conexiones(urls, verify=False, timeout=2):
+    """
+    Abre HTTP_POOL_WARMUP conexiones por host contra /ping y las deja en el pool,
+    para que la primera saga no pague el handshake.
+    """
+    hosts = set()
+    for url in urls:
+        if url:
+            partes = urlsplit(url)
+            hosts.add(f"{partes.scheme}://{partes.netloc}")
+
+    por_host = max(int(_opciones["HTTP_POOL_WARMUP"]), 0)
+    if not hosts or por_host == 0:
+        return
+
+    sesion = obtener_sesion()
+
+    def ping(base):
+        try:
+            sesion.get(f"{base}/ping", verify=verify, timeout=timeout)
+        except requests.RequestException as e:
+            logger.warning(f"No se pudo precalentar la conexión a {base}: {e}")
+
+    with ThreadPoolExecutor(max_workers=len(hosts) * por_host) as pool:
+        list(pool.map(ping, [base for base in hosts for _ in range(por_host)]))
+    logger.info(f"Conexiones precalentadas: {sorted(hosts)} (x{por_host})")
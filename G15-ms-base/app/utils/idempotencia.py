@@ -0,0 +1,36 @@
+import contextvars
+from contextlib import contextmanager
+
+HEADER = "Idempotency-Key"
+
+_clave = contextvars.ContextVar("clave_idempotencia", default=None)
+
+
+@contextmanager
+def clave_paso(paso, saga_id, compensacion=False, confirmacion=False):
+    """
+    Fija la Idempotency-Key de los pedidos que se hagan dentro del bloque. La clave
+    sale del saga_id y del paso, así que un reintento, un pedido duplicado o la
+    compensación (o confirmación) que retoma un worker llevan la misma y el servicio
+    devuelve la respuesta guardada en vez de volver a ejecutar.
+    """
+    sufijo = ":compensacion" if compensacion else ":confirmacion" if confirmacion else ""
+    token = _clave.set(f"{saga_id}:{paso}{sufijo}")
+    try:
+        yield
+    finally:
+        _clave.reset(token)
+
+
+def clave_actual():
+    return _clave.get()
+
+
+def cabeceras_con_clave(headers=None, clave=None):
+    """Copia de headers con la Idempotency-Key del paso en curso (o la indicada), si hay."""
+    clave = clave or clave_actual()
+    if clave is None:
+        return headers
+    headers = dict(headers or {})
+    headers.setdefault(HEADER, clave)
+    return headers
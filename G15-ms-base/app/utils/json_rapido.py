@@ -0,0 +1,68 @@
+import dataclasses
+import decimal
+import json
+from datetime import date
+
+import orjson
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+# Mismas claves ordenadas que el proveedor por defecto de Flask; las fechas pasan por
+# _por_defecto para seguir saliendo en formato HTTP como antes
+OPCIONES = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_SIN_PARSEAR = object()
+
+
+def _por_defecto(o):
+    """Lo que orjson no serializa solo, convertido igual que en Flask."""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=_por_defecto, option=OPCIONES)
+
+
+def loads(datos):
+    return orjson.loads(datos)
+
+
+def json_de(response):
+    """
+    Cuerpo JSON de una respuesta de requests o httpx, parseado una sola vez: el
+    resultado queda en la respuesta y lo reusan validar_respuesta y quien la pidió.
+    """
+    cuerpo = response.__dict__.get("_json", _SIN_PARSEAR)
+    if cuerpo is _SIN_PARSEAR:
+        cuerpo = orjson.loads(response.content)
+        response._json = cuerpo
+    return cuerpo
+
+
+class ProveedorJsonRapido(JSONProvider):
+    """Proveedor JSON de Flask con orjson, para las respuestas y request.get_json()."""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return json.dumps(obj, default=_por_defecto, **kwargs)
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        cuerpo = orjson.dumps(obj, default=_por_defecto, option=OPCIONES | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
@@ -1,4 +1,5 @@
 from requests import Response
+from app.utils.json_rapido import json_de
 from app.utils.logger_config import setup_logger
 
 logger = setup_logger(__name__)
@@ -8,6 +9,7 @@ class ValidationError(ServiceError): pass
 class NotFoundError(ServiceError): pass
 class ConflictError(ServiceError): pass
 class ServerError(ServiceError): pass
+class ServicioNoDisponible(ServiceError): pass
 
 def validar_respuesta(response: Response, codigo_esperado: int = 200):
    
@@ -29,7 +31,7 @@ def validar_respuesta(response: Response, codigo_esperado: int = 200):
 
     elif code == 422:
         try:
-            detalle = response.json().get('errors', 'Sin detalles')
+            detalle = json_de(response).get('errors', 'Sin detalles')
         except Exception:
             detalle = response.text 
             
@@ -0,0 +1,222 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from tenacity import AsyncRetrying, Retrying, stop_after_attempt, wait_random_exponential
+
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Respuestas que indican sobrecarga o un problema transitorio del destino
+ESTADOS_REINTENTABLES = frozenset({429, 502, 503, 504})
+METODOS_IDEMPOTENTES = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Valores por defecto; create_app los reemplaza con los de Config vía configurar_reintentos
+_opciones = {
+    "HTTP_RETRY_MAX_INTENTOS": 3,
+    "HTTP_RETRY_BASE_MS": 100.0,
+    "HTTP_RETRY_MAX_MS": 2000.0,
+    "HTTP_RETRY_PRESUPUESTO": 0.1,
+    "HTTP_RETRY_MINIMO_POR_SEG": 2.0,
+}
+_destinos = {}
+_presupuestos = {}
+_lock = threading.Lock()
+
+_CLAVES_DESTINO = {
+    "PAGOS_URL": "pagos",
+    "COMPRAS_URL": "compras",
+    "STOCK_URL": "stock",
+    "PRODUCTO_URL": "producto",
+}
+
+
+class PresupuestoReintentos:
+    """
+    Limita qué parte del tráfico a un destino pueden ser reintentos. Cada pedido
+    deposita `proporcion` fichas y cada reintento gasta una; además se repone un
+    mínimo por segundo para que con poco tráfico igual se pueda reintentar.
+    Si el destino está caído, los reintentos se cortan en vez de multiplicar la carga.
+    """
+
+    def __init__(self, proporcion=0.1, minimo_por_segundo=2.0, ventana_segundos=10.0):
+        self.proporcion = proporcion
+        self.minimo_por_segundo = minimo_por_segundo
+        self.maximo = max(minimo_por_segundo * ventana_segundos, 1.0)
+        self._fichas = self.maximo
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reponer(self):
+        ahora = time.monotonic()
+        self._fichas = min(self.maximo, self._fichas + (ahora - self._ultimo) * self.minimo_por_segundo)
+        self._ultimo = ahora
+
+    def registrar_pedido(self):
+        with self._lock:
+            self._reponer()
+            self._fichas = min(self.maximo, self._fichas + self.proporcion)
+
+    def retirar(self) -> bool:
+        with self._lock:
+            self._reponer()
+            if self._fichas >= 1:
+                self._fichas -= 1
+                return True
+            return False
+
+
+class MetricasReintentos:
+    """Contadores por destino, para medir el efecto de los reintentos en la cola de latencia."""
+
+    _CONTADORES = ("pedidos", "reintentos", "denegados_por_presupuesto", "agotados", "exitos_tras_reintento")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._por_destino = {}
+
+    def sumar(self, destino, contador):
+        with self._lock:
+            contadores = self._por_destino.setdefault(destino, dict.fromkeys(self._CONTADORES, 0))
+            contadores[contador] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {destino: dict(contadores) for destino, contadores in self._por_destino.items()}
+
+
+metricas = MetricasReintentos()
+
+
+def configurar_reintentos(config):
+    """Toma las opciones HTTP_RETRY_* y las URLs de los servicios de la config de Flask."""
+    with _lock:
+        for clave in _opciones:
+            if config.get(clave) is not None:
+                _opciones[clave] = config.get(clave)
+        _destinos.clear()
+        for clave, nombre in _CLAVES_DESTINO.items():
+            if config.get(clave):
+                _destinos[urlsplit(config[clave]).netloc] = nombre
+        _presupuestos.clear()
+
+
+def destino_de(url) -> str:
+    netloc = urlsplit(url).netloc
+    return _destinos.get(netloc, netloc)
+
+
+def presupuesto(destino) -> PresupuestoReintentos:
+    with _lock:
+        actual = _presupuestos.get(destino)
+        if actual is None:
+            actual = _presupuestos[destino] = PresupuestoReintentos(
+                proporcion=float(_opciones["HTTP_RETRY_PRESUPUESTO"]),
+                minimo_por_segundo=float(_opciones["HTTP_RETRY_MINIMO_POR_SEG"]),
+            )
+        return actual
+
+
+def es_reintentable(metodo, response=None, error=None, idempotente=False) -> bool:
+    """
+    Un estado de sobrecarga se puede reintentar siempre: el servicio no procesó el pedido.
+    Si no se pudo conectar tampoco llegó nada. Un timeout de lectura solo se reintenta
+    en métodos idempotentes, porque el POST pudo haberse aplicado; con Idempotency-Key
+    (idempotente=True) el servicio devuelve la respuesta guardada y también se reintenta.
+    """
+    if error is None:
+        return response is not None and response.status_code in ESTADOS_REINTENTABLES
+    if isinstance(error, (requests.ConnectionError, httpx.ConnectError, httpx.ConnectTimeout,
+                          httpx.PoolTimeout)):
+        return True
+    if isinstance(error, (requests.Timeout, httpx.TimeoutException, httpx.RemoteProtocolError)):
+        return idempotente or metodo.upper() in METODOS_IDEMPOTENTES
+    return False
+
+
+class PoliticaReintentos:
+    """
+    Backoff exponencial con jitter completo: la espera es aleatoria entre 0 y
+    base * 2^intento (con tope), así los clientes que fallaron juntos no vuelven
+    todos al mismo tiempo. Si el servicio manda Retry-After se respeta, con el mismo tope.
+    """
+
+    def __init__(self, metodo, url, max_intentos=None, base_ms=None, max_ms=None, idempotente=False):
+        self.metodo = metodo
+        self.idempotente = idempotente
+        self.destino = destino_de(url)
+        self.max_intentos = int(max_intentos or _opciones["HTTP_RETRY_MAX_INTENTOS"])
+        self.base = float(base_ms or _opciones["HTTP_RETRY_BASE_MS"]) / 1000
+        self.tope = float(max_ms or _opciones["HTTP_RETRY_MAX_MS"]) / 1000
+        self._jitter = wait_random_exponential(multiplier=self.base, max=self.tope)
+
+    def _debe_reintentar(self, retry_state):
+        resultado = retry_state.outcome
+        error = resultado.exception()
+        response = None if error is not None else resultado.result()
+        if not es_reintentable(self.metodo, response, error, self.idempotente):
+            if retry_state.attempt_number > 1 and error is None and response.status_code < 400:
+                metricas.sumar(self.destino, "exitos_tras_reintento")
+            return False
+
+        motivo = error if error is not None else f"HTTP {response.status_code}"
+        if retry_state.attempt_number >= self.max_intentos:
+            metricas.sumar(self.destino, "agotados")
+            logger.warning(f"{self.metodo} a {self.destino} sin más intentos: {motivo}")
+            return False
+        if not presupuesto(self.destino).retirar():
+            metricas.sumar(self.destino, "denegados_por_presupuesto")
+            logger.warning(f"Presupuesto de reintentos agotado para {self.destino}, no se reintenta: {motivo}")
+            return False
+
+        metricas.sumar(self.destino, "reintentos")
+        logger.info(f"Reintentando {self.metodo} a {self.destino} (intento {retry_state.attempt_number + 1}): {motivo}")
+        return True
+
+    def _espera(self, retry_state):
+        espera = self._jitter(retry_state)
+        resultado = retry_state.outcome
+        if resultado.exception() is None:
+            retry_after = resultado.result().headers.get("Retry-After")
+            try:
+                espera = max(espera, min(float(retry_after), self.tope))
+            except (TypeError, ValueError):
+                pass
+        return espera
+
+    def _argumentos(self):
+        return {
+            "stop": stop_after_attempt(self.max_intentos),
+            "wait": self._espera,
+            "retry": self._debe_reintentar,
+            "reraise": True,
+        }
+
+    def ejecutar(self, hacer_pedido):
+        metricas.sumar(self.destino, "pedidos")
+        presupuesto(self.destino).registrar_pedido()
+        return Retrying(**self._argumentos())(hacer_pedido)
+
+    async def ejecutar_async(self, hacer_pedido):
+        metricas.sumar(self.destino, "pedidos")
+        presupuesto(self.destino).registrar_pedido()
+        # AsyncRetrying solo hace await si recibe una función async, no un lambda que devuelve la corrutina
+        async def pedido():
+            return await hacer_pedido()
+
+        return await AsyncRetrying(**self._argumentos())(pedido)
+
+
+def con_reintentos(metodo, url, hacer_pedido, idempotente=False):
+    return PoliticaReintentos(metodo, url, idempotente=idempotente).ejecutar(hacer_pedido)
+
+
+async def con_reintentos_async(metodo, url, hacer_pedido, idempotente=False):
+    return await PoliticaReintentos(metodo, url, idempotente=idempotente).ejecutar_async(hacer_pedido)
@@ -0,0 +1,162 @@
+"""
+Benchmark de contención: venta relámpago donde la mayoría de las sagas compran unos
+pocos productos calientes, contra un stock falso que toma un lock por producto_id
+mientras registra el movimiento y rechaza al que llega con el lock tomado (el peor
+caso del choque del compare-and-swap en inventario, que reintenta antes de dar 409).
+
+Se simulan --replicas réplicas del orquestador en el proceso, cada una con su
+EjecutorSagas. Sin ruteo cada saga va a cualquier réplica; con ruteo va a la dueña
+de su producto_id según el anillo de hashing consistente y ahí se ejecuta después
+de las anteriores del mismo producto (como con SAGA_RUTEO_HABILITADO). Se informan
+sagas/seg, latencia, conflictos de lock y tasa de compensación, y cuántos productos
+cambian de réplica al agregar una con el anillo y con hash módulo N.
+
+    python -m benchmarks.bench_contencion --sagas 1000 --concurrencia 32 --replicas 3
+"""
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+
+from benchmarks.bench_suite import DATOS, _percentil
+from benchmarks.servicios_falsos import Latencia, levantar_servicios
+
+
+def _datos(producto_id):
+    return {paso: dict(datos, producto_id=producto_id) for paso, datos in DATOS.items()}
+
+
+def medir(replicas, plan, anillo, elegir_producto, n_sagas, concurrencia, stock, espera_max):
+    from app.services.saga.admision import SagaRechazada
+
+    lista = list(replicas.values())
+    latencias = []
+    codigos = {}
+    siguiente = iter(range(n_sagas))
+    lock = threading.Lock()
+    stock.configurar()
+
+    def trabajar(numero_hilo):
+        rng = random.Random(numero_hilo)
+        while True:
+            with lock:
+                numero = next(siguiente, None)
+            if numero is None:
+                break
+            producto_id = elegir_producto(rng)
+            inicio = time.perf_counter()
+            try:
+                if anillo is None:
+                    estado = lista[numero % len(lista)].enviar(plan, _datos(producto_id))
+                else:
+                    estado = replicas[anillo.nodo(producto_id)].enviar(plan, _datos(producto_id), clave=producto_id)
+                codigo = estado.resultado["status_code"] if estado.esperar(espera_max) else "sin_respuesta"
+            except SagaRechazada:
+                codigo = 429
+            fin = time.perf_counter()
+            with lock:
+                latencias.append((fin - inicio) * 1000)
+                codigos[codigo] = codigos.get(codigo, 0) + 1
+
+    hilos = [threading.Thread(target=trabajar, args=(numero,)) for numero in range(concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    return {
+        "sagas_por_seg": round(n_sagas / duracion, 1),
+        "exitosas_por_seg": round(sum(c for codigo, c in codigos.items() if codigo == 201) / duracion, 1),
+        "p50_ms": round(_percentil(latencias, 50), 2),
+        "p99_ms": round(_percentil(latencias, 99), 2),
+        "conflictos": stock.conflictos,
+        "tasa_compensacion": round(codigos.get(500, 0) / n_sagas, 4),
+        "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(codigos.items(), key=str)},
+    }
+
+
+def reubicados(anillo_clase, replicas, productos):
+    """Proporción de productos que cambian de réplica al pasar de N a N+1, con el anillo y con módulo N."""
+    antes = anillo_clase([f"replica-{i}" for i in range(replicas)])
+    despues = anillo_clase([f"replica-{i}" for i in range(replicas + 1)])
+    con_anillo = sum(antes.nodo(p) != despues.nodo(p) for p in range(1, productos + 1)) / productos
+    con_modulo = sum(p % replicas != p % (replicas + 1) for p in range(1, productos + 1)) / productos
+    return con_anillo, con_modulo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sagas", type=int, default=1000)
+    parser.add_argument("--concurrencia", type=int, default=32)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=16, help="SAGA_WORKERS de cada réplica")
+    parser.add_argument("--productos", type=int, default=1000)
+    parser.add_argument("--calientes", type=int, default=3, help="productos de la venta relámpago")
+    parser.add_argument("--prop-calientes", type=float, default=0.8, help="proporción de sagas a productos calientes")
+    parser.add_argument("--latencia-stock", default="lognormal:10:0.3")
+    parser.add_argument("--espera-max", type=float, default=60.0)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    servicios, urls = levantar_servicios(semilla=args.semilla)
+    os.environ.update(urls)
+    os.environ.update({
+        "SAGA_LOG_HABILITADO": "false",
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "STOCK_CACHE_HABILITADA": "false",
+        "COMPENSACION_HABILITADA": "false",
+        "HTTP_POOL_WARMUP": "0",
+        "TRACING_HABILITADO": "false",
+        "SAGA_WORKERS": str(args.workers),
+        "SAGA_MAX_POR_CLAVE": str(args.concurrencia),
+    })
+    os.environ.setdefault("REDIS_HOST", "localhost")
+
+    logging.disable(logging.CRITICAL)
+    from app import create_app
+    from app.services.saga.ejecutor import EjecutorSagas
+    from app.services.saga.ruteo import AnilloHash
+    from app.utils import circuit_breaker, retry
+
+    app = create_app()
+    plan = app.extensions['planes_saga']['compra']
+    servicios["pago"].configurar(Latencia.desde_texto("lognormal:20:0.3"), 0.0)
+    servicios["compra"].configurar(Latencia.desde_texto("lognormal:10:0.3"), 0.0)
+    stock = servicios["stock"]
+    stock.configurar(Latencia.desde_texto(args.latencia_stock), 0.0)
+    stock.bloqueo_por_producto = True
+
+    calientes = list(range(1, args.calientes + 1))
+
+    def elegir_producto(rng):
+        if rng.random() < args.prop_calientes:
+            return rng.choice(calientes)
+        return rng.randint(args.calientes + 1, args.productos)
+
+    print(f"{args.sagas} sagas, concurrencia {args.concurrencia}, {args.replicas} réplicas de {args.workers} workers, "
+          f"{args.prop_calientes:.0%} a {args.calientes} productos calientes de {args.productos}")
+    print(f"{'modo':<12} {'sagas/seg':>10} {'exitosas/s':>11} {'p50':>8} {'p99':>9} {'conflictos':>11} "
+          f"{'compens.':>9}  códigos")
+    for modo in ("sin_ruteo", "con_ruteo"):
+        circuit_breaker.configurar_breakers(app.config)
+        retry.configurar_reintentos(app.config)
+        replicas = {f"replica-{i}": EjecutorSagas(app) for i in range(args.replicas)}
+        anillo = AnilloHash(replicas) if modo == "con_ruteo" else None
+        r = medir(replicas, plan, anillo, elegir_producto, args.sagas, args.concurrencia, stock, args.espera_max)
+        print(f"{modo:<12} {r['sagas_por_seg']:>10.1f} {r['exitosas_por_seg']:>11.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p99_ms']:>9.1f} {r['conflictos']:>11} {r['tasa_compensacion']:>9.1%}  {r['codigos']}")
+
+    con_anillo, con_modulo = reubicados(AnilloHash, args.replicas, args.productos)
+    print(f"\nDe {args.replicas} a {args.replicas + 1} réplicas cambian de réplica el {con_anillo:.1%} de los "
+          f"productos con el anillo y el {con_modulo:.1%} con hash módulo N")
+
+    for servicio in servicios.values():
+        servicio.detener()
+
+
+if __name__ == "__main__":
+    main()
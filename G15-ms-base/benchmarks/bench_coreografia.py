@@ -0,0 +1,235 @@
+"""
+Benchmark: la saga de compra orquestada (SagaOrchestrator con el plan compilado, por
+HTTP contra los servicios falsos de benchmarks/servicios_falsos.py) contra el modo
+coreografía (CoreografiaSagas, eventos por Redis Streams), con la misma latencia y
+probabilidad de falla por servicio en cada escenario de bench_suite.
+
+En coreografía pagos, compras e inventario son participantes en el proceso que
+escuchan los mismos streams y eventos que app/services/eventos_saga.py de cada
+servicio: leen con su consumer group, esperan la latencia sorteada y publican el
+resultado o la compensación. En los dos modos hay --concurrencia sagas en vuelo a la
+vez; la latencia va desde que se envía la saga hasta que se conoce su resultado.
+
+Necesita un Redis (REDIS_HOST, REDIS_PORT). Usa la base --redis-db y borra ahí los
+streams saga:* al empezar y al terminar.
+
+    python -m benchmarks.bench_coreografia --sagas 500 --concurrencia 16
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+import redis
+
+from benchmarks.bench_suite import DATOS, ESCENARIOS, _percentil, medir
+from benchmarks.servicios_falsos import Latencia, ServicioFalso, levantar_servicios
+
+# servicio: (stream propio, {stream escuchado: {evento: (evento si sale bien, evento si falla)}})
+# Las compensaciones no fallan: el segundo evento es None
+REGLAS = {
+    "pago": ("saga:pagos", {
+        "saga:base": {"compra_solicitada": ("pago_realizado", "pago_rechazado")},
+        "saga:compras": {"compra_rechazada": ("pago_compensado", None),
+                         "compra_compensada": ("pago_compensado", None)},
+    }),
+    "compra": ("saga:compras", {
+        "saga:pagos": {"pago_realizado": ("compra_registrada", "compra_rechazada")},
+        "saga:inventario": {"stock_rechazado": ("compra_compensada", None)},
+    }),
+    "stock": ("saga:inventario", {
+        "saga:compras": {"compra_registrada": ("stock_reservado", "stock_rechazado")},
+    }),
+}
+STREAMS = ("saga:base", "saga:pagos", "saga:compras", "saga:inventario")
+
+
+class ParticipanteFalso(ServicioFalso):
+    """Un servicio falso que en vez de HTTP participa de la coreografía con --workers consumidores."""
+
+    def __init__(self, nombre, cliente, workers, **kwargs):
+        super().__init__(nombre, **kwargs)
+        self.cliente = cliente
+        self.workers = workers
+        self.stream, self.escucha = REGLAS[nombre]
+        self._parar = threading.Event()
+        self._hilos = []
+
+    def iniciar(self):
+        for stream in self.escucha:
+            try:
+                self.cliente.xgroup_create(stream, self.nombre, id="$", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        self._parar.clear()
+        self._hilos = [threading.Thread(target=self._trabajar, args=(numero,), daemon=True)
+                       for numero in range(self.workers)]
+        for hilo in self._hilos:
+            hilo.start()
+        return self
+
+    def detener(self):
+        self._parar.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+
+    def _trabajar(self, numero):
+        consumidor = f"{self.nombre}-{numero}"
+        while not self._parar.is_set():
+            respuesta = self.cliente.xreadgroup(self.nombre, consumidor, {stream: ">" for stream in self.escucha},
+                                                count=1, block=100)
+            for stream, mensajes in respuesta or []:
+                for id_mensaje, campos in mensajes:
+                    self._reaccionar(stream, campos)
+                    self.cliente.xack(stream, self.nombre, id_mensaje)
+
+    def _reaccionar(self, stream, campos):
+        eventos = self.escucha[stream].get(campos["evento"])
+        if eventos is None:
+            return
+        espera, falla = self._sortear()
+        time.sleep(espera)
+        exito, rechazo = eventos
+        if rechazo is None:
+            self._contar_compensacion()
+            evento = exito
+        elif falla:
+            with self._lock:
+                self.fallas += 1
+            evento = rechazo
+        else:
+            evento = exito
+        self.cliente.xadd(self.stream, {**campos, "evento": evento, "emitido": time.time()})
+
+
+def medir_coreografia(motor, plan, n_sagas, concurrencia, calentamiento, espera_max):
+    """Mismas métricas que bench_suite.medir, salvo la CPU: el trabajo lo hacen los workers."""
+    latencias = []
+    codigos = {}
+    compensadas = [0]
+    siguiente = iter(range(n_sagas + calentamiento))
+    lock = threading.Lock()
+
+    def trabajar():
+        while True:
+            with lock:
+                numero = next(siguiente, None)
+            if numero is None:
+                break
+            inicio = time.perf_counter()
+            estado = motor.enviar(plan, DATOS)
+            if estado.esperar(espera_max):
+                codigo = estado.resultado["status_code"]
+                compensada = estado.resultado["data"]["evento"] == "pago_compensado"
+            else:
+                codigo, compensada = "sin_respuesta", False
+            fin = time.perf_counter()
+            if numero < calentamiento:
+                continue
+            with lock:
+                latencias.append((fin - inicio) * 1000)
+                codigos[codigo] = codigos.get(codigo, 0) + 1
+                compensadas[0] += compensada
+
+    hilos = [threading.Thread(target=trabajar) for _ in range(concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = (time.perf_counter() - inicio) * n_sagas / (n_sagas + calentamiento)
+
+    return {
+        "sagas": n_sagas,
+        "sagas_por_seg": round(n_sagas / duracion, 1),
+        "p50_ms": round(_percentil(latencias, 50), 2),
+        "p95_ms": round(_percentil(latencias, 95), 2),
+        "p99_ms": round(_percentil(latencias, 99), 2),
+        "tasa_compensacion": round(compensadas[0] / n_sagas, 4),
+        "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(codigos.items(), key=str)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sagas", type=int, default=500)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--calentamiento", type=int, default=50, help="sagas iniciales que no se miden")
+    parser.add_argument("--escenarios", nargs="+", choices=sorted(ESCENARIOS), default=sorted(ESCENARIOS))
+    parser.add_argument("--workers", type=int, default=8,
+                        help="consumidores por servicio en coreografía (COREOGRAFIA_WORKERS de los servicios)")
+    parser.add_argument("--workers-base", type=int, default=4,
+                        help="consumidores del orquestador en coreografía (COREOGRAFIA_WORKERS de ms-base)")
+    parser.add_argument("--redis-db", type=int, default=15)
+    parser.add_argument("--espera-max", type=float, default=30.0, help="segundos máximos por saga")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    cliente = redis.StrictRedis(host=os.getenv("REDIS_HOST", "localhost"), port=int(os.getenv("REDIS_PORT", "6379")),
+                                db=args.redis_db, password=os.getenv("REDIS_PASSWORD"), decode_responses=True)
+    try:
+        cliente.ping()
+    except redis.RedisError as e:
+        parser.exit(2, f"Hace falta un Redis para el modo coreografía (REDIS_HOST/REDIS_PORT): {e}\n")
+    cliente.delete(*STREAMS)
+
+    servicios, urls = levantar_servicios(semilla=args.semilla)
+    os.environ.update(urls)
+    os.environ.update({
+        "SAGA_LOG_HABILITADO": "false",
+        "SQLALCHEMY_DATABASE_URI": "sqlite://",
+        "STOCK_CACHE_HABILITADA": "false",
+        "COMPENSACION_HABILITADA": "false",
+        "HTTP_POOL_WARMUP": "0",
+        "TRACING_HABILITADO": "false",
+        # Sin tope propio: la concurrencia la fija el benchmark
+        "SAGA_MAX_PENDIENTES": str(max(args.concurrencia, 256)),
+    })
+    os.environ.setdefault("REDIS_HOST", "localhost")
+
+    logging.disable(logging.CRITICAL)
+    from app import create_app
+    from app.services.saga.coreografia import CoreografiaSagas
+    from app.utils import circuit_breaker, retry
+
+    app = create_app()
+    app.config["COREOGRAFIA_WORKERS"] = args.workers_base
+    plan = app.extensions['planes_saga']['compra']
+    participantes = {
+        nombre: ParticipanteFalso(nombre, cliente, args.workers,
+                                  semilla=args.semilla + numero).iniciar()
+        for numero, nombre in enumerate(REGLAS)
+    }
+    coreografia = CoreografiaSagas(app, cliente=cliente)
+    # Los grupos tienen que existir antes del primer evento: se leen desde "$"
+    coreografia._crear_grupos()
+    coreografia.iniciar_workers()
+
+    print(f"{args.sagas} sagas por corrida, concurrencia {args.concurrencia}, "
+          f"{args.workers} workers por servicio y {args.workers_base} en el orquestador en coreografía")
+    print(f"{'modo/escenario':<26} {'sagas/seg':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'compens.':>9}  códigos")
+    for escenario in args.escenarios:
+        for modo in ("orquestacion", "coreografia"):
+            for servicio, (latencia, prob_falla) in ESCENARIOS[escenario].items():
+                destino = servicios[servicio] if modo == "orquestacion" else participantes[servicio]
+                destino.configurar(Latencia.desde_texto(latencia), prob_falla)
+            if modo == "orquestacion":
+                circuit_breaker.configurar_breakers(app.config)
+                retry.configurar_reintentos(app.config)
+                r = medir(app, "plan", args.sagas, args.concurrencia, args.calentamiento)
+            else:
+                r = medir_coreografia(coreografia, plan, args.sagas, args.concurrencia, args.calentamiento,
+                                      args.espera_max)
+            print(f"{modo + '/' + escenario:<26} {r['sagas_por_seg']:>10.1f} {r['p50_ms']:>8.1f} "
+                  f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['tasa_compensacion']:>9.1%}  {r['codigos']}")
+
+    for servicio in list(servicios.values()) + list(participantes.values()):
+        servicio.detener()
+    cliente.delete(*STREAMS)
+
+
+if __name__ == "__main__":
+    main()
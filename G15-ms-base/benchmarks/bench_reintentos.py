@@ -0,0 +1,116 @@
+"""
+Benchmark: latencia (p50/p99) y amplificación de carga de la política de reintentos
+anterior (wait_fixed(2), 3 intentos, reintenta cualquier error) contra PoliticaReintentos
+(backoff exponencial con jitter, estados clasificados y presupuesto por destino).
+
+El destino simulado responde 503 con la probabilidad de cada escenario; "caído" es 100%.
+
+    python -m benchmarks.bench_reintentos --pedidos 300 --concurrencia 50
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tenacity import retry, stop_after_attempt, wait_fixed
+
+from app.utils import retry as reintentos
+
+URL = "http://pagos.bench/api/v1/pagos/transaccion"
+
+
+class _Respuesta:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class _Destino:
+    def __init__(self, prob_falla, latencia):
+        self.prob_falla = prob_falla
+        self.latencia = latencia
+        self.intentos = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.intentos += 1
+        time.sleep(self.latencia)
+        return _Respuesta(503 if random.random() < self.prob_falla else 201)
+
+
+def _politica_fija(destino, espera):
+    @retry(wait=wait_fixed(espera), stop=stop_after_attempt(3), reraise=True)
+    def pedir():
+        respuesta = destino()
+        if respuesta.status_code >= 400:
+            raise RuntimeError(f"HTTP {respuesta.status_code}")
+        return respuesta
+
+    def correr():
+        try:
+            return pedir()
+        except RuntimeError:
+            return _Respuesta(503)
+
+    return correr
+
+
+def _politica_nueva(destino):
+    return lambda: reintentos.con_reintentos("POST", URL, destino)
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _medir(crear_pedido, destino, pedidos, concurrencia):
+    latencias = []
+    exitos = [0]
+    lock = threading.Lock()
+    pedir = crear_pedido(destino)
+
+    def uno(_):
+        inicio = time.perf_counter()
+        respuesta = pedir()
+        with lock:
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            exitos[0] += respuesta.status_code < 400
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        list(pool.map(uno, range(pedidos)))
+    return _percentil(latencias, 50), _percentil(latencias, 99), exitos[0] / pedidos, destino.intentos / pedidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pedidos", type=int, default=300)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--espera-fija-ms", type=float, default=2000.0, help="espera de la política anterior")
+    parser.add_argument("--escenarios", type=float, nargs="+", default=[0.05, 0.3, 1.0],
+                        help="probabilidad de 503 del destino")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    random.seed(1)
+    latencia = args.latencia_ms / 1000
+
+    print(f"{args.pedidos} pedidos, concurrencia {args.concurrencia}, latencia del destino {args.latencia_ms} ms")
+    print(f"{'escenario':>10} {'política':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'éxito':>8} {'intentos/pedido':>16}")
+    for prob in args.escenarios:
+        fija = _medir(lambda d: _politica_fija(d, args.espera_fija_ms / 1000), _Destino(prob, latencia),
+                      args.pedidos, args.concurrencia)
+        reintentos.configurar_reintentos({"PAGOS_URL": URL})
+        reintentos.metricas.reiniciar()
+        nueva = _medir(_politica_nueva, _Destino(prob, latencia), args.pedidos, args.concurrencia)
+        for nombre, (p50, p99, exito, amplificacion) in (("fija", fija), ("jitter", nueva)):
+            print(f"{prob:>10.0%} {nombre:>10} {p50:>10.1f} {p99:>10.1f} {exito:>8.1%} {amplificacion:>16.2f}")
+        print(f"{'':>10} contadores: {reintentos.metricas.snapshot().get('pagos')}")
+
+
+if __name__ == "__main__":
+    main()
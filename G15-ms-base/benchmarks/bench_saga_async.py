@@ -0,0 +1,112 @@
+"""
+Benchmark: sagas/seg del motor síncrono (SagaOrchestrator) contra el motor async.
+
+Los pasos simulan la latencia de pagos/compras/stock con sleep, sin red,
+para medir solo el costo del motor. Uso (desde G15-ms-base):
+
+    python -m benchmarks.bench_saga_async --sagas 2000 --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.saga.acciones import SagaAction
+from app.services.saga.acciones_async import AsyncSagaAction
+from app.services.saga.orquestador import SagaOrchestrator
+from app.services.saga.orquestador_async import AsyncSagaOrchestrator, ejecutar_sagas
+
+DATOS = {
+    "pago": {"precio": 500, "medio_pago": "tarjeta de credito", "producto_id": 1},
+    "compra": {"producto_id": 1, "fecha_compra": "2025-12-04T10:30:00", "direccion_envio": "UTN San Rafael"},
+    "stock": {"producto_id": 1, "cantidad": 5, "entrada_salida": 2, "fecha_transaccion": "2025-12-05T19:30:00"},
+}
+
+
+def _acciones_sync(latencias):
+    def paso(segundos):
+        def ejecutar(data):
+            time.sleep(segundos)
+            return "sim", {"data": {"id": 1}}
+        return ejecutar
+
+    return [SagaAction(paso(s), lambda _id: True) for s in latencias]
+
+
+def _acciones_async(latencias):
+    def paso(segundos):
+        async def ejecutar(data):
+            await asyncio.sleep(segundos)
+            return "sim", {"data": {"id": 1}}
+        return ejecutar
+
+    async def compensar(_id):
+        return True
+
+    return [AsyncSagaAction(paso(s), compensar) for s in latencias]
+
+
+def medir_sync(n_sagas, latencias, workers):
+    acciones = _acciones_sync(latencias)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda _: SagaOrchestrator(acciones, DATOS).ejecutar(), range(n_sagas)))
+    return n_sagas / (time.perf_counter() - inicio)
+
+
+def medir_async(n_sagas, latencias, concurrencia):
+    acciones = _acciones_async(latencias)
+
+    async def correr():
+        orquestadores = [AsyncSagaOrchestrator(acciones, DATOS) for _ in range(n_sagas)]
+        await ejecutar_sagas(orquestadores, max_concurrentes=concurrencia)
+
+    inicio = time.perf_counter()
+    asyncio.run(correr())
+    return n_sagas / (time.perf_counter() - inicio)
+
+
+def medir_adaptador(n_sagas, latencias, concurrencia, hilos):
+    """Acciones síncronas existentes corriendo en el motor async a través del adaptador."""
+    acciones = _acciones_sync(latencias)
+
+    async def correr():
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            orquestadores = [AsyncSagaOrchestrator(acciones, DATOS, executor=executor) for _ in range(n_sagas)]
+            await ejecutar_sagas(orquestadores, max_concurrentes=concurrencia)
+
+    inicio = time.perf_counter()
+    asyncio.run(correr())
+    return n_sagas / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sagas", type=int, default=1000)
+    parser.add_argument("--latencias-ms", type=float, nargs=3, default=[200.0, 20.0, 20.0],
+                        metavar=("PAGO", "COMPRA", "STOCK"))
+    parser.add_argument("--workers", type=int, default=4, help="hilos del motor síncrono")
+    parser.add_argument("--concurrencia", type=int, default=1000, help="sagas en vuelo en el motor async")
+    parser.add_argument("--hilos-adaptador", type=int, default=64)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    latencias = [ms / 1000 for ms in args.latencias_ms]
+
+    # El motor síncrono es mucho más lento: se mide con menos sagas para no esperar minutos.
+    n_sync = min(args.sagas, args.workers * 20)
+    resultados = [
+        (f"sync ({args.workers} workers)", medir_sync(n_sync, latencias, args.workers)),
+        (f"async nativo (concurrencia {args.concurrencia})", medir_async(args.sagas, latencias, args.concurrencia)),
+        (f"async + adaptador ({args.hilos_adaptador} hilos)",
+         medir_adaptador(args.sagas, latencias, args.concurrencia, args.hilos_adaptador)),
+    ]
+
+    print(f"Latencias por paso (ms): {args.latencias_ms}")
+    for nombre, sagas_por_seg in resultados:
+        print(f"{nombre:<45} {sagas_por_seg:>10.1f} sagas/seg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: latencia de punta a punta de la saga de compra lineal (pago -> compra -> stock)
+contra el DAG (pago -> {compra, stock}) y el costo de compensar en cada caso.
+
+    python -m benchmarks.bench_saga_dag --latencias-ms 200 80 80
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+from app.services.saga.acciones_async import AsyncSagaAction
+from app.services.saga.dag import DagSagaOrchestrator, dag_compra
+from app.services.saga.orquestador_async import AsyncSagaOrchestrator
+
+
+def _accion(segundos, falla=False):
+    async def ejecutar(data):
+        await asyncio.sleep(segundos)
+        if falla:
+            raise RuntimeError("fallo simulado")
+        return "sim", {"data": {"id": 1}}
+
+    async def compensar(_id):
+        await asyncio.sleep(segundos)
+        return True
+
+    return AsyncSagaAction(ejecutar, compensar)
+
+
+def _medir(crear_orquestador, repeticiones):
+    async def correr():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            await crear_orquestador().ejecutar()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.mean(tiempos)
+
+    return asyncio.run(correr())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencias-ms", type=float, nargs=3, default=[200.0, 80.0, 80.0],
+                        metavar=("PAGO", "COMPRA", "STOCK"))
+    parser.add_argument("--repeticiones", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    pago, compra, stock = (ms / 1000 for ms in args.latencias_ms)
+
+    def lineal(falla_stock=False):
+        acciones = [_accion(pago), _accion(compra), _accion(stock, falla=falla_stock)]
+        return lambda: AsyncSagaOrchestrator(acciones, {})
+
+    def dag(falla_stock=False):
+        saga = dag_compra(_accion(pago), _accion(compra), _accion(stock, falla=falla_stock))
+        return lambda: DagSagaOrchestrator(saga, {})
+
+    print(f"Latencias por paso (ms): {args.latencias_ms}")
+    print(f"{'lineal, exito':<30} {_medir(lineal(), args.repeticiones):>8.1f} ms")
+    print(f"{'DAG, exito':<30} {_medir(dag(), args.repeticiones):>8.1f} ms")
+    print(f"{'lineal, falla stock':<30} {_medir(lineal(True), args.repeticiones):>8.1f} ms")
+    print(f"{'DAG, falla stock':<30} {_medir(dag(True), args.repeticiones):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: llamadas HTTP por compra y latencia p99 de una ráfaga de compras según el
+tamaño de lote de SagaLoteOrchestrator (tamaño 1 equivale a una saga por compra).
+
+Cada llamada bulk simulada tarda base + por_item * n, y cada ítem falla en pagos con
+la probabilidad indicada (solo se compensa ese ítem).
+
+    python -m benchmarks.bench_saga_lote --compras 400 --tamanos 1 10 50 100
+"""
+import argparse
+import logging
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.saga.lote import PasoLote, SagaLoteOrchestrator
+
+
+def _paso(nombre, base, por_item, prob_falla=0.0):
+    contador = {"id": 0}
+    cerrojo = threading.Lock()
+
+    def ejecutar_bulk(payloads):
+        time.sleep(base + por_item * len(payloads))
+        resultados = []
+        for _ in payloads:
+            if random.random() < prob_falla:
+                resultados.append({"status_code": 402, "message": "Pago rechazado"})
+                continue
+            with cerrojo:
+                contador["id"] += 1
+                resultados.append({"status_code": 201, "data": {"id": contador["id"]}})
+        return "sim", resultados
+
+    def compensar(_id):
+        time.sleep(base)
+
+    return PasoLote(nombre, ejecutar_bulk, compensar)
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _medir(compras, tamano, workers, base, por_item, prob_falla):
+    pasos = [
+        _paso("pago", base, por_item, prob_falla),
+        _paso("compra", base, por_item),
+        _paso("stock", base, por_item),
+    ]
+    lotes = [compras[i:i + tamano] for i in range(0, len(compras), tamano)]
+    latencias = []
+    llamadas = [0]
+    cerrojo = threading.Lock()
+    inicio = time.perf_counter()
+
+    def correr(lote):
+        orquestador = SagaLoteOrchestrator(lote, pasos=pasos, registro=None)
+        orquestador.ejecutar()
+        fin = (time.perf_counter() - inicio) * 1000
+        with cerrojo:
+            # Toda la ráfaga llegó junta: cada compra espera hasta que termina su lote
+            latencias.extend([fin] * len(lote))
+            llamadas[0] += orquestador.llamadas
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(correr, lotes))
+
+    total = (time.perf_counter() - inicio) * 1000
+    return llamadas[0] / len(compras), statistics.median(latencias), _percentil(latencias, 99), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compras", type=int, default=400)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--workers", type=int, default=16, help="lotes en vuelo a la vez")
+    parser.add_argument("--base-ms", type=float, default=20.0, help="latencia fija por llamada")
+    parser.add_argument("--por-item-ms", type=float, default=0.5, help="latencia extra por ítem del lote")
+    parser.add_argument("--prob-falla", type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    random.seed(1)
+    compras = [{"pago": {"monto": 1}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1}}
+               for _ in range(args.compras)]
+
+    print(f"{args.compras} compras, {args.workers} lotes en vuelo, base {args.base_ms} ms, "
+          f"{args.por_item_ms} ms por ítem, {args.prob_falla:.0%} de rechazos en pagos")
+    print(f"{'tamaño lote':>12} {'llamadas/compra':>16} {'p50 (ms)':>10} {'p99 (ms)':>10} {'total (ms)':>11}")
+    for tamano in args.tamanos:
+        por_compra, p50, p99, total = _medir(compras, tamano, args.workers, args.base_ms / 1000,
+                                             args.por_item_ms / 1000, args.prob_falla)
+        print(f"{tamano:>12} {por_compra:>16.3f} {p50:>10.1f} {p99:>10.1f} {total:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Benchmark de punta a punta de la saga de compra contra pagos/compras/stock falsos
+levantados en el mismo proceso (benchmarks/servicios_falsos.py): no hacen falta
+los contenedores, ni Postgres, ni Redis.
+
+Por cada motor (Saga, SagaOrchestrator, y SagaOrchestrator con el plan compilado
+de la saga de compra) y escenario informa sagas/seg, latencia p50/p95/p99, tasa de compensación y CPU por saga (tiempo de CPU de los hilos que
+ejecutan sagas, sin contar a los servicios falsos). Con --guardar se escribe un
+baseline en JSON; con --comparar se compara contra uno anterior y el comando
+termina con código 1 si algún número empeoró más que --tolerancia.
+
+    python -m benchmarks.bench_suite --sagas 500 --concurrencia 16 --guardar benchmarks/baseline.json
+    python -m benchmarks.bench_suite --sagas 500 --concurrencia 16 --comparar benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.servicios_falsos import Latencia, levantar_servicios
+
+DATOS = {
+    "pago": {"precio": 500, "medio_pago": "tarjeta de credito", "producto_id": 1},
+    "compra": {"producto_id": 1, "fecha_compra": "2025-12-04T10:30:00", "direccion_envio": "UTN San Rafael"},
+    "stock": {"producto_id": 1, "cantidad": 5, "entrada_salida": 2, "fecha_transaccion": "2025-12-05T19:30:00"},
+}
+
+# Latencia y probabilidad de falla de cada servicio por escenario
+ESCENARIOS = {
+    "nominal": {
+        "pago": ("lognormal:20:0.3", 0.0),
+        "compra": ("lognormal:10:0.3", 0.0),
+        "stock": ("lognormal:10:0.3", 0.0),
+    },
+    "fallas": {
+        "pago": ("lognormal:20:0.3", 0.0),
+        "compra": ("lognormal:10:0.3", 0.02),
+        "stock": ("lognormal:10:0.3", 0.1),
+    },
+    "cola_larga": {
+        "pago": ("lognormal:20:1.2", 0.0),
+        "compra": ("exponencial:10", 0.0),
+        "stock": ("exponencial:10", 0.0),
+    },
+}
+
+# Métricas comparadas contra el baseline y si "mejor" es más alto o más bajo
+COMPARADAS = {
+    "sagas_por_seg": "alto",
+    "p50_ms": "bajo",
+    "p95_ms": "bajo",
+    "p99_ms": "bajo",
+    "cpu_ms_por_saga": "bajo",
+}
+
+
+def _acciones(app, motor):
+    if motor == "plan":
+        # Los pasos compilados al arrancar, los mismos que usa POST /api/v1/saga/compra
+        return app.extensions['planes_saga']['compra'].pasos
+
+    from app.services.compra_service import CompraService
+    from app.services.pago_service import PagoService
+    from app.services.saga.acciones import SagaAction
+    from app.services.saga_orchestrator import Action
+    from app.services.stock_service import StockService
+
+    clase = Action if motor == "saga" else SagaAction
+    return [
+        clase(PagoService().agregar_pago, PagoService().eliminar_pago, "pago"),
+        clase(CompraService().comprar, CompraService().borrar_compra, "compra"),
+        clase(StockService().reservar_stock, None, "stock", confirm_fn=StockService().confirmar_reserva),
+    ]
+
+
+def _ejecutar_una(motor, acciones):
+    """Corre una saga y devuelve (código de estado, se compensó)."""
+    from app.services.saga.orquestador import SagaOrchestrator
+    from app.services.saga_orchestrator import Saga
+
+    if motor == "saga":
+        respuesta = Saga(acciones, DATOS).execute()
+        return respuesta["status_code"], respuesta["status_code"] == 500
+    respuesta = SagaOrchestrator(acciones, DATOS).ejecutar()
+    return respuesta["codigo_estado"], respuesta["codigo_estado"] == 500
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir(app, motor, n_sagas, concurrencia, calentamiento):
+    acciones = _acciones(app, motor)
+    latencias = []
+    codigos = {}
+    compensadas = [0]
+    cpu = [0.0]
+    siguiente = iter(range(n_sagas + calentamiento))
+    lock = threading.Lock()
+
+    def trabajar():
+        with app.app_context():
+            cpu_hilo = 0.0
+            while True:
+                with lock:
+                    numero = next(siguiente, None)
+                if numero is None:
+                    break
+                inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+                codigo, compensada = _ejecutar_una(motor, acciones)
+                fin, fin_cpu = time.perf_counter(), time.thread_time()
+                if numero < calentamiento:
+                    continue
+                cpu_hilo += fin_cpu - inicio_cpu
+                with lock:
+                    latencias.append((fin - inicio) * 1000)
+                    codigos[codigo] = codigos.get(codigo, 0) + 1
+                    compensadas[0] += compensada
+            with lock:
+                cpu[0] += cpu_hilo
+
+    hilos = [threading.Thread(target=trabajar) for _ in range(concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    # El calentamiento también ocupa tiempo de pared: se descuenta en proporción
+    duracion = (time.perf_counter() - inicio) * n_sagas / (n_sagas + calentamiento)
+
+    return {
+        "sagas": n_sagas,
+        "sagas_por_seg": round(n_sagas / duracion, 1),
+        "p50_ms": round(_percentil(latencias, 50), 2),
+        "p95_ms": round(_percentil(latencias, 95), 2),
+        "p99_ms": round(_percentil(latencias, 99), 2),
+        "tasa_compensacion": round(compensadas[0] / n_sagas, 4),
+        "cpu_ms_por_saga": round(cpu[0] * 1000 / n_sagas, 3),
+        "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(codigos.items())},
+    }
+
+
+def _mediana(corridas):
+    """Mediana de cada métrica numérica; los códigos son los de la corrida del medio en sagas/seg."""
+    if len(corridas) == 1:
+        return corridas[0]
+    medio = sorted(corridas, key=lambda r: r["sagas_por_seg"])[len(corridas) // 2]
+    resultado = dict(medio)
+    for metrica in ("sagas_por_seg", "p50_ms", "p95_ms", "p99_ms", "tasa_compensacion", "cpu_ms_por_saga"):
+        resultado[metrica] = sorted(r[metrica] for r in corridas)[len(corridas) // 2]
+    return resultado
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actuales, baseline, tolerancia):
+    """Lista de regresiones (texto) de los resultados actuales contra el baseline."""
+    regresiones = []
+    for clave, resultado in actuales.items():
+        anterior = baseline.get("resultados", {}).get(clave)
+        if anterior is None:
+            continue
+        for metrica, mejor in COMPARADAS.items():
+            antes, ahora = anterior.get(metrica), resultado.get(metrica)
+            if not antes or ahora is None:
+                continue
+            cambio = (ahora - antes) / antes
+            if (mejor == "alto" and cambio < -tolerancia) or (mejor == "bajo" and cambio > tolerancia):
+                regresiones.append(f"{clave} {metrica}: {antes} -> {ahora} ({cambio:+.1%})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sagas", type=int, default=500)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--calentamiento", type=int, default=50, help="sagas iniciales que no se miden")
+    parser.add_argument("--motores", nargs="+", choices=("saga", "orquestador", "plan"),
+                        default=["saga", "orquestador", "plan"])
+    parser.add_argument("--escenarios", nargs="+", choices=sorted(ESCENARIOS), default=sorted(ESCENARIOS))
+    parser.add_argument("--latencia", nargs=2, action="append", default=[], metavar=("SERVICIO", "DIST"),
+                        help='pisa la latencia de un servicio en todos los escenarios, p. ej. pago "fija:50"')
+    parser.add_argument("--con-registro", action="store_true", help="escribe el log de sagas (SQLite temporal)")
+    parser.add_argument("--tracing", type=float, metavar="PROPORCION",
+                        help="activa el tracing con esa proporción de muestreo (spans a un archivo temporal)")
+    parser.add_argument("--repeticiones", type=int, default=1,
+                        help="corridas por motor y escenario; se informa la mediana de cada métrica")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--guardar", metavar="ARCHIVO", help="guarda los resultados como baseline")
+    parser.add_argument("--comparar", metavar="ARCHIVO", help="baseline contra el que se compara")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="empeoramiento relativo aceptado")
+    args = parser.parse_args()
+
+    servicios, urls = levantar_servicios(semilla=args.semilla)
+    # La config se lee al importar app: el entorno hermético se arma antes
+    os.environ.update(urls)
+    os.environ.update({
+        "SAGA_LOG_HABILITADO": "true" if args.con_registro else "false",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tempfile.mkdtemp()}/saga_log.db" if args.con_registro else "sqlite://",
+        "STOCK_CACHE_HABILITADA": "false",
+        "COMPENSACION_HABILITADA": "false",
+        "HTTP_POOL_WARMUP": "0",
+        "TRACING_HABILITADO": "true" if args.tracing is not None else "false",
+        "TRACING_MUESTREO": str(args.tracing or 0),
+        "TRACING_ARCHIVO": f"{tempfile.mkdtemp()}/trazas.jsonl",
+    })
+    # La config de la caché de Flask lo exige aunque la saga no la use
+    os.environ.setdefault("REDIS_HOST", "localhost")
+
+    logging.disable(logging.CRITICAL)
+    from app import create_app, db
+    from app.utils import circuit_breaker, retry
+
+    app = create_app()
+    if args.con_registro:
+        with app.app_context():
+            db.create_all()
+
+    latencias_fijas = {servicio: dist for servicio, dist in args.latencia}
+    resultados = {}
+    print(f"{args.sagas} sagas por corrida, concurrencia {args.concurrencia}, "
+          f"log de sagas {'activado' if args.con_registro else 'desactivado'}, "
+          f"tracing {'desactivado' if args.tracing is None else f'al {args.tracing:.0%}'}")
+    print(f"{'motor/escenario':<24} {'sagas/seg':>10} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'compens.':>9} {'CPU ms/saga':>12}  códigos")
+    for escenario in args.escenarios:
+        for motor in args.motores:
+            for servicio, (latencia, prob_falla) in ESCENARIOS[escenario].items():
+                servicios[servicio].configurar(Latencia.desde_texto(latencias_fijas.get(servicio, latencia)),
+                                               prob_falla)
+            corridas = []
+            for _ in range(args.repeticiones):
+                # Cada corrida arranca con los breakers cerrados y los presupuestos de reintento llenos
+                circuit_breaker.configurar_breakers(app.config)
+                retry.configurar_reintentos(app.config)
+                corridas.append(medir(app, motor, args.sagas, args.concurrencia, args.calentamiento))
+            clave = f"{motor}/{escenario}"
+            r = resultados[clave] = _mediana(corridas)
+            print(f"{clave:<24} {r['sagas_por_seg']:>10.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                  f"{r['p99_ms']:>8.1f} {r['tasa_compensacion']:>9.1%} {r['cpu_ms_por_saga']:>12.3f}  {r['codigos']}")
+
+    for servicio in servicios.values():
+        servicio.detener()
+
+    salida = {
+        "commit": _commit_actual(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": {
+            "sagas": args.sagas,
+            "concurrencia": args.concurrencia,
+            "calentamiento": args.calentamiento,
+            "repeticiones": args.repeticiones,
+            "con_registro": args.con_registro,
+            "tracing": args.tracing,
+            "latencias": latencias_fijas,
+        },
+        "resultados": resultados,
+    }
+
+    codigo_salida = 0
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            baseline = json.load(archivo)
+        if baseline.get("parametros") != salida["parametros"]:
+            print(f"Aviso: el baseline se tomó con otros parámetros: {baseline.get('parametros')}")
+        regresiones = comparar(resultados, baseline, args.tolerancia)
+        print(f"\nComparado contra {args.comparar} (commit {baseline.get('commit')}, tolerancia {args.tolerancia:.0%})")
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}")
+        if not regresiones:
+            print("Sin regresiones")
+        codigo_salida = 1 if regresiones else 0
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(salida, archivo, indent=2, ensure_ascii=False)
+        print(f"Baseline guardado en {args.guardar}")
+
+    sys.exit(codigo_salida)
+
+
+if __name__ == "__main__":
+    main()
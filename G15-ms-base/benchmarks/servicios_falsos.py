@@ -0,0 +1,248 @@
+"""
+Versiones en proceso de ms-pagos, ms-compras y ms-inventario para los benchmarks.
+
+Cada servicio es una app WSGI mínima servida por werkzeug en un puerto local, así
+la saga recorre el mismo camino que en producción (HttpClient, pool, reintentos,
+breakers) sin levantar los contenedores. La latencia de cada respuesta sale de una
+distribución configurable y los POST que crean recursos fallan con la probabilidad
+indicada; las consultas y compensaciones siempre responden bien.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class _HandlerSilencioso(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Latencia:
+    """
+    Distribución de latencia en ms, escrita como "tipo:parámetros":
+    "fija:20", "uniforme:10:30", "exponencial:20" (media) o "lognormal:20:0.5"
+    (mediana y sigma; con sigma alto aparece la cola larga).
+    """
+
+    TIPOS = ("fija", "uniforme", "exponencial", "lognormal")
+
+    def __init__(self, tipo="fija", *parametros):
+        if tipo not in self.TIPOS:
+            raise ValueError(f"Distribución desconocida: {tipo} (se acepta {', '.join(self.TIPOS)})")
+        self.tipo = tipo
+        self.parametros = [float(p) for p in parametros] or [0.0]
+
+    @classmethod
+    def desde_texto(cls, texto):
+        tipo, *parametros = str(texto).split(":")
+        return cls(tipo, *parametros)
+
+    def muestra(self, rng):
+        """Latencia en segundos."""
+        p = self.parametros
+        if self.tipo == "fija":
+            ms = p[0]
+        elif self.tipo == "uniforme":
+            ms = rng.uniform(p[0], p[1] if len(p) > 1 else p[0])
+        elif self.tipo == "exponencial":
+            ms = rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        else:
+            ms = p[0] * rng.lognormvariate(0, p[1] if len(p) > 1 else 0.5)
+        return max(ms, 0.0) / 1000
+
+    def __str__(self):
+        return ":".join([self.tipo] + [f"{p:g}" for p in self.parametros])
+
+
+class ServicioFalso:
+    """Base de los servicios falsos: latencia, fallas y respuestas con el formato de ResponseBuilder."""
+
+    def __init__(self, nombre, latencia=None, prob_falla=0.0, semilla=None):
+        self.nombre = nombre
+        self.latencia = latencia or Latencia()
+        self.prob_falla = prob_falla
+        self._rng = random.Random(semilla)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.pedidos = 0
+        self.fallas = 0
+        self.compensaciones = 0
+        self._servidor = None
+        self.url_base = None
+
+    def configurar(self, latencia=None, prob_falla=None):
+        if latencia is not None:
+            self.latencia = latencia
+        if prob_falla is not None:
+            self.prob_falla = prob_falla
+        with self._lock:
+            self.pedidos = self.fallas = self.compensaciones = 0
+
+    def _sortear(self):
+        with self._lock:
+            self.pedidos += 1
+            espera = self.latencia.muestra(self._rng)
+            falla = self._rng.random() < self.prob_falla
+        return espera, falla
+
+    def _nuevo_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def _contar_compensacion(self):
+        with self._lock:
+            self.compensaciones += 1
+
+    def _crear(self, espera, falla):
+        time.sleep(espera)
+        if falla:
+            with self._lock:
+                self.fallas += 1
+            return 500, {"message": f"Falla simulada de {self.nombre}", "status_code": 500, "data": {}}
+        return 201, {"message": "Creado", "status_code": 201, "data": {"id": self._nuevo_id()}}
+
+    def rutear(self, metodo, partes, pedido=None):
+        """
+        Devuelve (código, cuerpo o None). partes es la ruta después del prefijo del
+        servicio y pedido el JSON recibido, si hubo.
+        """
+        raise NotImplementedError
+
+    def __call__(self, environ, start_response):
+        metodo = environ["REQUEST_METHOD"]
+        largo = int(environ.get("CONTENT_LENGTH") or 0)
+        pedido = json.loads(environ["wsgi.input"].read(largo)) if largo else None
+        partes = [p for p in environ.get("PATH_INFO", "").split("/") if p][2:]  # sin api/v1
+        codigo, cuerpo = self.rutear(metodo, partes, pedido)
+        datos = b"" if cuerpo is None else json.dumps(cuerpo).encode()
+        encabezados = [("Content-Length", str(len(datos)))]
+        if cuerpo is not None:
+            encabezados.append(("Content-Type", "application/json"))
+        start_response(f"{codigo} X", encabezados)
+        return [datos]
+
+    def iniciar(self):
+        self._servidor = make_server("127.0.0.1", 0, self, threaded=True, request_handler=_HandlerSilencioso)
+        threading.Thread(target=self._servidor.serve_forever, name=f"falso-{self.nombre}", daemon=True).start()
+        self.url_base = f"http://127.0.0.1:{self._servidor.server_port}/api/v1"
+        return self
+
+    def detener(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor = None
+
+
+class PagosFalso(ServicioFalso):
+    """POST /pagos/transaccion y POST /pagos/<id>/compensacion."""
+
+    def __init__(self, **kwargs):
+        super().__init__("pagos", **kwargs)
+
+    def rutear(self, metodo, partes, pedido=None):
+        espera, falla = self._sortear()
+        if metodo == "POST" and partes == ["pagos", "transaccion"]:
+            return self._crear(espera, falla)
+        if metodo == "POST" and len(partes) == 3 and partes[2] == "compensacion":
+            time.sleep(espera)
+            self._contar_compensacion()
+            return 204, None
+        return 404, {"message": "No encontrado", "status_code": 404, "data": {}}
+
+
+class ComprasFalso(ServicioFalso):
+    """POST /compras y DELETE /compras/<id>."""
+
+    def __init__(self, **kwargs):
+        super().__init__("compras", **kwargs)
+
+    def rutear(self, metodo, partes, pedido=None):
+        espera, falla = self._sortear()
+        if metodo == "POST" and partes == ["compras"]:
+            return self._crear(espera, falla)
+        if metodo == "DELETE" and len(partes) == 2 and partes[0] == "compras":
+            time.sleep(espera)
+            self._contar_compensacion()
+            return 204, None
+        return 404, {"message": "No encontrado", "status_code": 404, "data": {}}
+
+
+class StockFalso(ServicioFalso):
+    """
+    POST /stock, DELETE /stock/<id>, GET /stock/producto/<id> (siempre con stock_disponible),
+    POST /stock/reservas y POST /stock/reservas/<id>/confirmacion (cuenta en confirmaciones).
+
+    Con bloqueo_por_producto, el POST toma un lock del producto_id mientras dura
+    y si ya está tomado responde 500 "El recurso está bloqueado" enseguida; se
+    cuentan en conflictos. Es el peor caso del choque en inventario, donde el
+    compare-and-swap sobre la versión del saldo reintenta antes de responder 409.
+    """
+
+    def __init__(self, stock_disponible=1_000_000, bloqueo_por_producto=False, **kwargs):
+        super().__init__("stock", **kwargs)
+        self.stock_disponible = stock_disponible
+        self.bloqueo_por_producto = bloqueo_por_producto
+        self.conflictos = 0
+        self.confirmaciones = 0
+        self._bloqueos = {}
+
+    def configurar(self, latencia=None, prob_falla=None):
+        super().configurar(latencia, prob_falla)
+        with self._lock:
+            self.conflictos = self.confirmaciones = 0
+
+    def _crear_bloqueando(self, espera, falla, producto_id):
+        with self._lock:
+            bloqueo = self._bloqueos.setdefault(producto_id, threading.Lock())
+        if not bloqueo.acquire(blocking=False):
+            with self._lock:
+                self.conflictos += 1
+            mensaje = f"El recurso está bloqueado para el stock {producto_id}."
+            return 500, {"message": mensaje, "status_code": 500, "data": {}}
+        try:
+            return self._crear(espera, falla)
+        finally:
+            bloqueo.release()
+
+    def rutear(self, metodo, partes, pedido=None):
+        espera, falla = self._sortear()
+        if metodo == "GET" and len(partes) == 3 and partes[:2] == ["stock", "producto"]:
+            time.sleep(espera)
+            datos = {"producto_id": int(partes[2]), "cantidad": self.stock_disponible}
+            return 200, {"message": "OK", "status_code": 200, "data": datos}
+        if metodo == "POST" and partes in (["stock"], ["stock", "reservas"]):
+            if self.bloqueo_por_producto and isinstance(pedido, dict):
+                return self._crear_bloqueando(espera, falla, pedido.get("producto_id"))
+            return self._crear(espera, falla)
+        if metodo == "POST" and len(partes) == 4 and partes[:2] == ["stock", "reservas"] \
+                and partes[3] == "confirmacion":
+            time.sleep(espera)
+            with self._lock:
+                self.confirmaciones += 1
+            datos = {"id": int(partes[2]), "estado": "confirmada"}
+            return 200, {"message": "Reservation confirmed", "status_code": 200, "data": datos}
+        if metodo == "DELETE" and len(partes) == 2 and partes[0] == "stock":
+            time.sleep(espera)
+            self._contar_compensacion()
+            return 204, None
+        return 404, {"message": "No encontrado", "status_code": 404, "data": {}}
+
+
+def levantar_servicios(semilla=None):
+    """Arranca los tres servicios y devuelve {nombre: servicio} y las URLs para la config del orquestador."""
+    servicios = {
+        "pago": PagosFalso(semilla=semilla).iniciar(),
+        "compra": ComprasFalso(semilla=None if semilla is None else semilla + 1).iniciar(),
+        "stock": StockFalso(semilla=None if semilla is None else semilla + 2).iniciar(),
+    }
+    urls = {
+        "PAGOS_URL": f"{servicios['pago'].url_base}/pagos",
+        # CompraService le agrega la "s" final, igual que con ms-compras
+        "COMPRAS_URL": f"{servicios['compra'].url_base}/compra",
+        "STOCK_URL": f"{servicios['stock'].url_base}/stock",
+    }
+    return servicios, urls
@@ -1,5 +1,25 @@
-from app import create_app
+from app import create_app, db
+from app.services.saga.compensadores import (
+    compensadores_por_defecto,
+    confirmadores_por_defecto,
+    reejecutores_lote_por_defecto,
+    reejecutores_por_defecto,
+)
+from app.services.saga.registro import recuperar_sagas
 
 if __name__ == "__main__":
     app = create_app()
+    with app.app_context():
+        db.create_all()
+        registro = app.extensions.get('registro_saga')
+        cola = app.extensions.get('cola_compensacion')
+        if registro is not None:
+            recuperar_sagas(registro, compensadores_por_defecto(), cola=cola, reejecutores=reejecutores_por_defecto(),
+                            confirmadores=confirmadores_por_defecto(),
+                            reejecutores_lote=reejecutores_lote_por_defecto())
+        if cola is not None:
+            cola.iniciar_workers()
+        coreografia = app.extensions.get('coreografia_sagas')
+        if coreografia is not None:
+            coreografia.iniciar_workers()
     app.run(host="0.0.0.0", port=5005, debug=False)
@@ -0,0 +1,95 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+from app import create_app
+from app.services.saga.admision import ControlAdmision, SagaRechazada, configurar_admision, control_admision
+from app.utils import circuit_breaker
+
+URLS = {
+    "PAGOS_URL": "http://127.0.0.1:9/api/v1/pagos",
+    "COMPRAS_URL": "http://127.0.0.1:9/api/v1/compra",
+    "STOCK_URL": "http://127.0.0.1:9/api/v1/stock",
+}
+COMPRA = {"pago": {"monto": 10}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1, "cantidad": 2}}
+
+
+class Respuesta:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class ControlAdmisionTestCase(unittest.TestCase):
+    def test_limite_por_servicio(self):
+        control = ControlAdmision(max_concurrentes=10, max_en_cola=10, limites={"pagos": 1})
+        permiso = control.admitir(["pago", "compra"])
+
+        # Stock tiene lugar aunque pagos esté lleno
+        with control.admitir(["stock"]):
+            self.assertEqual(control.snapshot()["en_curso_por_servicio"], {"pagos": 1, "compras": 1, "stock": 1})
+        with self.assertRaises(SagaRechazada) as rechazo:
+            control.admitir(["pago"], deadline=time.monotonic() + 0.05)
+        self.assertEqual(rechazo.exception.motivo, "vencida")
+        self.assertGreaterEqual(rechazo.exception.reintentar_en, 1)
+
+        permiso.liberar()
+        with control.admitir(["pago"]):
+            self.assertEqual(control.snapshot()["en_curso_por_servicio"]["pagos"], 1)
+
+    def test_cola_llena_rechaza_enseguida(self):
+        control = ControlAdmision(max_concurrentes=1, max_en_cola=0)
+        with control.admitir(["pago"]):
+            inicio = time.monotonic()
+            with self.assertRaises(SagaRechazada) as rechazo:
+                control.admitir(["compra"])
+            self.assertLess(time.monotonic() - inicio, 0.5)
+        self.assertEqual(rechazo.exception.motivo, "cola_llena")
+        self.assertEqual(control.snapshot()["rechazadas"]["cola_llena"], 1)
+
+    def test_deshabilitado_no_limita(self):
+        control = ControlAdmision(max_concurrentes=0, habilitado=False)
+        with control.admitir(["pago"]):
+            self.assertEqual(control.snapshot()["en_curso"], 0)
+
+
+class AdmisionRutaTestCase(unittest.TestCase):
+    """La saga rechazada por admisión o por un servicio caído responde con Retry-After, sin llamar a nadie."""
+
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'testing'
+        with mock.patch.dict(os.environ, URLS):
+            self.app = create_app()
+        self.cliente = self.app.test_client()
+
+    def tearDown(self):
+        configurar_admision(self.app.config)
+        circuit_breaker.configurar_breakers(self.app.config)
+
+    def test_429_con_retry_after_si_el_servicio_no_tiene_lugar(self):
+        control_admision.limites = {"pagos": 1}
+        control_admision.max_en_cola = 0
+        permiso = control_admision.admitir(["pago"])
+        try:
+            respuesta = self.cliente.post('/api/v1/saga/compra?wait=5', json=COMPRA)
+        finally:
+            permiso.liberar()
+
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta.headers["Retry-After"], "1")
+        self.assertEqual(respuesta.get_json()["resultado"]["data"]["motivo"], "cola_llena")
+
+    def test_503_con_retry_after_si_hay_un_breaker_abierto(self):
+        pagos = circuit_breaker.breaker("pagos")
+        for _ in range(pagos.breaker.fail_max):
+            pagos.llamar(lambda: Respuesta(500))
+
+        respuesta = self.cliente.post('/api/v1/saga/compra?wait=5', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn("Retry-After", respuesta.headers)
+        self.assertEqual(respuesta.get_json()["resultado"]["data"]["servicios"], ["pagos"])
+
+
+if __name__ == '__main__':
+    unittest.main()
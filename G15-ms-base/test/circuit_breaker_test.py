@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+import unittest
+
+import pybreaker
+
+from app.utils.circuit_breaker import BreakerServicio
+from app.utils.response_validator import ServicioNoDisponible
+
+
+class Respuesta:
+    """Lo que usa el breaker de una respuesta de requests/httpx."""
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class BreakerServicioTestCase(unittest.TestCase):
+    def _abrir(self, breaker):
+        for _ in range(breaker.breaker.fail_max):
+            # El 5xx cuenta como fallo, pero al que llamó se le devuelve la respuesta
+            self.assertEqual(breaker.llamar(lambda: Respuesta(500)).status_code, 500)
+        self.assertEqual(breaker.estado, pybreaker.STATE_OPEN)
+
+    def test_abierto_rechaza_sin_llamar_al_servicio(self):
+        breaker = BreakerServicio("pagos", fallos_max=2, reset_segundos=60)
+        self._abrir(breaker)
+        llamados = []
+
+        with self.assertRaises(ServicioNoDisponible):
+            breaker.llamar(lambda: llamados.append(1) or Respuesta(200))
+        self.assertEqual(llamados, [])
+        self.assertTrue(breaker.rechaza())
+        self.assertEqual(breaker.snapshot()["rechazados"], 1)
+        self.assertEqual(breaker.snapshot()["aperturas"], 1)
+
+    def test_errores_de_conexion_tambien_abren(self):
+        breaker = BreakerServicio("compras", fallos_max=2, reset_segundos=60)
+
+        def caido():
+            raise ConnectionError("sin conexión")
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                breaker.llamar(caido)
+        self.assertEqual(breaker.estado, pybreaker.STATE_OPEN)
+
+    def test_pasado_el_timeout_deja_pasar_un_solo_sondeo(self):
+        breaker = BreakerServicio("stock", fallos_max=1, reset_segundos=0.05)
+        self._abrir(breaker)
+        time.sleep(0.06)
+        self.assertFalse(breaker.rechaza())
+
+        en_vuelo = threading.Event()
+        seguir = threading.Event()
+        resultado = {}
+
+        def sondeo():
+            en_vuelo.set()
+            seguir.wait(2)
+            return Respuesta(200)
+
+        hilo = threading.Thread(target=lambda: resultado.setdefault("respuesta", breaker.llamar(sondeo)))
+        hilo.start()
+        self.assertTrue(en_vuelo.wait(2))
+        # Mientras el sondeo está en vuelo, el resto se rechaza
+        self.assertTrue(breaker.rechaza())
+        with self.assertRaises(ServicioNoDisponible):
+            breaker.llamar(lambda: Respuesta(200))
+        seguir.set()
+        hilo.join(2)
+
+        self.assertEqual(resultado["respuesta"].status_code, 200)
+        self.assertEqual(breaker.estado, pybreaker.STATE_CLOSED)
+        self.assertFalse(breaker.rechaza())
+
+    def test_sondeo_que_falla_vuelve_a_abrir(self):
+        breaker = BreakerServicio("stock", fallos_max=1, reset_segundos=0.05)
+        self._abrir(breaker)
+        time.sleep(0.06)
+
+        self.assertEqual(breaker.llamar(lambda: Respuesta(503)).status_code, 503)
+        self.assertEqual(breaker.estado, pybreaker.STATE_OPEN)
+        self.assertEqual(breaker.aperturas, 2)
+        self.assertTrue(breaker.rechaza())
+
+    def test_los_pedidos_no_esperan_el_lock_de_pybreaker(self):
+        breaker = BreakerServicio("pagos", fallos_max=5, reset_segundos=60)
+        # Si el pedido se hiciera adentro de breaker.call, el segundo esperaría al primero y la barrera vencería
+        barrera = threading.Barrier(2, timeout=2)
+        respuestas = []
+
+        def pedido():
+            barrera.wait()
+            return Respuesta(200)
+
+        hilos = [threading.Thread(target=lambda: respuestas.append(breaker.llamar(pedido))) for _ in range(2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join(3)
+        self.assertEqual([r.status_code for r in respuestas], [200, 200])
+
+    def test_async(self):
+        breaker = BreakerServicio("pagos", fallos_max=1, reset_segundos=60)
+
+        async def falla():
+            return Respuesta(502)
+
+        async def ok():
+            return Respuesta(200)
+
+        self.assertEqual(asyncio.run(breaker.llamar_async(falla)).status_code, 502)
+        with self.assertRaises(ServicioNoDisponible):
+            asyncio.run(breaker.llamar_async(ok))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from app import create_app, db
+from app.services.saga.acciones import SagaAction
+from app.services.saga.lote import PasoLote, SagaLoteOrchestrator
+from app.services.saga.orquestador import SagaOrchestrator
+from app.services.saga.orquestador_async import AsyncSagaOrchestrator
+from app.services.saga.registro import EventoSaga, eventos_de, sagas_sin_terminar
+from app.utils.response_validator import ConflictError, ServerError
+
+DATOS = {"pago": {"monto": 10}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1, "cantidad": 2}}
+
+
+class ConfirmacionTestCase(unittest.TestCase):
+    """La reserva de stock no se compensa: se confirma al final, y si se rechaza se compensa el resto."""
+
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'testing'
+        with mock.patch.dict(os.environ, {"PAGOS_URL": "", "COMPRAS_URL": "", "STOCK_URL": ""}):
+            self.app = create_app()
+        # Compensación en línea: sin cola los orquestadores no la difieren
+        self.app.extensions.pop('cola_compensacion', None)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.registro = self.app.extensions['registro_saga']
+        self.compensados = []
+        self.confirmados = []
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _acciones(self, confirmar):
+        def crear(id_recurso):
+            return lambda _datos: ("url", {"data": {"id": id_recurso}})
+
+        def compensar(paso):
+            return lambda id_recurso: self.compensados.append((paso, id_recurso))
+
+        return [
+            SagaAction(crear(1), compensar("pago"), "pago"),
+            SagaAction(crear(2), compensar("compra"), "compra"),
+            SagaAction(crear(3), None, "stock", confirm_fn=confirmar),
+        ]
+
+    def _eventos(self, saga_id):
+        return [(e.evento, e.paso) for e in eventos_de(saga_id)]
+
+    def test_confirma_y_cierra(self):
+        orquestador = SagaOrchestrator(self._acciones(self.confirmados.append), DATOS, registro=self.registro)
+        respuesta = orquestador.ejecutar()
+
+        self.assertEqual(respuesta["codigo_estado"], 201)
+        self.assertEqual(self.confirmados, [3])
+        eventos = self._eventos(orquestador.saga_id)
+        self.assertIn((EventoSaga.PASO_CONFIRMADO, "stock"), eventos)
+        self.assertEqual(eventos[-1], (EventoSaga.COMPLETADA, None))
+        inicio = eventos_de(orquestador.saga_id)[0].datos
+        self.assertEqual(inicio["confirmar"], ["stock"])
+        self.assertEqual(inicio["sin_compensacion"], ["stock"])
+
+    def test_confirmacion_rechazada_compensa_sin_tocar_la_reserva(self):
+        def vencida(_id):
+            raise ConflictError("Reserva vencida")
+
+        orquestador = SagaOrchestrator(self._acciones(vencida), DATOS, registro=self.registro)
+        respuesta = orquestador.ejecutar()
+
+        self.assertEqual(respuesta["codigo_estado"], 500)
+        self.assertEqual(self.compensados, [("compra", 2), ("pago", 1)])
+        eventos = self._eventos(orquestador.saga_id)
+        self.assertIn((EventoSaga.PASO_FALLIDO, "stock"), eventos)
+        self.assertEqual(eventos[-1], (EventoSaga.COMPENSADA, None))
+
+    def test_confirmacion_sin_resultado_deja_la_saga_abierta(self):
+        def caida(_id):
+            raise ServerError("503")
+
+        orquestador = SagaOrchestrator(self._acciones(caida), DATOS, registro=self.registro)
+        respuesta = orquestador.ejecutar()
+
+        self.assertEqual(respuesta["mensaje"], "Confirmación de la saga sin resultado")
+        self.assertEqual(self.compensados, [])
+        self.assertIn(orquestador.saga_id, sagas_sin_terminar())
+
+    def test_async_con_acciones_sincronas(self):
+        def vencida(_id):
+            raise ConflictError("Reserva vencida")
+
+        orquestador = AsyncSagaOrchestrator(self._acciones(vencida), DATOS, registro=self.registro)
+        respuesta = asyncio.run(orquestador.ejecutar())
+
+        self.assertEqual(respuesta["codigo_estado"], 500)
+        self.assertEqual(self.compensados, [("compra", 2), ("pago", 1)])
+        self.assertEqual(eventos_de(orquestador.saga_id)[0].datos["sin_compensacion"], ["stock"])
+
+    def test_lote_confirma_en_una_llamada(self):
+        def crear(payloads):
+            return "url", [{"status_code": 201, "data": {"id": i + 1}} for i in range(len(payloads))]
+
+        def confirmar_bulk(ids):
+            self.confirmados.append(ids)
+            return "url", [{"status_code": 200}, {"status_code": 409, "message": "Reserva vencida"}]
+
+        pasos = [
+            PasoLote("pago", crear, lambda id_recurso: self.compensados.append(("pago", id_recurso))),
+            PasoLote("stock", crear, None, confirmar_bulk=confirmar_bulk),
+        ]
+        orquestador = SagaLoteOrchestrator([DATOS, DATOS], pasos=pasos, registro=self.registro)
+        respuestas = orquestador.ejecutar()
+
+        self.assertEqual(self.confirmados, [[1, 2]])
+        self.assertEqual([r["codigo_estado"] for r in respuestas], [201, 500])
+        self.assertEqual(self.compensados, [("pago", 2)])
+        self.assertEqual(self._eventos(orquestador.saga_ids[0])[-1], (EventoSaga.COMPLETADA, None))
+        self.assertEqual(self._eventos(orquestador.saga_ids[1])[-1], (EventoSaga.COMPENSADA, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import redis
+from flask import Flask
+
+from app.services.saga.coreografia import ESTADO, GRUPO, STREAM, _STREAMS, CoreografiaSagas, EventoCoreografia
+from app.utils.json_rapido import dumps, loads
+
+DATOS = {"pago": {"monto": 10}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1, "cantidad": 2}}
+
+
+class CoreografiaReplicasTestCase(unittest.TestCase):
+    """Dos instancias del orquestador reciben el mismo evento final; solo la que empezó la saga la termina."""
+
+    def setUp(self):
+        self.cliente = redis.StrictRedis(decode_responses=True)
+        self.duena = self._replica("duena")
+        self.otra = self._replica("otra")
+        self.estado = self.duena.enviar(None, DATOS)
+
+    def tearDown(self):
+        self.cliente.delete(STREAM, *_STREAMS, ESTADO.format(self.estado.saga_id))
+
+    def _replica(self, nombre):
+        app = Flask(__name__)
+        app.config['SAGA_RESULTADO_TTL_S'] = 60
+        replica = CoreografiaSagas(app, cliente=self.cliente)
+        replica.grupo = GRUPO.format(nombre)
+        replica._crear_grupos()
+        return replica
+
+    def _evento_final(self):
+        return {"evento": EventoCoreografia.STOCK_RESERVADO, "saga_id": self.estado.saga_id,
+                "datos": dumps({"pago_id": 1, "compra_id": 2, "stock_id": 3})}
+
+    def _procesar(self, replica):
+        mensajes = replica._leer("c0", reclamar=False)
+        for stream, (id_mensaje, campos) in mensajes:
+            replica._procesar(campos)
+            replica.cliente.xack(stream, replica.grupo, id_mensaje)
+        return len(mensajes)
+
+    def test_cada_replica_recibe_el_evento_y_solo_la_duena_termina(self):
+        self.cliente.xadd("saga:inventario", self._evento_final())
+        self.assertEqual(self._procesar(self.otra), 1)
+        self.assertEqual(self._procesar(self.duena), 1)
+
+        self.assertEqual(self.duena.snapshot()["completadas"], 1)
+        self.assertEqual(self.duena.en_curso, 0)
+        self.assertEqual(self.otra.snapshot()["completadas"], 0)
+        self.assertEqual(self.otra.en_curso, 0)
+        self.assertEqual(self.estado.resultado["status_code"], 201)
+        # El resultado guardado es el completo de la dueña, aunque la otra haya escrito antes
+        guardado = loads(self.cliente.get(ESTADO.format(self.estado.saga_id)))
+        self.assertIn("recibida", guardado)
+
+    def test_evento_repetido_no_termina_la_saga_dos_veces(self):
+        self.duena._procesar(self._evento_final())
+        self.duena._procesar(self._evento_final())
+        self.otra._procesar(self._evento_final())
+
+        self.assertEqual(self.duena.snapshot()["completadas"], 1)
+        self.assertEqual(self.duena.en_curso, 0)
+        self.assertIn("recibida", loads(self.cliente.get(ESTADO.format(self.estado.saga_id))))
+
+    def test_sin_la_duena_queda_el_resultado_de_la_otra(self):
+        self.otra._procesar(self._evento_final())
+        guardado = loads(self.cliente.get(ESTADO.format(self.estado.saga_id)))
+        self.assertEqual(guardado["estado"], "completada")
+
+        # La dueña, si sigue viva y el evento no le llegó, lo toma de Redis y libera el cupo
+        self.assertEqual(self.duena.estado(self.estado.saga_id).resultado["status_code"], 201)
+        self.assertEqual(self.duena.en_curso, 0)
+        self.assertEqual(self.duena.snapshot()["completadas"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import unittest
+from unittest import mock
+
+from app import create_app
+from app.services.saga.definiciones import DEFINICIONES, ErrorDefinicionSaga, compilar, error_plan, plan_saga
+
+URLS = {
+    "PAGOS_URL": "http://127.0.0.1:9/api/v1/pagos",
+    "COMPRAS_URL": "http://127.0.0.1:9/api/v1/compra",
+    "STOCK_URL": "http://127.0.0.1:9/api/v1/stock",
+}
+
+
+class DefinicionesTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'testing'
+
+    def _app(self, urls):
+        sin_urls = {clave: "" for clave in URLS}
+        with mock.patch.dict(os.environ, dict(sin_urls, **urls)):
+            return create_app()
+
+    def test_sin_urls_la_app_arranca_y_la_saga_responde_503(self):
+        app = self._app({})
+        with app.app_context():
+            self.assertIsNone(plan_saga("compra"))
+            self.assertIn("PAGOS_URL", error_plan("compra"))
+
+        respuesta = app.test_client().post('/api/v1/saga/compra', json={"pago": {}, "compra": {}, "stock": {}})
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertIn("PAGOS_URL", respuesta.get_json()["error"])
+        self.assertEqual(app.test_client().get('/ping').status_code, 200)
+
+    def test_con_urls_compila_el_plan(self):
+        app = self._app(URLS)
+        with app.app_context():
+            plan = plan_saga("compra")
+            self.assertIsNone(error_plan("compra"))
+        self.assertEqual([paso.nombre for paso in plan.pasos], ["pago", "compra", "stock"])
+        self.assertEqual(plan.requeridos, ("pago", "compra", "stock"))
+        stock = plan.paso("stock")
+        self.assertIsNone(stock.compensacion)
+        self.assertEqual(stock.confirmacion.url, URLS["STOCK_URL"] + "/reservas/{id}/confirmacion")
+
+    def test_definicion_invalida(self):
+        definicion = {"pasos": [dict(DEFINICIONES["compra"]["pasos"][0], compensar={"metodo": "POST",
+                                                                                   "ruta": "/compensacion",
+                                                                                   "codigo": 204})]}
+        with self.assertRaises(ErrorDefinicionSaga):
+            compilar("compra", definicion, URLS)
+
+
+if __name__ == '__main__':
+    unittest.main()
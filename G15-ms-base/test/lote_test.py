@@ -0,0 +1,123 @@
+import os
+import unittest
+from unittest import mock
+
+from app import create_app, db
+from app.services.saga.lote import PasoLote, SagaLoteOrchestrator
+from app.services.saga.registro import EventoSaga, eventos_de, recuperar_sagas
+from app.utils.idempotencia import clave_actual
+
+URLS = {
+    "PAGOS_URL": "http://127.0.0.1:9/api/v1/pagos",
+    "COMPRAS_URL": "http://127.0.0.1:9/api/v1/compra",
+    "STOCK_URL": "http://127.0.0.1:9/api/v1/stock",
+}
+COMPRA = {"pago": {"monto": 10}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1, "cantidad": 2}}
+
+
+class LoteTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'testing'
+        with mock.patch.dict(os.environ, URLS):
+            self.app = create_app()
+        self.app.extensions.pop('cola_compensacion', None)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.registro = self.app.extensions['registro_saga']
+        self.llamadas = []
+        self.compensados = []
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _bulk(self, *tandas):
+        """ejecutar_bulk que responde cada llamada con la tanda que sigue; una excepción se lanza."""
+        tandas = list(tandas)
+
+        def ejecutar_bulk(payloads):
+            self.llamadas.append((clave_actual(), payloads))
+            tanda = tandas.pop(0)
+            if isinstance(tanda, Exception):
+                raise tanda
+            return "url", tanda
+        return ejecutar_bulk
+
+    def _compensar(self, paso):
+        return lambda id_recurso: self.compensados.append((paso, str(id_recurso)))
+
+    def _eventos(self, saga_id):
+        return [(e.evento, e.paso) for e in eventos_de(saga_id)]
+
+    def test_recuperacion_repite_la_llamada_del_lote(self):
+        # Se cayó después de mandar el pago de dos sagas en una llamada bulk
+        lote_id = "lote-1"
+        eventos = []
+        for indice, saga_id in enumerate(("saga-a", "saga-b")):
+            datos = dict(COMPRA, pago={"monto": indice + 1})
+            eventos += [
+                (saga_id, EventoSaga.INICIADA, None, None,
+                 {"pasos": ["pago", "stock"], "datos": datos, "confirmar": [], "sin_compensacion": []}),
+                (saga_id, EventoSaga.PASO_INICIADO, "pago", None, {"lote_id": lote_id, "indice": indice}),
+            ]
+        self.registro.registrar_varios(eventos)
+
+        ejecutar_bulk = self._bulk([{"status_code": 201, "data": {"id": 11}},
+                                    {"status_code": 402, "message": "Pago rechazado"}])
+        recuperar_sagas(self.registro, {"pago": self._compensar("pago")},
+                        reejecutores_lote={"pago": ejecutar_bulk})
+
+        # Una sola llamada para las dos sagas, con la clave y el cuerpo del lote
+        self.assertEqual(self.llamadas, [(f"{lote_id}:pago", [{"monto": 1}, {"monto": 2}])])
+        self.assertEqual(self.compensados, [("pago", "11")])
+        self.assertIn((EventoSaga.PASO_COMPLETADO, "pago"), self._eventos("saga-a"))
+        self.assertIn((EventoSaga.PASO_FALLIDO, "pago"), self._eventos("saga-b"))
+        for saga_id in ("saga-a", "saga-b"):
+            self.assertEqual(self._eventos(saga_id)[-1], (EventoSaga.COMPENSADA, None))
+
+    def test_sin_reejecutor_de_lote_la_saga_queda_abierta(self):
+        self.registro.registrar_varios([
+            ("saga-c", EventoSaga.INICIADA, None, None, {"pasos": ["pago"], "datos": COMPRA}),
+            ("saga-c", EventoSaga.PASO_INICIADO, "pago", None, {"lote_id": "lote-2", "indice": 0}),
+        ])
+        recuperar_sagas(self.registro, {"pago": self._compensar("pago")})
+        self.assertNotIn((EventoSaga.COMPENSADA, None), self._eventos("saga-c"))
+
+    def test_llamada_bulk_sin_respuesta_se_resuelve_antes_de_compensar(self):
+        pasos = [
+            PasoLote("pago", self._bulk([{"status_code": 201, "data": {"id": 1}}]), self._compensar("pago")),
+            # La llamada falla sin respuesta, pero el servicio la había procesado: la repetición devuelve el ID
+            PasoLote("compra", self._bulk(TimeoutError("timeout"), [{"status_code": 201, "data": {"id": 5}}]),
+                     self._compensar("compra")),
+        ]
+        orquestador = SagaLoteOrchestrator([COMPRA], pasos=pasos, registro=self.registro)
+        respuestas = orquestador.ejecutar()
+
+        self.assertEqual(respuestas[0]["codigo_estado"], 500)
+        self.assertEqual(self.llamadas[1][0], self.llamadas[2][0])
+        self.assertEqual(self.compensados, [("compra", "5"), ("pago", "1")])
+        self.assertEqual(self._eventos(orquestador.saga_ids[0])[-1], (EventoSaga.COMPENSADA, None))
+
+    def test_endpoint_del_lote(self):
+        cliente = self.app.test_client()
+        self.assertEqual(cliente.post('/api/v1/saga/compra/lote', json=COMPRA).status_code, 422)
+        respuesta = cliente.post('/api/v1/saga/compra/lote', json=[COMPRA, {"pago": {}}])
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertEqual(respuesta.get_json()["invalidas"], [{"indice": 1, "faltan": ["compra", "stock"]}])
+        self.app.config['SAGA_LOTE_MAX'] = 1
+        self.assertEqual(cliente.post('/api/v1/saga/compra/lote', json=[COMPRA, COMPRA]).status_code, 413)
+        self.app.config['SAGA_LOTE_MAX'] = 100
+
+        pasos = [PasoLote("pago", self._bulk([{"status_code": 201, "data": {"id": 1}},
+                                              {"status_code": 402, "message": "Pago rechazado"}]),
+                          self._compensar("pago"))]
+        with mock.patch('app.services.saga.lote.pasos_compra_lote', return_value=pasos):
+            respuesta = cliente.post('/api/v1/saga/compra/lote', json=[COMPRA, COMPRA])
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([s["codigo_estado"] for s in respuesta.get_json()["sagas"]], [201, 500])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+import unittest
+from unittest import mock
+
+from app import create_app, db
+from app.models import SagaLogEntry
+from app.services.saga.acciones import SagaAction
+from app.services.saga.orquestador import SagaOrchestrator
+from app.services.saga.registro import (ErrorRegistroSaga, EventoSaga, _pasos_a_compensar, _resolver_pasos,
+                                        compensar_desde_log, eventos_de, recuperar_sagas, sagas_sin_terminar)
+from app.utils.idempotencia import clave_actual
+from app.utils.response_validator import ConflictError
+
+DATOS = {"pago": {"monto": 10}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1, "cantidad": 2}}
+PASOS = ["pago", "compra", "stock"]
+
+
+class RegistroTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'testing'
+        with mock.patch.dict(os.environ, {"PAGOS_URL": "", "COMPRAS_URL": "", "STOCK_URL": ""}):
+            self.app = create_app()
+        self.app.extensions.pop('cola_compensacion', None)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.registro = self.app.extensions['registro_saga']
+        self.compensados = []
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _log(self, saga_id, *eventos, sin_compensacion=(), confirmar=()):
+        """INICIADA de la saga y después los eventos (evento, paso, id_recurso)."""
+        inicio = {"pasos": PASOS, "datos": DATOS, "confirmar": list(confirmar),
+                  "sin_compensacion": list(sin_compensacion)}
+        self.registro.registrar_varios([(saga_id, EventoSaga.INICIADA, None, None, inicio)] +
+                                       [(saga_id, evento, paso, id_recurso, None)
+                                        for evento, paso, id_recurso in eventos])
+
+    def _compensadores(self):
+        return {paso: (lambda id_recurso, paso=paso: self.compensados.append((paso, id_recurso))) for paso in PASOS}
+
+    def _eventos(self, saga_id):
+        return [(e.evento, e.paso) for e in eventos_de(saga_id)]
+
+    # --- recuperación
+
+    def test_paso_iniciado_que_termino_bien_en_el_servicio(self):
+        self._log("s1", (EventoSaga.PASO_INICIADO, "pago", None), (EventoSaga.PASO_COMPLETADO, "pago", "1"),
+                  (EventoSaga.PASO_INICIADO, "compra", None))
+        claves = []
+
+        def reejecutar(datos):
+            claves.append(clave_actual())
+            return True, 7
+
+        recuperar_sagas(self.registro, self._compensadores(), reejecutores={"compra": reejecutar})
+
+        self.assertEqual(claves, ["s1:compra"])
+        self.assertEqual(self.compensados, [("compra", "7"), ("pago", "1")])
+        eventos = self._eventos("s1")
+        self.assertIn((EventoSaga.PASO_COMPLETADO, "compra"), eventos)
+        self.assertEqual(eventos[-1], (EventoSaga.COMPENSADA, None))
+
+    def test_paso_iniciado_que_fallo_en_el_servicio(self):
+        self._log("s2", (EventoSaga.PASO_INICIADO, "pago", None), (EventoSaga.PASO_COMPLETADO, "pago", "1"),
+                  (EventoSaga.PASO_INICIADO, "compra", None))
+
+        recuperar_sagas(self.registro, self._compensadores(), reejecutores={"compra": lambda datos: (False, None)})
+
+        self.assertEqual(self.compensados, [("pago", "1")])
+        eventos = self._eventos("s2")
+        self.assertIn((EventoSaga.PASO_FALLIDO, "compra"), eventos)
+        self.assertEqual(eventos[-1], (EventoSaga.COMPENSADA, None))
+
+    def test_paso_que_todavia_no_se_puede_resolver_deja_la_saga_abierta(self):
+        self._log("s3", (EventoSaga.PASO_INICIADO, "pago", None))
+
+        def caido(datos):
+            raise ConnectionError("pagos caído")
+
+        recuperar_sagas(self.registro, self._compensadores(), reejecutores={"pago": caido})
+        self.assertEqual(self.compensados, [])
+        self.assertEqual(sagas_sin_terminar(), ["s3"])
+
+    def test_saga_compensada_a_medias_retoma_lo_que_faltaba(self):
+        self._log("s4", (EventoSaga.PASO_COMPLETADO, "pago", "1"), (EventoSaga.PASO_COMPLETADO, "compra", "2"),
+                  (EventoSaga.PASO_FALLIDO, "stock", None), (EventoSaga.COMPENSANDO, None, None),
+                  (EventoSaga.PASO_COMPENSADO, "compra", "2"))
+
+        self.assertEqual(_pasos_a_compensar(eventos_de("s4")), [("pago", "1")])
+        recuperar_sagas(self.registro, self._compensadores())
+        self.assertEqual(self.compensados, [("pago", "1")])
+        self.assertEqual(self._eventos("s4")[-1], (EventoSaga.COMPENSADA, None))
+
+    def test_pasos_sin_compensacion(self):
+        self._log("s5", (EventoSaga.PASO_COMPLETADO, "pago", "1"), (EventoSaga.PASO_COMPLETADO, "stock", "3"),
+                  (EventoSaga.PASO_FALLIDO, "compra", None), sin_compensacion=["stock"])
+
+        self.assertEqual(_pasos_a_compensar(eventos_de("s5")), [("pago", "1")])
+        compensar_desde_log(self.registro, "s5", eventos_de("s5"), self._compensadores())
+        self.assertEqual(self.compensados, [("pago", "1")])
+
+    def test_compensacion_que_falla_deja_la_saga_abierta(self):
+        self._log("s6", (EventoSaga.PASO_COMPLETADO, "pago", "1"), (EventoSaga.PASO_FALLIDO, "compra", None))
+
+        def falla(_id):
+            raise ConnectionError("pagos caído")
+
+        fallidos = compensar_desde_log(self.registro, "s6", eventos_de("s6"), {"pago": falla})
+        self.assertEqual([paso for paso, _ in fallidos], ["pago"])
+        self.assertIn((EventoSaga.COMPENSACION_FALLIDA, "pago"), self._eventos("s6"))
+        self.assertNotIn((EventoSaga.COMPENSADA, None), self._eventos("s6"))
+
+    def test_resolver_pasos_sin_reejecutor(self):
+        self._log("s7", (EventoSaga.PASO_INICIADO, "pago", None))
+        resueltos, fallidos = _resolver_pasos(self.registro, "s7", eventos_de("s7"), {})
+        self.assertEqual(resueltos, {})
+        self.assertEqual(fallidos, [("pago", "sin resultado")])
+
+    def test_saga_que_termino_sus_pasos_se_confirma_y_cierra(self):
+        pasos = [(EventoSaga.PASO_COMPLETADO, paso, str(i)) for i, paso in enumerate(PASOS, 1)]
+        self._log("s8", *pasos, confirmar=["stock"], sin_compensacion=["stock"])
+        self._log("s9", *pasos, confirmar=["stock"], sin_compensacion=["stock"])
+        confirmados = []
+
+        def confirmar(id_recurso):
+            confirmados.append(id_recurso)
+            if len(confirmados) == 2:
+                raise ConflictError("Reserva vencida")
+
+        recuperar_sagas(self.registro, self._compensadores(), confirmadores={"stock": confirmar})
+
+        self.assertEqual(confirmados, ["3", "3"])
+        self.assertEqual(self._eventos("s8")[-1], (EventoSaga.COMPLETADA, None))
+        self.assertEqual(self._eventos("s9")[-1], (EventoSaga.COMPENSADA, None))
+        self.assertEqual(self.compensados, [("compra", "2"), ("pago", "1")])
+
+    # --- escritor con group commit
+
+    def test_eventos_concurrentes_entran_en_pocos_commits(self):
+        commits = []
+        original = db.session.commit
+
+        def contar():
+            commits.append(1)
+            original()
+
+        def registrar(n):
+            self.registro.registrar(f"c{n}", EventoSaga.INICIADA)
+
+        self.registro.espera = 0.05
+        with mock.patch.object(db.session, 'commit', side_effect=contar):
+            hilos = [threading.Thread(target=registrar, args=(n,)) for n in range(20)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+        self.assertEqual(SagaLogEntry.query.count(), 20)
+        self.assertLess(len(commits), 20)
+
+    def test_error_del_escritor_llega_a_todos_los_del_lote(self):
+        db.drop_all()
+        with self.assertRaises(ErrorRegistroSaga):
+            self.registro.registrar_varios([("e1", EventoSaga.INICIADA, None, None, None),
+                                            ("e2", EventoSaga.INICIADA, None, None, None)])
+        with self.assertRaises(ErrorRegistroSaga):
+            asyncio.run(self.registro.registrar_async("e3", EventoSaga.INICIADA))
+        db.create_all()
+        self.registro.registrar("e4", EventoSaga.INICIADA)
+        self.assertEqual(SagaLogEntry.query.count(), 1)
+
+    def test_iniciada_estricta_que_falla_no_ejecuta_la_saga(self):
+        ejecutados = []
+        acciones = [SagaAction(lambda datos: ejecutados.append(1) or ("url", {"data": {"id": 1}}), None, "pago")]
+        db.drop_all()
+        respuesta = SagaOrchestrator(acciones, DATOS, registro=self.registro).ejecutar()
+        db.create_all()
+
+        self.assertEqual(respuesta["codigo_estado"], 503)
+        self.assertEqual(ejecutados, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
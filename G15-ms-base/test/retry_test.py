@@ -0,0 +1,105 @@
+import unittest
+from types import SimpleNamespace
+
+import requests
+
+from app.utils import retry
+from app.utils.retry import PoliticaReintentos, PresupuestoReintentos, configurar_reintentos, es_reintentable
+
+URL = "http://pagos.test/api/v1/pagos/transaccion"
+
+
+class Respuesta:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class Sesion:
+    """Sesión falsa: responde los códigos en orden y cuenta los pedidos."""
+
+    def __init__(self, *codigos):
+        self.codigos = list(codigos)
+        self.pedidos = 0
+
+    def post(self):
+        self.pedidos += 1
+        codigo = self.codigos.pop(0) if len(self.codigos) > 1 else self.codigos[0]
+        return Respuesta(codigo)
+
+
+class PresupuestoReintentosTestCase(unittest.TestCase):
+    def test_cada_reintento_gasta_una_ficha(self):
+        presupuesto = PresupuestoReintentos(proporcion=0.5, minimo_por_segundo=0)
+        self.assertTrue(presupuesto.retirar())
+        self.assertFalse(presupuesto.retirar())
+        # Dos pedidos depositan una ficha
+        presupuesto.registrar_pedido()
+        presupuesto.registrar_pedido()
+        self.assertTrue(presupuesto.retirar())
+        self.assertFalse(presupuesto.retirar())
+
+
+class PoliticaReintentosTestCase(unittest.TestCase):
+    def setUp(self):
+        self.opciones = dict(retry._opciones)
+        self._configurar(minimo_por_segundo=1000)
+        retry.metricas.reiniciar()
+
+    def tearDown(self):
+        configurar_reintentos(self.opciones)
+
+    def _configurar(self, minimo_por_segundo):
+        configurar_reintentos({"HTTP_RETRY_MAX_INTENTOS": 3, "HTTP_RETRY_BASE_MS": 1, "HTTP_RETRY_MAX_MS": 1,
+                               "HTTP_RETRY_PRESUPUESTO": 0.0, "HTTP_RETRY_MINIMO_POR_SEG": minimo_por_segundo})
+
+    def _pedir(self, sesion):
+        return PoliticaReintentos("POST", URL).ejecutar(sesion.post)
+
+    def test_reintenta_solo_sobrecarga(self):
+        for codigo in (429, 502, 503, 504):
+            sesion = Sesion(codigo, 201)
+            self.assertEqual(self._pedir(sesion).status_code, 201)
+            self.assertEqual(sesion.pedidos, 2, codigo)
+        for codigo in (400, 404, 409, 422, 500, 501):
+            sesion = Sesion(codigo)
+            self.assertEqual(self._pedir(sesion).status_code, codigo)
+            self.assertEqual(sesion.pedidos, 1, codigo)
+
+    def test_se_agotan_los_intentos(self):
+        sesion = Sesion(503)
+        self.assertEqual(self._pedir(sesion).status_code, 503)
+        self.assertEqual(sesion.pedidos, 3)
+        self.assertEqual(retry.metricas.snapshot()["pagos.test"]["agotados"], 1)
+
+    def test_sin_presupuesto_no_reintenta(self):
+        # Sin reposición: el presupuesto arranca con una sola ficha
+        self._configurar(minimo_por_segundo=0)
+        primera = Sesion(503)
+        self._pedir(primera)
+        segunda = Sesion(503)
+        self._pedir(segunda)
+
+        self.assertEqual(primera.pedidos, 2)
+        self.assertEqual(segunda.pedidos, 1)
+        self.assertEqual(retry.metricas.snapshot()["pagos.test"]["denegados_por_presupuesto"], 2)
+
+    def test_timeout_de_post_solo_con_idempotency_key(self):
+        timeout = requests.ReadTimeout("sin respuesta")
+        self.assertFalse(es_reintentable("POST", error=timeout))
+        self.assertTrue(es_reintentable("POST", error=timeout, idempotente=True))
+        self.assertTrue(es_reintentable("DELETE", error=timeout))
+        self.assertTrue(es_reintentable("POST", error=requests.ConnectionError("rechazada")))
+
+    def test_respeta_retry_after_con_tope(self):
+        politica = PoliticaReintentos("POST", URL, base_ms=1, max_ms=50)
+
+        respuesta = Respuesta(429, {"Retry-After": "30"})
+        resultado = SimpleNamespace(exception=lambda: None, result=lambda: respuesta)
+        estado = SimpleNamespace(attempt_number=1, outcome=resultado)
+
+        self.assertEqual(politica._espera(estado), 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import redis
+
+from app import create_app
+from app.services.saga.registro import RegistroSaga
+
+URLS = {
+    "PAGOS_URL": "http://127.0.0.1:9/api/v1/pagos",
+    "COMPRAS_URL": "http://127.0.0.1:9/api/v1/compra",
+    "STOCK_URL": "http://127.0.0.1:9/api/v1/stock",
+}
+COMPRA = {"pago": {"monto": 10}, "compra": {"producto_id": 1}, "stock": {"producto_id": 1, "cantidad": 2}}
+
+
+class SagaFalsa:
+    """Reemplaza a Saga en el ejecutor: termina cuando se libera `seguir`, con `resultado`."""
+
+    seguir = threading.Event()
+    resultado = {"status_code": 201, "message": "OK", "data": {"message": "Operación realizada con éxito"}}
+
+    def __init__(self, pasos, datos):
+        self.saga_id = RegistroSaga.nuevo_id()
+
+    def execute(self):
+        self.seguir.wait(5)
+        return self.resultado
+
+
+class SagaResourceTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'testing'
+        with mock.patch.dict(os.environ, URLS):
+            self.app = create_app()
+        self.cliente = self.app.test_client()
+        SagaFalsa.seguir = threading.Event()
+        parche = mock.patch('app.services.saga.ejecutor.Saga', SagaFalsa)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.addCleanup(lambda: SagaFalsa.seguir.set())
+
+    def test_202_y_consulta_del_estado(self):
+        respuesta = self.cliente.post('/api/v1/saga/compra', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 202)
+        url = respuesta.headers["Location"]
+        self.assertEqual(respuesta.get_json()["url"], url)
+
+        pendiente = self.cliente.get(url)
+        self.assertEqual(pendiente.status_code, 200)
+        self.assertIsNone(pendiente.get_json()["resultado"])
+
+        SagaFalsa.seguir.set()
+        terminada = self.cliente.get(url + "?wait=2")
+        self.assertEqual(terminada.status_code, 200)
+        self.assertEqual(terminada.get_json()["estado"], "completada")
+        self.assertEqual(terminada.get_json()["resultado"]["status_code"], 201)
+
+    def test_wait_devuelve_el_codigo_final(self):
+        SagaFalsa.seguir.set()
+        respuesta = self.cliente.post('/api/v1/saga/compra?wait=2', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.get_json()["estado"], "completada")
+
+    def test_wait_vencido_responde_202(self):
+        inicio = time.monotonic()
+        respuesta = self.cliente.post('/api/v1/saga/compra?wait=0.05', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertIn("Location", respuesta.headers)
+        self.assertLess(time.monotonic() - inicio, 2)
+
+    def test_wait_tiene_tope(self):
+        self.app.config['SAGA_ESPERA_MAX_S'] = 0.05
+        inicio = time.monotonic()
+        respuesta = self.cliente.post('/api/v1/saga/compra?wait=30', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 202)
+        url = respuesta.headers["Location"]
+        self.assertEqual(self.cliente.get(url + "?wait=30").status_code, 200)
+        self.assertLess(time.monotonic() - inicio, 2)
+
+    def test_cola_de_sagas_llena_responde_429(self):
+        self.app.extensions['ejecutor_sagas'].max_pendientes = 0
+        respuesta = self.cliente.post('/api/v1/saga/compra', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta.headers["Retry-After"], "1")
+
+    def test_sin_redis_para_publicar_responde_503(self):
+        ejecutor = self.app.extensions['ejecutor_sagas']
+        with mock.patch.object(ejecutor, 'enviar', side_effect=redis.ConnectionError("sin redis")):
+            respuesta = self.cliente.post('/api/v1/saga/compra', json=COMPRA)
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta.headers["Retry-After"], "5")
+
+    def test_datos_invalidos_y_saga_desconocida(self):
+        self.assertEqual(self.cliente.post('/api/v1/saga/compra', json=[COMPRA]).status_code, 422)
+        respuesta = self.cliente.post('/api/v1/saga/compra', json={"pago": {}})
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertEqual(respuesta.get_json()["faltan"], ["compra", "stock"])
+        with mock.patch.object(self.app.extensions['ejecutor_sagas'], 'estado_desde_log', return_value=None):
+            self.assertEqual(self.cliente.get('/api/v1/saga/no-existe').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,7 +42,10 @@ except redis.ConnectionError as e:
     logger.error(f"Error al conectar con Redis: {e}")
 
 def create_app():
+    from app.services.json_rapido import ProveedorJsonRapido
+
     app = Flask(__name__)
+    app.json = ProveedorJsonRapido(app)
     app_context = os.getenv('FLASK_ENV', 'development')
     
     try:
@@ -63,6 +66,9 @@ def create_app():
     except Exception as e:
         raise RuntimeError(f"Error al inicializar extensiones: {e}")
 
+    from app.services.tracing import configurar_tracing
+    configurar_tracing(app, "ms-catalogo")
+
     try:
         from app.routes import Producto
         app.register_blueprint(Producto, url_prefix='/api/v1')
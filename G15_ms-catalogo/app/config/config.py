@@ -8,6 +8,10 @@ load_dotenv(os.path.join(basedir, ".env"))  # Carga las variables del entorno
 
 class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'true').lower() == 'true'
+    TRACING_MUESTREO = float(os.getenv('TRACING_MUESTREO', '0.1'))
+    TRACING_MAX_TRAZAS_POR_SEG = float(os.getenv('TRACING_MAX_TRAZAS_POR_SEG', '50'))
+    TRACING_ARCHIVO = os.getenv('TRACING_ARCHIVO')
 
     @staticmethod
     def init_app(app):
@@ -41,6 +45,7 @@ class DevelopmentConfig(Config):
 
 
 class TestingConfig(Config):
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'false').lower() == 'true'
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     SQLALCHEMY_RECORD_QUERIES = True
     TESTING = True
@@ -1,6 +1,7 @@
 from app import cache, redis_client
 from app.models import Producto
 from app.repositories import ProductoRepository
+from app.services.tracing import span_lock_redis
 from contextlib import contextmanager
 import time
 class ProductoService:
@@ -15,14 +16,16 @@ class ProductoService:
         lock_key = f"producto_lock_{producto_id}"
         lock_value = str(time.time())
 
-        if redis_client.set(lock_key, lock_value, ex=self.REDIS_LOCK_TIMEOUT, nx=True):
-            try:
-                yield
-            finally:
-                redis_client.delete(lock_key)
-        else:
-            raise Exception(
-                f"El recurso está bloqueado para el producto {producto_id}.")
+        with span_lock_redis(lock_key) as span:
+            if redis_client.set(lock_key, lock_value, ex=self.REDIS_LOCK_TIMEOUT, nx=True):
+                try:
+                    yield
+                finally:
+                    redis_client.delete(lock_key)
+            else:
+                span.set_attribute("lock.ocupado", True)
+                raise Exception(
+                    f"El recurso está bloqueado para el producto {producto_id}.")
 
     def all(self) -> list[Producto]:
         cached_productos = cache.get('productos')
@@ -0,0 +1,93 @@
+"""
+Benchmark: CPU por pedido de GET /api/v1/producto (el listado completo) con el proveedor
+JSON por defecto de Flask (json de la stdlib) contra ProveedorJsonRapido (orjson).
+Mide también lo que le cuesta al orquestador parsear el cuerpo de la respuesta.
+
+Corre en el proceso, con SQLite en memoria y cache SimpleCache: no hacen falta
+Postgres ni Redis. El listado sale de la cache, así que lo que cambia entre las dos
+corridas es la serialización.
+
+    python -m benchmarks.bench_json --filas 100 1000 --pedidos 500
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('TEST_DB_URI', 'sqlite://')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+os.environ.setdefault('TRACING_HABILITADO', 'false')
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+from app.config import cache_config
+
+cache_config.update(CACHE_TYPE='SimpleCache')
+
+from app import cache, create_app, db, limiter
+from app.models import Producto
+from app.services.json_rapido import ProveedorJsonRapido
+
+RUTA = "/api/v1/producto"
+
+
+def _cargar(app, filas):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([
+            Producto(nombre=f"Producto {i}", precio=round(100 + i * 1.25, 2), activado=bool(i % 5))
+            for i in range(filas)
+        ])
+        db.session.commit()
+        cache.clear()
+
+
+def _medir(cliente, pedidos, parsear):
+    """CPU (µs) por pedido en la ruta y por parseo del cuerpo, y tamaño del cuerpo."""
+    for _ in range(20):
+        cliente.get(RUTA)
+    inicio = time.process_time()
+    for _ in range(pedidos):
+        respuesta = cliente.get(RUTA)
+    ruta_us = (time.process_time() - inicio) / pedidos * 1e6
+
+    cuerpo = respuesta.get_data()
+    inicio = time.process_time()
+    for _ in range(pedidos):
+        parsear(cuerpo)
+    parseo_us = (time.process_time() - inicio) / pedidos * 1e6
+    return ruta_us, parseo_us, len(cuerpo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--pedidos", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+    limiter.enabled = False
+    cliente = app.test_client()
+
+    print(f"GET {RUTA}, {args.pedidos} pedidos por corrida, CPU por pedido en µs")
+    print(f"{'filas':>6} {'codec':>8} {'ruta':>10} {'parseo':>10} {'bytes':>9}")
+    for filas in args.filas:
+        _cargar(app, filas)
+        app.json = DefaultJSONProvider(app)
+        antes = _medir(cliente, args.pedidos, json.loads)
+        app.json = ProveedorJsonRapido(app)
+        despues = _medir(cliente, args.pedidos, orjson.loads)
+        for nombre, (ruta_us, parseo_us, tamano) in (("stdlib", antes), ("orjson", despues)):
+            print(f"{filas:>6} {nombre:>8} {ruta_us:>10.1f} {parseo_us:>10.1f} {tamano:>9}")
+        print(f"{'':>6} {'mejora':>8} {1 - despues[0] / antes[0]:>10.1%} {1 - despues[1] / antes[1]:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,19 @@ load_dotenv(os.path.join(basedir, ".env"))
 
 class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'true').lower() == 'true'
+    TRACING_MUESTREO = float(os.getenv('TRACING_MUESTREO', '0.1'))
+    TRACING_MAX_TRAZAS_POR_SEG = float(os.getenv('TRACING_MAX_TRAZAS_POR_SEG', '50'))
+    TRACING_ARCHIVO = os.getenv('TRACING_ARCHIVO')
+    # Respuestas guardadas por Idempotency-Key y cuánto se espera a un pedido duplicado en curso
+    IDEMPOTENCIA_TTL_S = int(os.getenv('IDEMPOTENCIA_TTL_S', '86400'))
+    IDEMPOTENCIA_EN_CURSO_S = int(os.getenv('IDEMPOTENCIA_EN_CURSO_S', '30'))
+    IDEMPOTENCIA_ESPERA_S = float(os.getenv('IDEMPOTENCIA_ESPERA_S', '5'))
+    COREOGRAFIA_HABILITADA = os.getenv('COREOGRAFIA_HABILITADA', 'false').lower() == 'true'
+    COREOGRAFIA_WORKERS = int(os.getenv('COREOGRAFIA_WORKERS', '8'))
+    COREOGRAFIA_RECLAMO_S = float(os.getenv('COREOGRAFIA_RECLAMO_S', '30'))
+    COREOGRAFIA_MAX_STREAM = int(os.getenv('COREOGRAFIA_MAX_STREAM', '100000'))
+    COREOGRAFIA_PROCESADO_TTL_S = int(os.getenv('COREOGRAFIA_PROCESADO_TTL_S', '86400'))
     
     @staticmethod
     def init_app(app):
@@ -36,6 +49,7 @@ class DevelopmentConfig(Config):
         Config.validate_required_env_vars(['DEV_DATABASE_URI', 'REDIS_HOST', 'REDIS_PORT'])
 
 class TestingConfig(Config):
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'false').lower() == 'true'
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     SQLALCHEMY_RECORD_QUERIES = True
     TESTING = True
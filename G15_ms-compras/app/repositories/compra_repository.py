@@ -1,5 +1,7 @@
 from typing import List
 
+from sqlalchemy import insert
+
 from app import db
 from app.models import Compra
 
@@ -19,6 +21,24 @@ class CompraRepository(Repository_save, Repository_get, Repository_delete):
             db.session.rollback()
             raise e
 
+    def save_all(self, entities: List[Compra]) -> List[Compra]:
+        """
+        Inserta varias compras con un solo INSERT de varias filas y un único commit.
+        """
+        try:
+            rows = [
+                {key: value for key, value in entity.__dict__.items() if not key.startswith('_') and key != 'id'}
+                for entity in entities
+            ]
+            compras = db.session.scalars(
+                insert(Compra).returning(Compra, sort_by_parameter_order=True), rows
+            ).all()
+            db.session.commit()
+            return compras
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
     def get_all(self) -> List[Compra]:
         """
         Obtiene todas las compras almacenadas en la base de datos.
@@ -3,6 +3,7 @@ from marshmallow import ValidationError
 from app import limiter
 from app.mapping import CompraSchema, ResponseSchema
 from app.services import CompraService, ResponseBuilder
+from app.services.idempotencia import idempotente
 
 compra = Blueprint('compra', __name__)
 service = CompraService()
@@ -41,6 +42,7 @@ def one(id):
 
 @compra.route('/compras', methods=['POST'])
 @limiter.limit("50000 per minute")
+@idempotente
 def add():
     response_builder = ResponseBuilder()
     try:
@@ -55,6 +57,44 @@ def add():
         response_builder.add_message("Error creating compra").add_status_code(500).add_data(str(e))
         return response_schema.dump(response_builder.build()), 500
 
+@compra.route('/compras/bulk', methods=['POST'])
+@limiter.limit("50000 per minute")
+@idempotente
+def add_bulk():
+    response_builder = ResponseBuilder()
+    try:
+        json_data = request.json
+        if not json_data or not isinstance(json_data, list):
+            raise ValidationError("Expected a list of compras")
+
+        items = [None] * len(json_data)
+        compras = []
+        indices = []
+        for indice, item in enumerate(json_data):
+            try:
+                compras.append(compra_schema.load(item))
+                indices.append(indice)
+            except ValidationError as err:
+                items[indice] = ResponseBuilder().add_message("Validation error").add_status_code(422).add_data(err.messages).build()
+
+        if compras:
+            try:
+                creadas = service.add_all(compras)
+                for indice, creada in zip(indices, creadas):
+                    items[indice] = ResponseBuilder().add_message("Compra created").add_status_code(201).add_data(compra_schema.dump(creada)).build()
+            except Exception as e:
+                for indice in indices:
+                    items[indice] = ResponseBuilder().add_message("Error creating compra").add_status_code(500).add_data(str(e)).build()
+
+        response_builder.add_message("Batch processed").add_status_code(207).add_data(items)
+        return response_schema.dump(response_builder.build()), 207
+    except ValidationError as err:
+        response_builder.add_message("Validation error").add_status_code(422).add_data(err.messages)
+        return response_schema.dump(response_builder.build()), 422
+    except Exception as e:
+        response_builder.add_message("Error creating compras").add_status_code(500).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 500
+
 @compra.route('/compras/<int:id>', methods=['PUT'])
 @limiter.limit("50000 per minute")
 def update(id):
@@ -73,6 +113,7 @@ def update(id):
 
 @compra.route('/compras/<int:id>', methods=['DELETE'])
 @limiter.limit("30000 per minute")
+@idempotente
 def delete(id):
     response_builder = ResponseBuilder()
     try:
@@ -1,6 +1,7 @@
 from app import cache, redis_client
 from app.models import Compra
 from app.repositories import CompraRepository
+from app.services.tracing import span_lock_redis
 from contextlib import contextmanager
 import time
 
@@ -22,13 +23,15 @@ class CompraService:
         lock_key = f"compra_lock_{compra_id}"
         lock_value = str(time.time())
 
-        if redis_client.set(lock_key, lock_value, ex=self.REDIS_LOCK_TIMEOUT, nx=True):
-            try:
-                yield
-            finally:
-                redis_client.delete(lock_key)
-        else:
-            raise Exception(f"El recurso está bloqueado para la compra {compra_id}.")
+        with span_lock_redis(lock_key) as span:
+            if redis_client.set(lock_key, lock_value, ex=self.REDIS_LOCK_TIMEOUT, nx=True):
+                try:
+                    yield
+                finally:
+                    redis_client.delete(lock_key)
+            else:
+                span.set_attribute("lock.ocupado", True)
+                raise Exception(f"El recurso está bloqueado para la compra {compra_id}.")
 
     def all(self) -> list[Compra]:
         """
@@ -51,6 +54,15 @@ class CompraService:
         cache.delete('compras')
         return new_compra
 
+    def add_all(self, compras: list[Compra]) -> list[Compra]:
+        """
+        Agrega un lote de compras en una sola transacción e invalida la caché una vez por lote.
+        """
+        new_compras = self.repository.save_all(compras)
+        cache.set_many({f'compra_{c.id}': c for c in new_compras}, timeout=self.CACHE_TIMEOUT)
+        cache.delete('compras')
+        return new_compras
+
     def update(self, compra_id: int, updated_compra: Compra) -> Compra:
         """
         Actualiza una compra existente.
@@ -0,0 +1,203 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+import redis
+
+from app import redis_client
+from app.services.json_rapido import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+class EventoCoreografia:
+    """Eventos de la saga de compra en modo coreografía; cada uno lo publica un solo servicio."""
+
+    # ms-base
+    COMPRA_SOLICITADA = "compra_solicitada"
+    # pagos
+    PAGO_REALIZADO = "pago_realizado"
+    PAGO_RECHAZADO = "pago_rechazado"
+    PAGO_COMPENSADO = "pago_compensado"
+    # compras
+    COMPRA_REGISTRADA = "compra_registrada"
+    COMPRA_RECHAZADA = "compra_rechazada"
+    COMPRA_COMPENSADA = "compra_compensada"
+    # inventario
+    STOCK_RESERVADO = "stock_reservado"
+    STOCK_RECHAZADO = "stock_rechazado"
+
+
+def stream_de(servicio):
+    """Cada servicio publica sus eventos en su propio stream; los demás lo leen con su consumer group."""
+    return f"saga:{servicio}"
+
+
+class EventoEnProceso(Exception):
+    """Otro worker está procesando el mismo evento: el mensaje queda pendiente y se reintenta."""
+
+
+class ConsumidorCoreografia:
+    """
+    Participa de la saga de compra en modo coreografía: lee con el consumer group
+    del servicio los streams de los servicios que escucha, ejecuta el manejador del
+    evento y publica el resultado en el stream propio. No hay un orquestador que
+    espere la cadena: cada servicio reacciona a los eventos del anterior, y ante un
+    rechazo los servicios que ya hicieron su parte la compensan.
+
+    manejadores es {stream: {evento: fn(saga_id, datos) -> (evento, datos) | None}}.
+    Los eventos de esos streams que el servicio no maneja se confirman sin hacer nada.
+
+    El resultado de cada evento procesado queda en Redis COREOGRAFIA_PROCESADO_TTL_S:
+    si el evento llega de nuevo (reentrega o duplicado) se vuelve a publicar el mismo
+    resultado sin ejecutar otra vez, y mientras un worker lo procesa los demás lo dejan
+    pendiente. Si el manejador lanza una excepción el mensaje
+    no se confirma, y cuando supera COREOGRAFIA_RECLAMO_S de inactividad otro worker
+    lo reclama y lo reintenta.
+    """
+
+    def __init__(self, app, servicio, manejadores, cliente=None):
+        self.app = app
+        self.servicio = servicio
+        self.manejadores = manejadores
+        self.cliente = cliente or redis_client
+        self.grupo = servicio
+        self.stream = stream_de(servicio)
+        self.workers = int(app.config.get('COREOGRAFIA_WORKERS', 8))
+        self.reclamo_ms = int(float(app.config.get('COREOGRAFIA_RECLAMO_S', 30)) * 1000)
+        self.max_stream = int(app.config.get('COREOGRAFIA_MAX_STREAM', 100000))
+        self.procesado_ttl = int(app.config.get('COREOGRAFIA_PROCESADO_TTL_S', 86400))
+        self._hilos = []
+        self._lock = threading.Lock()
+        self.procesados = 0
+        self.repetidos = 0
+        self.publicados = 0
+        self.errores = 0
+        app.extensions['coreografia'] = self
+
+    def publicar(self, evento, saga_id, datos):
+        self.cliente.xadd(self.stream, {
+            "evento": evento,
+            "saga_id": saga_id,
+            "datos": dumps(datos),
+            "emitido": time.time(),
+        }, maxlen=self.max_stream, approximate=True)
+        with self._lock:
+            self.publicados += 1
+
+    def iniciar_workers(self):
+        if self._hilos:
+            return
+        for numero in range(self.workers):
+            hilo = threading.Thread(target=self._trabajar, args=(numero,),
+                                    name=f"coreografia-{numero}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        logger.info(f"{self.workers} workers de coreografía de {self.servicio} escuchando {', '.join(self.manejadores)}")
+
+    def _crear_grupos(self):
+        for stream in self.manejadores:
+            try:
+                self.cliente.xgroup_create(stream, self.grupo, id="$", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    def _reclamar(self, consumidor):
+        reclamados = []
+        for stream in self.manejadores:
+            respuesta = self.cliente.xautoclaim(stream, self.grupo, consumidor, self.reclamo_ms, "0-0", count=10)
+            reclamados.extend((stream, mensaje) for mensaje in (respuesta[1] if respuesta else []))
+        return reclamados
+
+    def _leer(self, consumidor):
+        respuesta = self.cliente.xreadgroup(
+            self.grupo, consumidor, {stream: ">" for stream in self.manejadores}, count=1, block=1000
+        )
+        return [(stream, mensaje) for stream, mensajes in respuesta or [] for mensaje in mensajes]
+
+    def _trabajar(self, numero):
+        consumidor = f"{self.servicio}-{socket.gethostname()}-{os.getpid()}-{numero}"
+        espera = 1
+        while True:
+            try:
+                self._crear_grupos()
+                # Los mensajes de un worker caído se buscan de vez en cuando, no en cada lectura
+                proximo_reclamo = 0.0
+                while True:
+                    mensajes = []
+                    if time.monotonic() >= proximo_reclamo:
+                        mensajes = self._reclamar(consumidor)
+                        proximo_reclamo = time.monotonic() + self.reclamo_ms / 2000
+                    for stream, (id_mensaje, campos) in mensajes or self._leer(consumidor):
+                        if campos is None:
+                            # Borrado del stream por MAXLEN antes de procesarse
+                            self.cliente.xack(stream, self.grupo, id_mensaje)
+                            continue
+                        try:
+                            self._procesar(stream, campos)
+                        except redis.RedisError:
+                            raise
+                        except EventoEnProceso:
+                            continue
+                        except Exception as e:
+                            with self._lock:
+                                self.errores += 1
+                            logger.exception(f"Error procesando {campos.get('evento')} de la saga "
+                                             f"{campos.get('saga_id')}, se reintenta: {e}")
+                            continue
+                        self.cliente.xack(stream, self.grupo, id_mensaje)
+                    espera = 1
+            except redis.RedisError as e:
+                logger.error(f"Worker de coreografía {numero} sin Redis, reintenta en {espera}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            except Exception as e:
+                logger.exception(f"Error inesperado en el worker de coreografía {numero}: {e}")
+                time.sleep(1)
+
+    def _procesar(self, stream, campos):
+        manejador = self.manejadores[stream].get(campos.get("evento"))
+        if manejador is None:
+            return
+        saga_id = campos["saga_id"]
+        clave = f"coreografia:{self.servicio}:{saga_id}:{campos['evento']}"
+        guardado = self.cliente.get(clave)
+        if guardado is not None:
+            resultado = loads(guardado)
+            with self._lock:
+                self.repetidos += 1
+        else:
+            if not self.cliente.set(f"{clave}:en_proceso", 1, nx=True, ex=max(self.reclamo_ms // 1000, 1)):
+                raise EventoEnProceso(clave)
+            try:
+                with self.app.app_context():
+                    salida = manejador(saga_id, loads(campos["datos"]))
+                resultado = {"evento": salida[0], "datos": salida[1]} if salida else {"evento": None}
+                self.cliente.set(clave, dumps(resultado), ex=self.procesado_ttl)
+            finally:
+                self.cliente.delete(f"{clave}:en_proceso")
+            with self._lock:
+                self.procesados += 1
+        if resultado["evento"] is not None:
+            self.publicar(resultado["evento"], saga_id, resultado["datos"])
+
+    def snapshot(self):
+        pendientes = {}
+        for stream in self.manejadores:
+            try:
+                pendientes[stream] = self.cliente.xpending(stream, self.grupo)["pending"]
+            except redis.ResponseError:
+                pendientes[stream] = 0
+        with self._lock:
+            return {
+                "servicio": self.servicio,
+                "workers": len(self._hilos),
+                "pendientes": pendientes,
+                "procesados": self.procesados,
+                "repetidos": self.repetidos,
+                "publicados": self.publicados,
+                "errores": self.errores,
+            }
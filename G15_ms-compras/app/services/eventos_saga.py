@@ -0,0 +1,42 @@
+import logging
+
+from marshmallow import ValidationError
+
+from app.mapping import CompraSchema
+from app.services.compra_services import CompraService
+from app.services.coreografia import ConsumidorCoreografia, EventoCoreografia, stream_de
+
+logger = logging.getLogger(__name__)
+
+compra_schema = CompraSchema()
+
+
+def _registrar_compra(saga_id, datos):
+    try:
+        compra = CompraService().add(compra_schema.load(datos.get("compra") or {}))
+    except ValidationError as err:
+        return EventoCoreografia.COMPRA_RECHAZADA, dict(datos, error=err.messages)
+    except Exception as e:
+        logger.error(f"Saga {saga_id}: error registrando la compra: {e}")
+        return EventoCoreografia.COMPRA_RECHAZADA, dict(datos, error=str(e))
+    logger.info(f"Saga {saga_id}: compra {compra.id} registrada")
+    return EventoCoreografia.COMPRA_REGISTRADA, dict(datos, compra_id=compra.id)
+
+
+def _compensar_compra(saga_id, datos):
+    compra_id = datos.get("compra_id")
+    # Si el lock está tomado delete lanza y el evento se reintenta
+    if compra_id is not None:
+        CompraService().delete(compra_id)
+    logger.info(f"Saga {saga_id}: compra {compra_id} compensada")
+    return EventoCoreografia.COMPRA_COMPENSADA, datos
+
+
+def configurar_coreografia(app):
+    """Suscribe compras a la saga de compra en modo coreografía, si COREOGRAFIA_HABILITADA."""
+    if not app.config.get('COREOGRAFIA_HABILITADA'):
+        return None
+    return ConsumidorCoreografia(app, "compras", {
+        stream_de("pagos"): {EventoCoreografia.PAGO_REALIZADO: _registrar_compra},
+        stream_de("inventario"): {EventoCoreografia.STOCK_RECHAZADO: _compensar_compra},
+    })
@@ -0,0 +1,65 @@
+import os
+import unittest
+from unittest import mock
+
+from app import cache, create_app, db, limiter
+from app.models import Compra
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _compra(self, producto_id):
+        return {"producto_id": producto_id, "fecha_compra": "2024-09-13T15:30:00", "direccion_envio": "Calle falsa 123"}
+
+    def test_bulk_resultado_por_item_en_orden(self):
+        lote = [self._compra(1), {"producto_id": 2, "fecha_compra": "2024-09-13T15:30:00"}, self._compra(3)]
+        respuesta = self.client.post('/api/v1/compras/bulk', json=lote)
+
+        self.assertEqual(respuesta.status_code, 207)
+        items = respuesta.get_json()['data']
+        self.assertEqual([item['status_code'] for item in items], [201, 422, 201])
+        self.assertIn('direccion_envio', items[1]['data'])
+        self.assertEqual(items[0]['data']['producto_id'], 1)
+        self.assertEqual(items[2]['data']['producto_id'], 3)
+        self.assertLess(items[0]['data']['id'], items[2]['data']['id'])
+
+    def test_bulk_en_una_sola_transaccion(self):
+        lote = [self._compra(1), {"producto_id": 2}, self._compra(3)]
+        with mock.patch.object(db.session, 'commit', side_effect=Exception("sin base")):
+            respuesta = self.client.post('/api/v1/compras/bulk', json=lote)
+
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [500, 422, 500])
+        # El INSERT de varias filas se deshace entero: ninguna compra del lote queda sola
+        self.assertEqual(Compra.query.count(), 0)
+
+    def test_bulk_invalida_el_listado_en_cache(self):
+        cache.clear()
+        self.client.post('/api/v1/compras', json=self._compra(1))
+        self.assertEqual(len(self.client.get('/api/v1/compras').get_json()['data']), 1)
+
+        self.client.post('/api/v1/compras/bulk', json=[self._compra(2), self._compra(3)])
+        listado = self.client.get('/api/v1/compras').get_json()['data']
+        self.assertEqual(sorted(c['producto_id'] for c in listado), [1, 2, 3])
+
+    def test_bulk_sin_lista(self):
+        respuesta = self.client.post('/api/v1/compras/bulk', json=self._compra(1))
+        self.assertEqual(respuesta.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+import unittest
+import uuid
+from unittest import mock
+
+import redis
+
+from app import create_app, db, limiter, redis_client
+from app.models import Compra
+from app.services import idempotencia
+from app.services.idempotencia import HEADER, HEADER_REPETIDA
+from app.services.json_rapido import dumps
+
+
+class IdempotenciaTestCase(unittest.TestCase):
+    """La compensación de la saga (DELETE) se reintenta con la misma clave y tiene que dar el mismo 204."""
+
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app.config['IDEMPOTENCIA_ESPERA_S'] = 0.2
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+        self.clave = str(uuid.uuid4())
+        self.claves_redis = []
+
+    def tearDown(self):
+        for clave in self.claves_redis:
+            redis_client.delete(clave)
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _compra(self, producto_id=1):
+        return {"producto_id": producto_id, "fecha_compra": "2024-09-13T15:30:00", "direccion_envio": "Calle falsa 123"}
+
+    def _pedir(self, metodo, url, cuerpo=None):
+        self.claves_redis.append(f"idempotencia:{metodo}:{url}:{self.clave}")
+        return self.client.open(url, method=metodo, json=cuerpo, headers={HEADER: self.clave})
+
+    def _crear(self):
+        return self.client.post('/api/v1/compras', json=self._compra()).get_json()['data']['id']
+
+    def test_compra_repetida_no_duplica_la_fila(self):
+        primera = self._pedir('POST', '/api/v1/compras', self._compra())
+        segunda = self._pedir('POST', '/api/v1/compras', self._compra())
+
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(segunda.get_json()['data']['id'], primera.get_json()['data']['id'])
+        self.assertEqual(Compra.query.count(), 1)
+
+    def test_compensacion_repetida_devuelve_el_mismo_204(self):
+        url = f'/api/v1/compras/{self._crear()}'
+
+        primera = self._pedir('DELETE', url)
+        segunda = self._pedir('DELETE', url)
+        self.assertEqual(primera.status_code, 204)
+        self.assertEqual(segunda.status_code, 204)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(Compra.query.count(), 0)
+        # Otra clave es otra compensación: la compra ya no está
+        self.assertEqual(self.client.delete(url, headers={HEADER: str(uuid.uuid4())}).status_code, 404)
+
+    def test_compensacion_duplicada_espera_a_la_original(self):
+        self.app.config['IDEMPOTENCIA_ESPERA_S'] = 2
+        url = f'/api/v1/compras/{self._crear()}'
+        clave_redis = f"idempotencia:DELETE:{url}:{self.clave}"
+        self._pedir('DELETE', url)
+        guardada = redis_client.get(clave_redis)
+        redis_client.set(clave_redis, dumps({"estado": "en_curso", "huella": "", "token": "otro"}), ex=30)
+
+        def terminar():
+            time.sleep(0.2)
+            redis_client.set(clave_redis, guardada, ex=30)
+
+        hilo = threading.Thread(target=terminar)
+        hilo.start()
+        segunda = self._pedir('DELETE', url)
+        hilo.join()
+        self.assertEqual(segunda.status_code, 204)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+
+    def test_lote_repetido_devuelve_los_mismos_ids(self):
+        lote = [self._compra(1), self._compra(2)]
+        primera = self._pedir('POST', '/api/v1/compras/bulk', lote)
+        segunda = self._pedir('POST', '/api/v1/compras/bulk', lote)
+
+        ids = [item['data']['id'] for item in primera.get_json()['data']]
+        self.assertEqual([item['data']['id'] for item in segunda.get_json()['data']], ids)
+        self.assertEqual(Compra.query.count(), 2)
+
+    def test_sin_redis_la_compensacion_repetida_da_404(self):
+        caido = mock.Mock()
+        caido.set.side_effect = redis.ConnectionError("sin redis")
+        url = f'/api/v1/compras/{self._crear()}'
+        with mock.patch.object(idempotencia, 'redis_client', caido):
+            self.assertEqual(self._pedir('DELETE', url).status_code, 204)
+            self.assertEqual(self._pedir('DELETE', url).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
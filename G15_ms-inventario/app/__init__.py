@@ -5,6 +5,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from app.config import cache_config, factory
+import click
 import redis
 import logging
 
@@ -42,7 +43,10 @@ except redis.ConnectionError as e:
     logger.error(f"Error al conectar con Redis: {e}")
 
 def create_app():
+    from app.services.json_rapido import ProveedorJsonRapido
+
     app = Flask(__name__)
+    app.json = ProveedorJsonRapido(app)
     app_context = os.getenv('FLASK_ENV', 'development')
     
     try:
@@ -63,14 +67,69 @@ def create_app():
     except Exception as e:
         raise RuntimeError(f"Error al inicializar extensiones: {e}")
 
+    from app.services.tracing import configurar_tracing
+    configurar_tracing(app, "ms-inventario")
+
+    from app.services.eventos_saga import configurar_coreografia
+    configurar_coreografia(app)
+
+    from app.services.barrido_reservas import BarridoReservas
+    BarridoReservas(app)
+
+    from app.services.compactacion_stock import CompactacionStock
+    CompactacionStock(app)
+
+    if app.config.get('CONTADORES_REDIS_HABILITADO'):
+        from app.services.contadores_stock import ContadoresStock
+        ContadoresStock(app)
+
     try:
         from app.routes import Stock
         app.register_blueprint(Stock, url_prefix='/api/v1')
     except Exception as e:
         raise RuntimeError(f"Error al registrar blueprints: {e}")
 
+    @app.cli.command('reconstruir-saldos')
+    @click.option('--producto', type=int, default=None, help="Solo este producto_id")
+    def reconstruir_saldos(producto):
+        """Rehace saldo_stock sumando los movimientos de la tabla stock."""
+        from app.services import StockService
+        corregidos = StockService().reconstruir_saldos(producto)
+        click.echo(f"{len(corregidos)} saldos corregidos" + (f": {corregidos}" if corregidos else ""))
+
+    @app.cli.command('compactar-stock')
+    @click.option('--dias', type=float, default=None, help="Retención en días (por defecto COMPACTACION_RETENCION_DIAS)")
+    def compactar_stock(dias):
+        """Archiva en cortes los movimientos de stock más viejos que la retención."""
+        from datetime import timedelta
+        retencion = timedelta(days=dias) if dias is not None else None
+        productos, movimientos = app.extensions['compactacion_stock'].compactar(retencion)
+        click.echo(f"{movimientos} movimientos de {productos} productos archivados")
+
     @app.route('/ping', methods=['GET'])
     def ping():
         return {"message": "El servicio de stocks está en funcionamiento"}
 
+    @app.route('/metricas/coreografia', methods=['GET'])
+    def metricas_coreografia():
+        consumidor = app.extensions.get('coreografia')
+        if consumidor is None:
+            return {"habilitada": False}
+        return dict(consumidor.snapshot(), habilitada=True)
+
+    @app.route('/metricas/reservas', methods=['GET'])
+    def metricas_reservas():
+        return app.extensions['barrido_reservas'].snapshot()
+
+    @app.route('/metricas/contadores', methods=['GET'])
+    def metricas_contadores():
+        contadores = app.extensions.get('contadores_stock')
+        if contadores is None:
+            return {"habilitado": False}
+        return dict(contadores.snapshot(), habilitado=True)
+
+    @app.route('/metricas/compactacion', methods=['GET'])
+    def metricas_compactacion():
+        return app.extensions['compactacion_stock'].snapshot()
+
     return app
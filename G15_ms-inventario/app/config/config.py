@@ -7,6 +7,36 @@ load_dotenv(os.path.join(basedir, ".env"))  # Carga las variables del entorno
 
 class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'true').lower() == 'true'
+    TRACING_MUESTREO = float(os.getenv('TRACING_MUESTREO', '0.1'))
+    TRACING_MAX_TRAZAS_POR_SEG = float(os.getenv('TRACING_MAX_TRAZAS_POR_SEG', '50'))
+    TRACING_ARCHIVO = os.getenv('TRACING_ARCHIVO')
+    # Respuestas guardadas por Idempotency-Key y cuánto se espera a un pedido duplicado en curso
+    IDEMPOTENCIA_TTL_S = int(os.getenv('IDEMPOTENCIA_TTL_S', '86400'))
+    IDEMPOTENCIA_EN_CURSO_S = int(os.getenv('IDEMPOTENCIA_EN_CURSO_S', '30'))
+    IDEMPOTENCIA_ESPERA_S = float(os.getenv('IDEMPOTENCIA_ESPERA_S', '5'))
+    COREOGRAFIA_HABILITADA = os.getenv('COREOGRAFIA_HABILITADA', 'false').lower() == 'true'
+    COREOGRAFIA_WORKERS = int(os.getenv('COREOGRAFIA_WORKERS', '8'))
+    COREOGRAFIA_RECLAMO_S = float(os.getenv('COREOGRAFIA_RECLAMO_S', '30'))
+    COREOGRAFIA_MAX_STREAM = int(os.getenv('COREOGRAFIA_MAX_STREAM', '100000'))
+    COREOGRAFIA_PROCESADO_TTL_S = int(os.getenv('COREOGRAFIA_PROCESADO_TTL_S', '86400'))
+    # Reservas de stock de las sagas: cuánto duran sin confirmar y cada cuánto se barren las vencidas
+    RESERVA_TTL_S = float(os.getenv('RESERVA_TTL_S', '300'))
+    RESERVA_BARRIDO_S = float(os.getenv('RESERVA_BARRIDO_S', '30'))
+    RESERVA_BARRIDO_LOTE = int(os.getenv('RESERVA_BARRIDO_LOTE', '500'))
+    # Compactación: los movimientos más viejos que la retención se archivan en cortes por producto
+    COMPACTACION_HABILITADA = os.getenv('COMPACTACION_HABILITADA', 'false').lower() == 'true'
+    COMPACTACION_S = float(os.getenv('COMPACTACION_S', '3600'))
+    COMPACTACION_RETENCION_DIAS = float(os.getenv('COMPACTACION_RETENCION_DIAS', '30'))
+    COMPACTACION_LOTE = int(os.getenv('COMPACTACION_LOTE', '100'))
+    # Disponible en Redis: reservar es un script atómico y las reservas se escriben en la base en lotes
+    CONTADORES_REDIS_HABILITADO = os.getenv('CONTADORES_REDIS_HABILITADO', 'false').lower() == 'true'
+    ESCRITURA_DIFERIDA_LOTE = int(os.getenv('ESCRITURA_DIFERIDA_LOTE', '500'))
+    ESCRITURA_DIFERIDA_S = float(os.getenv('ESCRITURA_DIFERIDA_S', '0.2'))
+    ESCRITURA_DIFERIDA_RECLAMO_S = float(os.getenv('ESCRITURA_DIFERIDA_RECLAMO_S', '30'))
+    # Compare-and-swap sobre la versión de la fila: cuántas veces se reintenta al chocar y la espera base
+    CAS_REINTENTOS = int(os.getenv('CAS_REINTENTOS', '8'))
+    CAS_ESPERA_S = float(os.getenv('CAS_ESPERA_S', '0.002'))
     
     @staticmethod
     def init_app(app):
@@ -36,6 +66,7 @@ class DevelopmentConfig(Config):
         Config.validate_required_env_vars(['DEV_DATABASE_URI', 'REDIS_HOST', 'REDIS_PORT'])
 
 class TestingConfig(Config):
+    TRACING_HABILITADO = os.getenv('TRACING_HABILITADO', 'false').lower() == 'true'
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     SQLALCHEMY_RECORD_QUERIES = True
     TESTING = True
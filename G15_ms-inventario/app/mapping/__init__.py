@@ -1,2 +1,3 @@
 from .response_schema import ResponseSchema
 from .stock_schema import StockSchema
+from .reserva_stock_schema import ReservaStockSchema
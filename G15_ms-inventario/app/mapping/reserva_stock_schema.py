@@ -0,0 +1,15 @@
+from marshmallow import fields, Schema, post_load, validate
+from app.models import ReservaStock
+
+class ReservaStockSchema(Schema):
+    id = fields.Integer(dump_only=True)
+    producto_id = fields.Integer(required=True)
+    cantidad = fields.Float(required=True, validate=validate.Range(min=0, min_inclusive=False))
+    estado = fields.String(dump_only=True)
+    creada = fields.DateTime(dump_only=True)
+    vence = fields.DateTime(dump_only=True)
+    stock_id = fields.Integer(dump_only=True)
+
+    @post_load
+    def make_reserva(self, data, **kwargs):
+        return ReservaStock(**data)
@@ -1 +1,5 @@
 from .stock import Stock
+from .reserva_stock import ReservaStock
+from .saldo_stock import SaldoStock
+from .corte_stock import CorteStock
+from .stock_archivado import StockArchivado
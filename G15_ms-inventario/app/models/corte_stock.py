@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from app import db
+from datetime import datetime
+
+@dataclass
+class CorteStock(db.Model):
+    """
+    Saldo de un producto con todos sus movimientos hasta `hasta_id` inclusive, que ya
+    no están en la tabla stock sino en stock_archivo. El saldo actual es el del
+    último corte más los movimientos que quedan en stock.
+    """
+    __tablename__ = 'corte_stock'
+    __table_args__ = (
+        db.Index('ix_corte_stock_producto_hasta', 'producto_id', 'hasta_id'),
+    )
+
+    id: int = db.Column('id', db.Integer, primary_key=True, autoincrement=True)
+    producto_id: int = db.Column('producto_id', db.Integer, nullable=False)
+    hasta_id: int = db.Column('hasta_id', db.Integer, nullable=False)
+    saldo: float = db.Column('saldo', db.Float, nullable=False)
+    movimientos: int = db.Column('movimientos', db.Integer, nullable=False)  # archivados en este corte
+    creado: datetime = db.Column('creado', db.DateTime, nullable=False)
@@ -0,0 +1,29 @@
+from dataclasses import dataclass
+from app import db
+from datetime import datetime
+
+@dataclass
+class ReservaStock(db.Model):
+    """
+    Stock retenido por una saga hasta `vence`. Mientras está activa se descuenta del
+    disponible; al confirmarse pasa a ser una salida en la tabla stock, y si la saga
+    falla simplemente vence.
+    """
+    __tablename__ = 'reserva_stock'
+    __table_args__ = (
+        # Disponible por producto y barrido de vencidas: las dos consultas filtran por estado y vence
+        db.Index('ix_reserva_stock_producto_estado', 'producto_id', 'estado', 'vence'),
+        db.Index('ix_reserva_stock_estado_vence', 'estado', 'vence'),
+    )
+
+    ACTIVA = 'activa'
+    CONFIRMADA = 'confirmada'
+    VENCIDA = 'vencida'
+
+    id: int = db.Column('id', db.Integer, primary_key=True, autoincrement=True)
+    producto_id: int = db.Column('producto_id', db.Integer, nullable=False)
+    cantidad: float = db.Column('cantidad', db.Float, nullable=False)
+    estado: str = db.Column('estado', db.String(12), nullable=False, default=ACTIVA)
+    creada: datetime = db.Column('creada', db.DateTime, nullable=False)
+    vence: datetime = db.Column('vence', db.DateTime, nullable=False)
+    stock_id: int = db.Column('stock_id', db.Integer, nullable=True)  # la salida creada al confirmar
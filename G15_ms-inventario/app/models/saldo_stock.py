@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from app import db
+from datetime import datetime
+
+@dataclass
+class SaldoStock(db.Model):
+    """
+    Entradas menos salidas de cada producto, contando las ya archivadas en cortes. Se
+    actualiza en la misma transacción que cada movimiento, así el disponible se lee
+    de una sola fila; si queda desfasado se rehace con `flask reconstruir-saldos`.
+    """
+    __tablename__ = 'saldo_stock'
+
+    producto_id: int = db.Column('producto_id', db.Integer, primary_key=True, autoincrement=False)
+    saldo: float = db.Column('saldo', db.Float, nullable=False, default=0)
+    actualizado: datetime = db.Column('actualizado', db.DateTime, nullable=False)
+    # Sube con cada cambio del saldo y con cada reserva: reservar es compare-and-swap sobre ella
+    version: int = db.Column('version', db.Integer, nullable=False, default=1, server_default='1')
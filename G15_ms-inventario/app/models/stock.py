@@ -5,10 +5,16 @@ from datetime import datetime
 @dataclass
 class Stock(db.Model):
     __tablename__ = 'stock'
+    __table_args__ = (
+        # Movimientos de un producto: saldo desde el último corte (id > hasta_id) y compactación
+        db.Index('ix_stock_producto', 'producto_id', 'id'),
+    )
 
     id: int = db.Column('id', db.Integer, primary_key=True, autoincrement=True)
     producto_id: int = db.Column('producto_id', db.Integer, nullable=False)
     fecha_transaccion: datetime = db.Column('fecha_transaccion', db.DateTime, nullable=False)
     cantidad: float = db.Column('cantidad', db.Float, nullable=False)
     entrada_salida: int = db.Column('entrada_salida', db.Integer, nullable=False)  # 1: entrada, 2: salida
+    # Sube con cada cambio de cantidad: las actualizaciones son compare-and-swap sobre ella
+    version: int = db.Column('version', db.Integer, nullable=False, default=1, server_default='1')
 
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from app import db
+from datetime import datetime
+
+@dataclass
+class StockArchivado(db.Model):
+    """Movimiento de la tabla stock ya sumado en un corte; conserva su id original."""
+    __tablename__ = 'stock_archivo'
+
+    id: int = db.Column('id', db.Integer, primary_key=True, autoincrement=False)
+    producto_id: int = db.Column('producto_id', db.Integer, nullable=False)
+    fecha_transaccion: datetime = db.Column('fecha_transaccion', db.DateTime, nullable=False)
+    cantidad: float = db.Column('cantidad', db.Float, nullable=False)
+    entrada_salida: int = db.Column('entrada_salida', db.Integer, nullable=False)
+    corte_id: int = db.Column('corte_id', db.Integer, nullable=False)
@@ -1 +1,4 @@
+from .saldo_stock_repository import SaldoStockRepository
+from .corte_stock_repository import CorteStockRepository
 from .stock_repository import StockRepository
+from .reserva_stock_repository import ReservaStockRepository
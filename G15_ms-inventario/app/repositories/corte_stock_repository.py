@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import case, delete, func, insert, literal, select, text
+
+from app import db
+from app.models import CorteStock, Stock, StockArchivado
+
+
+class CorteStockRepository:
+    def get_all(self) -> List[CorteStock]:
+        return CorteStock.query.all()
+
+    def ultimo(self, producto_id: int) -> Optional[CorteStock]:
+        return CorteStock.query.filter_by(producto_id=producto_id).order_by(CorteStock.hasta_id.desc()).first()
+
+    def productos_a_compactar(self, antes_de: datetime, lote: int, despues_de: int = 0) -> List[int]:
+        """Hasta `lote` producto_id mayores que `despues_de` con movimientos anteriores a `antes_de`."""
+        return db.session.scalars(
+            select(Stock.producto_id)
+            .where(Stock.fecha_transaccion < antes_de, Stock.producto_id > despues_de)
+            .group_by(Stock.producto_id)
+            .order_by(Stock.producto_id)
+            .limit(lote)
+        ).all()
+
+    def compactar(self, productos: List[int], antes_de: datetime) -> int:
+        """
+        Por cada producto suma en un corte nuevo (sobre el anterior) sus movimientos
+        hasta el último anterior a `antes_de`, y los pasa de stock a stock_archivo, todo
+        en una transacción. Devuelve cuántos movimientos archivó.
+        """
+        try:
+            if db.session.get_bind().dialect.name == "postgresql":
+                # Espera a las escrituras en curso: una que haya tomado un id menor y
+                # confirme después quedaría detrás del corte sin estar sumada en él
+                db.session.execute(text("LOCK TABLE stock IN SHARE ROW EXCLUSIVE MODE"))
+            ahora = datetime.now()
+            archivados = 0
+            for producto_id in productos:
+                hasta_id = db.session.scalar(
+                    select(func.max(Stock.id))
+                    .where(Stock.producto_id == producto_id, Stock.fecha_transaccion < antes_de)
+                )
+                if hasta_id is None:
+                    continue
+                del_corte = (Stock.producto_id == producto_id, Stock.id <= hasta_id)
+                suma, movimientos = db.session.execute(
+                    select(func.coalesce(func.sum(case(
+                        (Stock.entrada_salida == 1, Stock.cantidad), else_=-Stock.cantidad
+                    )), 0), func.count()).where(*del_corte)
+                ).one()
+                anterior = self.ultimo(producto_id)
+                corte = CorteStock(producto_id=producto_id, hasta_id=hasta_id, movimientos=movimientos,
+                                   saldo=(anterior.saldo if anterior else 0) + suma, creado=ahora)
+                db.session.add(corte)
+                db.session.flush()
+                db.session.execute(insert(StockArchivado).from_select(
+                    ["id", "producto_id", "fecha_transaccion", "cantidad", "entrada_salida", "corte_id"],
+                    select(Stock.id, Stock.producto_id, Stock.fecha_transaccion, Stock.cantidad,
+                           Stock.entrada_salida, literal(corte.id)).where(*del_corte),
+                ))
+                db.session.execute(delete(Stock).where(*del_corte).execution_options(synchronize_session=False))
+                archivados += movimientos
+            db.session.commit()
+            return archivados
+        except Exception as e:
+            db.session.rollback()
+            raise e
@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, select, text, update
+
+from app import db
+from app.models import ReservaStock, Stock
+
+from .repository import Repository_add, Repository_get
+from .saldo_stock_repository import SaldoStockRepository, deltas_de
+
+
+class ReservaStockRepository(Repository_add, Repository_get):
+    def __init__(self, saldos=None):
+        self.saldos = saldos or SaldoStockRepository()
+
+    def add(self, entity: ReservaStock) -> ReservaStock:
+        try:
+            db.session.add(entity)
+            db.session.commit()
+            return entity
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def add_si_version(self, entity: ReservaStock, version: int) -> Optional[ReservaStock]:
+        """
+        Guarda la reserva solo si el saldo del producto sigue en `version` (ver
+        SaldoStockRepository.tomar_version). None, sin escribir nada, si cambió.
+        """
+        try:
+            db.session.add(entity)
+            db.session.flush()
+            if not self.saldos.tomar_version(entity.producto_id, version, entity.cantidad):
+                db.session.rollback()
+                return None
+            db.session.commit()
+            return entity
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def add_diferidas(self, filas: List[dict]) -> None:
+        """
+        Escribe reservas que ya tienen id (las numeradas en Redis). Las que ya están se
+        saltean, así escribir dos veces el mismo lote no duplica nada.
+        """
+        try:
+            dialecto = db.session.get_bind().dialect.name
+            if dialecto == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            db.session.execute(insert(ReservaStock).values(filas).on_conflict_do_nothing(index_elements=["id"]))
+            if dialecto == "postgresql":
+                # Que la secuencia de la tabla no vuelva a dar estos ids
+                db.session.execute(text(
+                    "SELECT setval(pg_get_serial_sequence('reserva_stock', 'id'), "
+                    "GREATEST((SELECT MAX(id) FROM reserva_stock), 1))"
+                ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def ultimo_id(self) -> int:
+        return db.session.scalar(select(func.coalesce(func.max(ReservaStock.id), 0)))
+
+    def get_all(self) -> List[ReservaStock]:
+        return ReservaStock.query.all()
+
+    def get_by_id(self, id: int) -> ReservaStock:
+        return ReservaStock.query.get(id)
+
+    def cantidad_reservada(self, producto_id: int, ahora: datetime) -> float:
+        """Suma de las reservas activas sin vencer; las vencidas dejan de contar aunque el barrido no haya pasado."""
+        return db.session.query(func.coalesce(func.sum(ReservaStock.cantidad), 0)).filter(
+            ReservaStock.producto_id == producto_id,
+            ReservaStock.estado == ReservaStock.ACTIVA,
+            ReservaStock.vence > ahora,
+        ).scalar()
+
+    def confirmar(self, reserva: ReservaStock, salida: Stock, ahora: datetime) -> Optional[Stock]:
+        """
+        Registra la salida (con su saldo) y marca la reserva confirmada en una sola transacción. Devuelve
+        None, sin escribir nada, si la reserva ya no estaba activa o venció.
+        """
+        try:
+            db.session.add(salida)
+            db.session.flush()
+            resultado = db.session.execute(
+                update(ReservaStock)
+                .where(ReservaStock.id == reserva.id, ReservaStock.estado == ReservaStock.ACTIVA,
+                       ReservaStock.vence > ahora)
+                .values(estado=ReservaStock.CONFIRMADA, stock_id=salida.id)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount == 0:
+                db.session.rollback()
+                return None
+            self.saldos.sumar(deltas_de([salida]))
+            db.session.commit()
+            db.session.refresh(reserva)
+            return salida
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def vencer(self, ahora: datetime, lote: int) -> List[tuple]:
+        """Marca vencidas hasta `lote` reservas activas con vence <= ahora. Devuelve (producto_id, cantidad) de cada una."""
+        try:
+            ids = db.session.scalars(
+                select(ReservaStock.id)
+                .where(ReservaStock.estado == ReservaStock.ACTIVA, ReservaStock.vence <= ahora)
+                .order_by(ReservaStock.vence)
+                .limit(lote)
+                # Con varios procesos barriendo a la vez cada uno toma filas distintas
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not ids:
+                db.session.rollback()
+                return []
+            vencidas = db.session.execute(
+                update(ReservaStock)
+                .where(ReservaStock.id.in_(ids), ReservaStock.estado == ReservaStock.ACTIVA)
+                .values(estado=ReservaStock.VENCIDA)
+                .returning(ReservaStock.producto_id, ReservaStock.cantidad)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.session.commit()
+            return [tuple(fila) for fila in vencidas]
+        except Exception as e:
+            db.session.rollback()
+            raise e
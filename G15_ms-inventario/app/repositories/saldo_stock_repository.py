@@ -0,0 +1,149 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, func, insert, select, text, update
+
+from app import db
+from app.models import CorteStock, ReservaStock, SaldoStock, Stock
+
+
+def aporte(cantidad: float, entrada_salida: int) -> float:
+    """Lo que suma un movimiento al saldo de su producto: las entradas suman y las salidas restan."""
+    return cantidad if entrada_salida == 1 else -cantidad
+
+
+def deltas_de(movimientos) -> Dict[int, float]:
+    deltas = {}
+    for movimiento in movimientos:
+        deltas[movimiento.producto_id] = (deltas.get(movimiento.producto_id, 0)
+                                          + aporte(movimiento.cantidad, movimiento.entrada_salida))
+    return deltas
+
+
+class SaldoStockRepository:
+    def get_all(self) -> List[SaldoStock]:
+        return SaldoStock.query.all()
+
+    def get_saldo(self, producto_id: int) -> Optional[float]:
+        return db.session.scalar(select(SaldoStock.saldo).where(SaldoStock.producto_id == producto_id))
+
+    def get_posicion(self, producto_id: int, ahora: Optional[datetime]):
+        """
+        (saldo, version, reservado) del producto en una sola lectura: su fila de saldo_stock
+        y la suma de sus reservas activas sin vencer. Con `ahora` None cuentan también las
+        activas vencidas que el barrido todavía no pasó. None si el producto no tiene saldo.
+        """
+        condiciones = [ReservaStock.producto_id == producto_id, ReservaStock.estado == ReservaStock.ACTIVA]
+        if ahora is not None:
+            condiciones.append(ReservaStock.vence > ahora)
+        reservado = (
+            select(func.coalesce(func.sum(ReservaStock.cantidad), 0))
+            .where(*condiciones)
+            .scalar_subquery()
+        )
+        return db.session.execute(
+            select(SaldoStock.saldo, SaldoStock.version, reservado.label("reservado"))
+            .where(SaldoStock.producto_id == producto_id)
+        ).one_or_none()
+
+    def tomar_version(self, producto_id: int, version: int, cantidad: float) -> bool:
+        """
+        Compare-and-swap dentro de la transacción en curso: sube la versión solo si el
+        saldo sigue en `version` y alcanza para `cantidad`. False si otro lo cambió antes.
+        """
+        resultado = db.session.execute(
+            update(SaldoStock)
+            .where(SaldoStock.producto_id == producto_id, SaldoStock.version == version,
+                   SaldoStock.saldo >= cantidad)
+            .values(version=SaldoStock.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return resultado.rowcount == 1
+
+    def sumar(self, deltas: Dict[int, float]):
+        """
+        Suma los deltas a los saldos dentro de la transacción en curso, sin commit: se
+        confirman junto con los movimientos que los originan.
+        """
+        ahora = datetime.now()
+        # Siempre en el mismo orden, para que dos lotes con los mismos productos no se bloqueen entre sí
+        filas = [{"producto_id": producto_id, "saldo": delta, "actualizado": ahora}
+                 for producto_id, delta in sorted(deltas.items()) if delta]
+        if filas:
+            self._upsert(filas, acumular=True)
+
+    def reconstruir(self, producto_id: Optional[int] = None) -> List[int]:
+        """
+        Recalcula los saldos (de todos los productos o de uno) con el último corte de
+        cada producto más los movimientos que quedan en la tabla stock, y corrige los
+        que no coinciden. Devuelve los producto_id corregidos.
+        """
+        try:
+            if db.session.get_bind().dialect.name == "postgresql":
+                # Sin movimientos nuevos mientras se suma: el saldo escrito pisaría su delta
+                db.session.execute(text("LOCK TABLE stock IN SHARE MODE"))
+            sumas = select(Stock.producto_id, func.sum(case(
+                (Stock.entrada_salida == 1, Stock.cantidad), else_=-Stock.cantidad
+            ))).group_by(Stock.producto_id)
+            ultimos = select(CorteStock.producto_id, func.max(CorteStock.hasta_id).label("hasta_id")) \
+                .group_by(CorteStock.producto_id)
+            guardados = select(SaldoStock.producto_id, SaldoStock.saldo)
+            if producto_id is not None:
+                sumas = sumas.where(Stock.producto_id == producto_id)
+                ultimos = ultimos.where(CorteStock.producto_id == producto_id)
+                guardados = guardados.where(SaldoStock.producto_id == producto_id)
+            ultimos = ultimos.subquery()
+            cortes = select(CorteStock.producto_id, CorteStock.saldo).join(ultimos, and_(
+                CorteStock.producto_id == ultimos.c.producto_id, CorteStock.hasta_id == ultimos.c.hasta_id
+            ))
+            calculados = dict(db.session.execute(sumas).all())
+            for producto, saldo in db.session.execute(cortes).all():
+                calculados[producto] = calculados.get(producto, 0) + saldo
+            actuales = dict(db.session.execute(guardados).all())
+
+            # Un producto sin fila en saldo_stock tiene saldo 0
+            corregidos = sorted(
+                producto for producto in calculados.keys() | actuales.keys()
+                if not math.isclose(calculados.get(producto, 0), actuales.get(producto, 0), abs_tol=1e-6)
+            )
+            ahora = datetime.now()
+            filas = [{"producto_id": producto, "saldo": calculados.get(producto, 0), "actualizado": ahora}
+                     for producto in corregidos]
+            if filas:
+                self._upsert(filas, acumular=False)
+            db.session.commit()
+            return corregidos
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def _upsert(self, filas, acumular):
+        dialecto = db.session.get_bind().dialect.name
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        elif dialecto == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        else:
+            insert_dialecto = None
+
+        if insert_dialecto is not None:
+            sentencia = insert_dialecto(SaldoStock).values(filas)
+            saldo = SaldoStock.saldo + sentencia.excluded.saldo if acumular else sentencia.excluded.saldo
+            db.session.execute(sentencia.on_conflict_do_update(
+                index_elements=[SaldoStock.producto_id],
+                set_={"saldo": saldo, "actualizado": sentencia.excluded.actualizado,
+                      "version": SaldoStock.version + 1},
+            ))
+            return
+
+        for fila in filas:
+            resultado = db.session.execute(
+                update(SaldoStock)
+                .where(SaldoStock.producto_id == fila["producto_id"])
+                .values(saldo=SaldoStock.saldo + fila["saldo"] if acumular else fila["saldo"],
+                        actualizado=fila["actualizado"], version=SaldoStock.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount == 0:
+                db.session.execute(insert(SaldoStock).values(fila))
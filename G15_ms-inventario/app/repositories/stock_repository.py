@@ -1,21 +1,77 @@
-from typing import List
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select, update
 
 from app import db
 from app.models import Stock
 
 from .repository import Repository_delete, Repository_get, Repository_add
+from .saldo_stock_repository import SaldoStockRepository, aporte, deltas_de
 
 
 class StockRepository(Repository_add, Repository_get, Repository_delete):
+    """Cada movimiento que se escribe o se borra actualiza saldo_stock en la misma transacción."""
+
+    def __init__(self, saldos=None):
+        self.saldos = saldos or SaldoStockRepository()
+
     def add(self, entity: Stock) -> Stock:
         try:
             db.session.add(entity)  
+            self.saldos.sumar(deltas_de([entity]))
             db.session.commit()  
             return entity
         except Exception as e:
             db.session.rollback()
             raise e
 
+    def add_all(self, entities: List[Stock]) -> List[Stock]:
+        # Un solo INSERT de varias filas y un solo commit para todo el lote
+        try:
+            rows = [
+                {key: value for key, value in entity.__dict__.items() if not key.startswith('_') and key != 'id'}
+                for entity in entities
+            ]
+            stocks = db.session.scalars(
+                insert(Stock).returning(Stock, sort_by_parameter_order=True), rows
+            ).all()
+            self.saldos.sumar(deltas_de(stocks))
+            db.session.commit()
+            return stocks
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def get_version(self, id: int):
+        """(producto_id, cantidad, entrada_salida, version) leídos de la base, sin pasar por la sesión ni la caché."""
+        return db.session.execute(
+            select(Stock.producto_id, Stock.cantidad, Stock.entrada_salida, Stock.version).where(Stock.id == id)
+        ).one_or_none()
+
+    def actualizar_cantidad(self, id: int, version: int, cantidad_anterior: float, cantidad: float) -> Optional[Stock]:
+        """
+        Compare-and-swap: cambia la cantidad del movimiento (y su saldo) solo si la fila
+        sigue en `version`. Devuelve None, sin escribir nada, si otro la cambió antes.
+        """
+        try:
+            fila = db.session.execute(
+                update(Stock)
+                .where(Stock.id == id, Stock.version == version)
+                .values(cantidad=cantidad, version=Stock.version + 1)
+                .returning(Stock.producto_id, Stock.entrada_salida)
+                .execution_options(synchronize_session=False)
+            ).one_or_none()
+            if fila is None:
+                db.session.rollback()
+                return None
+            self.saldos.sumar({fila.producto_id: aporte(cantidad, fila.entrada_salida)
+                               - aporte(cantidad_anterior, fila.entrada_salida)})
+            db.session.commit()
+            return db.session.get(Stock, id, populate_existing=True)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
     def get_all(self) -> List[Stock]:
         return Stock.query.all()
 
@@ -24,12 +80,18 @@ class StockRepository(Repository_add, Repository_get, Repository_delete):
 
     def delete(self, id: int) -> bool:
         try:
-            Stock = self.get_by_id(id)
-            if Stock:
-                db.session.delete(Stock)  
-                db.session.commit()  
-                return True
-            return False
+            # El saldo se corrige con lo que se borró, no con lo que se leyó antes
+            fila = db.session.execute(
+                delete(Stock).where(Stock.id == id)
+                .returning(Stock.producto_id, Stock.cantidad, Stock.entrada_salida)
+                .execution_options(synchronize_session=False)
+            ).one_or_none()
+            if fila is None:
+                db.session.rollback()
+                return False
+            self.saldos.sumar({fila.producto_id: -aporte(fila.cantidad, fila.entrada_salida)})
+            db.session.commit()
+            return True
         except Exception as e:
             db.session.rollback()
             raise e
@@ -1,12 +1,15 @@
 from flask import Blueprint, request
 from marshmallow import ValidationError
-from app.mapping import StockSchema, ResponseSchema
+from app.mapping import StockSchema, ReservaStockSchema, ResponseSchema
 from app.services import StockService, ResponseBuilder
+from app.services.idempotencia import idempotente
+from app.services.stock_services import ConflictoConcurrencia, ReservaNoActiva, StockInsuficiente
 from app import limiter
 
 Stock = Blueprint('Stock', __name__)
 service = StockService()
 stock_schema = StockSchema()
+reserva_schema = ReservaStockSchema()
 response_schema = ResponseSchema()
 
 @Stock.route('/stock', methods=['GET'])
@@ -40,6 +43,7 @@ def one(id):
 
 @Stock.route('/stock', methods=['POST'])
 @limiter.limit("100 per minute")
+@idempotente
 def add():
     response_builder = ResponseBuilder()
     try:
@@ -58,6 +62,44 @@ def add():
         response_builder.add_message("Error creating Stock").add_status_code(500).add_data(str(e))
         return response_schema.dump(response_builder.build()), 500
 
+@Stock.route('/stock/bulk', methods=['POST'])
+@limiter.limit("100 per minute")
+@idempotente
+def add_bulk():
+    response_builder = ResponseBuilder()
+    try:
+        json_data = request.json
+        if not json_data or not isinstance(json_data, list):
+            raise ValidationError("Expected a list of Stock")
+
+        items = [None] * len(json_data)
+        stocks = []
+        indices = []
+        for indice, item in enumerate(json_data):
+            try:
+                stocks.append(stock_schema.load(item))
+                indices.append(indice)
+            except ValidationError as err:
+                items[indice] = ResponseBuilder().add_message("Validation error").add_status_code(422).add_data(err.messages).build()
+
+        if stocks:
+            try:
+                creados = service.add_all(stocks)
+                for indice, creado in zip(indices, creados):
+                    items[indice] = ResponseBuilder().add_message("Stock created").add_status_code(201).add_data(stock_schema.dump(creado)).build()
+            except Exception as e:
+                for indice in indices:
+                    items[indice] = ResponseBuilder().add_message("Error creating Stock").add_status_code(500).add_data(str(e)).build()
+
+        response_builder.add_message("Batch processed").add_status_code(207).add_data(items)
+        return response_schema.dump(response_builder.build()), 207
+    except ValidationError as err:
+        response_builder.add_message("Validation error").add_status_code(422).add_data(err.messages)
+        return response_schema.dump(response_builder.build()), 422
+    except Exception as e:
+        response_builder.add_message("Error creating Stock").add_status_code(500).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 500
+
 @Stock.route('/stock/<int:id>', methods=['PUT'])
 @limiter.limit("100 per minute")
 def update(id):
@@ -79,12 +121,16 @@ def update(id):
     except ValidationError as err:
         response_builder.add_message("Validation error").add_status_code(422).add_data(err.messages)
         return response_schema.dump(response_builder.build()), 422
+    except ConflictoConcurrencia as e:
+        response_builder.add_message("Concurrent update, retry").add_status_code(409).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 409
     except Exception as e:
         response_builder.add_message("Error updating Stock").add_status_code(500).add_data(str(e))
         return response_schema.dump(response_builder.build()), 500
 
 @Stock.route('/stock/<int:id>', methods=['DELETE'])
 @limiter.limit("3 per minute")
+@idempotente
 def delete(id):
     response_builder = ResponseBuilder()
     try:
@@ -99,6 +145,7 @@ def delete(id):
         return response_schema.dump(response_builder.build()), 500
 @Stock.route('/stock/<int:id>/manage', methods=['POST'])
 @limiter.limit("100 per minute")
+@idempotente
 def manage(id):
     response_builder = ResponseBuilder()
     try:
@@ -115,6 +162,9 @@ def manage(id):
     except ValidationError as err:
         response_builder.add_message("Validation error").add_status_code(422).add_data(err.messages)
         return response_schema.dump(response_builder.build()), 422
+    except ConflictoConcurrencia as e:
+        response_builder.add_message("Concurrent update, retry").add_status_code(409).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 409
     except Exception as e:
         response_builder.add_message("Error managing stock").add_status_code(500).add_data(str(e))
         return response_schema.dump(response_builder.build()), 500
@@ -134,3 +184,123 @@ def get_stock_by_producto(producto_id):
     except Exception as e:
         response_builder.add_message("Error fetching stock").add_status_code(500).add_data(str(e))
         return response_schema.dump(response_builder.build()), 500
+
+@Stock.route('/stock/reservas', methods=['POST'])
+@limiter.limit("100 per minute")
+@idempotente
+def reservar():
+    response_builder = ResponseBuilder()
+    try:
+        json_data = request.json
+        if not json_data:
+            raise ValidationError("No data provided")
+
+        reserva = reserva_schema.load(json_data)
+        data = reserva_schema.dump(service.reservar_stock(reserva))
+        response_builder.add_message("Stock reserved").add_status_code(201).add_data(data)
+        return response_schema.dump(response_builder.build()), 201
+    except ValidationError as err:
+        response_builder.add_message("Validation error").add_status_code(422).add_data(err.messages)
+        return response_schema.dump(response_builder.build()), 422
+    except StockInsuficiente as e:
+        response_builder.add_message("Insufficient stock").add_status_code(409).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 409
+    except ConflictoConcurrencia as e:
+        response_builder.add_message("Concurrent update, retry").add_status_code(409).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 409
+    except Exception as e:
+        response_builder.add_message("Error reserving stock").add_status_code(500).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 500
+
+@Stock.route('/stock/reservas/<int:id>', methods=['GET'])
+@limiter.limit("100 per minute")
+def reserva(id):
+    response_builder = ResponseBuilder()
+    try:
+        data = service.find_reserva(id)
+        if data:
+            response_builder.add_message("Reservation found").add_status_code(200).add_data(reserva_schema.dump(data))
+            return response_schema.dump(response_builder.build()), 200
+        response_builder.add_message("Reservation not found").add_status_code(404).add_data({'id': id})
+        return response_schema.dump(response_builder.build()), 404
+    except Exception as e:
+        response_builder.add_message("Error fetching reservation").add_status_code(500).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 500
+
+@Stock.route('/stock/reservas/<int:id>/confirmacion', methods=['POST'])
+@limiter.limit("100 per minute")
+@idempotente
+def confirmar_reserva(id):
+    response_builder = ResponseBuilder()
+    try:
+        reserva = service.confirmar_reserva(id)
+        if not reserva:
+            response_builder.add_message("Reservation not found").add_status_code(404).add_data({'id': id})
+            return response_schema.dump(response_builder.build()), 404
+        response_builder.add_message("Reservation confirmed").add_status_code(200).add_data(reserva_schema.dump(reserva))
+        return response_schema.dump(response_builder.build()), 200
+    except ReservaNoActiva as e:
+        response_builder.add_message("Reservation expired").add_status_code(409).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 409
+    except Exception as e:
+        response_builder.add_message("Error confirming reservation").add_status_code(500).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 500
+
+def _reservar_item(item):
+    """Resultado de una reserva del lote, con el formato de ResponseBuilder."""
+    try:
+        reserva = reserva_schema.load(item)
+        data = reserva_schema.dump(service.reservar_stock(reserva))
+        return ResponseBuilder().add_message("Stock reserved").add_status_code(201).add_data(data).build()
+    except ValidationError as err:
+        return ResponseBuilder().add_message("Validation error").add_status_code(422).add_data(err.messages).build()
+    except StockInsuficiente as e:
+        return ResponseBuilder().add_message("Insufficient stock").add_status_code(409).add_data(str(e)).build()
+    except ConflictoConcurrencia as e:
+        return ResponseBuilder().add_message("Concurrent update, retry").add_status_code(409).add_data(str(e)).build()
+    except Exception as e:
+        return ResponseBuilder().add_message("Error reserving stock").add_status_code(500).add_data(str(e)).build()
+
+def _confirmar_item(id):
+    """Resultado de una confirmación del lote, con el formato de ResponseBuilder."""
+    if not isinstance(id, int) or isinstance(id, bool):
+        return ResponseBuilder().add_message("Validation error").add_status_code(422).add_data({'id': id}).build()
+    try:
+        reserva = service.confirmar_reserva(id)
+        if not reserva:
+            return ResponseBuilder().add_message("Reservation not found").add_status_code(404).add_data({'id': id}).build()
+        data = reserva_schema.dump(reserva)
+        return ResponseBuilder().add_message("Reservation confirmed").add_status_code(200).add_data(data).build()
+    except ReservaNoActiva as e:
+        return ResponseBuilder().add_message("Reservation expired").add_status_code(409).add_data(str(e)).build()
+    except Exception as e:
+        return ResponseBuilder().add_message("Error confirming reservation").add_status_code(500).add_data(str(e)).build()
+
+@Stock.route('/stock/reservas/bulk', methods=['POST'])
+@limiter.limit("100 per minute")
+@idempotente
+def reservar_bulk():
+    # Cada reserva hace su propio compare-and-swap: una sin stock no frena a las demás
+    response_builder = ResponseBuilder()
+    json_data = request.get_json(silent=True)
+    if not json_data or not isinstance(json_data, list):
+        response_builder.add_message("Validation error").add_status_code(422).add_data("Expected a list of reservations")
+        return response_schema.dump(response_builder.build()), 422
+
+    items = [_reservar_item(item) for item in json_data]
+    response_builder.add_message("Batch processed").add_status_code(207).add_data(items)
+    return response_schema.dump(response_builder.build()), 207
+
+@Stock.route('/stock/reservas/confirmacion/bulk', methods=['POST'])
+@limiter.limit("100 per minute")
+@idempotente
+def confirmar_reservas_bulk():
+    response_builder = ResponseBuilder()
+    json_data = request.get_json(silent=True)
+    if not json_data or not isinstance(json_data, list):
+        response_builder.add_message("Validation error").add_status_code(422).add_data("Expected a list of reservation ids")
+        return response_schema.dump(response_builder.build()), 422
+
+    items = [_confirmar_item(id) for id in json_data]
+    response_builder.add_message("Batch processed").add_status_code(207).add_data(items)
+    return response_schema.dump(response_builder.build()), 207
@@ -0,0 +1,69 @@
+import logging
+import random
+import threading
+import time
+
+from app.services.stock_services import StockService
+
+logger = logging.getLogger(__name__)
+
+
+class BarridoReservas:
+    """
+    Cada RESERVA_BARRIDO_S segundos marca como vencidas las reservas de stock que
+    pasaron su vencimiento, de a RESERVA_BARRIDO_LOTE por transacción. El disponible
+    no depende del barrido (las reservas vencidas ya no se descuentan): el barrido
+    mantiene chico el conjunto de reservas activas y avisa al orquestador.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.intervalo = float(app.config.get('RESERVA_BARRIDO_S', 30))
+        self.lote = int(app.config.get('RESERVA_BARRIDO_LOTE', 500))
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.barridos = 0
+        self.vencidas = 0
+        self.errores = 0
+        self.ultimo = None
+        app.extensions['barrido_reservas'] = self
+
+    def iniciar(self):
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._trabajar, name="barrido-reservas", daemon=True)
+        self._hilo.start()
+        logger.info(f"Barrido de reservas cada {self.intervalo}s, de a {self.lote}")
+
+    def barrer(self) -> int:
+        with self.app.app_context():
+            vencidas = StockService().vencer_reservas(self.lote)
+        with self._lock:
+            self.barridos += 1
+            self.vencidas += vencidas
+            self.ultimo = time.time()
+        if vencidas:
+            logger.info(f"{vencidas} reservas de stock vencidas")
+        return vencidas
+
+    def _trabajar(self):
+        while True:
+            # Con varios workers de gunicorn barriendo, el jitter los desfasa
+            time.sleep(self.intervalo * random.uniform(0.8, 1.2))
+            try:
+                self.barrer()
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                logger.error(f"Error barriendo reservas vencidas: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "intervalo_s": self.intervalo,
+                "lote": self.lote,
+                "barridos": self.barridos,
+                "vencidas": self.vencidas,
+                "errores": self.errores,
+                "ultimo": self.ultimo,
+            }
@@ -0,0 +1,78 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.services.stock_services import StockService
+
+logger = logging.getLogger(__name__)
+
+
+class CompactacionStock:
+    """
+    Con COMPACTACION_HABILITADA, cada COMPACTACION_S segundos pasa los movimientos de
+    stock con más de COMPACTACION_RETENCION_DIAS días a un corte por producto (ver
+    CorteStock), de a COMPACTACION_LOTE productos por transacción. Así la tabla stock
+    solo guarda la cola reciente y rehacer un saldo no recorre todo el historial.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.habilitada = bool(app.config.get('COMPACTACION_HABILITADA', False))
+        self.intervalo = float(app.config.get('COMPACTACION_S', 3600))
+        self.retencion = timedelta(days=float(app.config.get('COMPACTACION_RETENCION_DIAS', 30)))
+        self.lote = int(app.config.get('COMPACTACION_LOTE', 100))
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.corridas = 0
+        self.productos = 0
+        self.movimientos = 0
+        self.errores = 0
+        self.ultima = None
+        app.extensions['compactacion_stock'] = self
+
+    def iniciar(self):
+        if self._hilo is not None or not self.habilitada:
+            return
+        self._hilo = threading.Thread(target=self._trabajar, name="compactacion-stock", daemon=True)
+        self._hilo.start()
+        logger.info(f"Compactación de stock cada {self.intervalo}s, movimientos de más de {self.retencion.days} días")
+
+    def compactar(self, retencion=None) -> tuple[int, int]:
+        antes_de = datetime.now() - (self.retencion if retencion is None else retencion)
+        with self.app.app_context():
+            productos, movimientos = StockService().compactar(antes_de, self.lote)
+        with self._lock:
+            self.corridas += 1
+            self.productos += productos
+            self.movimientos += movimientos
+            self.ultima = time.time()
+        if movimientos:
+            logger.info(f"{movimientos} movimientos de {productos} productos archivados en cortes")
+        return productos, movimientos
+
+    def _trabajar(self):
+        while True:
+            # Con varios workers de gunicorn, el jitter los desfasa; el lock de la tabla los serializa
+            time.sleep(self.intervalo * random.uniform(0.8, 1.2))
+            try:
+                self.compactar()
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                logger.error(f"Error compactando movimientos de stock: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "habilitada": self.habilitada,
+                "intervalo_s": self.intervalo,
+                "retencion_dias": self.retencion.days,
+                "lote": self.lote,
+                "corridas": self.corridas,
+                "productos": self.productos,
+                "movimientos": self.movimientos,
+                "errores": self.errores,
+                "ultima": self.ultima,
+            }
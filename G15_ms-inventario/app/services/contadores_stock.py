@@ -0,0 +1,271 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+import redis
+
+from app import redis_client
+from app.models import ReservaStock
+from app.repositories import ReservaStockRepository
+from app.services.stock_notifier import STOCK_CANAL
+
+logger = logging.getLogger(__name__)
+
+DISPONIBLE = "stock:disponible:{}"
+# Sube con cada cambio del disponible de la base, haya contador o no: el contador se
+# arma solo si nada cambió entre la lectura de la base y el script
+VERSION = "stock:disponible:version:{}"
+PENDIENTE = "stock:reservas:pendiente"
+SECUENCIA = "stock:reservas:id"
+RESERVA = "stock:reserva:{}"
+STREAM = "stock:reservas"
+GRUPO = "escritura"
+
+# KEYS: disponible, secuencia, stream, pendiente, reserva (sin id, se completa acá)
+# ARGV: producto_id, cantidad, creada, vence, ttl de la reserva en Redis, canal de cambios
+# Devuelve {-1} sin contador o secuencia, {0, disponible} sin stock suficiente, {1, id} si reservó
+_RESERVAR = """
+local disponible = redis.call('GET', KEYS[1])
+if not disponible or redis.call('EXISTS', KEYS[2]) == 0 then
+    return {-1}
+end
+local cantidad = tonumber(ARGV[2])
+if tonumber(disponible) < cantidad then
+    return {0, disponible}
+end
+redis.call('INCRBYFLOAT', KEYS[1], -cantidad)
+local id = redis.call('INCR', KEYS[2])
+redis.call('HINCRBYFLOAT', KEYS[4], ARGV[1], cantidad)
+redis.call('HSET', KEYS[5] .. id, 'producto_id', ARGV[1], 'cantidad', ARGV[2], 'creada', ARGV[3], 'vence', ARGV[4])
+redis.call('EXPIRE', KEYS[5] .. id, ARGV[5])
+redis.call('XADD', KEYS[3], '*', 'id', id, 'producto_id', ARGV[1], 'cantidad', ARGV[2],
+           'creada', ARGV[3], 'vence', ARGV[4])
+redis.call('PUBLISH', ARGV[6], '{"producto_ids": [' .. ARGV[1] .. ']}')
+return {1, id}
+"""
+
+# KEYS: disponible, secuencia, pendiente, versión. ARGV: producto_id, disponible según la base,
+# último id de reserva, versión leída antes que la base. Devuelve nil si la versión cambió
+# Lo reservado que todavía no se escribió en la base no está en su disponible: se descuenta acá
+_INICIALIZAR = """
+if (redis.call('GET', KEYS[4]) or '0') ~= ARGV[4] then
+    return false
+end
+local pendiente = tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or '0')
+redis.call('SET', KEYS[1], tostring(tonumber(ARGV[2]) - pendiente), 'NX')
+redis.call('SET', KEYS[2], ARGV[3], 'NX')
+return redis.call('GET', KEYS[1])
+"""
+
+# KEYS: contador de disponible y versión de cada producto, alternados. ARGV: deltas en el
+# mismo orden. Solo cambia los contadores que existen; las versiones suben siempre
+_AJUSTAR = """
+for i, delta in ipairs(ARGV) do
+    local clave = KEYS[2 * i - 1]
+    if redis.call('EXISTS', clave) == 1 then
+        redis.call('INCRBYFLOAT', clave, delta)
+    end
+    redis.call('INCR', KEYS[2 * i])
+end
+return #ARGV
+"""
+
+
+def _fecha(texto):
+    return datetime.fromisoformat(texto)
+
+
+class ContadoresStock:
+    """
+    Con CONTADORES_REDIS_HABILITADO el disponible de cada producto vive en Redis y
+    reservar es un solo script: controla y descuenta el contador, numera la reserva,
+    la encola para escribirla en la base y publica el cambio de stock. Un hilo por
+    proceso escribe las reservas encoladas de a ESCRITURA_DIFERIDA_LOTE por
+    transacción, y retoma las que otro proceso leyó y no llegó a escribir.
+
+    El contador se arma desde la base la primera vez que se reserva el producto
+    (saldo menos las reservas activas, vencidas o no, y menos lo reservado sin
+    escribir) y lo mantienen los movimientos de stock, las reservas vencidas y la
+    reconstrucción de saldos. Las vencidas cuentan hasta que el barrido las devuelve:
+    si no, el contador las sumaría dos veces. Si el disponible cambió mientras se leía
+    la base, el contador no se arma y se vuelve a leer. Redis tiene que
+    guardar estas claves sin desalojarlas (maxmemory-policy noeviction).
+    """
+
+    def __init__(self, app, cliente=None):
+        self.app = app
+        self.cliente = cliente or redis_client
+        self.lote = int(app.config.get('ESCRITURA_DIFERIDA_LOTE', 500))
+        self.espera_ms = int(float(app.config.get('ESCRITURA_DIFERIDA_S', 0.2)) * 1000)
+        self.reclamo_ms = int(float(app.config.get('ESCRITURA_DIFERIDA_RECLAMO_S', 30)) * 1000)
+        self.ttl_reserva = int(float(app.config.get('RESERVA_TTL_S', 300))) + 3600
+        self._reservar = self.cliente.register_script(_RESERVAR)
+        self._inicializar = self.cliente.register_script(_INICIALIZAR)
+        self._ajustar = self.cliente.register_script(_AJUSTAR)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.reservadas = 0
+        self.rechazadas = 0
+        self.inicializados = 0
+        self.escritas = 0
+        self.reintentadas = 0
+        self.errores = 0
+        self.ultima_escritura = None
+        app.extensions['contadores_stock'] = self
+
+    def reservar(self, producto_id, cantidad, creada, vence):
+        """
+        Devuelve (id, None) si reservó, (None, disponible) si no alcanza el stock o
+        (None, None) si el contador no está armado.
+        """
+        estado, valor = (self._reservar(
+            keys=[DISPONIBLE.format(producto_id), SECUENCIA, STREAM, PENDIENTE, RESERVA.format("")],
+            args=[producto_id, repr(float(cantidad)), creada.isoformat(), vence.isoformat(),
+                  self.ttl_reserva, STOCK_CANAL],
+        ) + [None])[:2]
+        with self._lock:
+            if estado == 1:
+                self.reservadas += 1
+            elif estado == 0:
+                self.rechazadas += 1
+        if estado == 1:
+            return int(valor), None
+        return None, (float(valor) if estado == 0 else None)
+
+    def version(self, producto_id):
+        """Versión del disponible del producto; se lee antes que la base para armar el contador."""
+        return self.cliente.get(VERSION.format(producto_id)) or '0'
+
+    def inicializar(self, producto_id, disponible, ultimo_id, version):
+        """Arma el contador si no existe. None si el disponible cambió desde que se leyó `version`."""
+        valor = self._inicializar(keys=[DISPONIBLE.format(producto_id), SECUENCIA, PENDIENTE,
+                                        VERSION.format(producto_id)],
+                                  args=[producto_id, repr(float(disponible)), ultimo_id, version])
+        if valor is None:
+            return None
+        with self._lock:
+            self.inicializados += 1
+        return float(valor)
+
+    def disponible(self, producto_id):
+        valor = self.cliente.get(DISPONIBLE.format(producto_id))
+        return float(valor) if valor is not None else None
+
+    def ajustar(self, deltas):
+        """Suma los deltas a los contadores armados; los que no existen se arman después desde la base."""
+        deltas = {producto_id: delta for producto_id, delta in deltas.items() if delta}
+        if deltas:
+            self._ajustar(keys=[clave for producto_id in deltas
+                                for clave in (DISPONIBLE.format(producto_id), VERSION.format(producto_id))],
+                          args=[repr(float(delta)) for delta in deltas.values()])
+
+    def descartar(self, *productos_ids):
+        """Borra los contadores: el próximo pedido los arma desde la base."""
+        if productos_ids:
+            pipe = self.cliente.pipeline()
+            for producto_id in productos_ids:
+                pipe.delete(DISPONIBLE.format(producto_id))
+                pipe.incr(VERSION.format(producto_id))
+            pipe.execute()
+
+    def reserva(self, reserva_id):
+        """Reserva encolada que todavía puede no estar en la base, o None."""
+        campos = self.cliente.hgetall(RESERVA.format(reserva_id))
+        if not campos:
+            return None
+        return ReservaStock(id=reserva_id, producto_id=int(campos["producto_id"]), cantidad=float(campos["cantidad"]),
+                            estado=ReservaStock.ACTIVA, creada=_fecha(campos["creada"]), vence=_fecha(campos["vence"]))
+
+    def iniciar(self):
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._trabajar, name="escritura-diferida", daemon=True)
+        self._hilo.start()
+        logger.info(f"Escritura diferida de reservas de a {self.lote}")
+
+    def _crear_grupo(self):
+        try:
+            self.cliente.xgroup_create(STREAM, GRUPO, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def escribir(self, mensajes):
+        """Escribe en la base las reservas de estos mensajes del stream y los confirma."""
+        filas = [{"id": int(campos["id"]), "producto_id": int(campos["producto_id"]),
+                  "cantidad": float(campos["cantidad"]), "estado": ReservaStock.ACTIVA,
+                  "creada": _fecha(campos["creada"]), "vence": _fecha(campos["vence"])}
+                 for _, campos in mensajes if campos]
+        if filas:
+            with self.app.app_context():
+                ReservaStockRepository().add_diferidas(filas)
+        pipe = self.cliente.pipeline()
+        for fila in filas:
+            pipe.hincrbyfloat(PENDIENTE, fila["producto_id"], -fila["cantidad"])
+            pipe.delete(RESERVA.format(fila["id"]))
+            # Pasó de pendiente a la base: un contador que se arma ahora no puede usar lo leído antes
+            pipe.incr(VERSION.format(fila["producto_id"]))
+        ids = [id_mensaje for id_mensaje, _ in mensajes]
+        pipe.xack(STREAM, GRUPO, *ids)
+        # Ya están en la base: el stream solo guarda lo que falta escribir
+        pipe.xdel(STREAM, *ids)
+        pipe.execute()
+        with self._lock:
+            self.escritas += len(filas)
+            self.ultima_escritura = time.time()
+
+    def _trabajar(self):
+        consumidor = f"{socket.gethostname()}-{os.getpid()}"
+        espera = 1
+        while True:
+            try:
+                self._crear_grupo()
+                proximo_reclamo = 0.0
+                while True:
+                    mensajes = []
+                    if time.monotonic() >= proximo_reclamo:
+                        # Reservas que leyó un proceso que se cayó antes de escribirlas
+                        respuesta = self.cliente.xautoclaim(STREAM, GRUPO, consumidor, self.reclamo_ms, "0-0",
+                                                            count=self.lote)
+                        mensajes = respuesta[1] if respuesta else []
+                        proximo_reclamo = time.monotonic() + self.reclamo_ms / 2000
+                        with self._lock:
+                            self.reintentadas += len(mensajes)
+                    if not mensajes:
+                        respuesta = self.cliente.xreadgroup(GRUPO, consumidor, {STREAM: ">"}, count=self.lote,
+                                                            block=self.espera_ms)
+                        mensajes = [mensaje for _, lista in respuesta or [] for mensaje in lista]
+                    if mensajes:
+                        self.escribir(mensajes)
+                    espera = 1
+            except redis.RedisError as e:
+                logger.error(f"Escritura diferida sin Redis, reintenta en {espera}s: {e}")
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                logger.exception(f"Error escribiendo reservas diferidas, se reintentan: {e}")
+                time.sleep(1)
+
+    def snapshot(self):
+        try:
+            pendientes = self.cliente.xpending(STREAM, GRUPO)["pending"]
+            largo = self.cliente.xlen(STREAM)
+        except redis.ResponseError:
+            pendientes = largo = 0
+        with self._lock:
+            return {
+                "reservadas": self.reservadas,
+                "rechazadas": self.rechazadas,
+                "inicializados": self.inicializados,
+                "escritas": self.escritas,
+                "reintentadas": self.reintentadas,
+                "errores": self.errores,
+                "pendientes": pendientes,
+                "largo_stream": largo,
+                "ultima_escritura": self.ultima_escritura,
+            }
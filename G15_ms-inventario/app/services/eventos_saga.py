@@ -0,0 +1,44 @@
+import logging
+
+from marshmallow import ValidationError
+
+from app.mapping import ReservaStockSchema
+from app.services.coreografia import ConsumidorCoreografia, EventoCoreografia, stream_de
+from app.services.stock_services import StockService
+
+logger = logging.getLogger(__name__)
+
+reserva_schema = ReservaStockSchema()
+
+
+def _reservar_stock(saga_id, datos):
+    """
+    Retiene el stock con una reserva y, como inventario es el último paso, la confirma
+    enseguida: la saga ya terminó bien. Si algo falla la reserva no se devuelve, vence sola.
+    """
+    stock = datos.get("stock") or {}
+    service = StockService()
+    try:
+        reserva = service.reservar_stock(reserva_schema.load(
+            {"producto_id": stock.get("producto_id"), "cantidad": stock.get("cantidad")}
+        ))
+        reserva = service.confirmar_reserva(reserva.id)
+    except ValidationError as err:
+        return EventoCoreografia.STOCK_RECHAZADO, dict(datos, error=err.messages)
+    except Exception as e:
+        logger.error(f"Saga {saga_id}: error reservando el stock: {e}")
+        return EventoCoreografia.STOCK_RECHAZADO, dict(datos, error=str(e))
+    logger.info(f"Saga {saga_id}: reserva {reserva.id} confirmada (stock {reserva.stock_id})")
+    return EventoCoreografia.STOCK_RESERVADO, dict(datos, reserva_id=reserva.id, stock_id=reserva.stock_id)
+
+
+def configurar_coreografia(app):
+    """
+    Suscribe inventario a la saga de compra en modo coreografía, si COREOGRAFIA_HABILITADA.
+    Es el último paso: un rechazo acá lo compensan compras y después pagos.
+    """
+    if not app.config.get('COREOGRAFIA_HABILITADA'):
+        return None
+    return ConsumidorCoreografia(app, "inventario", {
+        stream_de("compras"): {EventoCoreografia.COMPRA_REGISTRADA: _reservar_stock},
+    })
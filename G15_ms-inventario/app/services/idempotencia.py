@@ -0,0 +1,130 @@
+import functools
+import hashlib
+import logging
+import time
+import uuid
+
+import redis
+from flask import current_app, make_response, request
+
+from app import redis_client
+from app.mapping.response_schema import ResponseSchema
+from app.services.json_rapido import dumps, loads
+from app.services.response_builder import ResponseBuilder
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+HEADER_REPETIDA = "Idempotent-Replayed"
+
+response_schema = ResponseSchema()
+
+
+def _clave_redis(clave):
+    return f"idempotencia:{request.method}:{request.path}:{clave}"
+
+
+def _error(mensaje, codigo, reintentar_en=None):
+    respuesta = make_response(
+        response_schema.dump(ResponseBuilder().add_message(mensaje).add_status_code(codigo).build()), codigo
+    )
+    if reintentar_en is not None:
+        respuesta.headers["Retry-After"] = str(reintentar_en)
+    return respuesta
+
+
+def _repetir(guardada):
+    respuesta = make_response(guardada["cuerpo"], guardada["codigo"])
+    respuesta.mimetype = guardada["tipo"]
+    respuesta.headers[HEADER_REPETIDA] = "true"
+    return respuesta
+
+
+def _esperar_resultado(clave, espera_max):
+    """Espera a que termine el pedido original con la misma clave; None si la clave se liberó."""
+    limite = time.monotonic() + espera_max
+    while True:
+        guardada = redis_client.get(clave)
+        if guardada is None:
+            return None
+        guardada = loads(guardada)
+        if guardada["estado"] == "hecho" or time.monotonic() >= limite:
+            return guardada
+        time.sleep(0.05)
+
+
+def _liberar(clave, token):
+    try:
+        guardada = redis_client.get(clave)
+        if guardada is not None and loads(guardada).get("token") == token:
+            redis_client.delete(clave)
+    except redis.RedisError as e:
+        logger.warning(f"No se pudo liberar la clave de idempotencia {clave}: {e}")
+
+
+def idempotente(fn):
+    """
+    Honra el header Idempotency-Key: la primera vez ejecuta la ruta y guarda la
+    respuesta en Redis por IDEMPOTENCIA_TTL_S; un reintento o un pedido duplicado
+    con la misma clave recibe esa respuesta sin volver a ejecutar. Si el original
+    todavía está en curso se lo espera hasta IDEMPOTENCIA_ESPERA_S y después se
+    responde 409. Los 5xx no se guardan, así el reintento vuelve a ejecutar.
+    Sin header, o sin Redis, la ruta se ejecuta como siempre.
+    """
+
+    @functools.wraps(fn)
+    def envoltura(*args, **kwargs):
+        clave = request.headers.get(HEADER)
+        if not clave:
+            return fn(*args, **kwargs)
+
+        clave = _clave_redis(clave)
+        huella = hashlib.sha256(request.get_data()).hexdigest()
+        token = str(uuid.uuid4())
+        en_curso = dumps({"estado": "en_curso", "huella": huella, "token": token})
+        try:
+            tomada = redis_client.set(
+                clave, en_curso, nx=True, ex=int(current_app.config.get('IDEMPOTENCIA_EN_CURSO_S', 30))
+            )
+            guardada = None if tomada else _esperar_resultado(
+                clave, float(current_app.config.get('IDEMPOTENCIA_ESPERA_S', 5))
+            )
+            # El original falló con 5xx y liberó la clave mientras se esperaba: se vuelve a intentar tomarla
+            if not tomada and guardada is None:
+                tomada = redis_client.set(
+                    clave, en_curso, nx=True, ex=int(current_app.config.get('IDEMPOTENCIA_EN_CURSO_S', 30))
+                )
+        except redis.RedisError as e:
+            logger.warning(f"Redis no disponible, se procesa sin idempotencia ({clave}): {e}")
+            return fn(*args, **kwargs)
+
+        if not tomada:
+            if guardada is None or guardada["estado"] != "hecho":
+                return _error("Hay un pedido con la misma Idempotency-Key en curso", 409, reintentar_en=1)
+            if guardada["huella"] != huella:
+                return _error("La Idempotency-Key ya se usó con otro cuerpo", 422)
+            logger.info(f"Respuesta repetida para {clave}")
+            return _repetir(guardada)
+
+        try:
+            respuesta = make_response(fn(*args, **kwargs))
+        except Exception:
+            _liberar(clave, token)
+            raise
+
+        if respuesta.status_code >= 500:
+            _liberar(clave, token)
+            return respuesta
+        try:
+            redis_client.set(clave, dumps({
+                "estado": "hecho",
+                "huella": huella,
+                "codigo": respuesta.status_code,
+                "tipo": respuesta.mimetype,
+                "cuerpo": respuesta.get_data(as_text=True),
+            }), ex=int(current_app.config.get('IDEMPOTENCIA_TTL_S', 86400)))
+        except redis.RedisError as e:
+            logger.warning(f"No se pudo guardar la respuesta de {clave}: {e}")
+        return respuesta
+
+    return envoltura
@@ -0,0 +1,25 @@
+import json
+import logging
+import os
+
+from app import redis_client
+
+logger = logging.getLogger(__name__)
+
+# El orquestador escucha este canal para invalidar su caché local de disponibilidad
+STOCK_CANAL = os.getenv('STOCK_CANAL', 'stock:cambios')
+
+
+def publicar_cambio_stock(*productos_ids):
+    """
+    Avisa que cambió el stock disponible de estos productos. Un solo mensaje por
+    operación (aunque sea un lote). Si Redis no responde no se corta la escritura:
+    el orquestador igual descarta sus entradas al vencer el TTL.
+    """
+    ids = sorted({int(producto_id) for producto_id in productos_ids if producto_id is not None})
+    if not ids:
+        return
+    try:
+        redis_client.publish(STOCK_CANAL, json.dumps({"producto_ids": ids}))
+    except Exception as e:
+        logger.warning(f"No se pudo publicar el cambio de stock de {ids}: {e}")
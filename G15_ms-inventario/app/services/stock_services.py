@@ -1,34 +1,82 @@
-from app import cache, redis_client  
-from app.models import Stock    
-from app.repositories import StockRepository
-from contextlib import contextmanager
-import time
+from app import cache
+from app.models import ReservaStock, Stock
+from app.repositories import CorteStockRepository, ReservaStockRepository, SaldoStockRepository, StockRepository
+from app.repositories.saldo_stock_repository import aporte, deltas_de
+from app.services.stock_notifier import publicar_cambio_stock
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import inspect
 import random
+import time
+
+
+class StockInsuficiente(Exception):
+    pass
+
+
+class ReservaNoActiva(Exception):
+    pass
+
+
+class ConflictoConcurrencia(Exception):
+    pass
+
 
 class StockService:
 
     CACHE_TIMEOUT = 60 
-    REDIS_LOCK_TIMEOUT = 10 
-
-    def __init__(self, repository=None):
-        self.repository = repository or StockRepository()
-
-    @contextmanager
-    def redis_lock(self, stock_id: int):
-        lock_key = f"stock_lock_{stock_id}"
-        lock_value = str(time.time())
-
-        if redis_client.set(lock_key, lock_value, ex=self.REDIS_LOCK_TIMEOUT, nx=True):
-            try:
-                yield
-            finally:
-                current = redis_client.get(lock_key)
-                if current is not None and isinstance(current, bytes):
-                    current = current.decode()
-                if current == lock_value:
-                    redis_client.delete(lock_key)
-        else:
-            raise Exception(f"El recurso está bloqueado para el stock {stock_id}.")
+
+    def __init__(self, repository=None, reservas=None, saldos=None, cortes=None):
+        self.saldos = saldos or SaldoStockRepository()
+        self.cortes = cortes or CorteStockRepository()
+        self.repository = repository or StockRepository(self.saldos)
+        self.reservas = reservas or ReservaStockRepository(self.saldos)
+
+    @staticmethod
+    def _contadores():
+        """ContadoresStock si el disponible vive en Redis (CONTADORES_REDIS_HABILITADO), si no None."""
+        return current_app.extensions.get('contadores_stock')
+
+    @staticmethod
+    def _cambio_stock(*productos_ids):
+        """
+        Cambió el disponible de estos productos: borra su caché (stock_producto_<id>, aparte
+        de la de filas stock_<id>) y avisa al orquestador.
+        """
+        claves = [f'stock_producto_{producto_id}' for producto_id in set(productos_ids) if producto_id is not None]
+        if claves:
+            cache.delete_many(*claves)
+        publicar_cambio_stock(*productos_ids)
+
+    def _ajustar_contadores(self, deltas):
+        contadores = self._contadores()
+        if contadores is not None:
+            contadores.ajustar(deltas)
+
+    @staticmethod
+    def _reintentar(intento, descripcion: str):
+        """
+        Corre `intento` hasta que devuelva algo distinto de None (None: otro cambió la
+        fila entre la lectura y el compare-and-swap), con espera exponencial al azar.
+        """
+        reintentos = int(current_app.config.get('CAS_REINTENTOS', 8))
+        espera = float(current_app.config.get('CAS_ESPERA_S', 0.002))
+        for numero in range(reintentos):
+            resultado = intento()
+            if resultado is not None:
+                return resultado
+            # Al azar: los que chocaron no vuelven a leer todos a la vez
+            time.sleep(random.uniform(0, espera * 2 ** numero))
+        raise ConflictoConcurrencia(f"{descripcion} cambió {reintentos} veces mientras se actualizaba.")
+
+    def all(self) -> list[Stock]:
+        cached_stocks = cache.get('stocks')
+        if cached_stocks is None:
+            stocks = self.repository.get_all()
+            if stocks:
+                cache.set('stocks', stocks, timeout=self.CACHE_TIMEOUT)
+            return stocks
+        return cached_stocks
 
     def find(self, stock_id: int) -> Stock:
         cached_stock = cache.get(f'stock_{stock_id}')
@@ -43,120 +91,218 @@ class StockService:
         new_stock = self.repository.add(stock)
         cache.set(f'stock_{new_stock.id}', new_stock, timeout=self.CACHE_TIMEOUT)
         cache.delete('stocks')
+        self._ajustar_contadores(deltas_de([new_stock]))
+        self._cambio_stock(new_stock.producto_id)
         return new_stock
 
-    def update(self, stock_id: int, updated_stock: Stock) -> Stock:
-        with self.redis_lock(stock_id):
-            existing_stock = self.find(stock_id)
-            if not existing_stock:
-                raise Exception(f"Stock con ID {stock_id} no encontrado.")
+    def add_all(self, stocks: list[Stock]) -> list[Stock]:
+        new_stocks = self.repository.add_all(stocks)
+        cache.set_many({f'stock_{s.id}': s for s in new_stocks}, timeout=self.CACHE_TIMEOUT)
+        cache.delete('stocks')
+        self._ajustar_contadores(deltas_de(new_stocks))
+        self._cambio_stock(*(s.producto_id for s in new_stocks))
+        return new_stocks
 
-            existing_stock.nombre = updated_stock.nombre
-            existing_stock.cantidad = updated_stock.cantidad
-            existing_stock.precio = updated_stock.precio
-            
-            saved_stock = self.repository.save(existing_stock)
-            
-            cache.set(f'stock_{stock_id}', saved_stock, timeout=self.CACHE_TIMEOUT)
-            cache.delete('stocks') 
-            return saved_stock
+    def update(self, stock_id: int, updated_stock: Stock) -> Stock:
+        return self._cambiar_cantidad(stock_id, lambda cantidad: updated_stock.cantidad)
 
     def delete(self, stock_id: int) -> bool:
-        with self.redis_lock(stock_id):
-            deleted = self.repository.delete(stock_id)
-            if deleted:
-                cache.delete(f'stock_{stock_id}')
-                cache.delete('stocks')
-            return deleted
+        stock = self.find(stock_id)
+        deleted = self.repository.delete(stock_id)
+        if deleted:
+            cache.delete(f'stock_{stock_id}')
+            cache.delete('stocks')
+            if stock:
+                self._ajustar_contadores({stock.producto_id: -aporte(stock.cantidad, stock.entrada_salida)})
+            self._cambio_stock(stock.producto_id if stock else None)
+        return deleted
 
     def manage_stock(self, stock_id: int, cantidad: int) -> Stock:
-        with self.redis_lock(stock_id):
-            stock = self.find(stock_id)
-            if not stock:
-                raise Exception(f"Stock con ID {stock_id} no encontrado.")
-            
-            nuevo_stock = stock.cantidad + cantidad
+        def nueva_cantidad(actual):
+            nuevo_stock = actual + cantidad
             if nuevo_stock < 0:
                 raise Exception(f"No hay suficiente stock para egresar {abs(cantidad)} unidades.")
-            
-            stock.cantidad = nuevo_stock
-            updated_stock = self.repository.save(stock)
+            return nuevo_stock
+        return self._cambiar_cantidad(stock_id, nueva_cantidad)
 
-            cache.set(f'stock_{stock_id}', updated_stock, timeout=self.CACHE_TIMEOUT)
-            cache.delete('stocks')
+    def _cambiar_cantidad(self, stock_id: int, nueva_cantidad) -> Stock:
+        """Compare-and-swap de la cantidad del movimiento contra la versión leída de la base."""
+        anterior = None
+
+        def intento():
+            nonlocal anterior
+            anterior = self.repository.get_version(stock_id)
+            if anterior is None:
+                raise Exception(f"Stock con ID {stock_id} no encontrado.")
+            return self.repository.actualizar_cantidad(stock_id, anterior.version, anterior.cantidad,
+                                                       nueva_cantidad(anterior.cantidad))
+
+        stock = self._reintentar(intento, f"El stock {stock_id}")
+        cache.set(f'stock_{stock_id}', stock, timeout=self.CACHE_TIMEOUT)
+        cache.delete('stocks')
+        self._ajustar_contadores({stock.producto_id: aporte(stock.cantidad, stock.entrada_salida)
+                                  - aporte(anterior.cantidad, anterior.entrada_salida)})
+        self._cambio_stock(stock.producto_id)
+        return stock
 
-            return updated_stock
-    
     def get_stock_disponible(self, producto_id: int) -> int:
-        """Calcula el stock disponible total para un producto sumando entradas y restando salidas"""
-        from sqlalchemy import func, case
-        from app import db
-        
-        result = db.session.query(
-            func.sum(
-                case(
-                    (Stock.entrada_salida == 1, Stock.cantidad),
-                    else_=-Stock.cantidad
-                )
-            )
-        ).filter(Stock.producto_id == producto_id).scalar()
-        
-        return int(result) if result else None
-        
-    def reservar_stock(self, data):
+        """Stock disponible de un producto: su saldo (entradas menos salidas) menos las reservas activas"""
+        contadores = self._contadores()
+        if contadores is not None:
+            disponible = contadores.disponible(producto_id)
+            if disponible is not None:
+                return int(disponible)
+            return self._disponible_en_base(producto_id)
+
+        cached_disponible = cache.get(f'stock_producto_{producto_id}')
+        if cached_disponible is None:
+            disponible = self._disponible_en_base(producto_id)
+            if disponible is not None:
+                cache.set(f'stock_producto_{producto_id}', disponible, timeout=self.CACHE_TIMEOUT)
+            return disponible
+        return cached_disponible
+
+    def _disponible_en_base(self, producto_id: int) -> int:
+        posicion = self.saldos.get_posicion(producto_id, datetime.now())
+        if posicion is None or not posicion.saldo:
+            return None
+        return int(posicion.saldo - posicion.reservado)
+
+    def reconstruir_saldos(self, producto_id: int = None) -> list[int]:
+        """Rehace saldo_stock desde la tabla stock. Devuelve los producto_id cuyo saldo estaba mal."""
+        corregidos = self.saldos.reconstruir(producto_id)
+        contadores = self._contadores()
+        if contadores is not None:
+            contadores.descartar(*corregidos)
+        self._cambio_stock(*corregidos)
+        return corregidos
+
+    def compactar(self, antes_de: datetime, lote: int) -> tuple[int, int]:
         """
-        Lógica para reservar stock (usada por la SAGA).
-        Devuelve una tupla (json, status_code).
+        Archiva los movimientos anteriores a `antes_de` en cortes por producto, de a
+        `lote` productos por transacción. El disponible no cambia. Devuelve
+        (productos, movimientos) compactados.
         """
-        try:
-            producto_id = int(data.get('producto_id'))
-            cantidad = int(data.get('cantidad', 1))
-
-            if random.random() < 0.2:
-                print(f"Fallo aleatorio provocado para producto {producto_id}")
-                return {"Error": "Fallo de stock simulado (Aleatorio)"}, 409
-
-            with self.redis_lock(producto_id):
-                stock = self.find(producto_id)
-                if not stock:
-                    return {"error": "Producto no encontrado en inventario"}, 404
-
-                if stock.cantidad < cantidad:
-                    return {"error": f"Stock insuficiente. Hay {stock.cantidad}"}, 409
-
-                stock.cantidad -= cantidad
-                updated_stock = self.repository.save(stock)
-                
-                cache.set(f'stock_{producto_id}', updated_stock, timeout=self.CACHE_TIMEOUT)
-                cache.delete('stocks')
-                
-                return {"mensaje": "Stock reservado", "stock_restante": stock.cantidad, "id": stock.id}, 200
-        except Exception as e:
-            return {"error": str(e)}, 500
-    
-    def compensar_stock(self, data):
+        productos = movimientos = 0
+        ultimo = 0
+        while True:
+            lote_productos = self.cortes.productos_a_compactar(antes_de, lote, ultimo)
+            if not lote_productos:
+                break
+            movimientos += self.cortes.compactar(lote_productos, antes_de)
+            productos += len(lote_productos)
+            ultimo = lote_productos[-1]
+        if movimientos:
+            cache.delete('stocks')
+        return productos, movimientos
+
+    def reservar_stock(self, reserva: ReservaStock) -> ReservaStock:
         """
-        Lógica para compensar (devolver) stock.
+        Retiene stock para una saga (ver ReservaStock). Si la saga falla no hace falta
+        devolver nada: la reserva vence sola a los RESERVA_TTL_S segundos.
         """
-        try:
-            producto_id = int(data.get('producto_id', data.get('id', 0)))
-            cantidad = int(data.get('cantidad', 1))
-
-            if producto_id == 0:
-                 return {"error": "ID de producto inválido"}, 400
-
-            with self.redis_lock(producto_id):
-                stock = self.find(producto_id)
-                if not stock:
-                    return {"mensaje": "Producto no encontrado, nada que compensar"}, 200
-                
-                stock.cantidad += cantidad
-                updated_stock = self.repository.save(stock)
-                
-                cache.set(f'stock_{producto_id}', updated_stock, timeout=self.CACHE_TIMEOUT)
-                cache.delete('stocks')
-                
-                print(f"[Compensación] Stock devuelto para {producto_id}")
-                return {"mensaje": "Compensación exitosa"}, 200
-        except Exception as e:
-            return {"error": str(e)}, 500
\ No newline at end of file
+        contadores = self._contadores()
+        if contadores is not None:
+            return self._reservar_con_contador(contadores, reserva)
+
+        def intento():
+            # Sin lock: la reserva se guarda solo si el saldo del producto sigue en la
+            # versión leída; si otra reserva o movimiento lo cambió, se vuelve a leer
+            ahora = datetime.now()
+            posicion = self.saldos.get_posicion(reserva.producto_id, ahora)
+            disponible = int(posicion.saldo - posicion.reservado) if posicion else 0
+            if disponible < reserva.cantidad:
+                raise StockInsuficiente(f"Stock insuficiente para el producto {reserva.producto_id}. Hay {disponible}")
+
+            nueva = ReservaStock(producto_id=reserva.producto_id, cantidad=reserva.cantidad,
+                                 estado=ReservaStock.ACTIVA, creada=ahora,
+                                 vence=ahora + timedelta(seconds=current_app.config.get('RESERVA_TTL_S', 300)))
+            return self.reservas.add_si_version(nueva, posicion.version)
+
+        nueva = self._reintentar(intento, f"El stock del producto {reserva.producto_id}")
+        self._cambio_stock(nueva.producto_id)
+        return nueva
+
+    def _reservar_con_contador(self, contadores, reserva: ReservaStock) -> ReservaStock:
+        """Un solo script en Redis; la reserva se escribe en la base después (ver ContadoresStock)."""
+        reserva.estado = ReservaStock.ACTIVA
+        reserva.creada = datetime.now()
+        reserva.vence = reserva.creada + timedelta(seconds=current_app.config.get('RESERVA_TTL_S', 300))
+
+        def reservar():
+            return contadores.reservar(reserva.producto_id, reserva.cantidad, reserva.creada, reserva.vence)
+
+        def intento():
+            reserva_id, disponible = reservar()
+            if reserva_id is None and disponible is None:
+                # Primera reserva del producto: el contador se arma desde la base, salvo que
+                # el disponible haya cambiado mientras se leía; entonces se vuelve a leer
+                version = contadores.version(reserva.producto_id)
+                if contadores.inicializar(reserva.producto_id, self._disponible_para_contador(reserva.producto_id),
+                                          self.reservas.ultimo_id(), version) is None:
+                    return None
+                reserva_id, disponible = reservar()
+            if reserva_id is not None:
+                reserva.id = reserva_id
+                return reserva
+            if disponible is not None:
+                raise StockInsuficiente(f"Stock insuficiente para el producto {reserva.producto_id}. Hay {int(disponible)}")
+            return None
+
+        return self._reintentar(intento, f"El stock del producto {reserva.producto_id}")
+
+    def _disponible_para_contador(self, producto_id: int) -> float:
+        """
+        Saldo menos todas las reservas activas, también las vencidas sin barrer: el barrido
+        las devuelve al contador después (ver vencer_reservas).
+        """
+        posicion = self.saldos.get_posicion(producto_id, None)
+        return posicion.saldo - posicion.reservado if posicion else 0
+
+    def find_reserva(self, reserva_id: int) -> ReservaStock:
+        reserva = self.reservas.get_by_id(reserva_id)
+        contadores = self._contadores()
+        if reserva is None and contadores is not None:
+            # Puede estar reservada en Redis y todavía sin escribir
+            return contadores.reserva(reserva_id)
+        return reserva
+
+    def confirmar_reserva(self, reserva_id: int) -> ReservaStock:
+        """
+        La saga terminó bien: la reserva pasa a ser una salida de stock. Confirmar dos
+        veces la misma reserva no registra otra salida. Devuelve None si no existe.
+        """
+        reserva = self.find_reserva(reserva_id)
+        if reserva is None or reserva.estado == ReservaStock.CONFIRMADA:
+            return reserva
+        if inspect(reserva).transient:
+            # Encolada en Redis: se escribe ya en vez de esperar a la escritura diferida
+            self.reservas.add_diferidas([{campo: getattr(reserva, campo) for campo in
+                                          ("id", "producto_id", "cantidad", "estado", "creada", "vence")}])
+            reserva = self.reservas.get_by_id(reserva_id)
+
+        ahora = datetime.now()
+        salida = Stock(producto_id=reserva.producto_id, fecha_transaccion=ahora,
+                       cantidad=reserva.cantidad, entrada_salida=2)
+        if self.reservas.confirmar(reserva, salida, ahora) is None:
+            raise ReservaNoActiva(f"La reserva {reserva_id} venció o ya no está activa.")
+        # El disponible no cambia: la reserva ya lo descontaba
+        cache.set(f'stock_{salida.id}', salida, timeout=self.CACHE_TIMEOUT)
+        cache.delete('stocks')
+        return reserva
+
+    def vencer_reservas(self, lote: int) -> int:
+        """Barre las reservas vencidas de a `lote` por transacción. Devuelve cuántas venció."""
+        total = 0
+        while True:
+            vencidas = self.reservas.vencer(datetime.now(), lote)
+            total += len(vencidas)
+            devueltas = {}
+            for producto_id, cantidad in vencidas:
+                devueltas[producto_id] = devueltas.get(producto_id, 0) + cantidad
+            # En la base ya no contaban en el disponible; el contador de Redis sí, hasta ahora
+            self._ajustar_contadores(devueltas)
+            # El orquestador puede tenerlo en caché
+            self._cambio_stock(*devueltas)
+            if len(vencidas) < lote:
+                return total
@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from opentelemetry import trace
+from opentelemetry.instrumentation.flask import FlaskInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import Decision, ParentBased, Sampler, SamplingResult, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer(__name__)
+
+
+class ExportadorArchivo(SpanExporter):
+    """Escribe cada span como una línea JSON en un archivo local; no necesita ningún backend."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def export(self, spans):
+        lineas = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.ruta, "a", encoding="utf-8") as archivo:
+                archivo.write(lineas)
+        except OSError as e:
+            logger.error(f"No se pudieron escribir {len(spans)} spans en {self.ruta}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+class MuestreoConPresupuesto(Sampler):
+    """
+    Muestreo en la cabeza de la traza: se queda con TRACING_MUESTREO de las trazas
+    nuevas y nunca con más de TRACING_MAX_TRAZAS_POR_SEG, así el costo del tracing
+    tiene un techo aunque el servicio esté a plena carga. Va dentro de ParentBased:
+    las trazas que vienen de otro servicio respetan la decisión del que las empezó.
+    """
+
+    def __init__(self, proporcion, max_por_seg):
+        self._proporcion = TraceIdRatioBased(proporcion)
+        self.max_por_seg = float(max_por_seg)
+        self._fichas = self.max_por_seg
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _tomar_ficha(self):
+        with self._lock:
+            ahora = time.monotonic()
+            self._fichas = min(self.max_por_seg, self._fichas + (ahora - self._ultima) * self.max_por_seg)
+            self._ultima = ahora
+            if self._fichas < 1:
+                return False
+            self._fichas -= 1
+            return True
+
+    def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None,
+                      trace_state=None):
+        resultado = self._proporcion.should_sample(parent_context, trace_id, name, kind, attributes, links,
+                                                   trace_state)
+        if resultado.decision == Decision.RECORD_AND_SAMPLE and not self._tomar_ficha():
+            return SamplingResult(Decision.DROP)
+        return resultado
+
+    def get_description(self):
+        return f"MuestreoConPresupuesto({self._proporcion.get_description()}, max={self.max_por_seg}/s)"
+
+
+def _antes_de_query(conn, cursor, statement, parameters, context, executemany):
+    # Las queries fuera de una traza muestreada no generan spans
+    if not trace.get_current_span().is_recording():
+        return
+    operacion = statement.split(None, 1)[0].upper() if statement else ""
+    context._span_traza = tracer.start_span(
+        f"db {operacion}",
+        kind=SpanKind.CLIENT,
+        attributes={"db.system": conn.dialect.name, "db.operation": operacion, "db.statement": statement[:500]},
+    )
+
+
+def _despues_de_query(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_span_traza", None)
+    if span is not None:
+        span.end()
+        context._span_traza = None
+
+
+def _error_de_query(contexto_excepcion):
+    span = getattr(contexto_excepcion.execution_context, "_span_traza", None)
+    if span is not None:
+        span.record_exception(contexto_excepcion.original_exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+        contexto_excepcion.execution_context._span_traza = None
+
+
+def configurar_tracing(app, nombre_servicio):
+    """
+    Spans de cada pedido entrante (leyendo el traceparent del que llamó) y de cada
+    query SQL, exportados a TRACING_ARCHIVO. Con TRACING_HABILITADO=false no se
+    instala nada y tracer queda como no-op.
+    """
+    if not app.config.get('TRACING_HABILITADO', True):
+        return
+    sampler = ParentBased(MuestreoConPresupuesto(
+        float(app.config.get('TRACING_MUESTREO', 0.1)),
+        float(app.config.get('TRACING_MAX_TRAZAS_POR_SEG', 50)),
+    ))
+    proveedor = TracerProvider(resource=Resource.create({"service.name": nombre_servicio}), sampler=sampler)
+    ruta = app.config.get('TRACING_ARCHIVO') or f"trazas/{nombre_servicio}.jsonl"
+    proveedor.add_span_processor(BatchSpanProcessor(ExportadorArchivo(ruta)))
+    trace.set_tracer_provider(proveedor)
+
+    FlaskInstrumentor().instrument_app(app)
+    if not event.contains(Engine, "before_cursor_execute", _antes_de_query):
+        event.listen(Engine, "before_cursor_execute", _antes_de_query)
+        event.listen(Engine, "after_cursor_execute", _despues_de_query)
+        event.listen(Engine, "handle_error", _error_de_query)
+    logger.info(f"Tracing de {nombre_servicio} activo: {sampler.get_description()} -> {ruta}")
+
+
+@contextmanager
+def span_lock_redis(clave):
+    """Span de un lock de Redis, desde que se pide hasta que se libera."""
+    with tracer.start_as_current_span("redis.lock", attributes={"db.system": "redis", "lock.clave": clave}) as span:
+        yield span
+
@@ -0,0 +1,93 @@
+"""
+Benchmark: cuánto cuesta calcular el saldo de un producto según su historial, sumando
+todos sus movimientos (la tabla stock sin compactar) contra el último corte más la
+cola de movimientos recientes (después de compactar), y leyendo saldo_stock.
+Informa también cuánto tarda la compactación.
+
+Corre en el proceso con SQLite en memoria y sin Redis. Cada corrida carga N
+movimientos viejos de un producto más --cola recientes; con 10M conviene una base
+en disco (SQLALCHEMY_DATABASE_URI=sqlite:////tmp/bench.db).
+
+    python -m benchmarks.bench_compactacion --movimientos 10000 1000000 10000000
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('TEST_DB_URI', os.environ['SQLALCHEMY_DATABASE_URI'])
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+os.environ.setdefault('TRACING_HABILITADO', 'false')
+
+from sqlalchemy import insert
+
+from app.config import cache_config
+
+cache_config.update(CACHE_TYPE='SimpleCache')
+
+from app import create_app, db
+from app.models import Stock
+from app.repositories import SaldoStockRepository
+from app.services import StockService
+
+PRODUCTO = 1
+
+
+def _cargar(movimientos, cola):
+    db.drop_all()
+    db.create_all()
+    viejo = datetime.now() - timedelta(days=365)
+    reciente = datetime.now()
+    for inicio in range(0, movimientos + cola, 50000):
+        db.session.execute(insert(Stock), [
+            {"producto_id": PRODUCTO, "fecha_transaccion": viejo if i < movimientos else reciente,
+             "cantidad": float(i % 7 + 1), "entrada_salida": 1 if i % 3 else 2}
+            for i in range(inicio, min(inicio + 50000, movimientos + cola))
+        ])
+    db.session.commit()
+
+
+def _medir(funcion, repeticiones):
+    """Mediana en ms."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movimientos", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--cola", type=int, default=1000, help="movimientos recientes que no se compactan")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+    saldos = SaldoStockRepository()
+
+    print(f"Saldo del producto {PRODUCTO}, cola de {args.cola} movimientos, mediana de {args.repeticiones} en ms")
+    print(f"{'movimientos':>12} {'historial':>11} {'corte+cola':>11} {'saldo_stock':>12} {'compactar':>11}")
+    with app.app_context():
+        for movimientos in args.movimientos:
+            _cargar(movimientos, args.cola)
+            historial = _medir(lambda: saldos.reconstruir(PRODUCTO), args.repeticiones)
+
+            inicio = time.perf_counter()
+            StockService().compactar(datetime.now() - timedelta(days=1), 100)
+            compactar = (time.perf_counter() - inicio) * 1000
+
+            corte = _medir(lambda: saldos.reconstruir(PRODUCTO), args.repeticiones)
+            lectura = _medir(lambda: saldos.get_saldo(PRODUCTO), args.repeticiones)
+            print(f"{movimientos:>12} {historial:>11.2f} {corte:>11.2f} {lectura:>12.3f} {compactar:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
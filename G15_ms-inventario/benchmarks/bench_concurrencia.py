@@ -0,0 +1,211 @@
+"""
+Benchmark: reservas por segundo sobre un mismo producto con 1, 10 y 100 hilos
+reservando a la vez, con el lock de Redis por producto de antes (SET NX, y si está
+tomado la reserva falla) contra el compare-and-swap sobre la versión de saldo_stock
+(StockService.reservar_stock, que reintenta al chocar).
+
+Informa reservas exitosas por segundo, p50/p99 de las exitosas, las rechazadas (lock
+ocupado, o ConflictoConcurrencia después de CAS_REINTENTOS), los demás errores
+(con SQLite, "database is locked" si la escritura espera demasiado), los choques del
+compare-and-swap por reserva y los comandos a Redis por reserva (la publicación del
+cambio de stock incluida).
+
+El modo lock necesita un Redis (REDIS_HOST, REDIS_PORT) y usa la base --redis-db (15),
+que vacía; sin Redis se mide solo el compare-and-swap. La base de datos es SQLite en
+disco salvo SQLALCHEMY_DATABASE_URI.
+
+    python -m benchmarks.bench_concurrencia --reservas 1000 --hilos 1 10 100
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--reservas", type=int, default=1000, help="reservas por corrida, repartidas entre los hilos")
+parser.add_argument("--hilos", type=int, nargs="+", default=[1, 10, 100])
+parser.add_argument("--redis-db", type=int, default=15)
+args = parser.parse_args()
+
+# redis_client se arma al importar app: la base de Redis se elige antes
+os.environ['REDIS_DB'] = str(args.redis_db)
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:////tmp/bench_concurrencia.db')
+os.environ.setdefault('TEST_DB_URI', os.environ['SQLALCHEMY_DATABASE_URI'])
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+os.environ.setdefault('TRACING_HABILITADO', 'false')
+
+import redis
+
+from app.config import cache_config
+
+cache_config.update(CACHE_TYPE='SimpleCache')
+
+from app import create_app, db, redis_client
+from app.models import ReservaStock, Stock
+from app.repositories import ReservaStockRepository, SaldoStockRepository
+from app.services import StockService
+from app.services.stock_notifier import publicar_cambio_stock
+from app.services.stock_services import ConflictoConcurrencia, StockInsuficiente
+
+PRODUCTO = 1
+
+_hilo = threading.local()
+
+
+def _contar_llamadas(cliente):
+    """Cuenta los comandos a Redis del hilo que reserva."""
+    original = cliente.execute_command
+
+    def contando(*partes, **opciones):
+        _hilo.llamadas = getattr(_hilo, "llamadas", 0) + 1
+        return original(*partes, **opciones)
+
+    cliente.execute_command = contando
+
+
+class _ReservasContando(ReservaStockRepository):
+    def add_si_version(self, entity, version):
+        nueva = super().add_si_version(entity, version)
+        if nueva is None:
+            _hilo.choques += 1
+        return nueva
+
+
+@contextmanager
+def _redis_lock(clave):
+    """El lock por producto que usaba reservar_stock antes del compare-and-swap."""
+    valor = str(time.time())
+    if not redis_client.set(clave, valor, ex=10, nx=True):
+        raise Exception(f"El recurso está bloqueado para el stock {clave}.")
+    try:
+        yield
+    finally:
+        if redis_client.get(clave) == valor:
+            redis_client.delete(clave)
+
+
+def _reservar_con_lock(servicio, reserva):
+    with _redis_lock(f"stock_lock_producto_{reserva.producto_id}"):
+        disponible = servicio._disponible_en_base(reserva.producto_id) or 0
+        if disponible < reserva.cantidad:
+            raise StockInsuficiente(f"Stock insuficiente para el producto {reserva.producto_id}. Hay {disponible}")
+        reserva.estado = ReservaStock.ACTIVA
+        reserva.creada = datetime.now()
+        reserva.vence = reserva.creada + timedelta(seconds=300)
+        nueva = servicio.reservas.add(reserva)
+    publicar_cambio_stock(nueva.producto_id)
+    return nueva
+
+
+def _cargar(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        StockService().add(Stock(producto_id=PRODUCTO, fecha_transaccion=datetime.now(), cantidad=1e9,
+                                 entrada_salida=1))
+
+
+def medir(app, modo, hilos):
+    latencias = []
+    llamadas = []
+    choques = [0]
+    rechazadas = [0]
+    errores = [0]
+    siguiente = iter(range(args.reservas))
+    lock = threading.Lock()
+
+    def trabajar():
+        saldos = SaldoStockRepository()
+        servicio = StockService(saldos=saldos, reservas=_ReservasContando(saldos))
+        with app.app_context():
+            while True:
+                with lock:
+                    numero = next(siguiente, None)
+                if numero is None:
+                    break
+                _hilo.llamadas = 0
+                _hilo.choques = 0
+                reserva = ReservaStock(producto_id=PRODUCTO, cantidad=1)
+                inicio = time.perf_counter()
+                try:
+                    if modo == "lock":
+                        _reservar_con_lock(servicio, reserva)
+                    else:
+                        servicio.reservar_stock(reserva)
+                except ConflictoConcurrencia:
+                    with lock:
+                        rechazadas[0] += 1
+                        choques[0] += _hilo.choques
+                    continue
+                except Exception as e:
+                    with lock:
+                        if modo == "lock" and "bloqueado" in str(e):
+                            rechazadas[0] += 1
+                        else:
+                            errores[0] += 1
+                    continue
+                fin = time.perf_counter()
+                with lock:
+                    latencias.append((fin - inicio) * 1000)
+                    llamadas.append(_hilo.llamadas)
+                    choques[0] += _hilo.choques
+            db.session.remove()
+
+    trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    duracion = time.perf_counter() - inicio
+    latencias.sort()
+    with app.app_context():
+        en_base = ReservaStock.query.count()
+    return {
+        "por_seg": len(latencias) / duracion,
+        "p50": latencias[len(latencias) // 2] if latencias else 0,
+        "p99": latencias[int(len(latencias) * 0.99)] if latencias else 0,
+        "rechazadas": rechazadas[0],
+        "errores": errores[0],
+        "choques": choques[0] / args.reservas,
+        "llamadas": sum(llamadas) / len(llamadas) if llamadas else 0,
+        "exitosas": len(latencias),
+        "en_base": en_base,
+    }
+
+
+def main():
+    modos = ["lock", "cas"]
+    try:
+        redis_client.ping()
+        redis_client.flushdb()
+    except redis.RedisError as e:
+        print(f"Sin Redis ({e}): solo compare-and-swap")
+        modos = ["cas"]
+
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+    _contar_llamadas(redis_client)
+
+    print(f"{args.reservas} reservas de una unidad sobre el producto {PRODUCTO}")
+    print(f"{'hilos':>5} {'modo':<5} {'exitosas/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'rechazadas':>11} {'errores':>8} "
+          f"{'choques/res':>12} {'redis/res':>10}")
+    for hilos in args.hilos:
+        for modo in modos:
+            _cargar(app)
+            r = medir(app, modo, hilos)
+            print(f"{hilos:>5} {modo:<5} {r['por_seg']:>11.1f} {r['p50']:>8.2f} {r['p99']:>8.2f} "
+                  f"{r['rechazadas']:>11} {r['errores']:>8} {r['choques']:>12.2f} {r['llamadas']:>10.1f}")
+            if r["en_base"] != r["exitosas"]:
+                print(f"      {r['en_base']} reservas en la base para {r['exitosas']} exitosas")
+    if "lock" in modos:
+        redis_client.flushdb()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: latencia de StockService.reservar_stock y llamadas a Redis por reserva,
+con la reserva escrita en la base en el momento (compare-and-swap sobre la versión
+de saldo_stock), contra los contadores en Redis (un script por reserva y escritura
+diferida en lotes).
+
+Hilos en el proceso reservan de a una unidad sobre --productos productos con stock
+de sobra; en el modo cas, dos reservas del mismo producto a la vez chocan y la
+segunda reintenta (si se queda sin reintentos se cuenta como error). Al final espera
+a que la escritura diferida deje todas las reservas en la base y lo verifica.
+
+Necesita un Redis (REDIS_HOST, REDIS_PORT) y usa la base --redis-db (15), que vacía.
+La base de datos es SQLite en disco salvo SQLALCHEMY_DATABASE_URI.
+
+    python -m benchmarks.bench_reservas --reservas 2000 --concurrencia 8 --productos 10
+"""
+import argparse
+import logging
+import os
+import statistics
+import threading
+import time
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--reservas", type=int, default=2000)
+parser.add_argument("--concurrencia", type=int, default=8)
+parser.add_argument("--productos", type=int, default=10)
+parser.add_argument("--redis-db", type=int, default=15)
+args = parser.parse_args()
+
+# redis_client se arma al importar app: la base de Redis se elige antes
+os.environ['REDIS_DB'] = str(args.redis_db)
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:////tmp/bench_reservas.db')
+os.environ.setdefault('TEST_DB_URI', os.environ['SQLALCHEMY_DATABASE_URI'])
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+os.environ.setdefault('TRACING_HABILITADO', 'false')
+
+import redis
+
+from app.config import cache_config
+
+cache_config.update(CACHE_TYPE='SimpleCache')
+
+from app import create_app, db, redis_client
+from app.models import ReservaStock, Stock
+from app.services import StockService
+from app.services.contadores_stock import ContadoresStock
+
+_llamadas = threading.local()
+
+
+def _contar_llamadas(cliente):
+    """Cuenta los comandos a Redis del hilo que reserva (scripts incluidos; la escritura diferida no)."""
+    original = cliente.execute_command
+
+    def contando(*partes, **opciones):
+        _llamadas.total = getattr(_llamadas, "total", 0) + 1
+        return original(*partes, **opciones)
+
+    cliente.execute_command = contando
+
+
+def _cargar(app):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        StockService().add_all([
+            Stock(producto_id=producto_id, fecha_transaccion=datetime.now(), cantidad=1e9, entrada_salida=1)
+            for producto_id in range(1, args.productos + 1)
+        ])
+    redis_client.flushdb()
+
+
+def medir(app):
+    latencias = []
+    llamadas = []
+    errores = [0]
+    siguiente = iter(range(args.reservas))
+    lock = threading.Lock()
+
+    def trabajar():
+        servicio = StockService()
+        with app.app_context():
+            while True:
+                with lock:
+                    numero = next(siguiente, None)
+                if numero is None:
+                    break
+                _llamadas.total = 0
+                inicio = time.perf_counter()
+                try:
+                    servicio.reservar_stock(ReservaStock(producto_id=numero % args.productos + 1, cantidad=1))
+                except Exception:
+                    with lock:
+                        errores[0] += 1
+                    continue
+                fin = time.perf_counter()
+                with lock:
+                    latencias.append((fin - inicio) * 1000)
+                    llamadas.append(_llamadas.total)
+
+    hilos = [threading.Thread(target=trabajar) for _ in range(args.concurrencia)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "por_seg": len(latencias) / duracion,
+        "p50": latencias[len(latencias) // 2] if latencias else 0,
+        "p99": latencias[int(len(latencias) * 0.99)] if latencias else 0,
+        "llamadas": statistics.mean(llamadas) if llamadas else 0,
+        "errores": errores[0],
+        "exitosas": len(latencias),
+    }
+
+
+def main():
+    try:
+        redis_client.ping()
+    except redis.RedisError as e:
+        parser.exit(2, f"Hace falta un Redis (REDIS_HOST/REDIS_PORT): {e}\n")
+
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+    _contar_llamadas(redis_client)
+
+    print(f"{args.reservas} reservas, concurrencia {args.concurrencia}, {args.productos} productos")
+    print(f"{'modo':<10} {'reservas/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'redis/reserva':>14} {'errores':>8}")
+    for modo in ("cas", "contador"):
+        _cargar(app)
+        app.extensions.pop('contadores_stock', None)
+        contadores = None
+        if modo == "contador":
+            contadores = ContadoresStock(app)
+            contadores.iniciar()
+        r = medir(app)
+        print(f"{modo:<10} {r['por_seg']:>11.1f} {r['p50']:>8.3f} {r['p99']:>8.3f} {r['llamadas']:>14.1f} "
+              f"{r['errores']:>8}")
+        if contadores is not None:
+            limite = time.monotonic() + 30
+            with app.app_context():
+                while ReservaStock.query.count() < r["exitosas"] and time.monotonic() < limite:
+                    time.sleep(0.1)
+                escritas = ReservaStock.query.count()
+            print(f"{'':<10} escritura diferida: {escritas} de {r['exitosas']} reservas en la base")
+    app.extensions.pop('contadores_stock', None)
+    redis_client.flushdb()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: latencia de GET /api/v1/stock/producto/<id> según el largo de la tabla
+stock, sumando todos los movimientos del producto en cada lectura (como antes; sin
+y con el índice ix_stock_producto) contra leer su fila de saldo_stock con sus
+reservas en una consulta, y contra la caché stock_producto_<id>.
+
+Corre en el proceso, con SQLite en memoria y cache SimpleCache: no hacen falta
+Postgres ni Redis (con RedisCache la lectura cacheada suma un viaje a Redis). Los
+movimientos se reparten entre --productos productos.
+
+    python -m benchmarks.bench_saldo --filas 1000 10000 100000 --pedidos 500
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('TEST_DB_URI', 'sqlite://')
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+os.environ.setdefault('REDIS_HOST', 'localhost')
+os.environ.setdefault('REDIS_PORT', '6379')
+os.environ.setdefault('TRACING_HABILITADO', 'false')
+
+from sqlalchemy import case, func, insert, text
+
+from app.config import cache_config
+
+cache_config.update(CACHE_TYPE='SimpleCache')
+
+from app import create_app, db, limiter
+from app.models import Stock
+from app.services import StockService
+from app.services import stock_services
+
+
+def _disponible_sumando(self, producto_id):
+    """get_stock_disponible de antes de saldo_stock: suma los movimientos del producto."""
+    result = db.session.query(
+        func.sum(case((Stock.entrada_salida == 1, Stock.cantidad), else_=-Stock.cantidad))
+    ).filter(Stock.producto_id == producto_id).scalar()
+    if not result:
+        return None
+    return int(result - self.reservas.cantidad_reservada(producto_id, datetime.now()))
+
+
+def _disponible_sin_cache(self, producto_id):
+    return self._disponible_en_base(producto_id)
+
+
+def _indice(app, crear):
+    with app.app_context():
+        db.session.execute(text("CREATE INDEX ix_stock_producto ON stock (producto_id, id)" if crear
+                                else "DROP INDEX ix_stock_producto"))
+        db.session.commit()
+
+
+def _cargar(app, filas, productos):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        fecha = datetime(2024, 1, 1, 12, 0, 0)
+        for inicio in range(0, filas, 10000):
+            db.session.execute(insert(Stock), [
+                {"producto_id": i % productos + 1, "fecha_transaccion": fecha,
+                 "cantidad": float(i % 7 + 1), "entrada_salida": 1 if i % 3 else 2}
+                for i in range(inicio, min(inicio + 10000, filas))
+            ])
+        db.session.commit()
+        StockService().reconstruir_saldos()
+
+
+def _medir(cliente, pedidos, productos):
+    """Latencias (ms) de GET /api/v1/stock/producto/<id>, recorriendo los productos."""
+    for producto_id in range(1, 21):
+        cliente.get(f"/api/v1/stock/producto/{producto_id % productos + 1}")
+    latencias = []
+    for numero in range(pedidos):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(f"/api/v1/stock/producto/{numero % productos + 1}")
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        assert respuesta.status_code == 200, respuesta.get_data()
+    latencias.sort()
+    return latencias[len(latencias) // 2], latencias[int(len(latencias) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--productos", type=int, default=10)
+    parser.add_argument("--pedidos", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    app = create_app()
+    limiter.enabled = False
+    cliente = app.test_client()
+    con_cache = stock_services.StockService.get_stock_disponible
+    modos = (("suma sin indice", _disponible_sumando), ("suma", _disponible_sumando),
+             ("saldo", _disponible_sin_cache), ("cache", con_cache))
+
+    print(f"GET /api/v1/stock/producto/<id>, {args.pedidos} pedidos por corrida, {args.productos} productos, ms")
+    print(f"{'filas':>8} {'lectura':>16} {'p50':>8} {'p99':>8}")
+    for filas in args.filas:
+        _cargar(app, filas, args.productos)
+        resultados = {}
+        for nombre, funcion in modos:
+            if nombre == "suma sin indice":
+                _indice(app, crear=False)
+            stock_services.StockService.get_stock_disponible = funcion
+            resultados[nombre] = _medir(cliente, args.pedidos, args.productos)
+            if nombre == "suma sin indice":
+                _indice(app, crear=True)
+        stock_services.StockService.get_stock_disponible = con_cache
+        for nombre, (p50, p99) in resultados.items():
+            print(f"{filas:>8} {nombre:>16} {p50:>8.3f} {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
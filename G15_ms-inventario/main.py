@@ -6,6 +6,33 @@ app.app_context().push()
 
 with app.app_context():
     db.create_all()
+    # create_all no agrega columnas a tablas que ya existen: la versión del compare-and-swap
+    from sqlalchemy import inspect, text
+    for tabla in ("stock", "saldo_stock"):
+        if "version" not in {columna["name"] for columna in inspect(db.engine).get_columns(tabla)}:
+            db.session.execute(text(f"ALTER TABLE {tabla} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+            db.session.commit()
+    from app.models import SaldoStock, Stock
+    # Tampoco crea los índices nuevos de tablas que ya existen (ix_stock_producto)
+    for indice in Stock.__table__.indexes:
+        indice.create(db.engine, checkfirst=True)
+    # Primer arranque con saldo_stock: se arma desde los movimientos que ya hay
+    if SaldoStock.query.first() is None and Stock.query.first() is not None:
+        from app.services import StockService
+        StockService().reconstruir_saldos()
+
+
+def iniciar_hilos(*_):
+    # Con gunicorn se llama en cada worker después del fork: los hilos no sobreviven al fork
+    consumidor = app.extensions.get('coreografia')
+    if consumidor is not None:
+        consumidor.iniciar_workers()
+    app.extensions['barrido_reservas'].iniciar()
+    app.extensions['compactacion_stock'].iniciar()
+    contadores = app.extensions.get('contadores_stock')
+    if contadores is not None:
+        contadores.iniciar()
+
 
 # Configurar ejecución según el entorno
 if __name__ == "__main__":
@@ -31,9 +58,11 @@ if __name__ == "__main__":
         options = {
             "bind": "0.0.0.0:5001",  # El puerto en el que Gunicorn escucha
             "workers": 3,  # Número de trabajadores
+            "post_fork": iniciar_hilos,
             "access-logfile": "-"  # Muestra los logs de acceso en la terminal
             }
         GunicornApp(app, options).run()
     else:
         # Usar servidor Flask en desarrollo
+        iniciar_hilos()
         app.run(host="0.0.0.0", port=5001, debug=True)
@@ -0,0 +1,69 @@
+import os
+import unittest
+from unittest import mock
+
+from app import create_app, db, limiter
+from app.models import Stock
+from app.routes import stock_resource
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _stock(self, producto_id, cantidad=10, entrada_salida=1):
+        return {"producto_id": producto_id, "fecha_transaccion": "2024-09-13T15:30:00", "cantidad": cantidad,
+                "entrada_salida": entrada_salida}
+
+    def test_bulk_resultado_por_item_en_orden(self):
+        invalido = dict(self._stock(2), entrada_salida=3)
+        lote = [self._stock(1, 5), invalido, self._stock(3, 7)]
+        respuesta = self.client.post('/api/v1/stock/bulk', json=lote)
+
+        self.assertEqual(respuesta.status_code, 207)
+        items = respuesta.get_json()['data']
+        self.assertEqual([item['status_code'] for item in items], [201, 422, 201])
+        self.assertIn('entrada_salida', items[1]['data'])
+        self.assertEqual((items[0]['data']['producto_id'], items[0]['data']['cantidad']), (1, 5))
+        self.assertEqual((items[2]['data']['producto_id'], items[2]['data']['cantidad']), (3, 7))
+        self.assertEqual(stock_resource.service.get_stock_disponible(3), 7)
+
+    def test_bulk_entradas_y_salidas_mueven_el_disponible(self):
+        lote = [self._stock(1, 10), self._stock(2, 5), self._stock(1, 4, entrada_salida=2), self._stock(1, 1)]
+        respuesta = self.client.post('/api/v1/stock/bulk', json=lote)
+
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [201] * 4)
+        self.assertEqual(stock_resource.service.get_stock_disponible(1), 7)
+        self.assertEqual(stock_resource.service.get_stock_disponible(2), 5)
+
+    def test_bulk_que_falla_no_mueve_el_saldo(self):
+        self.client.post('/api/v1/stock/bulk', json=[self._stock(1, 10)])
+        lote = [self._stock(1, 5), {"producto_id": 2}, self._stock(1, 3, entrada_salida=2)]
+        with mock.patch.object(db.session, 'commit', side_effect=Exception("sin base")):
+            respuesta = self.client.post('/api/v1/stock/bulk', json=lote)
+
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [500, 422, 500])
+        # Movimientos y saldo van en la misma transacción: se deshacen juntos y el contador no se toca
+        self.assertEqual(Stock.query.count(), 1)
+        self.assertEqual(stock_resource.service.get_stock_disponible(1), 10)
+
+    def test_bulk_sin_lista(self):
+        respuesta = self.client.post('/api/v1/stock/bulk', json=self._stock(1))
+        self.assertEqual(respuesta.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from app import create_app, db, limiter
+from app.models import ReservaStock, Stock
+from app.repositories import SaldoStockRepository, StockRepository
+from app.routes import stock_resource
+from app.services import StockService
+from app.services.stock_services import ConflictoConcurrencia
+
+
+class _StockConOtroEscritor(StockRepository):
+    """Después de cada lectura otro escritor cambia el movimiento: la versión leída queda vieja."""
+
+    def __init__(self, saldos, choques):
+        super().__init__(saldos)
+        self.choques = choques
+        self.lecturas = 0
+        self.intentos = 0
+
+    def get_version(self, id):
+        leida = super().get_version(id)
+        self.lecturas += 1
+        if self.lecturas <= self.choques:
+            db.session.execute(db.text("UPDATE stock SET version = version + 1 WHERE id = :id"), {"id": id})
+            db.session.commit()
+        return leida
+
+    def actualizar_cantidad(self, id, version, cantidad_anterior, cantidad):
+        self.intentos += 1
+        return super().actualizar_cantidad(id, version, cantidad_anterior, cantidad)
+
+
+class _SaldoConOtroEscritor(SaldoStockRepository):
+    """Después de cada lectura otro escritor cambia el saldo del producto."""
+
+    def __init__(self, choques):
+        super().__init__()
+        self.choques = choques
+        self.lecturas = 0
+
+    def get_posicion(self, producto_id, ahora):
+        leida = super().get_posicion(producto_id, ahora)
+        self.lecturas += 1
+        if self.lecturas <= self.choques:
+            db.session.execute(db.text("UPDATE saldo_stock SET version = version + 1 WHERE producto_id = :id"),
+                               {"id": producto_id})
+            db.session.commit()
+        return leida
+
+
+class ConcurrenciaTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app.config.update(CAS_REINTENTOS=3, CAS_ESPERA_S=0)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+        self.stock = StockService().add(Stock(producto_id=1, fecha_transaccion=datetime(2020, 1, 1),
+                                              cantidad=10.0, entrada_salida=1))
+
+    def tearDown(self):
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _servicio(self, stock_choques=0, saldo_choques=0):
+        saldos = _SaldoConOtroEscritor(saldo_choques)
+        return StockService(repository=_StockConOtroEscritor(saldos, stock_choques), saldos=saldos)
+
+    def test_actualizar_cantidad_reintenta_con_version_vieja(self):
+        servicio = self._servicio(stock_choques=1)
+        stock = servicio.manage_stock(self.stock.id, 5)
+        self.assertEqual(stock.cantidad, 15.0)
+        self.assertEqual(servicio.repository.intentos, 2)
+        self.assertEqual(servicio.get_stock_disponible(1), 15)
+
+    def test_actualizar_cantidad_da_409_tras_los_reintentos(self):
+        servicio = self._servicio(stock_choques=99)
+        with self.assertRaises(ConflictoConcurrencia):
+            servicio.manage_stock(self.stock.id, 5)
+        self.assertEqual(servicio.repository.intentos, 3)
+
+        with mock.patch.object(stock_resource, 'service', servicio):
+            respuesta = self.client.put(f'/api/v1/stock/{self.stock.id}', json={
+                "producto_id": 1, "fecha_transaccion": "2020-01-01T00:00:00", "cantidad": 20, "entrada_salida": 1})
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(db.session.get(Stock, self.stock.id, populate_existing=True).cantidad, 10.0)
+
+    def test_reservar_stock_reintenta_con_version_vieja(self):
+        servicio = self._servicio(saldo_choques=2)
+        reserva = servicio.reservar_stock(ReservaStock(producto_id=1, cantidad=4))
+        self.assertEqual(reserva.estado, ReservaStock.ACTIVA)
+        self.assertEqual(servicio.saldos.lecturas, 3)
+        self.assertEqual(servicio.get_stock_disponible(1), 6)
+
+    def test_reservar_stock_da_409_tras_los_reintentos(self):
+        servicio = self._servicio(saldo_choques=99)
+        with self.assertRaises(ConflictoConcurrencia):
+            servicio.reservar_stock(ReservaStock(producto_id=1, cantidad=4))
+        self.assertEqual(servicio.saldos.lecturas, 3)
+
+        with mock.patch.object(stock_resource, 'service', servicio):
+            respuesta = self.client.post('/api/v1/stock/reservas', json={"producto_id": 1, "cantidad": 4})
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.get_json()['message'], "Concurrent update, retry")
+        self.assertEqual(ReservaStock.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, redis_client
+from app.models import ReservaStock, Stock
+from app.repositories import ReservaStockRepository
+from app.services import StockService
+from app.services.contadores_stock import ContadoresStock
+from app.services.stock_services import StockInsuficiente
+
+
+class ContadoresStockTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app.config.update(CAS_ESPERA_S=0)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.__borrar_claves()
+        # Sin iniciar el hilo de escritura diferida: las reservas quedan pendientes en Redis
+        self.contadores = ContadoresStock(self.app)
+        self.service = StockService()
+
+    def tearDown(self):
+        self.app.extensions.pop('contadores_stock', None)
+        self.__borrar_claves()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_reserva_vencida_sin_barrer_no_se_devuelve_dos_veces(self):
+        self.service.add(self.__get_stock(10.0))
+        ahora = datetime.now()
+        db.session.add(ReservaStock(producto_id=1, cantidad=3.0, estado=ReservaStock.ACTIVA,
+                                    creada=ahora - timedelta(minutes=10), vence=ahora - timedelta(minutes=5)))
+        db.session.commit()
+
+        # El contador se arma con la vencida todavía retenida; el barrido la devuelve una sola vez
+        self.service.reservar_stock(ReservaStock(producto_id=1, cantidad=1))
+        self.assertEqual(self.contadores.disponible(1), 6.0)
+        self.assertEqual(self.service.vencer_reservas(100), 1)
+        self.assertEqual(self.contadores.disponible(1), 9.0)
+
+        self.service.reservar_stock(ReservaStock(producto_id=1, cantidad=9))
+        with self.assertRaises(StockInsuficiente):
+            self.service.reservar_stock(ReservaStock(producto_id=1, cantidad=1))
+
+    def test_cambio_mientras_se_arma_el_contador(self):
+        self.service.add(self.__get_stock(10.0))
+        salida = self.service.add(self.__get_stock(4.0, entrada_salida=2))
+        service = self.service
+
+        class ReservasConBorrado(ReservaStockRepository):
+            borrados = 0
+
+            def ultimo_id(self):
+                # Entre la lectura de la base y el script se borra la salida
+                if not self.borrados:
+                    self.borrados += 1
+                    service.delete(salida.id)
+                return super().ultimo_id()
+
+        self.service.reservas = ReservasConBorrado(self.service.saldos)
+        self.service.reservar_stock(ReservaStock(producto_id=1, cantidad=2))
+        self.assertEqual(self.service.reservas.borrados, 1)
+        self.assertEqual(self.contadores.disponible(1), 8.0)
+
+    def test_descartar_durante_el_armado(self):
+        self.service.add(self.__get_stock(10.0))
+        version = self.contadores.version(1)
+        self.contadores.descartar(1)
+        self.assertIsNone(self.contadores.inicializar(1, 10.0, 0, version))
+        self.assertIsNone(self.contadores.disponible(1))
+        self.assertEqual(self.contadores.inicializar(1, 10.0, 0, self.contadores.version(1)), 10.0)
+
+    def __borrar_claves(self):
+        claves = list(redis_client.scan_iter("stock:*"))
+        if claves:
+            redis_client.delete(*claves)
+
+    def __get_stock(self, cantidad, entrada_salida=1):
+        return Stock(producto_id=1, fecha_transaccion=datetime(2020, 1, 1), cantidad=cantidad,
+                     entrada_salida=entrada_salida)
+
+
+if __name__ == '__main__':
+    unittest.main()
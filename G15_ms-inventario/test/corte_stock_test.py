@@ -0,0 +1,58 @@
+import os
+import unittest
+from datetime import datetime
+from app import create_app, db
+from app.models import Stock, StockArchivado
+from app.repositories import CorteStockRepository, SaldoStockRepository, StockRepository
+
+
+class CorteStockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.FECHA_VIEJA = datetime(2020, 1, 1, 0, 0, 0)
+        self.FECHA_NUEVA = datetime(2024, 1, 1, 0, 0, 0)
+        self.CORTE = datetime(2023, 1, 1, 0, 0, 0)
+
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.saldos = SaldoStockRepository()
+        self.cortes = CorteStockRepository()
+        self.repository = StockRepository(self.saldos)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_compactar(self):
+        self.repository.add_all([
+            self.__get_stock(1, 10.0, 1, self.FECHA_VIEJA),
+            self.__get_stock(1, 4.0, 2, self.FECHA_VIEJA),
+            self.__get_stock(1, 1.0, 1, self.FECHA_NUEVA),
+        ])
+        self.assertEqual(self.cortes.productos_a_compactar(self.CORTE, 10), [1])
+        self.assertEqual(self.cortes.compactar([1], self.CORTE), 2)
+
+        corte = self.cortes.ultimo(1)
+        self.assertEqual(corte.saldo, 6.0)
+        self.assertEqual(corte.movimientos, 2)
+        self.assertEqual(Stock.query.count(), 1)
+        self.assertEqual(StockArchivado.query.filter_by(corte_id=corte.id).count(), 2)
+
+        # El saldo no cambia y se puede rehacer con el corte más la cola
+        self.assertEqual(self.saldos.get_saldo(1), 7.0)
+        self.assertEqual(self.saldos.reconstruir(), [])
+
+    def __get_stock(self, producto_id, cantidad, entrada_salida, fecha):
+        stock = Stock()
+        stock.producto_id = producto_id
+        stock.fecha_transaccion = fecha
+        stock.cantidad = cantidad
+        stock.entrada_salida = entrada_salida
+
+        return stock
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import unittest
+import uuid
+from datetime import datetime
+
+from app import create_app, db, limiter, redis_client
+from app.models import ReservaStock, Stock
+from app.services import StockService
+from app.services.idempotencia import HEADER, HEADER_REPETIDA
+
+
+class IdempotenciaTestCase(unittest.TestCase):
+    """
+    Un reintento con la misma clave devuelve la reserva original aunque el stock ya
+    se haya movido: no descuenta otra vez ni responde con el disponible de ahora.
+    """
+
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app.config['IDEMPOTENCIA_ESPERA_S'] = 0.2
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+        self.service = StockService()
+        self.ingreso = self.service.add(Stock(producto_id=1, fecha_transaccion=datetime(2020, 1, 1), cantidad=10.0,
+                                              entrada_salida=1))
+        self.clave = str(uuid.uuid4())
+        self.claves_redis = []
+
+    def tearDown(self):
+        for clave in self.claves_redis:
+            redis_client.delete(clave)
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _post(self, url, cuerpo=None, clave=None):
+        clave = clave or self.clave
+        self.claves_redis.append(f"idempotencia:POST:{url}:{clave}")
+        return self.client.post(url, json=cuerpo, headers={HEADER: clave})
+
+    def _reservar(self, cantidad, clave=None):
+        return self._post('/api/v1/stock/reservas', {"producto_id": 1, "cantidad": cantidad}, clave)
+
+    def test_reserva_repetida_despues_de_que_se_movio_el_stock(self):
+        primera = self._reservar(6)
+        # Otra saga se lleva el resto: con el contador en 0 una reserva nueva de 6 daría 409
+        self.assertEqual(self._reservar(4, clave=str(uuid.uuid4())).status_code, 201)
+        self.assertEqual(self.service.get_stock_disponible(1), 0)
+
+        segunda = self._reservar(6)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(segunda.get_json()['data']['id'], primera.get_json()['data']['id'])
+        self.assertEqual(ReservaStock.query.count(), 2)
+        self.assertEqual(self.service.get_stock_disponible(1), 0)
+
+    def test_rechazo_por_falta_de_stock_se_repite_aunque_entre_stock(self):
+        self.assertEqual(self._reservar(15).status_code, 409)
+        self.service.manage_stock(self.ingreso.id, 10)
+
+        # Con la misma clave sigue siendo el mismo pedido rechazado; para reintentar hace falta otra clave
+        segunda = self._reservar(15)
+        self.assertEqual(segunda.status_code, 409)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(self._reservar(15, clave=str(uuid.uuid4())).status_code, 201)
+
+    def test_ajuste_repetido_no_se_aplica_dos_veces(self):
+        url = f'/api/v1/stock/{self.ingreso.id}/manage'
+        primera = self._post(url, {"cantidad": -3})
+        segunda = self._post(url, {"cantidad": -3})
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(self.service.get_stock_disponible(1), 7)
+
+    def test_confirmacion_repetida_no_mueve_el_libro_otra_vez(self):
+        reserva_id = self._reservar(4).get_json()['data']['id']
+        url = f'/api/v1/stock/reservas/{reserva_id}/confirmacion'
+
+        self.assertEqual(self._post(url).status_code, 200)
+        segunda = self._post(url)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(Stock.query.filter_by(entrada_salida=2).count(), 1)
+        self.assertEqual(self.service.get_stock_disponible(1), 6)
+
+    def test_lote_de_reservas_repetido(self):
+        lote = [{"producto_id": 1, "cantidad": 6}, {"producto_id": 1, "cantidad": 6}]
+        primera = self._post('/api/v1/stock/reservas/bulk', lote)
+        segunda = self._post('/api/v1/stock/reservas/bulk', lote)
+
+        # El segundo ítem no tuvo stock la primera vez y tampoco se reintenta en la repetición
+        self.assertEqual([item['status_code'] for item in segunda.get_json()['data']], [201, 409])
+        self.assertEqual(segunda.get_json()['data'][0]['data']['id'], primera.get_json()['data'][0]['data']['id'])
+        self.assertEqual(ReservaStock.query.count(), 1)
+        self.assertEqual(self.service.get_stock_disponible(1), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
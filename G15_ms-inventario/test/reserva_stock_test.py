@@ -0,0 +1,118 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, limiter
+from app.models import ReservaStock, Stock
+from app.services import StockService
+from app.services.coreografia import EventoCoreografia
+from app.services.eventos_saga import _reservar_stock
+
+
+class ReservaStockTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+        self.service = StockService()
+        self.service.add(Stock(producto_id=1, fecha_transaccion=datetime(2020, 1, 1), cantidad=10.0,
+                               entrada_salida=1))
+
+    def tearDown(self):
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _reservar(self, cantidad):
+        return self.client.post('/api/v1/stock/reservas', json={"producto_id": 1, "cantidad": cantidad})
+
+    def test_reservar_descuenta_el_disponible(self):
+        respuesta = self._reservar(4)
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.get_json()['data']['estado'], ReservaStock.ACTIVA)
+        self.assertEqual(self.service.get_stock_disponible(1), 6)
+        # Sin movimiento en el libro hasta que se confirma
+        self.assertEqual(Stock.query.count(), 1)
+
+        self.assertEqual(self._reservar(7).status_code, 409)
+
+    def test_confirmar_una_sola_vez(self):
+        reserva_id = self._reservar(4).get_json()['data']['id']
+        url = f'/api/v1/stock/reservas/{reserva_id}/confirmacion'
+
+        primera = self.client.post(url)
+        segunda = self.client.post(url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.get_json()['data']['estado'], ReservaStock.CONFIRMADA)
+        self.assertEqual(Stock.query.filter_by(entrada_salida=2).count(), 1)
+        self.assertEqual(self.service.get_stock_disponible(1), 6)
+
+    def test_confirmar_vencida_da_409(self):
+        reserva_id = self._reservar(4).get_json()['data']['id']
+        db.session.get(ReservaStock, reserva_id).vence = datetime.now() - timedelta(seconds=1)
+        db.session.commit()
+
+        respuesta = self.client.post(f'/api/v1/stock/reservas/{reserva_id}/confirmacion')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(Stock.query.filter_by(entrada_salida=2).count(), 0)
+        self.assertEqual(self.service.get_stock_disponible(1), 10)
+
+    def test_barrido_por_lotes(self):
+        ids = [self._reservar(1).get_json()['data']['id'] for _ in range(5)]
+        vigente = self._reservar(2).get_json()['data']['id']
+        ReservaStock.query.filter(ReservaStock.id.in_(ids)).update(
+            {ReservaStock.vence: datetime.now() - timedelta(seconds=1)}, synchronize_session=False)
+        db.session.commit()
+
+        self.assertEqual(self.service.vencer_reservas(2), 5)
+        self.assertEqual(ReservaStock.query.filter_by(estado=ReservaStock.VENCIDA).count(), 5)
+        self.assertEqual(db.session.get(ReservaStock, vigente).estado, ReservaStock.ACTIVA)
+        self.assertEqual(self.service.get_stock_disponible(1), 8)
+        self.assertEqual(self.service.vencer_reservas(2), 0)
+
+    def test_reservar_bulk_cada_item_por_su_lado(self):
+        lote = [{"producto_id": 1, "cantidad": 6}, {"producto_id": 1}, {"producto_id": 1, "cantidad": 6},
+                {"producto_id": 1, "cantidad": 4}]
+        respuesta = self.client.post('/api/v1/stock/reservas/bulk', json=lote)
+
+        self.assertEqual(respuesta.status_code, 207)
+        items = respuesta.get_json()['data']
+        self.assertEqual([item['status_code'] for item in items], [201, 422, 409, 201])
+        self.assertEqual(ReservaStock.query.count(), 2)
+        self.assertEqual(self.service.get_stock_disponible(1), 0)
+        self.assertEqual(self.client.post('/api/v1/stock/reservas/bulk', json={"producto_id": 1}).status_code, 422)
+
+    def test_confirmar_bulk(self):
+        confirmada = self._reservar(2).get_json()['data']['id']
+        vencida = self._reservar(3).get_json()['data']['id']
+        db.session.get(ReservaStock, vencida).vence = datetime.now() - timedelta(seconds=1)
+        db.session.commit()
+        self.client.post(f'/api/v1/stock/reservas/{confirmada}/confirmacion')
+
+        respuesta = self.client.post('/api/v1/stock/reservas/confirmacion/bulk',
+                                     json=[confirmada, vencida, 999, "x"])
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [200, 409, 404, 422])
+        # La que ya estaba confirmada no registra otra salida
+        self.assertEqual(Stock.query.filter_by(entrada_salida=2).count(), 1)
+
+    def test_coreografia_reserva_y_confirma(self):
+        evento, datos = _reservar_stock("saga-1", {"stock": {"producto_id": 1, "cantidad": 3}})
+        self.assertEqual(evento, EventoCoreografia.STOCK_RESERVADO)
+        self.assertEqual(db.session.get(ReservaStock, datos["reserva_id"]).estado, ReservaStock.CONFIRMADA)
+        self.assertEqual(db.session.get(Stock, datos["stock_id"]).entrada_salida, 2)
+        self.assertEqual(self.service.get_stock_disponible(1), 7)
+
+        evento, _ = _reservar_stock("saga-2", {"stock": {"producto_id": 1, "cantidad": 8}})
+        self.assertEqual(evento, EventoCoreografia.STOCK_RECHAZADO)
+        self.assertEqual(self.service.get_stock_disponible(1), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
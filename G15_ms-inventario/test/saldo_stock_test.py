@@ -0,0 +1,73 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import ReservaStock, Stock
+from app.repositories import SaldoStockRepository, StockRepository
+
+
+class SaldoStockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.FECHA_PRUEBA = datetime(2020, 1, 1, 0, 0, 0)
+
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.saldos = SaldoStockRepository()
+        self.repository = StockRepository(self.saldos)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_saldo_sigue_a_los_movimientos(self):
+        entrada = self.repository.add(self.__get_stock(1, 10.0, 1))
+        self.repository.add_all([self.__get_stock(1, 4.0, 2), self.__get_stock(2, 3.0, 1)])
+        self.assertEqual(self.saldos.get_saldo(1), 6.0)
+        self.assertEqual(self.saldos.get_saldo(2), 3.0)
+
+        self.assertIsNone(self.repository.actualizar_cantidad(entrada.id, entrada.version + 1, 10.0, 12.0))
+        self.repository.actualizar_cantidad(entrada.id, entrada.version, 10.0, 12.0)
+        self.assertEqual(self.saldos.get_saldo(1), 8.0)
+        self.assertEqual(self.repository.get_version(entrada.id).version, 2)
+
+        self.repository.delete(entrada.id)
+        self.assertEqual(self.saldos.get_saldo(1), -4.0)
+
+    def test_reconstruir(self):
+        self.repository.add(self.__get_stock(1, 10.0, 1))
+        db.session.execute(db.text("UPDATE saldo_stock SET saldo = 99"))
+        db.session.commit()
+
+        self.assertEqual(self.saldos.reconstruir(), [1])
+        self.assertEqual(self.saldos.get_saldo(1), 10.0)
+        self.assertEqual(self.saldos.reconstruir(), [])
+
+    def test_posicion(self):
+        self.repository.add(self.__get_stock(1, 10.0, 1))
+        ahora = datetime.now()
+        db.session.add_all([
+            ReservaStock(producto_id=1, cantidad=3.0, creada=ahora, vence=ahora + timedelta(minutes=5)),
+            ReservaStock(producto_id=1, cantidad=2.0, creada=ahora, vence=ahora - timedelta(minutes=1)),
+            ReservaStock(producto_id=2, cantidad=4.0, creada=ahora, vence=ahora + timedelta(minutes=5)),
+        ])
+        db.session.commit()
+
+        posicion = self.saldos.get_posicion(1, ahora)
+        self.assertEqual((posicion.saldo, posicion.version, posicion.reservado), (10.0, 1, 3.0))
+        self.assertIsNone(self.saldos.get_posicion(3, ahora))
+
+    def __get_stock(self, producto_id, cantidad, entrada_salida):
+        stock = Stock()
+        stock.producto_id = producto_id
+        stock.fecha_transaccion = self.FECHA_PRUEBA
+        stock.cantidad = cantidad
+        stock.entrada_salida = entrada_salida
+
+        return stock
+
+if __name__ == '__main__':
+    unittest.main()
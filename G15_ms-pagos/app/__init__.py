@@ -42,7 +42,10 @@ except redis.ConnectionError as e:
     logger.error(f"Error al conectar con Redis: {e}")
 
 def create_app():
+    from app.services.json_rapido import ProveedorJsonRapido
+
     app = Flask(__name__)
+    app.json = ProveedorJsonRapido(app)
     app_context = os.getenv('FLASK_ENV', 'development')
     
     try:
@@ -63,6 +66,12 @@ def create_app():
     except Exception as e:
         raise RuntimeError(f"Error al inicializar extensiones: {e}")
 
+    from app.services.tracing import configurar_tracing
+    configurar_tracing(app, "ms-pagos")
+
+    from app.services.eventos_saga import configurar_coreografia
+    configurar_coreografia(app)
+
     try:
         from app.routes import Pagos
         app.register_blueprint(Pagos, url_prefix='/api/v1')
@@ -73,4 +82,11 @@ def create_app():
     def ping():
         return {"message": "El servicio de pagos está en funcionamiento"}
 
+    @app.route('/metricas/coreografia', methods=['GET'])
+    def metricas_coreografia():
+        consumidor = app.extensions.get('coreografia')
+        if consumidor is None:
+            return {"habilitada": False}
+        return dict(consumidor.snapshot(), habilitada=True)
+
     return app
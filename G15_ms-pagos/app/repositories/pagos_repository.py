@@ -1,4 +1,5 @@
 from typing import List
+from sqlalchemy import insert
 from app import db
 from app.models import Pagos
 from .repository import Repository_delete, Repository_get, Repository_save
@@ -13,6 +14,22 @@ class PagosRepository(Repository_save, Repository_get, Repository_delete):
             db.session.rollback()
             raise e
 
+    def save_all(self, entities: List[Pagos]) -> List[Pagos]:
+        # Un solo INSERT de varias filas y un solo commit para todo el lote
+        try:
+            rows = [
+                {key: value for key, value in entity.__dict__.items() if not key.startswith('_') and key != 'id'}
+                for entity in entities
+            ]
+            pagos = db.session.scalars(
+                insert(Pagos).returning(Pagos, sort_by_parameter_order=True), rows
+            ).all()
+            db.session.commit()
+            return pagos
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
     def get_all(self) -> List[Pagos]:
         return Pagos.query.all()
 
@@ -3,6 +3,7 @@ from marshmallow import ValidationError
 from app import limiter
 from app.mapping import PagosSchema, ResponseSchema
 from app.services import PagosService, ResponseBuilder
+from app.services.idempotencia import idempotente
 
 Pagos = Blueprint('Pagos', __name__)  
 service = PagosService()
@@ -11,6 +12,7 @@ response_schema = ResponseSchema()
 
 @Pagos.route('/pagos/transaccion', methods=['POST'])
 @limiter.limit("5 per minute")
+@idempotente
 def realizar_transaccion():
     response_builder = ResponseBuilder()
     try:
@@ -24,7 +26,10 @@ def realizar_transaccion():
         if resultado['code'] == 409:
             response_builder.add_message("Transacción fallida: Fondos insuficientes").add_status_code(409)
             return response_schema.dump(response_builder.build()), 409
-        
+        if resultado['code'] == 500:
+            response_builder.add_message("Error procesando transacción").add_status_code(500)
+            return response_schema.dump(response_builder.build()), 500
+
         data = pagos_schema.dump(resultado['data'])
         response_builder.add_message("Transacción exitosa").add_status_code(201).add_data(data)
         return response_schema.dump(response_builder.build()), 201
@@ -36,8 +41,49 @@ def realizar_transaccion():
         response_builder.add_message("Error procesando transacción").add_status_code(500).add_data(str(e))
         return response_schema.dump(response_builder.build()), 500
 
+@Pagos.route('/pagos/transaccion/bulk', methods=['POST'])
+@limiter.limit("5 per minute")
+@idempotente
+def realizar_transacciones():
+    response_builder = ResponseBuilder()
+    try:
+        json_data = request.json
+        if not json_data or not isinstance(json_data, list):
+            raise ValidationError("Se esperaba una lista de pagos")
+
+        items = [None] * len(json_data)
+        pagos = []
+        indices = []
+        for indice, item in enumerate(json_data):
+            try:
+                pagos.append(pagos_schema.load(item))
+                indices.append(indice)
+            except ValidationError as err:
+                items[indice] = ResponseBuilder().add_message("Validation error").add_status_code(422).add_data(err.messages).build()
+
+        resultados = service.realizar_transacciones(pagos) if pagos else []
+        for indice, resultado in zip(indices, resultados):
+            if resultado['code'] == 409:
+                items[indice] = ResponseBuilder().add_message("Transacción fallida: Fondos insuficientes").add_status_code(409).build()
+            elif resultado['code'] == 500:
+                items[indice] = ResponseBuilder().add_message("Error procesando transacción").add_status_code(500).build()
+            else:
+                data = pagos_schema.dump(resultado['data'])
+                items[indice] = ResponseBuilder().add_message("Transacción exitosa").add_status_code(201).add_data(data).build()
+
+        response_builder.add_message("Lote procesado").add_status_code(207).add_data(items)
+        return response_schema.dump(response_builder.build()), 207
+
+    except ValidationError as err:
+        response_builder.add_message("Validation error").add_status_code(422).add_data(err.messages)
+        return response_schema.dump(response_builder.build()), 422
+    except Exception as e:
+        response_builder.add_message("Error procesando lote de transacciones").add_status_code(500).add_data(str(e))
+        return response_schema.dump(response_builder.build()), 500
+
 @Pagos.route('/pagos/<int:id>/compensacion', methods=['POST'])
 @limiter.limit("5 per minute")
+@idempotente
 def compensar_transaccion(id):
     response_builder = ResponseBuilder()
     try:
@@ -9,5 +9,8 @@ class CacheHelper:
     def set(self, key, value, timeout=None):
         self.cache.set(key, value, timeout or self.default_timeout)
 
+    def set_many(self, mapping, timeout=None):
+        self.cache.set_many(mapping, timeout or self.default_timeout)
+
     def delete(self, key):
         self.cache.delete(key)
\ No newline at end of file
@@ -0,0 +1,49 @@
+import logging
+
+from marshmallow import ValidationError
+
+from app.mapping import PagosSchema
+from app.services.coreografia import ConsumidorCoreografia, EventoCoreografia, stream_de
+from app.services.pagos_services import PagosService
+
+logger = logging.getLogger(__name__)
+
+pagos_schema = PagosSchema()
+
+
+def _pagar(saga_id, datos):
+    try:
+        pago = pagos_schema.load(datos.get("pago") or {})
+    except ValidationError as err:
+        return EventoCoreografia.PAGO_RECHAZADO, dict(datos, error=err.messages)
+
+    resultado = PagosService().realizar_transaccion(pago)
+    if resultado['code'] == 409:
+        return EventoCoreografia.PAGO_RECHAZADO, dict(datos, error="Transacción fallida: Fondos insuficientes")
+    if resultado['code'] != 200:
+        return EventoCoreografia.PAGO_RECHAZADO, dict(datos, error="Error procesando transacción")
+    logger.info(f"Saga {saga_id}: pago {resultado['data'].id} realizado")
+    return EventoCoreografia.PAGO_REALIZADO, dict(datos, pago_id=resultado['data'].id)
+
+
+def _compensar_pago(saga_id, datos):
+    pago_id = datos.get("pago_id")
+    service = PagosService()
+    # compensar_pago devuelve False tanto si el pago no existe como si falló: si sigue estando, se reintenta
+    if pago_id is not None and not service.compensar_pago(pago_id) and service.find(pago_id) is not None:
+        raise RuntimeError(f"No se pudo compensar el pago {pago_id}")
+    logger.info(f"Saga {saga_id}: pago {pago_id} compensado")
+    return EventoCoreografia.PAGO_COMPENSADO, datos
+
+
+def configurar_coreografia(app):
+    """Suscribe pagos a la saga de compra en modo coreografía, si COREOGRAFIA_HABILITADA."""
+    if not app.config.get('COREOGRAFIA_HABILITADA'):
+        return None
+    return ConsumidorCoreografia(app, "pagos", {
+        stream_de("base"): {EventoCoreografia.COMPRA_SOLICITADA: _pagar},
+        stream_de("compras"): {
+            EventoCoreografia.COMPRA_RECHAZADA: _compensar_pago,
+            EventoCoreografia.COMPRA_COMPENSADA: _compensar_pago,
+        },
+    })
@@ -42,6 +42,42 @@ class PagosService:
             logger.error(f"Error al agregar el pago: {e}")
             return {"status": "error", "code": 500, "data": None}
 
+    def realizar_transacciones(self, pagos: list[Pagos]) -> list[dict]:
+        """
+        Procesa un lote de pagos con una sola conexión a la pasarela. Cada pago se
+        aprueba o rechaza por separado; los aprobados se insertan en una única transacción.
+        Devuelve un resultado por pago, en el mismo orden.
+        """
+        logger.info(f"Procesando lote de {len(pagos)} pagos... Conectando con pasarela...")
+        time.sleep(random.uniform(1, 3))
+
+        resultados = [None] * len(pagos)
+        aprobados = []
+        for indice in range(len(pagos)):
+            if random.random() < 0.2:
+                logger.warning(f"Pago {indice} del lote rechazado por la pasarela de pagos.")
+                resultados[indice] = {"status": "error", "code": 409, "data": None}
+            else:
+                aprobados.append(indice)
+
+        if not aprobados:
+            return resultados
+
+        try:
+            nuevos = self.repository.save_all([pagos[i] for i in aprobados])
+        except Exception as e:
+            logger.error(f"Error al agregar el lote de pagos: {e}")
+            for indice in aprobados:
+                resultados[indice] = {"status": "error", "code": 500, "data": None}
+            return resultados
+
+        for indice, nuevo in zip(aprobados, nuevos):
+            resultados[indice] = {"status": "success", "code": 200, "data": nuevo}
+        self.cache.set_many({f'pagos_{nuevo.id}': nuevo for nuevo in nuevos})
+        self.cache.delete('pagos')
+        logger.info(f"{len(nuevos)} pagos del lote procesados exitosamente.")
+        return resultados
+
     def compensar_pago(self, pago_id: int) -> bool:
         logger.info(f"Iniciando compensación para el pago {pago_id}...")
         
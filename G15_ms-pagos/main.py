@@ -7,6 +7,14 @@ app.app_context().push()
 with app.app_context():
     db.create_all()
 
+
+def iniciar_coreografia(*_):
+    # Con gunicorn se llama en cada worker después del fork: los hilos no sobreviven al fork
+    consumidor = app.extensions.get('coreografia')
+    if consumidor is not None:
+        consumidor.iniciar_workers()
+
+
 if __name__ == "__main__":
     env = os.getenv("FLASK_ENV", "development")
     if env == "production":
@@ -29,7 +37,9 @@ if __name__ == "__main__":
         options = {
             "bind": "0.0.0.0:5002",
             "workers": 3,
+            "post_fork": iniciar_coreografia,
         }
         GunicornApp(app, options).run()
     else:
+        iniciar_coreografia()
         app.run(host="0.0.0.0", port=5002, debug=True)
@@ -0,0 +1,86 @@
+import os
+import unittest
+from unittest import mock
+
+from app import create_app, db, limiter
+from app.models import Pagos
+from app.services import pagos_services
+
+
+class BulkTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _pago(self, producto_id):
+        return {"producto_id": producto_id, "precio": 100.0, "medio_pago": "Tarjeta de credito"}
+
+    def test_bulk_resultado_por_item_en_orden(self):
+        lote = [self._pago(1), {"producto_id": 2, "precio": 50.0, "medio_pago": "corto"}, self._pago(3),
+                self._pago(4)]
+        # La pasarela aprueba el primero y el último y rechaza el tercero
+        with mock.patch.object(pagos_services, 'random') as pasarela:
+            pasarela.uniform.return_value = 0
+            pasarela.random.side_effect = [0.5, 0.1, 0.5]
+            respuesta = self.client.post('/api/v1/pagos/transaccion/bulk', json=lote)
+
+        self.assertEqual(respuesta.status_code, 207)
+        items = respuesta.get_json()['data']
+        self.assertEqual([item['status_code'] for item in items], [201, 422, 409, 201])
+        self.assertIn('medio_pago', items[1]['data'])
+        self.assertEqual(items[0]['data']['producto_id'], 1)
+        self.assertEqual(items[3]['data']['producto_id'], 4)
+        self.assertNotEqual(items[0]['data']['id'], items[3]['data']['id'])
+
+    def test_bulk_una_sola_conexion_a_la_pasarela(self):
+        with mock.patch.object(pagos_services, 'random') as pasarela, \
+                mock.patch.object(pagos_services.time, 'sleep') as demora:
+            pasarela.uniform.return_value = 0
+            pasarela.random.return_value = 0.5
+            respuesta = self.client.post('/api/v1/pagos/transaccion/bulk', json=[self._pago(i) for i in range(5)])
+
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [201] * 5)
+        # La demora de conectarse se paga una vez por lote y la aprobación va por pago
+        self.assertEqual(pasarela.uniform.call_count, 1)
+        self.assertEqual(demora.call_count, 1)
+        self.assertEqual(pasarela.random.call_count, 5)
+        self.assertEqual(Pagos.query.count(), 5)
+
+    def test_bulk_falla_el_insert_y_los_rechazados_siguen_en_409(self):
+        with mock.patch.object(pagos_services, 'random') as pasarela, \
+                mock.patch.object(db.session, 'commit', side_effect=Exception("sin base")):
+            pasarela.uniform.return_value = 0
+            pasarela.random.side_effect = [0.5, 0.1, 0.5]
+            respuesta = self.client.post('/api/v1/pagos/transaccion/bulk', json=[self._pago(i) for i in range(3)])
+
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [500, 409, 500])
+        # Los aprobados iban en una sola transacción: no queda ninguno a medias
+        self.assertEqual(Pagos.query.count(), 0)
+
+    def test_bulk_todos_invalidos(self):
+        with mock.patch.object(pagos_services, 'random') as pasarela:
+            respuesta = self.client.post('/api/v1/pagos/transaccion/bulk', json=[{"producto_id": 1}, {}])
+            pasarela.uniform.assert_not_called()
+
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([item['status_code'] for item in respuesta.get_json()['data']], [422, 422])
+
+    def test_bulk_sin_lista(self):
+        respuesta = self.client.post('/api/v1/pagos/transaccion/bulk', json=self._pago(1))
+        self.assertEqual(respuesta.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import unittest
+import uuid
+from unittest import mock
+
+from app import create_app, db, limiter, redis_client
+from app.models import Pagos
+from app.services import pagos_services
+from app.services.idempotencia import HEADER, HEADER_REPETIDA
+from app.services.json_rapido import dumps
+
+
+class IdempotenciaTestCase(unittest.TestCase):
+    """Un reintento del orquestador con la misma Idempotency-Key no cobra dos veces."""
+
+    def setUp(self):
+        os.environ['FLASK_CONTEXT'] = 'testing'
+        self.app = create_app()
+        self.app.config['IDEMPOTENCIA_ESPERA_S'] = 0.2
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        limiter.enabled = False
+        self.client = self.app.test_client()
+        self.clave = str(uuid.uuid4())
+        self.claves_redis = []
+
+        # Pasarela sin demora que aprueba todo salvo que el test diga lo contrario
+        parche = mock.patch.object(pagos_services, 'random')
+        self.pasarela = parche.start()
+        self.addCleanup(parche.stop)
+        self.pasarela.uniform.return_value = 0
+        self.pasarela.random.return_value = 0.5
+
+    def tearDown(self):
+        for clave in self.claves_redis:
+            redis_client.delete(clave)
+        limiter.enabled = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _post(self, url, cuerpo=None):
+        self.claves_redis.append(f"idempotencia:POST:{url}:{self.clave}")
+        return self.client.post(url, json=cuerpo, headers={HEADER: self.clave})
+
+    def _pagar(self, precio=100.0):
+        return self._post('/api/v1/pagos/transaccion',
+                          {"producto_id": 1, "precio": precio, "medio_pago": "Tarjeta de credito"})
+
+    def test_repite_el_201_sin_cobrar_otra_vez(self):
+        primera = self._pagar()
+        segunda = self._pagar()
+
+        self.assertEqual(primera.status_code, 201)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(segunda.get_json()['data']['id'], primera.get_json()['data']['id'])
+        self.assertEqual(Pagos.query.count(), 1)
+        self.assertEqual(self.pasarela.random.call_count, 1)
+
+    def test_repite_el_rechazo_de_la_pasarela(self):
+        # Un reintento no es otra chance de que la pasarela apruebe
+        self.pasarela.random.return_value = 0.1
+        self.assertEqual(self._pagar().status_code, 409)
+        self.pasarela.random.return_value = 0.5
+
+        segunda = self._pagar()
+        self.assertEqual(segunda.status_code, 409)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(Pagos.query.count(), 0)
+
+    def test_otro_monto_con_la_misma_clave_da_422(self):
+        self._pagar(100.0)
+        respuesta = self._pagar(200.0)
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertEqual(Pagos.query.count(), 1)
+
+    def test_error_al_guardar_no_queda_repetido(self):
+        with mock.patch.object(pagos_services.PagosRepository, 'save', side_effect=Exception("sin base")):
+            self.assertEqual(self._pagar().status_code, 500)
+
+        respuesta = self._pagar()
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertIsNone(respuesta.headers.get(HEADER_REPETIDA))
+        self.assertEqual(Pagos.query.count(), 1)
+
+    def test_compensacion_repetida_devuelve_el_mismo_204(self):
+        pago_id = self.client.post('/api/v1/pagos/transaccion', json={
+            "producto_id": 1, "precio": 100.0, "medio_pago": "Tarjeta de credito"}).get_json()['data']['id']
+        url = f'/api/v1/pagos/{pago_id}/compensacion'
+
+        primera = self._post(url)
+        # Sin la clave, el pago ya borrado daría 404 y la saga creería que la compensación falló
+        segunda = self._post(url)
+        self.assertEqual(primera.status_code, 204)
+        self.assertEqual(segunda.status_code, 204)
+        self.assertEqual(segunda.headers.get(HEADER_REPETIDA), 'true')
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_compensacion_en_curso_devuelve_409(self):
+        url = '/api/v1/pagos/1/compensacion'
+        redis_client.set(f"idempotencia:POST:{url}:{self.clave}",
+                         dumps({"estado": "en_curso", "huella": "", "token": "otro"}), ex=30)
+
+        respuesta = self._post(url)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.headers.get('Retry-After'), '1')
+
+
+if __name__ == '__main__':
+    unittest.main()